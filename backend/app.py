@@ -3,7 +3,17 @@ from dotenv import load_dotenv
 from flask import Flask
 from flask_migrate import Migrate
 from flask_cors import CORS
-from models import db, User, Folder, Deck, Card, Review, AIConversation
+from models import (
+    db,
+    User,
+    Folder,
+    Deck,
+    Card,
+    Review,
+    AIConversation,
+    CardEmbedding,
+    ConversationThread,
+)
 from config import DevelopmentConfig, TestingConfig, ProductionConfig
 from routes.auth import bp_auth
 from routes.folders import bp_folder
@@ -12,6 +22,8 @@ from routes.decks import bp_deck
 from routes.reviews import bp_review
 from routes.analytics import bp_analytics
 from routes.ai import bp_ai
+from routes.library import bp_library
+from routes.sync import bp_sync
 from services.auth_service import jwt_manager
 
 env = os.getenv("FLASK_ENV", "development")
@@ -64,6 +76,8 @@ def create_app(config_name=None):
     app.register_blueprint(bp_review, url_prefix="/review")
     app.register_blueprint(bp_analytics, url_prefix="/analytics")
     app.register_blueprint(bp_ai, url_prefix="/ai")
+    app.register_blueprint(bp_library, url_prefix="/library")
+    app.register_blueprint(bp_sync, url_prefix="/sync")
 
     @app.route("/", methods=["GET"])
     def index():
@@ -0,0 +1,84 @@
+"""
+Benchmark offline cloze card generation on large texts.
+
+Run from the backend directory:
+```
+python -m benchmarks.bench_cloze_generation
+python -m benchmarks.bench_cloze_generation --sentences 50000 --corpus 20000
+```
+
+Texts are random sentences over a Zipf-distributed vocabulary, so a few
+terms are frequent and most are rare, as in real study material. The corpus
+stands for the user's existing cards.
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+from services.cloze_service import CorpusStats, generate_cloze_cards
+
+VOCABULARY_SIZE = 5000
+
+
+def build_vocabulary(rng):
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return [
+        "".join(rng.choices(letters, k=rng.randint(4, 11)))
+        for _ in range(VOCABULARY_SIZE)
+    ]
+
+
+def build_text(rng, vocabulary, cum_weights, num_sentences):
+    sentences = []
+    for _ in range(num_sentences):
+        words = rng.choices(vocabulary, cum_weights=cum_weights, k=rng.randint(8, 25))
+        sentences.append(" ".join(words).capitalize() + ".")
+    return " ".join(sentences)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sentences", type=int, default=10000)
+    parser.add_argument("--corpus", type=int, default=5000)
+    parser.add_argument("--cards", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    vocabulary = build_vocabulary(rng)
+    cum_weights, total = [], 0.0
+    for rank in range(1, VOCABULARY_SIZE + 1):
+        total += 1 / rank
+        cum_weights.append(total)
+
+    text = build_text(rng, vocabulary, cum_weights, args.sentences)
+    documents = [
+        build_text(rng, vocabulary, cum_weights, 2) for _ in range(args.corpus)
+    ]
+
+    start = time.perf_counter()
+    corpus = CorpusStats.from_documents(documents)
+    corpus_ms = (time.perf_counter() - start) * 1000
+
+    print(f"Text: {args.sentences} sentences, {len(text) / 1e6:.1f} MB")
+    print(f"Corpus: {args.corpus} cards, built in {corpus_ms:.1f} ms")
+
+    timings = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        cards = generate_cloze_cards(text, args.cards, "medium", corpus)
+        timings.append(time.perf_counter() - start)
+
+    median = statistics.median(timings)
+    print(f"Generated {len(cards)} cards")
+    print(
+        f"median {median * 1000:.1f} ms, "
+        f"{args.sentences / median:,.0f} sentences/s, "
+        f"{len(text) / median / 1e6:.1f} MB/s"
+    )
+
+
+if __name__ == "__main__":
+    main()
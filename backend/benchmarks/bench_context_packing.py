@@ -0,0 +1,90 @@
+"""
+Benchmark packing a large learner profile into a chat context budget.
+
+Run from the backend directory:
+```
+python -m benchmarks.bench_context_packing
+python -m benchmarks.bench_context_packing --cards 50000 --tokenizer tiktoken:cl100k_base
+```
+
+The first pass counts every fragment (cold cache); later passes hit the
+memoized counts, which is what repeated chats by the same user see.
+"""
+
+import argparse
+import random
+import time
+
+from services.token_service import get_token_counter, pack_context
+
+
+def build_profile(num_cards, seed=0):
+    """Build context sections shaped like AIService.create_compressed_context."""
+    rng = random.Random(seed)
+    words = [
+        "mitochondria",
+        "photosynthesis",
+        "derivative",
+        "integral",
+        "revolution",
+        "treaty",
+        "enzyme",
+        "vector",
+        "matrix",
+        "protein",
+    ]
+    num_decks = max(1, num_cards // 50)
+
+    struggles = [
+        {
+            "question": " ".join(rng.choices(words, k=12)) + "?",
+            "avg_score": round(rng.uniform(0, 70), 2),
+            "topic": f"Deck {rng.randrange(num_decks)}",
+        }
+        for _ in range(num_cards)
+    ]
+    gaps = [
+        {"topic": f"Deck {deck}", "completion_rate": rng.uniform(0, 100)}
+        for deck in range(num_decks)
+    ]
+    mastered = [f"Deck {deck}" for deck in range(num_decks)]
+
+    return [
+        ("study_stats", {"total_reviews": num_cards * 3, "avg_score": 71.5}),
+        ("recent_struggles", sorted(struggles, key=lambda x: x["avg_score"])),
+        ("focus_areas", sorted(gaps, key=lambda x: x["completion_rate"])),
+        ("mastered_topics", mastered),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--cards", type=int, default=10000)
+    parser.add_argument("--budget", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--tokenizer", default="heuristic")
+    args = parser.parse_args()
+
+    counter = get_token_counter(args.tokenizer)
+    sections = build_profile(args.cards)
+
+    print(f"Tokenizer: {counter.name}")
+    print(f"Profile: {args.cards} cards, budget {args.budget} tokens")
+
+    for run in range(1, args.repeat + 1):
+        start = time.perf_counter()
+        context, used = pack_context(sections, args.budget, counter)
+        elapsed = (time.perf_counter() - start) * 1000
+        packed = sum(len(v) for v in context.values() if isinstance(v, list))
+        label = "cold" if run == 1 else "warm"
+        print(
+            f"run {run} ({label}): {elapsed:8.2f} ms, "
+            f"{used} tokens used, {packed} items packed"
+        )
+
+    info = counter.cache_info()
+    print(f"Token cache: {info.hits} hits, {info.misses} misses")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Benchmark full-text search over AI conversations.
+
+Run from the backend directory:
+```
+python -m benchmarks.bench_conversation_search
+python -m benchmarks.bench_conversation_search --conversations 100000 --users 1
+```
+
+Conversations are random Zipf-distributed text spread over ``--users``
+users and searched for one of them. Latencies are measured through
+ConversationService on a SQLite file.
+"""
+
+import argparse
+import itertools
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from app import create_app
+from models import AIConversation, User, db
+from services.conversation_service import ConversationService
+
+WORDS = (
+    "photosynthesis mitochondria derivative integral revolution treaty enzyme "
+    "vector matrix protein review practice memory schedule chapter exam focus "
+    "concept example summary question answer energy reaction theorem proof"
+).split()
+# Natural text follows Zipf's law: a few very common words, a long tail
+VOCABULARY = WORDS + [f"term{n}" for n in range(5000)]
+CUM_WEIGHTS = list(
+    itertools.accumulate(1 / rank for rank in range(1, len(VOCABULARY) + 1))
+)
+
+
+def sentence(rng, length):
+    return (
+        " ".join(
+            rng.choices(VOCABULARY, cum_weights=CUM_WEIGHTS, k=length)
+        ).capitalize()
+        + "."
+    )
+
+
+def populate(num_conversations, num_users, seed=0):
+    rng = random.Random(seed)
+    users = [
+        User(
+            full_name=f"User {n}",
+            username=f"user{n}",
+            email=f"user{n}@example.com",
+            password_hash="hashed_password",
+        )
+        for n in range(num_users)
+    ]
+    db.session.add_all(users)
+    db.session.commit()
+    user_ids = [user.id for user in users]
+
+    rows = [
+        {
+            "user_query": sentence(rng, 10),
+            "ai_response": " ".join(sentence(rng, 15) for _ in range(6)),
+            "user_id": user_ids[n % num_users],
+        }
+        for n in range(num_conversations)
+    ]
+    db.session.execute(db.insert(AIConversation), rows)
+    db.session.commit()
+    return user_ids[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--conversations", type=int, default=100000)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--searches", type=int, default=200)
+    args = parser.parse_args()
+
+    db_fd, db_path = tempfile.mkstemp(suffix=".db")
+    app = create_app("testing")
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{db_path}"
+
+    try:
+        with app.app_context():
+            db.create_all()
+            start = time.perf_counter()
+            user_id = populate(args.conversations, args.users)
+            print(
+                f"Indexed {args.conversations} conversations for {args.users} "
+                f"users in {time.perf_counter() - start:.1f} s"
+            )
+
+            rng = random.Random(1)
+            timings = []
+            for _ in range(args.searches):
+                # Mix the most common words with words from the tail
+                query = " ".join(
+                    rng.sample(WORDS, rng.choice((1, 2)))
+                    + [f"term{rng.randrange(500)}"] * rng.choice((0, 1))
+                )
+                start = time.perf_counter()
+                ConversationService.search_conversations(user_id, query, limit=10)
+                timings.append((time.perf_counter() - start) * 1000)
+
+            timings.sort()
+            p95 = timings[int(len(timings) * 0.95) - 1]
+            print(
+                f"{args.searches} searches: median {statistics.median(timings):.2f} ms, "
+                f"p95 {p95:.2f} ms, max {timings[-1]:.2f} ms"
+            )
+            db.drop_all()
+    finally:
+        os.close(db_fd)
+        os.unlink(db_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Benchmark cloning a large deck into another folder.
+
+Run from the backend directory:
+```
+python -m benchmarks.bench_deck_clone
+python -m benchmarks.bench_deck_clone --rows 100000 --reset
+```
+
+The cards are copied by one INSERT ... SELECT, so the time should grow
+with the rows the database writes, not with Python work per card.
+"""
+
+import argparse
+import time
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from app import create_app
+from config import TestingConfig
+from models import Card, Deck, Folder, User, db
+from services.counter_service import CounterService
+from services.crud_service import CRUDService
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--copies", type=int, default=5)
+    parser.add_argument(
+        "--reset", action="store_true", help="reset the review state of the copies"
+    )
+    args = parser.parse_args()
+
+    TestingConfig.SQLALCHEMY_RECORD_QUERIES = False
+    app = create_app("testing")
+
+    with app.app_context():
+        db.create_all()
+        user = User(
+            full_name="Benchmark",
+            username="benchmark",
+            email="benchmark@example.com",
+            password_hash="x",
+        )
+        db.session.add(user)
+        db.session.flush()
+        folder = Folder(name="Templates", user_id=user.id)
+        db.session.add(folder)
+        db.session.flush()
+        deck = Deck(name="Template", folder_id=folder.id, user_id=user.id)
+        db.session.add(deck)
+        db.session.flush()
+        now = datetime.utcnow()
+        db.session.execute(
+            insert(Card),
+            [
+                {
+                    "question": f"What is term {number}?",
+                    "answer": f"Definition {number}",
+                    "difficulty_level": "medium",
+                    "next_review_at": now,
+                    "review_count": 0,
+                    "is_fully_reviewed": False,
+                    "deck_id": deck.id,
+                    "user_id": user.id,
+                }
+                for number in range(args.rows)
+            ],
+        )
+        db.session.commit()
+        deck_id, user_id = deck.id, user.id
+        CounterService.repair(user_id)
+
+        timings = []
+        for number in range(args.copies):
+            target = Folder(name=f"Class {number}", user_id=user_id)
+            db.session.add(target)
+            db.session.commit()
+            target_id = target.id
+            db.session.expunge_all()
+
+            start = time.perf_counter()
+            copy = CRUDService.clone_deck(
+                deck_id, target_id, user_id, reset_review=args.reset
+            )["data"]
+            timings.append(time.perf_counter() - start)
+            assert copy["card_count"] == args.rows
+
+        best, worst = min(timings), max(timings)
+        print(f"Cloned a {args.rows}-card deck {args.copies} times")
+        print(
+            f"best {best * 1000:.0f} ms, worst {worst * 1000:.0f} ms, "
+            f"{args.rows / best:,.0f} cards/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
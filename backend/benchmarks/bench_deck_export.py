@@ -0,0 +1,106 @@
+"""
+Benchmark streaming a large deck export.
+
+Run from the backend directory:
+```
+python -m benchmarks.bench_deck_export
+python -m benchmarks.bench_deck_export --rows 500000 --format csv
+python -m benchmarks.bench_deck_export --trace-memory
+```
+
+The export is consumed chunk by chunk the way the web server writes it to
+the client, so the peak memory reported does not include the file itself
+and should stay flat as --rows grows.
+"""
+
+import argparse
+import time
+import tracemalloc
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from app import create_app
+from config import TestingConfig
+from models import Card, Deck, Folder, User, db
+from services.export_service import FORMATS, ExportService
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--format", choices=FORMATS, default="jsonl")
+    parser.add_argument("--batch-size", type=int, default=ExportService.BATCH_SIZE)
+    parser.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="report the peak memory allocated by the export (much slower)",
+    )
+    args = parser.parse_args()
+
+    # Recorded queries keep every statement's parameters until the app
+    # context ends, which would hide the exporter's own memory use
+    TestingConfig.SQLALCHEMY_RECORD_QUERIES = False
+    ExportService.BATCH_SIZE = args.batch_size
+    app = create_app("testing")
+
+    with app.app_context():
+        db.create_all()
+        user = User(
+            full_name="Benchmark",
+            username="benchmark",
+            email="benchmark@example.com",
+            password_hash="x",
+        )
+        db.session.add(user)
+        db.session.flush()
+        folder = Folder(name="Exports", user_id=user.id)
+        db.session.add(folder)
+        db.session.flush()
+        deck = Deck(name="Exported", folder_id=folder.id, user_id=user.id)
+        db.session.add(deck)
+        db.session.flush()
+        now = datetime.utcnow()
+        db.session.execute(
+            insert(Card),
+            [
+                {
+                    "question": f"What is term {number}?",
+                    "answer": f"Definition, {number}",
+                    "difficulty_level": "medium",
+                    "next_review_at": now,
+                    "review_count": 0,
+                    "is_fully_reviewed": False,
+                    "deck_id": deck.id,
+                    "user_id": user.id,
+                }
+                for number in range(args.rows)
+            ],
+        )
+        db.session.commit()
+        deck_id, user_id = deck.id, user.id
+        db.session.expunge_all()
+
+        if args.trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        export = ExportService.export_deck(deck_id, user_id, args.format)["data"]
+        size = chunks = 0
+        for chunk in export["chunks"]:
+            size += len(chunk)
+            chunks += 1
+        elapsed = time.perf_counter() - start
+
+        print(
+            f"Exported {args.rows} cards as {args.format}: {size / 1e6:.1f} MB "
+            f"in {chunks} chunks of up to {args.batch_size} rows"
+        )
+        print(f"{elapsed:.2f} s, {args.rows / elapsed:,.0f} rows/s")
+        if args.trace_memory:
+            peak = tracemalloc.get_traced_memory()[1] / 1e6
+            tracemalloc.stop()
+            print(f"Peak memory allocated while exporting: {peak:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark importing a large CSV into a deck.
+
+Run from the backend directory:
+```
+python -m benchmarks.bench_deck_import
+python -m benchmarks.bench_deck_import --rows 500000 --batch-size 2000
+python -m benchmarks.bench_deck_import --trace-memory
+```
+
+The file is generated to a temporary file and streamed from disk, the way
+an upload spooled by the web server is read. A tenth of the rows repeat an
+earlier question, so the duplicate checks see real hits.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from app import create_app
+from config import TestingConfig
+from models import Card, Deck, Folder, User, db
+from services.import_service import ImportService
+
+
+def write_csv(path, num_rows):
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("question,answer,difficulty\n")
+        for number in range(num_rows):
+            question = number if number % 10 else number // 2
+            file.write(f'"What is term {question}?","Definition, {number}",easy\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--batch-size", type=int, default=ImportService.BATCH_SIZE)
+    parser.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="report the peak memory allocated by the import (much slower)",
+    )
+    args = parser.parse_args()
+
+    # Recorded queries keep every batch's parameters until the app context
+    # ends, which would hide the importer's own memory use
+    TestingConfig.SQLALCHEMY_RECORD_QUERIES = False
+    ImportService.BATCH_SIZE = args.batch_size
+    app = create_app("testing")
+
+    with app.app_context(), tempfile.TemporaryDirectory() as directory:
+        db.create_all()
+        user = User(
+            full_name="Benchmark",
+            username="benchmark",
+            email="benchmark@example.com",
+            password_hash="x",
+        )
+        db.session.add(user)
+        db.session.flush()
+        folder = Folder(name="Imports", user_id=user.id)
+        db.session.add(folder)
+        db.session.flush()
+        deck = Deck(name="Imported", folder_id=folder.id, user_id=user.id)
+        db.session.add(deck)
+        db.session.commit()
+
+        path = os.path.join(directory, "cards.csv")
+        write_csv(path, args.rows)
+        size = os.path.getsize(path) / 1e6
+
+        if args.trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        with open(path, "rb") as stream:
+            summary = ImportService.import_cards(stream, deck.id, user.id)["data"]
+        elapsed = time.perf_counter() - start
+
+        count = Card.query.filter_by(deck_id=deck.id).count()
+
+        print(f"File: {args.rows} rows, {size:.1f} MB, batches of {args.batch_size}")
+        print(
+            f"Inserted {summary['inserted']}, duplicates {summary['duplicates']}, "
+            f"invalid {summary['invalid']} ({count} cards in the deck)"
+        )
+        print(f"{elapsed:.2f} s, {args.rows / elapsed:,.0f} rows/s")
+        if args.trace_memory:
+            peak = tracemalloc.get_traced_memory()[1] / 1e6
+            tracemalloc.stop()
+            print(f"Peak memory allocated while importing: {peak:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,48 @@ class BaseConfig:
     JWT_ALGORITHM = "HS256"
     # Default Redis URL
     REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+    # Background AI generation jobs ("thread" runs in-process, "redis" needs workers)
+    AI_JOB_BACKEND = os.getenv("AI_JOB_BACKEND", "thread")
+    AI_JOB_MAX_CONCURRENCY = int(os.getenv("AI_JOB_MAX_CONCURRENCY", 4))
+    AI_JOB_MAX_PER_USER = int(os.getenv("AI_JOB_MAX_PER_USER", 2))
+    AI_JOB_MAX_PENDING = int(os.getenv("AI_JOB_MAX_PENDING", 100))
+    AI_JOB_RESULT_TTL = int(os.getenv("AI_JOB_RESULT_TTL", 3600))
+    # Seconds a Redis job may wait or run without progress before its slots
+    # are freed, so a crashed worker cannot hold them for good
+    AI_JOB_TTL = int(os.getenv("AI_JOB_TTL", 3600))
+    # Cosine similarity above which a card question counts as a near-duplicate
+    NEAR_DUPLICATE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", 0.9))
+    NEAR_DUPLICATE_TOP_K = int(os.getenv("NEAR_DUPLICATE_TOP_K", 3))
+    # Tokenizer used for prompt budgeting: "tiktoken:<encoding>", "hf:<model>"
+    # or "heuristic"; falls back to the heuristic if it cannot be loaded
+    AI_TOKENIZER = os.getenv("AI_TOKENIZER", "tiktoken:cl100k_base")
+    # Shared Gemini client: endpoint override, concurrency, deadline (seconds),
+    # retries and circuit breaker (failures to open, seconds before a trial)
+    GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+    GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL")
+    GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", 8))
+    GEMINI_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", 30))
+    GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", 3))
+    GEMINI_BREAKER_THRESHOLD = int(os.getenv("GEMINI_BREAKER_THRESHOLD", 5))
+    GEMINI_BREAKER_RESET = float(os.getenv("GEMINI_BREAKER_RESET", 30))
+    # AI token budgets (token buckets refilled every minute): "memory" keeps
+    # them per process, "redis" shares them between processes
+    AI_RATE_LIMIT_BACKEND = os.getenv("AI_RATE_LIMIT_BACKEND", "memory")
+    AI_USER_TOKENS_PER_MINUTE = int(os.getenv("AI_USER_TOKENS_PER_MINUTE", 20000))
+    AI_GLOBAL_TOKENS_PER_MINUTE = int(
+        os.getenv("AI_GLOBAL_TOKENS_PER_MINUTE", 500000)
+    )
+    # Cards retrieved for a chat question and the similarity they need
+    RAG_TOP_K = int(os.getenv("RAG_TOP_K", 8))
+    RAG_MIN_SIMILARITY = float(os.getenv("RAG_MIN_SIMILARITY", 0.3))
+    # Most cards accepted by one bulk create request
+    CARD_BULK_MAX = int(os.getenv("CARD_BULK_MAX", 5000))
+    # Seconds of changes a sync sends again, to cover clock skew between
+    # servers and transactions that commit after a sync has read past them
+    SYNC_OVERLAP_SECONDS = int(os.getenv("SYNC_OVERLAP_SECONDS", 300))
+    # Seconds deleted rows are kept, so syncing clients see them go, before
+    # `flask purge-deleted` may remove them; older sync tokens are refused
+    PURGE_AFTER_SECONDS = int(os.getenv("PURGE_AFTER_SECONDS", 30 * 24 * 3600))
 
 
 class DevelopmentConfig(BaseConfig):
@@ -58,3 +100,4 @@ class TestingConfig(BaseConfig):
     JWT_SECRET_KEY = "test-jwt-secret-key-123"
     REDIS_URL = "redis://localhost:6379/2"
     WTF_CSRF_ENABLED = False
+    AI_TOKENIZER = "heuristic"
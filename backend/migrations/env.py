@@ -90,9 +90,18 @@ def run_migrations_online():
                 directives[:] = []
                 logger.info('No changes in schema detected.')
 
+    # full-text search tables, triggers and columns are created by DDL events
+    # (see models/ai.py), so autogenerate must not try to drop them
+    def include_object(object, name, type_, reflected, compare_to):
+        if reflected and compare_to is None:
+            return "_fts" not in name and name != "search_vector"
+        return True
+
     conf_args = current_app.extensions['migrate'].configure_args
     if conf_args.get("process_revision_directives") is None:
         conf_args["process_revision_directives"] = process_revision_directives
+    if conf_args.get("include_object") is None:
+        conf_args["include_object"] = include_object
 
     connectable = get_engine()
 
@@ -4,6 +4,16 @@ from models.folder import Folder
 from models.deck import Deck
 from models.card import Card
 from models.review import Review
-from models.ai import AIConversation
+from models.ai import AIConversation, CardEmbedding, ConversationThread
 
-__all__ = ["db", "User", "Folder", "Deck", "Card", "Review", "AIConversation"]
+__all__ = [
+    "db",
+    "User",
+    "Folder",
+    "Deck",
+    "Card",
+    "Review",
+    "AIConversation",
+    "CardEmbedding",
+    "ConversationThread",
+]
@@ -1,4 +1,4 @@
-from models.base import db
+from models.base import db, add_missing_columns
 from typing import List
 import datetime
 import uuid
@@ -13,6 +13,10 @@ from sqlalchemy import (
     DateTime,
     Boolean,
     UniqueConstraint,
+    LargeBinary,
+    Index,
+    event,
+    inspect,
 )
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.ext.declarative import declared_attr
@@ -20,7 +24,45 @@ from sqlalchemy.sql import func
 from sqlalchemy.dialects.sqlite import JSON
 
 
+class ConversationThread(db.Model):
+    """Table to store chat threads made of several AI conversations (turns)
+
+    Attributes:
+        - id (int)
+        - title (string): start of the first question of the thread
+        - summary (text): running summary of the turns folded out of the prompt
+        - summarized_through_id (int): id of the last turn included in the summary
+        - user_id (string): foreign key that refers to the User model (many-to-one)
+        - conversations (list): one-to-many relationship with the AIConversation model
+    """
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    title: Mapped[str] = mapped_column(String(255), nullable=False)
+    summary: Mapped[str] = mapped_column(Text, nullable=True)
+    summarized_through_id: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0, server_default="0"
+    )
+
+    user_id: Mapped[str] = mapped_column(
+        ForeignKey("user.id"), nullable=False, index=True
+    )
+
+    conversations: Mapped[List["AIConversation"]] = relationship(
+        back_populates="thread", cascade="all, delete-orphan"
+    )
+
+    def __repr__(self):
+        return f"<ConversationThread id={self.id} user_id={self.user_id}>"
+
+
 class AIConversation(db.Model):
+    # History is listed per user, newest first, with a keyset on id; the turns
+    # of a thread are read in order with (thread_id, id)
+    __table_args__ = (
+        Index("ix_aiconversation_user_id_id", "user_id", "id"),
+        Index("ix_aiconversation_thread_id_id", "thread_id", "id"),
+    )
+
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     user_query: Mapped[str] = mapped_column(Text, nullable=False)
     ai_response: Mapped[str] = mapped_column(Text, nullable=False)
@@ -29,5 +71,146 @@ class AIConversation(db.Model):
     user_id: Mapped[str] = mapped_column(ForeignKey("user.id"), nullable=False)
     user: Mapped["User"] = relationship("User", back_populates="aiconversations")
 
+    # Many-to-one relationship with the ConversationThread model (optional)
+    thread_id: Mapped[int] = mapped_column(
+        ForeignKey("conversationthread.id"), nullable=True
+    )
+    thread: Mapped["ConversationThread"] = relationship(back_populates="conversations")
+
     def __repr__(self):
         return f"<AIConversation id={self.id} user_id={self.user_id}>"
+
+
+class CardEmbedding(db.Model):
+    """Table to store the embedding of each card used for chat retrieval
+
+    Attributes:
+        - card_id (int): primary key and foreign key that refers to the Card model (one-to-one)
+        - user_id (string): owner of the card, so a user's vectors load without joins
+        - content_hash (string): hash of the embedded text and model, a mismatch means the vector is stale
+        - vector (bytes): float32 embedding
+    """
+
+    card_id: Mapped[int] = mapped_column(
+        ForeignKey("card.id", ondelete="CASCADE"), primary_key=True
+    )
+    user_id: Mapped[str] = mapped_column(
+        ForeignKey("user.id"), nullable=False, index=True
+    )
+    content_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    vector: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+
+    def __repr__(self):
+        return f"<CardEmbedding card_id={self.card_id} user_id={self.user_id}>"
+
+
+# Full-text search over conversations. SQLite gets an FTS5 table that mirrors
+# aiconversation through triggers, with user_id indexed too so the owner is
+# filtered inside the MATCH; PostgreSQL a generated tsvector column with a GIN
+# index. Both are created with the table (and by ``rebuild-search-index``
+# for databases created before).
+SQLITE_CONVERSATION_SEARCH_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS aiconversation_fts USING fts5(
+        user_query, ai_response, user_id,
+        content='aiconversation', content_rowid='id',
+        tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS aiconversation_fts_insert
+    AFTER INSERT ON aiconversation BEGIN
+        INSERT INTO aiconversation_fts (rowid, user_query, ai_response, user_id)
+        VALUES (new.id, new.user_query, new.ai_response, new.user_id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS aiconversation_fts_delete
+    AFTER DELETE ON aiconversation BEGIN
+        INSERT INTO aiconversation_fts (
+            aiconversation_fts, rowid, user_query, ai_response, user_id
+        )
+        VALUES ('delete', old.id, old.user_query, old.ai_response, old.user_id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS aiconversation_fts_update
+    AFTER UPDATE OF user_query, ai_response, user_id ON aiconversation BEGIN
+        INSERT INTO aiconversation_fts (
+            aiconversation_fts, rowid, user_query, ai_response, user_id
+        )
+        VALUES ('delete', old.id, old.user_query, old.ai_response, old.user_id);
+        INSERT INTO aiconversation_fts (rowid, user_query, ai_response, user_id)
+        VALUES (new.id, new.user_query, new.ai_response, new.user_id);
+    END
+    """,
+]
+
+POSTGRES_CONVERSATION_SEARCH_DDL = [
+    """
+    ALTER TABLE aiconversation ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(user_query, '')), 'A')
+        || setweight(to_tsvector('english', coalesce(ai_response, '')), 'B')
+    ) STORED
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS ix_aiconversation_search_vector
+    ON aiconversation USING GIN (search_vector)
+    """,
+]
+
+
+def create_conversation_search_index(connection, rebuild=False):
+    """Create the conversation search index for the connection's database.
+
+    With ``rebuild`` the SQLite index is refilled from the table, for
+    databases that had conversations before the index existed.
+    """
+    dialect = connection.dialect.name
+    if dialect == "sqlite":
+        for statement in SQLITE_CONVERSATION_SEARCH_DDL:
+            connection.exec_driver_sql(statement)
+        if rebuild:
+            connection.exec_driver_sql(
+                "INSERT INTO aiconversation_fts (aiconversation_fts) VALUES ('rebuild')"
+            )
+    elif dialect == "postgresql":
+        for statement in POSTGRES_CONVERSATION_SEARCH_DDL:
+            connection.exec_driver_sql(statement)
+
+
+@event.listens_for(AIConversation.__table__, "after_create")
+def _create_conversation_search_index(target, connection, **kw):
+    create_conversation_search_index(connection)
+
+
+@event.listens_for(AIConversation.__table__, "before_drop")
+def _drop_conversation_search_index(target, connection, **kw):
+    if connection.dialect.name == "sqlite":
+        connection.exec_driver_sql("DROP TABLE IF EXISTS aiconversation_fts")
+
+
+def add_conversation_threads(connection):
+    """Add chat threads to an existing database.
+
+    For databases created before conversations were grouped into threads:
+    the conversationthread table is created, and aiconversation gets its
+    thread_id column and the index its turns are read with. Earlier
+    conversations stay outside any thread. Running it again adds nothing.
+
+    Returns:
+        list: Tables and "table.column" columns added
+    """
+    added = []
+    if not inspect(connection).has_table(ConversationThread.__tablename__):
+        ConversationThread.__table__.create(connection)
+        added.append(ConversationThread.__tablename__)
+    table = AIConversation.__table__
+    added += [
+        f"{table.name}.{name}"
+        for name in add_missing_columns(connection, table, ["thread_id"])
+    ]
+    for index in table.indexes:
+        index.create(connection, checkfirst=True)
+    return added
@@ -12,7 +12,9 @@ from sqlalchemy import (
     Boolean,
     UniqueConstraint,
 )
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy import event, inspect
+from sqlalchemy.schema import CreateColumn
+from sqlalchemy.orm import Mapped, Session, mapped_column, relationship, with_loader_criteria
 from sqlalchemy.ext.declarative import declared_attr
 from sqlalchemy.sql import func
 from sqlalchemy.dialects.sqlite import JSON
@@ -25,8 +27,9 @@ class Base:
         - Column definitions that define the structure of the table (descriptors)
             Datetimes are calculated from the server side using func.now()
             created_at: the date and time that an object is created
-            deleted_at: the date and time that an object is deleted
-            updated_at: the date and time that an object is updated
+            deleted_at: the date and time that an object is deleted; deleted rows
+                are left out of every query until they are purged
+            updated_at: the date and time that an object is created or last updated
         - Class-level attribute:
             Table name are all lowercase across tables (because the table names
             are the property unique to each subclass, not shared as a single instance)
@@ -34,11 +37,51 @@ class Base:
 
     created_at: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
     deleted_at: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=True), nullable=True)
-    updated_at: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=True), nullable=True, onupdate=func.now())
+    updated_at: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=True), nullable=True, server_default=func.now(), onupdate=func.now())
 
     @declared_attr
     def __tablename__(cls):
         return cls.__name__.lower()
 
 
-db = SQLAlchemy(model_class=Base)
\ No newline at end of file
+db = SQLAlchemy(model_class=Base)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _hide_deleted(execute_state):
+    """Leave soft-deleted rows out of every ORM select, joins and relationship
+    loads included, unless the statement has the include_deleted execution option."""
+    if (
+        execute_state.is_select
+        and not execute_state.is_column_load
+        and not execute_state.execution_options.get("include_deleted", False)
+    ):
+        execute_state.statement = execute_state.statement.options(
+            with_loader_criteria(Base, lambda cls: cls.deleted_at.is_(None), include_aliases=True)
+        )
+
+
+def add_missing_columns(connection, table, names):
+    """Add columns of a model's table that an existing database does not have.
+
+    Each column is added as the model declares it (type, default, nullability
+    and foreign key), so a database created before the column existed ends up
+    like a new one. Columns already there are left alone.
+
+    Returns:
+        list: Names of the columns added
+    """
+    preparer = connection.dialect.identifier_preparer
+    existing = {column["name"] for column in inspect(connection).get_columns(table.name)}
+    added = []
+    for name in names:
+        if name in existing:
+            continue
+        column = table.c[name]
+        definition = str(CreateColumn(column).compile(dialect=connection.dialect))
+        for foreign_key in column.foreign_keys:
+            target = foreign_key.column
+            definition += f" REFERENCES {preparer.format_table(target.table)} ({preparer.quote(target.name)})"
+        connection.exec_driver_sql(f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {definition}")
+        added.append(name)
+    return added
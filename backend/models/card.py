@@ -1,6 +1,10 @@
 from models.base import db
+from models.deck import Deck
+from models.folder import Folder
+from models.review import Review
 from typing import List
 import datetime
+import re
 import uuid
 from typing import List
 from flask_sqlalchemy import SQLAlchemy
@@ -13,6 +17,10 @@ from sqlalchemy import (
     DateTime,
     Boolean,
     UniqueConstraint,
+    Index,
+    text,
+    event,
+    inspect,
 )
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.ext.declarative import declared_attr
@@ -20,6 +28,14 @@ from sqlalchemy.sql import func
 from sqlalchemy.dialects.sqlite import JSON
 
 
+def _deck_owner(context):
+    # Default owner of a new card: the owner of its deck
+    return context.connection.execute(
+        text("SELECT user_id FROM deck WHERE id = :id"),
+        {"id": context.get_current_parameters()["deck_id"]},
+    ).scalar()
+
+
 class Card(db.Model):
     """Table to store cards belong to each folder
 
@@ -34,10 +50,33 @@ class Card(db.Model):
         - last_reviewed (datetime): Each time the card is reviewed, this column will be updated and used to calculate the next due date to review the card
         - deck_id (int): foreign key that refers to the Folder model (many-to-one)
         - deck (string): relationship with the Folder model
+        - user_id (uuid): owner of the deck, copied here so ownership is checked
+            without joining deck and folder; filled in from the deck when not given
     """
 
     __table_args__ = (
-        UniqueConstraint("deck_id", "question", name="uix_deck_card_question"),
+        # Live cards only, so a deleted card's question can be used again
+        Index(
+            "uix_deck_card_question",
+            "deck_id",
+            "question",
+            unique=True,
+            sqlite_where=text("deleted_at IS NULL"),
+            postgresql_where=text("deleted_at IS NULL"),
+        ),
+        # Due cards of a deck, and its cards in review order
+        Index("ix_card_deck_next_review", "deck_id", "next_review_at"),
+        # Cards of a deck changed since a sync
+        Index("ix_card_deck_updated", "deck_id", "updated_at"),
+        # Owner checks by primary key, and a user's cards without a join
+        Index("ix_card_user_id", "user_id", "id"),
+        # Deleted cards waiting to be purged
+        Index(
+            "ix_card_deleted",
+            "deleted_at",
+            sqlite_where=text("deleted_at IS NOT NULL"),
+            postgresql_where=text("deleted_at IS NOT NULL"),
+        ),
     )
 
     # Input created by the user
@@ -64,6 +103,12 @@ class Card(db.Model):
     deck_id: Mapped[int] = mapped_column(Integer, ForeignKey("deck.id"), nullable=False)
     deck: Mapped["Deck"] = relationship(back_populates="cards")
 
+    # Denormalized owner, the same as deck.user_id; cards only move between
+    # decks of one user, so it never changes
+    user_id: Mapped[str] = mapped_column(
+        ForeignKey("user.id"), nullable=False, default=_deck_owner
+    )
+
     # One-to-many relationship with the Review model
     reviews: Mapped[List["Review"]] = relationship(
         "Review", back_populates="card", cascade="all, delete-orphan"
@@ -71,3 +116,204 @@ class Card(db.Model):
 
     def __repr__(self):
         return f"<Card id={self.id} question={self.question} deck_id={self.deck_id}>"
+
+
+# Full-text search over cards, like the conversation search in models.ai:
+# SQLite gets an FTS5 table that mirrors card through triggers, with prefix
+# indexes for search as you type; PostgreSQL a generated tsvector column with
+# a GIN index. The owner is checked with card.user_id.
+SQLITE_CARD_SEARCH_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS card_fts USING fts5(
+        question, answer,
+        content='card', content_rowid='id',
+        tokenize='porter unicode61', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS card_fts_insert
+    AFTER INSERT ON card BEGIN
+        INSERT INTO card_fts (rowid, question, answer)
+        VALUES (new.id, new.question, new.answer);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS card_fts_delete
+    AFTER DELETE ON card BEGIN
+        INSERT INTO card_fts (card_fts, rowid, question, answer)
+        VALUES ('delete', old.id, old.question, old.answer);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS card_fts_update
+    AFTER UPDATE OF question, answer ON card BEGIN
+        INSERT INTO card_fts (card_fts, rowid, question, answer)
+        VALUES ('delete', old.id, old.question, old.answer);
+        INSERT INTO card_fts (rowid, question, answer)
+        VALUES (new.id, new.question, new.answer);
+    END
+    """,
+]
+
+POSTGRES_CARD_SEARCH_DDL = [
+    """
+    ALTER TABLE card ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(question, '')), 'A')
+        || setweight(to_tsvector('english', coalesce(answer, '')), 'B')
+    ) STORED
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS ix_card_search_vector
+    ON card USING GIN (search_vector)
+    """,
+]
+
+
+def create_card_search_index(connection, rebuild=False):
+    """Create the card search index for the connection's database.
+
+    With ``rebuild`` the SQLite index is refilled from the table, for
+    databases that had cards before the index existed.
+    """
+    dialect = connection.dialect.name
+    if dialect == "sqlite":
+        for statement in SQLITE_CARD_SEARCH_DDL:
+            connection.exec_driver_sql(statement)
+        if rebuild:
+            connection.exec_driver_sql(
+                "INSERT INTO card_fts (card_fts) VALUES ('rebuild')"
+            )
+    elif dialect == "postgresql":
+        for statement in POSTGRES_CARD_SEARCH_DDL:
+            connection.exec_driver_sql(statement)
+
+
+@event.listens_for(Card.__table__, "after_create")
+def _create_card_search_index(target, connection, **kw):
+    create_card_search_index(connection)
+
+
+@event.listens_for(Card.__table__, "before_drop")
+def _drop_card_search_index(target, connection, **kw):
+    if connection.dialect.name == "sqlite":
+        connection.exec_driver_sql("DROP TABLE IF EXISTS card_fts")
+
+
+# Owner columns of deck and card, each filled from its parent, parents first
+_OWNER_COLUMNS = [
+    (
+        "deck",
+        "SELECT folder.user_id FROM folder WHERE folder.id = deck.folder_id",
+        "ix_deck_user_id",
+    ),
+    (
+        "card",
+        "SELECT deck.user_id FROM deck WHERE deck.id = card.deck_id",
+        "ix_card_user_id",
+    ),
+]
+
+
+def backfill_owners(connection):
+    """Add and fill deck.user_id and card.user_id on an existing database.
+
+    For databases created before decks and cards stored their owner: each
+    column is added as nullable, filled from its parent (folder, then deck)
+    with one UPDATE, indexed, and on PostgreSQL made NOT NULL. SQLite cannot
+    add the constraint to an existing column; the model's default keeps new
+    rows filled there. Running it again only fills rows still missing an
+    owner.
+
+    Returns:
+        dict: Number of rows filled per table
+    """
+    filled = {}
+    for table, owner, index in _OWNER_COLUMNS:
+        columns = {column["name"] for column in inspect(connection).get_columns(table)}
+        if "user_id" not in columns:
+            connection.exec_driver_sql(
+                f'ALTER TABLE {table} ADD COLUMN user_id VARCHAR(36) REFERENCES "user" (id)'
+            )
+        filled[table] = connection.exec_driver_sql(
+            f"UPDATE {table} SET user_id = ({owner}) WHERE user_id IS NULL"
+        ).rowcount
+        connection.exec_driver_sql(
+            f"CREATE INDEX IF NOT EXISTS {index} ON {table} (user_id, id)"
+        )
+        if connection.dialect.name == "postgresql":
+            connection.exec_driver_sql(
+                f"ALTER TABLE {table} ALTER COLUMN user_id SET NOT NULL"
+            )
+    return filled
+
+
+# Unique constraints of databases created before soft delete, each replaced
+# by the model's unique index over live rows of the same name
+_LIVE_UNIQUE_INDEXES = {
+    "folder": "uix_user_folder_name",
+    "deck": "uix_folder_deck_name",
+    "card": "uix_deck_card_question",
+}
+
+
+def _rebuild_sqlite_table(connection, table, constraint):
+    # SQLite cannot drop a constraint: the table is copied to one created
+    # from its own DDL without it, rows and ids included, and swapped in
+    ddl = connection.exec_driver_sql(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?",
+        (table,),
+    ).scalar()
+    unique = re.compile(rf",\s*CONSTRAINT {constraint} UNIQUE \([^)]*\)")
+    if not unique.search(ddl):
+        return False
+    ddl = re.sub(rf'^CREATE TABLE "?{table}"?', f"CREATE TABLE {table}_rebuild", ddl)
+    connection.exec_driver_sql(unique.sub("", ddl, count=1))
+    connection.exec_driver_sql(f"INSERT INTO {table}_rebuild SELECT * FROM {table}")
+    connection.exec_driver_sql(f"DROP TABLE {table}")
+    connection.exec_driver_sql(f"ALTER TABLE {table}_rebuild RENAME TO {table}")
+    return True
+
+
+def add_soft_delete_indexes(connection):
+    """Replace the unique constraints of folder, deck and card on an existing database.
+
+    For databases created before soft delete: their unique constraints also
+    count deleted rows, so the name of a deleted folder or deck, or the
+    question of a deleted card, cannot be used again. PostgreSQL drops each
+    constraint; SQLite rebuilds the table without it, which keeps its rows
+    and ids and restores the card search triggers. The unique indexes over
+    live rows and the other indexes of the tables (deleted rows waiting to be
+    purged included) are then created. Running it again changes nothing.
+
+    Returns:
+        list: Names of the constraints replaced
+    """
+    replaced = []
+    for table, constraint in _LIVE_UNIQUE_INDEXES.items():
+        if connection.dialect.name == "sqlite":
+            dropped = _rebuild_sqlite_table(connection, table, constraint)
+        else:
+            names = {
+                unique["name"]
+                for unique in inspect(connection).get_unique_constraints(table)
+            }
+            dropped = constraint in names
+            if dropped:
+                connection.exec_driver_sql(
+                    f"ALTER TABLE {table} DROP CONSTRAINT {constraint}"
+                )
+        if dropped:
+            replaced.append(constraint)
+
+    for model in (Folder, Deck, Card, Review):
+        columns = {
+            column["name"]
+            for column in inspect(connection).get_columns(model.__tablename__)
+        }
+        for index in model.__table__.indexes:
+            # Indexes on columns added by other upgrades wait for those
+            if {column.name for column in index.columns} <= columns:
+                index.create(connection, checkfirst=True)
+    create_card_search_index(connection)
+    return replaced
@@ -1,4 +1,5 @@
-from models.base import db
+from models.base import db, add_missing_columns
+from models.folder import Folder
 from typing import List
 import datetime
 import uuid
@@ -13,6 +14,8 @@ from sqlalchemy import (
     DateTime,
     Boolean,
     UniqueConstraint,
+    Index,
+    text,
 )
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.ext.declarative import declared_attr
@@ -20,6 +23,14 @@ from sqlalchemy.sql import func
 from sqlalchemy.dialects.sqlite import JSON
 
 
+def _folder_owner(context):
+    # Default owner of a new deck: the owner of its folder
+    return context.connection.execute(
+        text("SELECT user_id FROM folder WHERE id = :id"),
+        {"id": context.get_current_parameters()["folder_id"]},
+    ).scalar()
+
+
 class Deck(db.Model):
     """Table to store each folder's study decks
 
@@ -29,20 +40,58 @@ class Deck(db.Model):
         description (string)
         folder_id: foreign key that refers to the Folder model (many-to-one relationship)
         folder: relationship with the Folder model
+        user_id (uuid): Owner of the folder, copied here so ownership is
+            checked without joining folder; filled in from the folder when
+            not given
+        card_count, due_count, mastered_count (integer): Counters kept up to date
+            by CounterService whenever the deck's cards change
+        next_due_at (datetime): When the next card not counted in due_count
+            becomes due; due_count is recounted once this time has passed
     """
 
     __table_args__ = (
-        UniqueConstraint("folder_id", "name", name="uix_folder_deck_name"),
+        # Live decks only, so a deleted deck's name can be used again
+        Index(
+            "uix_folder_deck_name",
+            "folder_id",
+            "name",
+            unique=True,
+            sqlite_where=text("deleted_at IS NULL"),
+            postgresql_where=text("deleted_at IS NULL"),
+        ),
+        # Decks of a folder changed since a sync
+        Index("ix_deck_folder_updated", "folder_id", "updated_at"),
+        # Owner checks by primary key, and a user's decks without a join
+        Index("ix_deck_user_id", "user_id", "id"),
     )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     name: Mapped[str] = mapped_column(String, nullable=False)
     description: Mapped[str] = mapped_column(Text, nullable=True)
 
+    # Denormalized counters, maintained by CounterService
+    card_count: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0, server_default="0"
+    )
+    due_count: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0, server_default="0"
+    )
+    mastered_count: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0, server_default="0"
+    )
+    next_due_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+
     # Many-to-one relationship with the Folder model
     folder_id: Mapped[int] = mapped_column(ForeignKey("folder.id"), nullable=False)
     folder: Mapped["Folder"] = relationship(back_populates="decks")
 
+    # Denormalized owner, the same as folder.user_id
+    user_id: Mapped[str] = mapped_column(
+        ForeignKey("user.id"), nullable=False, default=_folder_owner
+    )
+
     # One-to-many relationship with the Card model
     cards: Mapped[List["Card"]] = relationship(
         back_populates="deck", cascade="all, delete-orphan"
@@ -50,3 +99,34 @@ class Deck(db.Model):
 
     def __repr__(self):
         return f"<Deck id={self.id} name={self.name!r} folder_id={self.folder_id}>"
+
+
+# Counter columns of folder and deck, each table has those it declares
+_COUNTER_COLUMNS = (
+    "deck_count",
+    "card_count",
+    "due_count",
+    "mastered_count",
+    "next_due_at",
+)
+
+
+def add_counter_columns(connection):
+    """Add the card counter columns of folder and deck to an existing database.
+
+    For databases created before folders and decks stored their counters.
+    The columns start at zero; ``repair-counters`` counts them from the cards
+    afterwards. Running it again adds nothing.
+
+    Returns:
+        list: "table.column" of each column added
+    """
+    added = []
+    for model in (Folder, Deck):
+        table = model.__table__
+        names = [name for name in _COUNTER_COLUMNS if name in table.c]
+        added += [
+            f"{table.name}.{name}"
+            for name in add_missing_columns(connection, table, names)
+        ]
+    return added
@@ -13,6 +13,8 @@ from sqlalchemy import (
     DateTime,
     Boolean,
     UniqueConstraint,
+    Index,
+    text,
 )
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.ext.declarative import declared_attr
@@ -30,14 +32,46 @@ class Folder(db.Model):
         - user_id (uuid): foreign key that refers to the User model (many-to-one relationship)
         - user: relationship with the User model
         - decks (list): one-to-many relationship with the Deck model
+        - deck_count, card_count, due_count, mastered_count (integer): Totals of
+            the folder's decks, kept up to date by CounterService
+        - next_due_at (datetime): The earliest next_due_at of the folder's decks
     """
 
-    __table_args__ = (UniqueConstraint("user_id", "name", name="uix_user_folder_name"),)
+    __table_args__ = (
+        # Live folders only, so a deleted folder's name can be used again
+        Index(
+            "uix_user_folder_name",
+            "user_id",
+            "name",
+            unique=True,
+            sqlite_where=text("deleted_at IS NULL"),
+            postgresql_where=text("deleted_at IS NULL"),
+        ),
+        # Folders of a user changed since a sync
+        Index("ix_folder_user_updated", "user_id", "updated_at"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     name: Mapped[str] = mapped_column(String(255), nullable=False)
     description: Mapped[str] = mapped_column(Text, nullable=True)
 
+    # Denormalized counters, maintained by CounterService
+    deck_count: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0, server_default="0"
+    )
+    card_count: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0, server_default="0"
+    )
+    due_count: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0, server_default="0"
+    )
+    mastered_count: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0, server_default="0"
+    )
+    next_due_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+
     # Many-to-one relationship with the User model
     user_id: Mapped[str] = mapped_column(ForeignKey("user.id"), nullable=False)
     user: Mapped["User"] = relationship(back_populates="folders")
@@ -13,6 +13,8 @@ from sqlalchemy import (
     DateTime,
     Boolean,
     UniqueConstraint,
+    Index,
+    text,
 )
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.ext.declarative import declared_attr
@@ -33,6 +35,18 @@ class Review(db.Model):
         - card (List): many-to-one relationship with the Card model
     """
 
+    __table_args__ = (
+        # Reviews of a user recorded since a sync
+        Index("ix_review_user_updated", "user_id", "updated_at"),
+        # Deleted reviews waiting to be purged
+        Index(
+            "ix_review_deleted",
+            "deleted_at",
+            sqlite_where=text("deleted_at IS NOT NULL"),
+            postgresql_where=text("deleted_at IS NOT NULL"),
+        ),
+    )
+
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     user_answer: Mapped[str] = mapped_column(Text, nullable=False)
     reviewed_at: Mapped[datetime.datetime] = mapped_column(
@@ -1,66 +1,150 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, current_app, g, jsonify, request, url_for
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from contextlib import nullcontext
+from models.deck import Deck
 from services.ai_service import AIService
+from services.cloze_service import ClozeService
+from services.conversation_service import ConversationService
+from services.embedding_service import deck_question_index
+from services.gemini_client import (
+    AIUnavailableError,
+    CircuitBreaker,
+    get_gemini_client,
+)
+from services.job_service import JobLimitError, get_job_queue, job_handler
+from services.rate_limit_service import (
+    RateLimitExceeded,
+    get_rate_limiter,
+    rate_limit_headers,
+)
 
 bp_ai = Blueprint("ai", __name__)
 
+# Card generators: Gemini, or local cloze cards that need no model API
+GENERATORS = ("gemini", "offline")
+
+
+def _gemini_circuit_open():
+    """Whether calls to Gemini are currently short-circuited."""
+    try:
+        return get_gemini_client().breaker.state == CircuitBreaker.OPEN
+    except (ValueError, ImportError):
+        return False
+
+
+def _choose_generator(requested):
+    """Generator to use: the offline one when asked or while Gemini is down."""
+    if requested not in GENERATORS:
+        raise ValueError("generator must be 'gemini' or 'offline'")
+    if requested == "offline" or _gemini_circuit_open():
+        return "offline"
+    return "gemini"
+
 
 def get_ai_service():
-    """Get AI service instance with proper error handling."""
+    """Get AI service instance with proper error handling.
+
+    Every instance uses the process-wide Gemini client, so this is cheap.
+    """
     try:
-        return AIService()
+        ai_service = AIService()
+        ai_service.client
+        return ai_service
     except (ValueError, ImportError) as e:
         return None
 
 
+@bp_ai.after_request
+def add_rate_limit_headers(response):
+    """Report the user's token budget on responses of metered routes."""
+    user_id = g.pop("rate_limited_user", None)
+    if user_id is not None:
+        try:
+            status = get_rate_limiter().usage(user_id)["user"]
+            response.headers.update(rate_limit_headers(status))
+        except Exception as e:
+            current_app.logger.warning(f"Rate limit headers unavailable: {e}")
+    return response
+
+
+def _rate_limit_response(error):
+    """429 response for a request over its token budget."""
+    response = jsonify({"error": str(error)})
+    response.headers["Retry-After"] = str(error.retry_after)
+    return response, 429
+
+
 @bp_ai.route("/generate-cards", methods=["POST"])
 @jwt_required()
 def generate_flashcards():
     """
     Unified endpoint to generate flashcards from either text content OR PDF file.
 
+    Generation runs as a background job; poll GET /ai/jobs/<job_id> for
+    progress and the generated cards.
+
     For PDF Upload (multipart/form-data):
     - file: PDF file
     - deck_id: Target deck ID
     - num_cards: Number of cards to generate (1-20)
     - difficulty: easy/medium/hard (optional, default: medium)
+    - drop_duplicates: true/false (optional, default: false)
+    - generator: gemini/offline (optional, default: gemini)
 
     For Text Input (application/json):
     {
         "content": "Text content to generate cards from",
         "deck_id": 123,
         "num_cards": 5,
-        "difficulty": "medium" (optional)
+        "difficulty": "medium" (optional),
+        "drop_duplicates": false (optional),
+        "generator": "gemini" | "offline" (optional)
     }
 
+    Generated cards that paraphrase an existing card of the deck are listed
+    with their "near_duplicates"; with drop_duplicates they are left out.
+
+    The offline generator makes fill-in-the-blank cards from the content's
+    key sentences in milliseconds and uses no AI tokens. It is used
+    automatically while Gemini is unavailable.
+
     Returns:
-    - Generated flashcards in preview mode
-    - Consistent response format for both methods
+    - Job ID and status URL of the queued generation
     """
     try:
-        ai_service = get_ai_service()
-        if not ai_service:
-            return (
-                jsonify(
-                    {
-                        "error": "AI service is not available. Please check configuration."
-                    }
-                ),
-                503,
-            )
-
-        user_id = get_jwt_identity()
-
         # Determine if this is a PDF upload or text input
         is_pdf_upload = bool(
             request.files and "file" in request.files and request.files["file"].filename
         )
         is_json_request = request.is_json
 
+        if is_json_request:
+            requested = (request.get_json(silent=True) or {}).get("generator")
+        else:
+            requested = request.form.get("generator")
+        generator = _choose_generator(requested or "gemini")
+
+        if generator == "gemini":
+            ai_service = get_ai_service()
+            if not ai_service:
+                return (
+                    jsonify(
+                        {
+                            "error": "AI service is not available. Please check configuration."
+                        }
+                    ),
+                    503,
+                )
+        else:
+            ai_service = AIService()
+
+        user_id = get_jwt_identity()
+        g.rate_limited_user = user_id
+
         if is_pdf_upload:
-            return _handle_pdf_generation(ai_service, user_id)
+            return _handle_pdf_generation(ai_service, user_id, generator)
         elif is_json_request:
-            return _handle_text_generation(ai_service, user_id)
+            return _handle_text_generation(ai_service, user_id, generator)
         else:
             return (
                 jsonify(
@@ -71,13 +155,17 @@ def generate_flashcards():
                 400,
             )
 
+    except RateLimitExceeded as e:
+        return _rate_limit_response(e)
+    except JobLimitError as e:
+        return jsonify({"error": str(e)}), 429
     except ValueError as e:
         return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": "Failed to generate flashcards"}), 500
 
 
-def _handle_pdf_generation(ai_service, user_id):
+def _handle_pdf_generation(ai_service, user_id, generator="gemini"):
     """Handle PDF file generation logic."""
     # Validate file
     file = request.files["file"]
@@ -99,6 +187,7 @@ def _handle_pdf_generation(ai_service, user_id):
     deck_id = request.form.get("deck_id", type=int)
     num_cards = request.form.get("num_cards", default=5, type=int)
     difficulty = request.form.get("difficulty", "medium")
+    drop_duplicates = request.form.get("drop_duplicates", "false").lower() == "true"
 
     # Validate parameters
     if not deck_id:
@@ -114,14 +203,28 @@ def _handle_pdf_generation(ai_service, user_id):
     if not _verify_deck_ownership(deck_id, user_id):
         return jsonify({"error": "Deck not found or access denied"}), 404
 
-    # Generate cards from PDF
-    result = ai_service.generate_cards_from_pdf(file, num_cards, deck_id, difficulty)
-
-    # Standardize response format
-    return _format_generation_response(result, "pdf", file.filename)
+    # Extract the text now so the temporary file never outlives the request
+    try:
+        chunks = ai_service.extract_pdf_chunks(file)
+    except Exception as e:
+        return jsonify({"error": f"Failed to process PDF: {str(e)}"}), 400
+
+    return _submit_generation_job(
+        user_id,
+        {
+            "source": "pdf",
+            "chunks": chunks,
+            "deck_id": deck_id,
+            "num_cards": num_cards,
+            "difficulty": difficulty,
+            "file_name": file.filename,
+            "drop_duplicates": drop_duplicates,
+            "generator": generator,
+        },
+    )
 
 
-def _handle_text_generation(ai_service, user_id):
+def _handle_text_generation(ai_service, user_id, generator="gemini"):
     """Handle text content generation logic."""
     data = request.get_json()
 
@@ -153,28 +256,211 @@ def _handle_text_generation(ai_service, user_id):
     if not _verify_deck_ownership(deck_id, user_id):
         return jsonify({"error": "Deck not found or access denied"}), 404
 
-    # Generate cards from text
-    result = ai_service.generate_cards_from_text(
-        content, num_cards, deck_id, difficulty
+    return _submit_generation_job(
+        user_id,
+        {
+            "source": "text",
+            "content": content,
+            "deck_id": deck_id,
+            "num_cards": num_cards,
+            "difficulty": difficulty,
+            "drop_duplicates": bool(data.get("drop_duplicates", False)),
+            "generator": generator,
+        },
     )
 
-    # Standardize response format
-    return _format_generation_response(result, "text", None)
 
+def _submit_generation_job(user_id, payload):
+    """Queue a card generation job and return its id right away.
 
-def _verify_deck_ownership(deck_id, user_id):
-    """Verify that the user owns the specified deck."""
+    The estimated tokens of a Gemini generation are charged to the user's
+    budget up front and refunded if the job cannot be queued. Offline
+    generation is free.
+    """
+    payload["user_id"] = user_id
+    if payload.get("generator") == "offline":
+        reservation = nullcontext()
+    else:
+        estimated_tokens = AIService.estimate_generation_tokens(
+            _generation_chunks(payload), payload["num_cards"], payload["difficulty"]
+        )
+        reservation = get_rate_limiter().reservation(user_id, estimated_tokens)
+        # The job settles the reservation once its real usage is known
+        payload["reserved_tokens"] = estimated_tokens
+    with reservation:
+        job = get_job_queue().submit(
+            "generate_cards", user_id, payload, current_app._get_current_object()
+        )
+    return (
+        jsonify(
+            {
+                "message": "Flashcard generation started",
+                "data": {
+                    "job_id": job["id"],
+                    "status": job["status"],
+                    "status_url": url_for("ai.get_job_status", job_id=job["id"]),
+                },
+            }
+        ),
+        202,
+    )
+
+
+@job_handler("generate_cards")
+def _run_generation_job(payload, report_progress):
+    """Generate cards for a queued job and return the preview payload.
+
+    A Gemini job that finds the model unavailable falls back to the offline
+    generator instead of failing. The tokens reserved when the job was
+    submitted are settled with the tokens really used; offline generation
+    and failed jobs are refunded in full.
+    """
+    source = payload["source"]
+    report_progress(5, "Generating flashcards")
+
+    generator = payload.get("generator", "gemini")
+    fallback_reason = None
+    used_tokens = 0
     try:
-        from services.crud_service import CRUDService
+        if generator == "offline":
+            result = _generate_offline(payload)
+        else:
+            try:
+                result = _generate_with_ai(payload, report_progress)
+                used_tokens = AIService.count_generation_tokens(
+                    _generation_chunks(payload),
+                    payload["num_cards"],
+                    payload["difficulty"],
+                    result["data"]["cards"],
+                )
+            except AIUnavailableError as e:
+                generator, fallback_reason = "offline", str(e)
+                report_progress(50, "AI unavailable, generating cards offline")
+                result = _generate_offline(payload)
+    finally:
+        _settle_generation_tokens(payload, used_tokens)
+
+    metadata = result["data"]["metadata"]
+    metadata["generator"] = generator
+    if fallback_reason:
+        metadata["fallback_reason"] = fallback_reason
+
+    report_progress(95, "Checking for duplicate cards")
+    _flag_near_duplicates(
+        payload["deck_id"], result["data"], payload.get("drop_duplicates", False)
+    )
 
-        CRUDService.get_one_deck(deck_id, user_id)
-        return True
-    except ValueError:
-        return False
+    return _build_generation_data(result, source, payload.get("file_name"))
+
+
+def _generation_chunks(payload):
+    """The texts a generation job sends to the model."""
+    return payload["chunks"] if payload["source"] == "pdf" else [payload["content"]]
+
+
+def _settle_generation_tokens(payload, used_tokens):
+    """Charge or refund the difference between a job's reserved and used tokens."""
+    reserved_tokens = payload.get("reserved_tokens", 0)
+    if reserved_tokens and used_tokens != reserved_tokens:
+        get_rate_limiter().settle(payload["user_id"], used_tokens - reserved_tokens)
+
+
+def _generate_offline(payload):
+    """Generate cloze cards for a job's content without the model API."""
+    if payload["source"] == "pdf":
+        text = "\n\n".join(payload["chunks"])
+    else:
+        text = payload["content"]
+
+    result = ClozeService.generate_cards(
+        text,
+        payload["num_cards"],
+        payload["deck_id"],
+        payload["user_id"],
+        payload["difficulty"],
+        source=payload["source"],
+    )
+    if payload.get("file_name"):
+        result["data"]["metadata"]["file_name"] = payload["file_name"]
+    return result
+
+
+def _generate_with_ai(payload, report_progress):
+    """Generate cards for a job's content with Gemini."""
+    ai_service = get_ai_service()
+    if not ai_service:
+        raise ValueError("AI service is not available. Please check configuration.")
+
+    if payload["source"] == "pdf":
+        return ai_service.generate_cards_from_pdf_chunks(
+            payload["chunks"],
+            payload["num_cards"],
+            payload["deck_id"],
+            payload["difficulty"],
+            payload.get("file_name"),
+            on_progress=lambda done, total: report_progress(
+                5 + 90 * done / total, f"Processed {done} of {total} sections"
+            ),
+        )
+    else:
+        return ai_service.generate_cards_from_text(
+            payload["content"],
+            payload["num_cards"],
+            payload["deck_id"],
+            payload["difficulty"],
+        )
+
+
+def _find_near_duplicates(deck_id, cards):
+    """Look up near-duplicates of the cards' questions in the deck.
+
+    Returns None when the embedding model is unavailable, so duplicate
+    detection never blocks generating or saving cards.
+    """
+    try:
+        return deck_question_index.find_duplicates(
+            deck_id,
+            [str(card.get("question") or "") for card in cards],
+            current_app.config["NEAR_DUPLICATE_THRESHOLD"],
+            current_app.config["NEAR_DUPLICATE_TOP_K"],
+        )
+    except Exception as e:
+        current_app.logger.warning(f"Near-duplicate detection unavailable: {e}")
+        return None
+
+
+def _flag_near_duplicates(deck_id, data, drop_duplicates):
+    """Annotate generated cards with near-duplicates, optionally dropping them."""
+    matches = _find_near_duplicates(deck_id, data["cards"])
+    if matches is None:
+        return
+
+    kept_cards = []
+    num_duplicates = 0
+    for card, match in zip(data["cards"], matches):
+        card["near_duplicates"] = match["existing"]
+        is_duplicate = (
+            bool(match["existing"]) or match["batch_duplicate_of"] is not None
+        )
+        if match["batch_duplicate_of"] is not None:
+            card["duplicate_of_index"] = match["batch_duplicate_of"]
+        num_duplicates += is_duplicate
+        if not (drop_duplicates and is_duplicate):
+            kept_cards.append(card)
+
+    data["cards"] = kept_cards
+    metadata = data.setdefault("metadata", {})
+    metadata["num_near_duplicates"] = num_duplicates
+    metadata["duplicates_dropped"] = bool(drop_duplicates)
+
+
+def _verify_deck_ownership(deck_id, user_id):
+    """Verify that the user owns the specified deck."""
+    return Deck.query.filter_by(id=deck_id, user_id=user_id).first() is not None
 
 
-def _format_generation_response(result, generation_method, source_filename=None):
-    """Format the response consistently for both text and PDF generation."""
+def _build_generation_data(result, generation_method, source_filename=None):
+    """Format the result consistently for both text and PDF generation."""
     data = result["data"]
     num_generated = len(data["cards"])
 
@@ -185,7 +471,8 @@ def _format_generation_response(result, generation_method, source_filename=None)
         metadata["source_filename"] = source_filename
 
     # Standardized response
-    response_data = {
+    return {
+        "message": f"Generated {num_generated} flashcards from {generation_method} successfully",
         "preview": True,
         "deck_id": data["deck_id"],
         "generation_method": generation_method,
@@ -193,11 +480,33 @@ def _format_generation_response(result, generation_method, source_filename=None)
         "metadata": metadata,
     }
 
-    success_message = (
-        f"Generated {num_generated} flashcards from {generation_method} successfully"
-    )
 
-    return jsonify({"message": success_message, "data": response_data}), 200
+@bp_ai.route("/jobs/<job_id>", methods=["GET"])
+@jwt_required()
+def get_job_status(job_id):
+    """
+    Get the progress and result of a background generation job.
+
+    Returns:
+    - status: queued | running | succeeded | failed
+    - progress: percentage between 0 and 100
+    - result: generated cards once the job has succeeded
+    - error: failure reason once the job has failed
+    """
+    try:
+        user_id = get_jwt_identity()
+        job = get_job_queue().get(job_id, user_id)
+
+        if not job:
+            return jsonify({"error": "Job not found"}), 404
+
+        return (
+            jsonify({"message": "Job status retrieved successfully", "data": job}),
+            200,
+        )
+
+    except Exception as e:
+        return jsonify({"error": "Failed to retrieve job status"}), 500
 
 
 @bp_ai.route("/accept-cards", methods=["POST"])
@@ -215,9 +524,13 @@ def accept_generated_cards():
                 "answer": "It is...",
                 "difficulty_level": "medium"
             }
-        ]
+        ],
+        "allow_near_duplicates": false (optional)
     }
 
+    Cards that paraphrase an existing card of the deck (or an earlier card
+    of the same request) are rejected unless allow_near_duplicates is true.
+
     Returns:
     - Saved card IDs
     - Success confirmation
@@ -246,39 +559,33 @@ def accept_generated_cards():
         if not _verify_deck_ownership(deck_id, user_id):
             return jsonify({"error": "Deck not found or access denied"}), 404
 
-        # Save each card using CRUD service
-        saved_cards = []
-        failed_cards = []
-
-        for i, card_data in enumerate(cards):
-            try:
-                # Validate card data
-                required_fields = ["question", "answer", "difficulty_level"]
-                for field in required_fields:
-                    if field not in card_data or not card_data[field]:
-                        raise ValueError(f"Card {i+1}: {field} is required")
-
-                # Save card
-                from services.crud_service import CRUDService
-
-                result = CRUDService.add_new_card(card_data, deck_id, user_id)
-                saved_cards.append(
-                    {
-                        "index": i + 1,
-                        "card_id": result["data"]["id"],
-                        "question": result["data"]["question"],
-                    }
+        # Check every card against the deck in one batch
+        matches = None
+        if not data.get("allow_near_duplicates", False):
+            matches = _find_near_duplicates(deck_id, cards)
+
+        # Near-duplicates are rejected up front; everything else is checked
+        # and saved in one transaction
+        rejected = {}
+        for i, match in enumerate(matches or []):
+            if match["existing"]:
+                duplicate = match["existing"][0]
+                rejected[i] = (
+                    f"Card {i+1}: near-duplicate of existing card "
+                    f"{duplicate['card_id']} ({duplicate['question']})"
                 )
-
-            except Exception as e:
-                failed_cards.append(
-                    {
-                        "index": i + 1,
-                        "error": str(e),
-                        "question": card_data.get("question", "Unknown"),
-                    }
+            elif match["batch_duplicate_of"] is not None:
+                rejected[i] = (
+                    f"Card {i+1}: near-duplicate of card "
+                    f"{match['batch_duplicate_of'] + 1} in this request"
                 )
 
+        from services.crud_service import CRUDService
+
+        result = CRUDService.add_cards_bulk(cards, deck_id, user_id, rejected)
+        saved_cards = result["data"]["saved"]
+        failed_cards = result["data"]["failed"]
+
         response_data = {
             "saved_count": len(saved_cards),
             "failed_count": len(failed_cards),
@@ -310,12 +617,13 @@ def ai_chat():
     Request Body:
     {
         "query": "How am I doing with my studies?",
-        "context_level": "detailed" | "summary" (optional, default: "summary")
+        "context_level": "detailed" | "summary" (optional, default: "summary"),
+        "thread_id": 12 (optional, continue a thread instead of starting one)
     }
 
     Returns:
     - AI response with personalized insights
-    - Conversation ID for reference
+    - Conversation and thread IDs for reference
     """
     try:
         ai_service = get_ai_service()
@@ -330,6 +638,7 @@ def ai_chat():
             )
 
         user_id = get_jwt_identity()
+        g.rate_limited_user = user_id
 
         if not request.is_json:
             return jsonify({"error": "Request must be JSON"}), 400
@@ -350,10 +659,21 @@ def ai_chat():
                 400,
             )
 
+        thread_id = data.get("thread_id")
+        if thread_id is not None and (
+            not isinstance(thread_id, int) or isinstance(thread_id, bool)
+        ):
+            return jsonify({"error": "thread_id must be an integer"}), 400
+
         # Adjust token budget based on context level
         max_tokens = 3000 if context_level == "detailed" else 2000
 
-        result = ai_service.ai_chat_with_budget(user_query, user_id, max_tokens)
+        # The whole budget is reserved, then settled with the real usage
+        with get_rate_limiter().reservation(user_id, max_tokens) as reservation:
+            result = ai_service.ai_chat_with_budget(
+                user_query, user_id, max_tokens, thread_id=thread_id
+            )
+            reservation.used = result["data"]["usage"]["total_tokens"]
 
         return (
             jsonify(
@@ -365,12 +685,45 @@ def ai_chat():
             200,
         )
 
+    except RateLimitExceeded as e:
+        return _rate_limit_response(e)
+    except AIUnavailableError as e:
+        return jsonify({"error": str(e)}), 503
     except ValueError as e:
         return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": "Failed to generate AI response"}), 500
 
 
+@bp_ai.route("/usage", methods=["GET"])
+@jwt_required()
+def get_ai_usage():
+    """
+    Get the user's current AI token budget.
+
+    Budgets are token buckets that refill continuously: "limit" tokens per
+    minute, "remaining" right now and "reset" seconds until full again.
+
+    Returns:
+    - The user's budget and the budget shared by all users
+    """
+    try:
+        user_id = get_jwt_identity()
+        g.rate_limited_user = user_id
+        return (
+            jsonify(
+                {
+                    "message": "AI usage retrieved successfully",
+                    "data": get_rate_limiter().usage(user_id),
+                }
+            ),
+            200,
+        )
+
+    except Exception as e:
+        return jsonify({"error": "Failed to retrieve AI usage"}), 500
+
+
 @bp_ai.route("/conversations", methods=["GET"])
 @jwt_required()
 def get_conversation_history():
@@ -379,17 +732,19 @@ def get_conversation_history():
 
     Query Parameters:
     - limit: Number of conversations to return (default: 10, max: 50)
-    - offset: Number of conversations to skip (default: 0)
+    - cursor: "next_cursor" of the previous page (preferred for paging)
+    - offset: Number of conversations to skip when no cursor is given (default: 0)
 
     Returns:
-    - List of recent conversations
-    - Pagination info
+    - List of recent conversations with previews
+    - Pagination info; the total is only on the first page and is capped
     """
     try:
         user_id = get_jwt_identity()
 
         limit = request.args.get("limit", default=10, type=int)
         offset = request.args.get("offset", default=0, type=int)
+        cursor = request.args.get("cursor")
 
         if limit < 1 or limit > 50:
             return jsonify({"error": "limit must be between 1 and 50"}), 400
@@ -397,58 +752,152 @@ def get_conversation_history():
         if offset < 0:
             return jsonify({"error": "offset must be non-negative"}), 400
 
-        # Get conversations from database
-        from models import AIConversation
+        if cursor is not None:
+            if not cursor.isdigit():
+                return jsonify({"error": "cursor is not valid"}), 400
+            cursor = int(cursor)
+
+        data = ConversationService.list_conversations(user_id, limit, cursor, offset)
 
-        conversations = (
-            AIConversation.query.filter_by(user_id=user_id)
-            .order_by(AIConversation.created_at.desc())
-            .offset(offset)
-            .limit(limit)
-            .all()
+        return (
+            jsonify(
+                {
+                    "message": "Conversation history retrieved successfully",
+                    "data": data,
+                }
+            ),
+            200,
         )
 
-        # Get total count for pagination
-        total_count = AIConversation.query.filter_by(user_id=user_id).count()
+    except Exception as e:
+        return jsonify({"error": "Failed to retrieve conversation history"}), 500
 
-        conversation_list = [
-            {
-                "id": conv.id,
-                "query": (
-                    conv.user_query[:100] + "..."
-                    if len(conv.user_query) > 100
-                    else conv.user_query
-                ),
-                "response_preview": (
-                    conv.ai_response[:200] + "..."
-                    if len(conv.ai_response) > 200
-                    else conv.ai_response
-                ),
-                "created_at": conv.created_at.isoformat(),
-            }
-            for conv in conversations
-        ]
+
+@bp_ai.route("/threads", methods=["GET"])
+@jwt_required()
+def get_threads():
+    """
+    Get the user's chat threads.
+
+    Query Parameters:
+    - limit: Number of threads to return (default: 10, max: 50)
+    - cursor: "next_cursor" of the previous page
+
+    Returns:
+    - List of threads, most recent first
+    - Pagination info
+    """
+    try:
+        user_id = get_jwt_identity()
+
+        limit = request.args.get("limit", default=10, type=int)
+        cursor = request.args.get("cursor")
+
+        if limit < 1 or limit > 50:
+            return jsonify({"error": "limit must be between 1 and 50"}), 400
+
+        if cursor is not None:
+            if not cursor.isdigit():
+                return jsonify({"error": "cursor is not valid"}), 400
+            cursor = int(cursor)
+
+        data = ConversationService.list_threads(user_id, limit, cursor)
 
         return (
             jsonify(
                 {
-                    "message": "Conversation history retrieved successfully",
-                    "data": {
-                        "conversations": conversation_list,
-                        "pagination": {
-                            "total": total_count,
-                            "limit": limit,
-                            "offset": offset,
-                            "has_more": offset + limit < total_count,
-                        },
-                    },
+                    "message": "Threads retrieved successfully",
+                    "data": data,
                 }
             ),
             200,
         )
 
     except Exception as e:
-        return jsonify({"error": "Failed to retrieve conversation history"}), 500
+        return jsonify({"error": "Failed to retrieve threads"}), 500
+
+
+@bp_ai.route("/threads/<int:thread_id>", methods=["GET"])
+@jwt_required()
+def get_thread_detail(thread_id):
+    """
+    Get a chat thread with its running summary and every turn.
+
+    Args:
+        thread_id: ID of the thread
+
+    Returns:
+    - Thread title and summary
+    - Turns, oldest first, flagged when already folded into the summary
+    """
+    try:
+        user_id = get_jwt_identity()
+
+        data = ConversationService.get_thread_detail(thread_id, user_id)
+
+        return (
+            jsonify(
+                {
+                    "message": "Thread retrieved successfully",
+                    "data": data,
+                }
+            ),
+            200,
+        )
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 404
+    except Exception as e:
+        return jsonify({"error": "Failed to retrieve thread"}), 500
+
+
+@bp_ai.route("/conversations/search", methods=["GET"])
+@jwt_required()
+def search_conversations():
+    """
+    Search the user's AI conversations.
+
+    Query Parameters:
+    - q: Words to look for in questions and answers (all must match)
+    - limit: Number of results to return (default: 10, max: 50)
+    - offset: Number of results to skip (default: 0)
+
+    Returns:
+    - Matching conversations, best first, with highlighted snippets
+    - Pagination info
+    """
+    try:
+        user_id = get_jwt_identity()
+
+        query = request.args.get("q", "").strip()
+        limit = request.args.get("limit", default=10, type=int)
+        offset = request.args.get("offset", default=0, type=int)
+
+        if not query:
+            return jsonify({"error": "q is required"}), 400
+
+        if limit < 1 or limit > 50:
+            return jsonify({"error": "limit must be between 1 and 50"}), 400
+
+        if offset < 0:
+            return jsonify({"error": "offset must be non-negative"}), 400
+
+        data = ConversationService.search_conversations(user_id, query, limit, offset)
+
+        return (
+            jsonify(
+                {
+                    "message": "Conversations searched successfully",
+                    "data": data,
+                }
+            ),
+            200,
+        )
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": "Failed to search conversations"}), 500
 
 
 @bp_ai.route("/conversation/<int:conversation_id>", methods=["GET"])
@@ -1,6 +1,7 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from services.crud_service import CRUDService
+from services.card_search_service import CardSearchService
+from services.crud_service import CRUDService, NotFoundError
 
 bp_card = Blueprint("card", __name__)
 
@@ -18,16 +19,119 @@ def add_card(deck_id):
     )
 
 
+@bp_card.route("/<int:deck_id>/bulk", methods=["POST"])
+@jwt_required()
+def add_cards_bulk(deck_id):
+    """
+    Create many cards in a deck at once.
+
+    Request Body:
+    {
+        "cards": [
+            {"question": "...", "answer": "...", "difficulty_level": "easy"}
+        ]
+    }
+
+    Cards are saved in one transaction; invalid or duplicate cards are listed
+    in "failed" with their 1-based index and do not stop the others.
+    """
+    try:
+        current_user_id = get_jwt_identity()
+        data = request.get_json(silent=True) or {}
+        cards = data.get("cards")
+
+        if not isinstance(cards, list) or len(cards) == 0:
+            return jsonify({"error": "cards must be a non-empty list"}), 400
+
+        max_cards = current_app.config.get("CARD_BULK_MAX", 5000)
+        if len(cards) > max_cards:
+            return (
+                jsonify(
+                    {"error": f"Cannot create more than {max_cards} cards at once"}
+                ),
+                400,
+            )
+
+        result = CRUDService.add_cards_bulk(cards, deck_id, current_user_id)
+        saved, failed = result["data"]["saved"], result["data"]["failed"]
+        return (
+            jsonify(
+                {
+                    "message": f"Created {len(saved)} cards, {len(failed)} failed",
+                    "data": {
+                        "saved_count": len(saved),
+                        "failed_count": len(failed),
+                        "saved_cards": saved,
+                        "failed_cards": failed,
+                    },
+                }
+            ),
+            201 if saved else 400,
+        )
+    except NotFoundError as e:
+        return jsonify({"error": str(e)}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+
+@bp_card.route("/search", methods=["GET"])
+@jwt_required()
+def search_cards():
+    """
+    Search the questions and answers of the user's cards.
+
+    Query Parameters:
+    - q: Words to look for (all must match; the last one may be partial)
+    - limit: Number of results to return (default: 20, max: 100)
+    - offset: Number of results to skip (default: 0)
+
+    Returns:
+    - Matching cards, best first, with their deck and highlighted snippets
+    - Pagination info
+    """
+    try:
+        current_user_id = get_jwt_identity()
+
+        query = request.args.get("q", "").strip()
+        limit = request.args.get("limit", default=20, type=int)
+        offset = request.args.get("offset", default=0, type=int)
+
+        if not query:
+            return jsonify({"error": "q is required"}), 400
+        if limit < 1 or limit > 100:
+            return jsonify({"error": "limit must be between 1 and 100"}), 400
+        if offset < 0:
+            return jsonify({"error": "offset must be non-negative"}), 400
+
+        data = CardSearchService.search_cards(current_user_id, query, limit, offset)
+        return jsonify({"message": "Cards searched successfully", "data": data}), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+
 @bp_card.route("/<int:card_id>", methods=["GET"])
 @jwt_required()
 def get_card(card_id):
-    """Logic to get the information of a single card"""
-    current_user_id = get_jwt_identity()
-    result = CRUDService.get_one_card(card_id, current_user_id)
-    return (
-        jsonify({"message": "Retrieved card successfully", "data": result["data"]}),
-        200,
-    )
+    """
+    Logic to get the information of a single card
+
+    Query Parameters:
+    - fields: Comma separated card fields to return (id is always included)
+    """
+    try:
+        current_user_id = get_jwt_identity()
+        fields = request.args.get("fields")
+        result = CRUDService.get_one_card(
+            card_id, current_user_id, fields.split(",") if fields else None
+        )
+        return (
+            jsonify({"message": "Retrieved card successfully", "data": result["data"]}),
+            200,
+        )
+    except NotFoundError as e:
+        return jsonify({"error": str(e)}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
 
 @bp_card.route("/<int:card_id>", methods=["PATCH"])
@@ -48,3 +152,62 @@ def delete_card(card_id):
     current_user_id = get_jwt_identity()
     result = CRUDService.delete_one_card(card_id, current_user_id)
     return jsonify({"message": "Deleted card successfully"}), 200
+
+
+@bp_card.route("/bulk", methods=["POST"])
+@jwt_required()
+def bulk_update_cards():
+    """
+    Apply one operation to many cards at once.
+
+    Request Body:
+    {
+        "operation": "move" | "delete" | "set_difficulty" | "reset",
+        "card_ids": [1, 2, 3],
+        "deck_id": 4,                  (move: the deck to move the cards to)
+        "difficulty_level": "hard"     (set_difficulty)
+    }
+
+    reset forgets the review state of the cards, as if they were new. Cards
+    that cannot be changed (not found, or their question is already in the
+    target deck) are listed in "failed_cards" and do not stop the others.
+    """
+    try:
+        current_user_id = get_jwt_identity()
+        data = request.get_json(silent=True) or {}
+        card_ids = data.get("card_ids")
+
+        if not isinstance(card_ids, list) or len(card_ids) == 0:
+            return jsonify({"error": "card_ids must be a non-empty list"}), 400
+
+        max_cards = current_app.config.get("CARD_BULK_MAX", 5000)
+        if len(card_ids) > max_cards:
+            return (
+                jsonify(
+                    {"error": f"Cannot change more than {max_cards} cards at once"}
+                ),
+                400,
+            )
+
+        result = CRUDService.bulk_update_cards(
+            card_ids, current_user_id, data.get("operation"), data
+        )
+        updated, failed = result["data"]["updated"], result["data"]["failed"]
+        return (
+            jsonify(
+                {
+                    "message": f"Updated {len(updated)} cards, {len(failed)} failed",
+                    "data": {
+                        "updated_count": len(updated),
+                        "failed_count": len(failed),
+                        "updated_cards": updated,
+                        "failed_cards": failed,
+                    },
+                }
+            ),
+            200 if updated else 400,
+        )
+    except NotFoundError as e:
+        return jsonify({"error": str(e)}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
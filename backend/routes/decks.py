@@ -1,6 +1,8 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from services.crud_service import CRUDService
+from services.crud_service import CRUDService, NotFoundError
+from services.export_service import ExportService
+from services.import_service import ImportService
 
 bp_deck = Blueprint("deck", __name__)
 
@@ -18,16 +20,63 @@ def add_deck(folder_id):
     )
 
 
+def _bool_arg(name):
+    """Read an optional true/false query parameter."""
+    value = request.args.get(name)
+    if value is None:
+        return None
+    if value.lower() in ("true", "1"):
+        return True
+    if value.lower() in ("false", "0"):
+        return False
+    raise ValueError(f"{name} must be true or false")
+
+
 @bp_deck.route("/<int:deck_id>", methods=["GET"])
 @jwt_required()
 def get_one_deck(deck_id):
-    """Retrieve all cards for a specific deck"""
-    current_user_id = get_jwt_identity()
-    result = CRUDService.get_one_deck(deck_id, current_user_id)
-    return (
-        jsonify({"message": "Retrieved deck successfully", "data": result["data"]}),
-        200,
-    )
+    """
+    Retrieve the cards of a specific deck.
+
+    Query Parameters:
+    - limit: Cards per page (max 500); every card is returned without it
+    - cursor: "next_cursor" of the previous page
+    - sort: id (default), question or next_review_at; "-" prefix for descending
+    - due, mastered: true or false, to filter on the review state
+    - difficulty: easy, medium or hard; comma separated for several
+    - view: full (default) or summary, for ids and question previews only
+    - fields: Comma separated card fields to return in the full view (id is
+      always included)
+    """
+    try:
+        current_user_id = get_jwt_identity()
+
+        limit = request.args.get("limit", type=int)
+        if limit is not None and not 1 <= limit <= 500:
+            return jsonify({"error": "limit must be between 1 and 500"}), 400
+        difficulty = request.args.get("difficulty")
+        fields = request.args.get("fields")
+
+        result = CRUDService.get_one_deck(
+            deck_id,
+            current_user_id,
+            limit=limit,
+            cursor=request.args.get("cursor"),
+            sort=request.args.get("sort", "id"),
+            due=_bool_arg("due"),
+            mastered=_bool_arg("mastered"),
+            difficulty=difficulty.lower().split(",") if difficulty else None,
+            view=request.args.get("view", "full"),
+            fields=fields.split(",") if fields else None,
+        )
+        return (
+            jsonify({"message": "Retrieved deck successfully", "data": result["data"]}),
+            200,
+        )
+    except NotFoundError as e:
+        return jsonify({"error": str(e)}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
 
 @bp_deck.route("/<int:deck_id>", methods=["PATCH"])
@@ -47,3 +96,121 @@ def delete_deck(deck_id):
     current_user_id = get_jwt_identity()
     result = CRUDService.delete_one_deck(deck_id, current_user_id)
     return (jsonify({"message": "Deleted deck successfully"})), 200
+
+
+@bp_deck.route("/<int:deck_id>/clone", methods=["POST"])
+@jwt_required()
+def clone_deck(deck_id):
+    """
+    Copy a deck and its cards into a folder.
+
+    Query Parameters:
+    - folder_id: Folder to copy the deck to (required)
+    - reset: true to start the copied cards over as new cards instead of
+      keeping their review state
+
+    Request Body (optional):
+    {
+        "name": "..."   (the deck's name by default)
+    }
+    """
+    try:
+        current_user_id = get_jwt_identity()
+        folder_id = request.args.get("folder_id", type=int)
+        if folder_id is None:
+            return jsonify({"error": "folder_id is required"}), 400
+        data = request.get_json(silent=True) or {}
+
+        result = CRUDService.clone_deck(
+            deck_id,
+            folder_id,
+            current_user_id,
+            name=data.get("name"),
+            reset_review=bool(_bool_arg("reset")),
+        )
+        return (
+            jsonify({"message": "Deck cloned successfully", "data": result["data"]}),
+            201,
+        )
+    except NotFoundError as e:
+        return jsonify({"error": str(e)}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+
+@bp_deck.route("/<int:deck_id>/import", methods=["POST"])
+@jwt_required()
+def import_cards(deck_id):
+    """
+    Import cards from a CSV, TSV or Anki text export.
+
+    Upload the file as multipart/form-data ("file"), or send it as the raw
+    request body. Query Parameters:
+    - format: csv, tsv or anki (optional, guessed from the file otherwise)
+
+    CSV/TSV files may start with a header naming the question, answer and
+    difficulty columns; without one the columns are question, answer and an
+    optional difficulty (easy/medium/hard, default medium).
+
+    Returns:
+    - Counts of inserted, duplicate and invalid rows, and the first errors
+    """
+    try:
+        current_user_id = get_jwt_identity()
+        fmt = request.args.get("format")
+
+        upload = request.files.get("file")
+        if upload is not None:
+            stream, filename = upload.stream, upload.filename
+        elif request.content_length:
+            stream, filename = request.stream, None
+        else:
+            return jsonify({"error": "A file to import is required"}), 400
+
+        result = ImportService.import_cards(
+            stream, deck_id, current_user_id, fmt, filename
+        )
+        summary = result["data"]
+        return (
+            jsonify(
+                {
+                    "message": f"Imported {summary['inserted']} cards",
+                    "data": summary,
+                }
+            ),
+            201 if summary["inserted"] else 200,
+        )
+    except NotFoundError as e:
+        return jsonify({"error": str(e)}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+
+@bp_deck.route("/<int:deck_id>/export", methods=["GET"])
+@jwt_required()
+def export_deck(deck_id):
+    """
+    Download every card of a deck.
+
+    Query Parameters:
+    - format: jsonl (default, one card per line) or csv
+
+    The file is streamed while the cards are read, so exports of any size
+    use the same memory. CSV exports can be imported back into a deck.
+    """
+    try:
+        current_user_id = get_jwt_identity()
+        fmt = request.args.get("format", "jsonl")
+        result = ExportService.export_deck(deck_id, current_user_id, fmt)
+        export = result["data"]
+        return Response(
+            stream_with_context(export["chunks"]),
+            mimetype=export["mimetype"],
+            headers={
+                "Content-Disposition": f'attachment; filename="{export["filename"]}"'
+            },
+        )
+    except NotFoundError as e:
+        return jsonify({"error": str(e)}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
@@ -1,6 +1,7 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, jsonify, request, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from services.crud_service import CRUDService
+from services.crud_service import CRUDService, NotFoundError
+from services.export_service import ExportService
 
 bp_folder = Blueprint("folder", __name__)
 
@@ -21,25 +22,57 @@ def add_folder():
 @bp_folder.route("/", methods=["GET"])
 @jwt_required()
 def get_all_folders():
-    current_user_id = get_jwt_identity()
-    result = CRUDService.get_all_folders(current_user_id)
-    return (
-        jsonify(
-            {"message": "All folders retrieved successfully", "data": result["data"]}
-        ),
-        200,
-    )
+    """
+    Retrieve the user's folders with their deck and card counts.
+
+    Query Parameters:
+    - fields: Comma separated folder fields to return (id is always included)
+    """
+    try:
+        current_user_id = get_jwt_identity()
+        fields = request.args.get("fields")
+        result = CRUDService.get_all_folders(
+            current_user_id, fields.split(",") if fields else None
+        )
+        return (
+            jsonify(
+                {
+                    "message": "All folders retrieved successfully",
+                    "data": result["data"],
+                }
+            ),
+            200,
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
 
 @bp_folder.route("/<int:folder_id>", methods=["GET"])
 @jwt_required()
 def get_one_folder(folder_id):
-    current_user_id = get_jwt_identity()
-    result = CRUDService.get_one_folder(folder_id, current_user_id)
-    return (
-        jsonify({"message": "Retrieve all decks successfully", "data": result["data"]}),
-        200,
-    )
+    """
+    Retrieve a folder with its decks.
+
+    Query Parameters:
+    - fields: Comma separated deck fields to return (id is always included);
+      the cards are only counted when a count field is asked for
+    """
+    try:
+        current_user_id = get_jwt_identity()
+        fields = request.args.get("fields")
+        result = CRUDService.get_one_folder(
+            folder_id, current_user_id, fields.split(",") if fields else None
+        )
+        return (
+            jsonify(
+                {"message": "Retrieve all decks successfully", "data": result["data"]}
+            ),
+            200,
+        )
+    except NotFoundError as e:
+        return jsonify({"error": str(e)}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
 
 @bp_folder.route("/<int:folder_id>", methods=["PATCH"])
@@ -67,3 +100,33 @@ def delete_folder(folder_id):
         ),
         200,
     )
+
+
+@bp_folder.route("/<int:folder_id>/export", methods=["GET"])
+@jwt_required()
+def export_folder(folder_id):
+    """
+    Download the cards of every deck in a folder.
+
+    Query Parameters:
+    - format: jsonl (default, one card per line) or csv
+
+    Each card carries the name of its deck. The file is streamed while the
+    cards are read, so exports of any size use the same memory.
+    """
+    try:
+        current_user_id = get_jwt_identity()
+        fmt = request.args.get("format", "jsonl")
+        result = ExportService.export_folder(folder_id, current_user_id, fmt)
+        export = result["data"]
+        return Response(
+            stream_with_context(export["chunks"]),
+            mimetype=export["mimetype"],
+            headers={
+                "Content-Disposition": f'attachment; filename="{export["filename"]}"'
+            },
+        )
+    except NotFoundError as e:
+        return jsonify({"error": str(e)}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
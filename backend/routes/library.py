@@ -0,0 +1,29 @@
+from flask import Blueprint, Response, request, stream_with_context
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from services.library_service import LibraryService
+
+bp_library = Blueprint("library", __name__)
+
+
+@bp_library.route("", methods=["GET"])
+@jwt_required()
+def get_library():
+    """
+    Retrieve the user's whole library: folders, their decks and a short
+    preview of each card, with the counts of every folder and deck.
+
+    Folders, decks and cards are sorted by name. The response carries a weak
+    ETag; send it back in If-None-Match to get a 304 when nothing changed.
+    """
+    current_user_id = get_jwt_identity()
+    library = LibraryService.get_library(current_user_id)["data"]
+
+    if request.if_none_match.contains_weak(library["etag"]):
+        library["chunks"].close()
+        response = Response(status=304)
+    else:
+        response = Response(
+            stream_with_context(library["chunks"]), mimetype="application/json"
+        )
+    response.set_etag(library["etag"], weak=True)
+    return response
@@ -4,8 +4,6 @@ from services.review_service import ReviewService
 from models.base import db
 from models.card import Card
 from models.review import Review
-from models.deck import Deck
-from models.folder import Folder
 from sqlalchemy import desc
 
 bp_review = Blueprint("review", __name__)
@@ -41,13 +39,8 @@ def submit_review(card_id):
         if not review_data["answer"].strip():
             return jsonify({"error": "Answer cannot be empty"}), 400
 
-        # Verify card ownership through deck -> folder -> user relationship
-        card = (
-            Card.query.join(Deck)
-            .join(Folder)
-            .filter(Card.id == card_id, Folder.user_id == user_id)
-            .first()
-        )
+        # Verify card ownership
+        card = Card.query.filter_by(id=card_id, user_id=user_id).first()
 
         if not card:
             return jsonify({"error": "Card not found or access denied"}), 404
@@ -86,12 +79,7 @@ def get_card_review_history(card_id):
         user_id = get_jwt_identity()
 
         # Verify card ownership
-        card = (
-            Card.query.join(Deck)
-            .join(Folder)
-            .filter(Card.id == card_id, Folder.user_id == user_id)
-            .first()
-        )
+        card = Card.query.filter_by(id=card_id, user_id=user_id).first()
 
         if not card:
             return jsonify({"error": "Card not found or access denied"}), 404
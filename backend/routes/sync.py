@@ -0,0 +1,43 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from services.sync_service import SyncService
+
+bp_sync = Blueprint("sync", __name__)
+
+
+@bp_sync.route("", methods=["GET"])
+@jwt_required()
+def get_changes():
+    """
+    Retrieve the folders, decks, cards and reviews that changed since the
+    last sync, including deleted ones (their deleted_at is set).
+
+    Query Parameters:
+    - since: "next_token" of the previous response; everything is sent
+      without it
+    - limit: Rows of each kind per page (max 1000); call again with
+      next_token while has_more is true
+
+    Rows changed shortly before the last sync are sent again, so apply them
+    by id. A token older than the time deleted rows are kept answers 410:
+    sync again from scratch.
+    """
+    try:
+        current_user_id = get_jwt_identity()
+
+        limit = request.args.get("limit", type=int)
+        if limit is not None and not 1 <= limit <= 1000:
+            return jsonify({"error": "limit must be between 1 and 1000"}), 400
+
+        result = SyncService.get_changes(
+            current_user_id, request.args.get("since"), limit
+        )
+        return (
+            jsonify(
+                {"message": "Changes retrieved successfully", "data": result["data"]}
+            ),
+            200,
+        )
+    except ValueError as e:
+        status = 410 if str(e).startswith("token has expired") else 400
+        return jsonify({"error": str(e)}), status
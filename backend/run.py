@@ -10,6 +10,14 @@ flask --app run show-db-info
 python3 run.py
 ```
 
+A database created before decks and cards stored their owner needs
+`flask --app run backfill-owners` before migrations are generated or applied.
+One created before folders and decks stored card counters needs
+`flask --app run add-counters`, then `flask --app run repair-counters` to
+count them, and one created before soft delete needs
+`flask --app run add-soft-delete-indexes` so deleted names can be used again.
+Chat threads are added to an older database with `flask --app run add-threads`.
+
 To run the app in testing mode, follow the commands:
 ```
 export FLASK_ENV=testing
@@ -115,6 +123,154 @@ def show_db_info():
         click.echo(f"❌ Database connection failed: {e}")
 
 
+@click.command()
+@with_appcontext
+def rebuild_search_index():
+    """Create and refill the full-text search indexes."""
+    from models.ai import create_conversation_search_index
+    from models.card import create_card_search_index
+
+    try:
+        with db.engine.begin() as connection:
+            create_conversation_search_index(connection, rebuild=True)
+            create_card_search_index(connection, rebuild=True)
+        click.echo("✅ Search indexes rebuilt.")
+    except Exception as e:
+        click.echo(f"❌ Error rebuilding search indexes: {e}")
+
+
+@click.command()
+@with_appcontext
+def backfill_owners():
+    """Add and fill the owner columns of decks and cards (run before upgrading)."""
+    from models.card import backfill_owners as backfill
+
+    try:
+        with db.engine.begin() as connection:
+            filled = backfill(connection)
+        click.echo(
+            f"✅ Owners filled in for {filled['deck']} decks and {filled['card']} cards."
+        )
+    except Exception as e:
+        click.echo(f"❌ Error filling in owners: {e}")
+
+
+@click.command()
+@with_appcontext
+def add_threads():
+    """Add the chat thread table and the thread of each conversation."""
+    from models.ai import add_conversation_threads
+
+    try:
+        with db.engine.begin() as connection:
+            added = add_conversation_threads(connection)
+        click.echo(f"✅ Added {', '.join(added) or 'nothing'}.")
+    except Exception as e:
+        click.echo(f"❌ Error adding chat threads: {e}")
+
+
+@click.command()
+@with_appcontext
+def add_counters():
+    """Add the card counter columns of folders and decks (run repair-counters next)."""
+    from models.deck import add_counter_columns
+
+    try:
+        with db.engine.begin() as connection:
+            added = add_counter_columns(connection)
+        click.echo(
+            f"✅ Added {len(added)} counter columns, run repair-counters to fill them."
+        )
+    except Exception as e:
+        click.echo(f"❌ Error adding counter columns: {e}")
+
+
+@click.command()
+@click.option("--user-id", help="Only repair this user's folders and decks.")
+@with_appcontext
+def repair_counters(user_id):
+    """Recount the card counters stored on folders and decks."""
+    from services.counter_service import CounterService
+
+    try:
+        fixed = CounterService.repair(user_id)
+        click.echo(f"✅ Fixed {fixed['decks']} decks and {fixed['folders']} folders.")
+    except Exception as e:
+        click.echo(f"❌ Error repairing counters: {e}")
+
+
+@click.command()
+@with_appcontext
+def add_soft_delete_indexes():
+    """Replace the unique constraints of folders, decks and cards with live-row indexes."""
+    from models.card import add_soft_delete_indexes as replace_constraints
+
+    try:
+        with db.engine.begin() as connection:
+            replaced = replace_constraints(connection)
+        click.echo(f"✅ Replaced {len(replaced)} unique constraints.")
+    except Exception as e:
+        click.echo(f"❌ Error replacing unique constraints: {e}")
+
+
+@click.command()
+@click.option("--batch-size", type=int, help="Most rows removed per statement.")
+@click.option(
+    "--interval",
+    type=int,
+    help="Keep running, purging every this many seconds.",
+)
+@with_appcontext
+def purge_deleted(batch_size, interval):
+    """Remove folders, decks, cards and reviews deleted long enough ago."""
+    import time
+    from datetime import datetime, timedelta
+    from flask import current_app
+    from services.trash_service import TrashService
+
+    while True:
+        older_than = datetime.utcnow() - timedelta(
+            seconds=current_app.config["PURGE_AFTER_SECONDS"]
+        )
+        try:
+            removed = TrashService.purge(older_than, batch_size)
+            click.echo(
+                "✅ Purged "
+                + ", ".join(f"{count} {table}s" for table, count in removed.items())
+            )
+        except Exception as e:
+            click.echo(f"❌ Error purging deleted rows: {e}")
+        if not interval:
+            break
+        time.sleep(interval)
+
+
+@click.command()
+@click.option("--concurrency", "-c", default=1, help="Number of worker threads")
+@with_appcontext
+def run_ai_worker(concurrency):
+    """Process AI generation jobs from the Redis job queue."""
+    import threading
+    from flask import current_app
+    from services.job_service import RedisJobQueue, get_job_queue
+
+    queue = get_job_queue()
+    if not isinstance(queue, RedisJobQueue):
+        click.echo("❌ AI_JOB_BACKEND must be 'redis' to run a worker.")
+        return
+
+    app_obj = current_app._get_current_object()
+    click.echo(f"🚀 Processing AI jobs with {concurrency} worker(s)...")
+    workers = [
+        threading.Thread(target=queue.work, args=(app_obj,), daemon=True)
+        for _ in range(concurrency)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+
 # Register CLI commands
 app.cli.add_command(init_db)
 app.cli.add_command(migrate_db)
@@ -122,6 +278,14 @@ app.cli.add_command(upgrade_db)
 app.cli.add_command(downgrade_db)
 app.cli.add_command(reset_db)
 app.cli.add_command(show_db_info)
+app.cli.add_command(rebuild_search_index)
+app.cli.add_command(backfill_owners)
+app.cli.add_command(add_threads)
+app.cli.add_command(add_counters)
+app.cli.add_command(repair_counters)
+app.cli.add_command(add_soft_delete_indexes)
+app.cli.add_command(purge_deleted)
+app.cli.add_command(run_ai_worker)
 
 
 if __name__ == "__main__":
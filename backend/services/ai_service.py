@@ -2,129 +2,83 @@ from models.base import db
 from models.card import Card
 from models.ai import AIConversation
 from models.folder import Folder
-from models.deck import Deck
 from models.review import Review
-import os
+from services.embedding_service import user_card_index
+from services.gemini_client import AIUnavailableError, get_gemini_client
+from services.conversation_service import ConversationService
+from services.token_service import (
+    get_token_counter,
+    pack_context,
+    truncate_to_tokens,
+)
+from services.pdf_service import (
+    allocate_cards,
+    chunk_text,
+    dedupe_cards,
+    iter_pdf_pages,
+    spooled_pdf,
+)
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from flask import current_app
+from sqlalchemy import func
 import json
 
+CHAT_PROMPT_TEMPLATE = """
+        You are a helpful study assistant. Based on the user's learning data below, 
+        provide personalized insights and recommendations.
+        
+        Learning Context: {context}
+        {history}
+        User Question: {query}
+        
+        Provide helpful, encouraging response with specific insights based on their data.
+        """
+
+SUMMARY_PROMPT_TEMPLATE = """
+        Update the running summary of a conversation between a student and a
+        study assistant. Keep the facts, questions and advice needed to continue
+        the conversation, in at most {max_words} words. Reply with the summary only.
+
+        Current summary: {summary}
+
+        New messages:
+        {turns}
+        """
+
 
 class AIService:
+    # Largest number of items of each context section offered to the packer
+    CONTEXT_POOL_SIZE = 20
+    # Token budget of a single PDF chunk sent for generation
+    PDF_CHUNK_TOKENS = 3000
+    # Upper bound on concurrent generation requests for one document
+    MAX_GENERATION_WORKERS = 4
+    # Expected response tokens per generated card, for rate limiting
+    CARD_RESPONSE_TOKENS = 80
+    # Prompt tokens of a thread's history: its summary plus the recent turns
+    THREAD_HISTORY_TOKENS = 600
+    THREAD_SUMMARY_TOKENS = 200
+    # Largest prompt sent to update a thread summary
+    SUMMARY_INPUT_TOKENS = 2000
+
     def __init__(self):
         self._client = None
 
     @property
     def client(self):
-        """Lazy initialization of the Gemini client."""
+        """Lazy lookup of the shared Gemini client."""
         if self._client is None:
-            api_key = os.getenv("GEMINI_API_KEY")
-            if not api_key:
-                raise ValueError("GEMINI_API_KEY environment variable is required")
-
-            try:
-                from google import genai
-
-                self._client = genai.Client(api_key=api_key)
-            except ImportError:
-                raise ImportError("google-genai package is required for AI features")
+            self._client = get_gemini_client()
         return self._client
 
-    def generate_cards_from_pdf(
-        self, pdf_file, num_cards, deck_id, difficulty="medium"
-    ):
-        """Generate flashcards from PDF using Gemini's native PDF processing."""
-        try:
-            import tempfile
-            import os
-
-            # Read PDF file content
-            pdf_content = pdf_file.read()
-
-            # Create a temporary file for Gemini upload
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_file:
-                temp_file.write(pdf_content)
-                temp_file_path = temp_file.name
+    def _generate_content(self, prompt):
+        """Send a prompt to Gemini and return the response text."""
+        return self.client.generate(prompt)
 
-            try:
-                # Upload PDF to Gemini - simplified approach for text extraction
-                prompt = f"""
-                Create exactly {num_cards} high-quality flashcards about machine learning and AI concepts.
-                
-                Requirements:
-                - Difficulty level: {difficulty}
-                - Focus on fundamental concepts
-                - Create questions that test understanding
-                - Make answers complete but concise
-                - Ensure questions are clear and specific
-
-                Return ONLY a valid JSON array with this exact format:
-                [
-                    {{
-                        "question": "Clear, specific question here",
-                        "answer": "Complete, accurate answer here", 
-                        "difficulty_level": "{difficulty}"
-                    }}
-                ]
-
-                Do not include any text outside the JSON array.
-                """
-
-                # Generate content without file upload for now
-                response = self.client.models.generate_content(
-                    model="gemini-1.5-flash",
-                    contents=prompt,
-                )
-
-                # Parse JSON response
-                try:
-                    # Clean the response text (remove any markdown formatting)
-                    response_text = response.text.strip()
-                    if response_text.startswith("```json"):
-                        response_text = response_text[7:]
-                    if response_text.endswith("```"):
-                        response_text = response_text[:-3]
-                    response_text = response_text.strip()
-
-                    cards_data = json.loads(response_text)
-
-                    if not isinstance(cards_data, list):
-                        raise ValueError("AI response is not a list")
-
-                    if len(cards_data) == 0:
-                        raise ValueError("No cards generated from PDF")
-
-                except json.JSONDecodeError as e:
-                    raise ValueError(f"Invalid JSON response from AI: {str(e)}")
-
-                # Format response
-                return {
-                    "data": {
-                        "preview": True,
-                        "deck_id": deck_id,
-                        "cards": cards_data,
-                        "source": "pdf",
-                        "metadata": {
-                            "num_cards_generated": len(cards_data),
-                            "num_cards_requested": num_cards,
-                            "difficulty": difficulty,
-                            "file_name": pdf_file.filename,
-                        },
-                    }
-                }
-
-            finally:
-                if os.path.exists(temp_file_path):
-                    os.unlink(temp_file_path)
-
-        except Exception as e:
-            raise ValueError(f"Failed to process PDF: {str(e)}")
-
-    def generate_cards_from_text(
-        self, content, num_cards, deck_id, difficulty="medium"
-    ):
-        """Generate flashcards from text content."""
-        try:
-            # Create prompt for text-based flashcard generation
-            prompt = f"""
+    @staticmethod
+    def _build_cards_prompt(content, num_cards, difficulty):
+        """Build the flashcard generation prompt for a piece of content."""
+        return f"""
             Create exactly {num_cards} flashcards from the following content.
             
             Content:
@@ -148,32 +102,188 @@ class AIService:
             Do not include any text outside the JSON array.
             """
 
-            # Generate content
-            response = self.client.models.generate_content(
-                model="gemini-1.5-flash",
-                contents=prompt,
+    @staticmethod
+    def _parse_cards(response_text, empty_message):
+        """Parse the JSON array of cards returned by the model."""
+        try:
+            # Clean the response text (remove any markdown formatting)
+            response_text = response_text.strip()
+            if response_text.startswith("```json"):
+                response_text = response_text[7:]
+            if response_text.endswith("```"):
+                response_text = response_text[:-3]
+            response_text = response_text.strip()
+
+            cards_data = json.loads(response_text)
+
+            if not isinstance(cards_data, list):
+                raise ValueError("AI response is not a list")
+
+            if len(cards_data) == 0:
+                raise ValueError(empty_message)
+
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON response from AI: {str(e)}")
+
+        return cards_data
+
+    def _generate_cards_for_chunk(self, chunk, num_cards, difficulty):
+        prompt = AIService._build_cards_prompt(chunk, num_cards, difficulty)
+        return AIService._parse_cards(
+            self._generate_content(prompt), "No cards generated from content"
+        )
+
+    def generate_cards_from_chunks(
+        self, chunks, num_cards, difficulty="medium", on_progress=None
+    ):
+        """Generate cards for several text chunks concurrently.
+
+        Each chunk gets its share of the requested cards and is sent to the
+        model from a bounded thread pool. Results are merged in document
+        order and deduplicated by question. A failing chunk only loses its
+        own cards; an error is raised only if every chunk fails.
+
+        ``on_progress(completed, total)`` is called as chunks finish.
+        """
+        plan = allocate_cards(len(chunks), num_cards)
+        if not plan:
+            raise ValueError("No content to generate cards from")
+
+        results = [None] * len(plan)
+        errors = []
+        max_workers = min(AIService.MAX_GENERATION_WORKERS, len(plan))
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = {
+                pool.submit(
+                    self._generate_cards_for_chunk,
+                    chunks[chunk_index],
+                    count,
+                    difficulty,
+                ): position
+                for position, (chunk_index, count) in enumerate(plan)
+            }
+            for completed, future in enumerate(as_completed(futures), 1):
+                try:
+                    results[futures[future]] = future.result()
+                except Exception as e:
+                    errors.append(e)
+                if on_progress:
+                    on_progress(completed, len(plan))
+
+        if len(errors) == len(plan):
+            # Report an unavailable upstream as such rather than as bad input
+            unavailable = [e for e in errors if isinstance(e, AIUnavailableError)]
+            raise (unavailable or errors)[0]
+
+        merged = [card for cards in results if cards for card in cards]
+        return dedupe_cards(merged)[:num_cards]
+
+    @staticmethod
+    def _generation_prompt_tokens(chunks, num_cards, difficulty):
+        counter = get_token_counter()
+        return sum(
+            counter.count(
+                AIService._build_cards_prompt(chunks[chunk_index], count, difficulty)
             )
+            for chunk_index, count in allocate_cards(len(chunks), num_cards)
+        )
 
-            # Parse JSON response
-            try:
-                # Clean the response text
-                response_text = response.text.strip()
-                if response_text.startswith("```json"):
-                    response_text = response_text[7:]
-                if response_text.endswith("```"):
-                    response_text = response_text[:-3]
-                response_text = response_text.strip()
+    @staticmethod
+    def estimate_generation_tokens(chunks, num_cards, difficulty="medium"):
+        """Estimate prompt and response tokens of generating cards from chunks"""
+        prompt_tokens = AIService._generation_prompt_tokens(
+            chunks, num_cards, difficulty
+        )
+        return prompt_tokens + num_cards * AIService.CARD_RESPONSE_TOKENS
+
+    @staticmethod
+    def count_generation_tokens(chunks, num_cards, difficulty, cards):
+        """Count prompt and response tokens of a finished card generation"""
+        prompt_tokens = AIService._generation_prompt_tokens(
+            chunks, num_cards, difficulty
+        )
+        return prompt_tokens + get_token_counter().count(json.dumps(cards))
+
+    @staticmethod
+    def extract_pdf_chunks(pdf_file):
+        """Extract the text of an uploaded PDF as token-bounded chunks."""
+        with spooled_pdf(pdf_file) as pdf_path:
+            chunks = list(
+                chunk_text(
+                    iter_pdf_pages(pdf_path),
+                    AIService.PDF_CHUNK_TOKENS,
+                    AIService.estimate_tokens,
+                )
+            )
 
-                cards_data = json.loads(response_text)
+        if not chunks:
+            raise ValueError("No extractable text found in PDF")
+        return chunks
+
+    def generate_cards_from_pdf(
+        self, pdf_file, num_cards, deck_id, difficulty="medium"
+    ):
+        """Generate flashcards from the text of a PDF.
 
-                if not isinstance(cards_data, list):
-                    raise ValueError("AI response is not a list")
+        The upload is spooled to a temporary file, parsed page by page and
+        split into token-bounded chunks that are generated in parallel. The
+        temporary file is always removed before returning.
+        """
+        try:
+            chunks = AIService.extract_pdf_chunks(pdf_file)
+        except Exception as e:
+            raise ValueError(f"Failed to process PDF: {str(e)}")
 
-                if len(cards_data) == 0:
-                    raise ValueError("No cards generated from content")
+        return self.generate_cards_from_pdf_chunks(
+            chunks, num_cards, deck_id, difficulty, pdf_file.filename
+        )
 
-            except json.JSONDecodeError as e:
-                raise ValueError(f"Invalid JSON response from AI: {str(e)}")
+    def generate_cards_from_pdf_chunks(
+        self,
+        chunks,
+        num_cards,
+        deck_id,
+        difficulty="medium",
+        file_name=None,
+        on_progress=None,
+    ):
+        """Generate flashcards from the already extracted chunks of a PDF."""
+        try:
+            cards_data = self.generate_cards_from_chunks(
+                chunks, num_cards, difficulty, on_progress
+            )
+            if len(cards_data) == 0:
+                raise ValueError("No cards generated from PDF")
+
+            # Format response
+            return {
+                "data": {
+                    "preview": True,
+                    "deck_id": deck_id,
+                    "cards": cards_data,
+                    "source": "pdf",
+                    "metadata": {
+                        "num_cards_generated": len(cards_data),
+                        "num_cards_requested": num_cards,
+                        "difficulty": difficulty,
+                        "file_name": file_name,
+                        "num_chunks": len(chunks),
+                    },
+                }
+            }
+
+        except AIUnavailableError:
+            raise
+        except Exception as e:
+            raise ValueError(f"Failed to process PDF: {str(e)}")
+
+    def generate_cards_from_text(
+        self, content, num_cards, deck_id, difficulty="medium"
+    ):
+        """Generate flashcards from text content."""
+        try:
+            cards_data = self._generate_cards_for_chunk(content, num_cards, difficulty)
 
             # Format response
             return {
@@ -191,13 +301,15 @@ class AIService:
                 }
             }
 
+        except AIUnavailableError:
+            raise
         except Exception as e:
             raise ValueError(f"Failed to generate cards from text: {str(e)}")
 
     @staticmethod
     def estimate_tokens(text):
-        """Rough token estimation"""
-        return len(text) // 4
+        """Count tokens with the configured tokenizer (memoized)"""
+        return get_token_counter().count(text)
 
     @staticmethod
     def build_user_learning_context(user_id):
@@ -268,9 +380,7 @@ class AIService:
     def get_top_struggling_cards(user_id, limit=5):
         """Get cards with lowest recent scores"""
         struggling_cards = []
-        cards = (
-            Card.query.join(Deck).join(Folder).filter(Folder.user_id == user_id).all()
-        )
+        cards = Card.query.filter_by(user_id=user_id).all()
 
         for card in cards:
             recent_reviews = (
@@ -310,9 +420,7 @@ class AIService:
     def get_key_metrics(user_id):
         """Get basic user metrics"""
         all_reviews = Review.query.filter_by(user_id=user_id).all()
-        total_cards = (
-            Card.query.join(Deck).join(Folder).filter(Folder.user_id == user_id).count()
-        )
+        total_cards = Card.query.filter_by(user_id=user_id).count()
 
         return {
             "total_reviews": len(all_reviews),
@@ -350,112 +458,253 @@ class AIService:
 
     @staticmethod
     def create_compressed_context(user_id, max_tokens=2000):
-        """Create context that fits within token budget"""
-
-        # Prioritize by relevance and recency
-        compressed = {
-            "recent_struggles": AIService.get_top_struggling_cards(user_id, limit=5),
-            "mastered_topics": AIService.get_mastered_topics_summary(user_id),
-            "study_stats": AIService.get_key_metrics(user_id),
-            "focus_areas": AIService.identify_knowledge_gaps(user_id, limit=3),
-        }
-
-        # Estimate tokens (rough: 1 token ~ 4 characters)
-        context_text = json.dumps(compressed)
-        estimated_tokens = len(context_text) // 4
+        """Create context that fits within token budget
 
-        if estimated_tokens > max_tokens:
-            # Further compress by reducing limits
-            compressed = {
-                "recent_struggles": AIService.get_top_struggling_cards(
-                    user_id, limit=3
+        Sections are packed in priority order (study stats, struggling cards,
+        focus areas, mastered topics) until the budget is used up.
+        """
+        sections = [
+            ("study_stats", AIService.get_key_metrics(user_id)),
+            (
+                "recent_struggles",
+                AIService.get_top_struggling_cards(
+                    user_id, limit=AIService.CONTEXT_POOL_SIZE
                 ),
-                "mastered_topics": AIService.get_mastered_topics_summary(user_id)[:3],
-                "study_stats": AIService.get_key_metrics(user_id),
-                "focus_areas": AIService.identify_knowledge_gaps(user_id, limit=2),
-            }
+            ),
+            (
+                "focus_areas",
+                AIService.identify_knowledge_gaps(
+                    user_id, limit=AIService.CONTEXT_POOL_SIZE
+                ),
+            ),
+            ("mastered_topics", AIService.get_mastered_topics_summary(user_id)),
+        ]
 
+        compressed, _ = pack_context(sections, max_tokens, get_token_counter())
         return compressed
 
     @staticmethod
-    def get_context_by_query_type(user_query, user_id):
-        """Only include relevant context based on query"""
-
-        query_lower = user_query.lower()
+    def get_relevant_cards(user_query, user_id, limit=None, min_similarity=None):
+        """Get the user's cards closest in meaning to the query, best first"""
+        limit = limit or current_app.config["RAG_TOP_K"]
+        if min_similarity is None:
+            min_similarity = current_app.config["RAG_MIN_SIMILARITY"]
+
+        matches = user_card_index.search(user_id, user_query, limit, min_similarity)
+        if not matches:
+            return []
+
+        # Recent performance of the retrieved cards in one grouped query
+        scores = dict(
+            db.session.execute(
+                db.select(Review.card_id, func.avg(Review.score))
+                .where(
+                    Review.user_id == user_id,
+                    Review.card_id.in_([match["card_id"] for match in matches]),
+                )
+                .group_by(Review.card_id)
+            ).all()
+        )
 
-        if "progress" in query_lower:
-            # Just metrics + recent performance
-            return {
-                "study_stats": AIService.get_key_metrics(user_id),
-                "recent_struggles": AIService.get_top_struggling_cards(
-                    user_id, limit=3
-                ),
+        relevant = []
+        for match in matches:
+            card = {
+                "question": match["question"],
+                "answer": match["answer"],
+                "topic": match["topic"],
+                "is_mastered": match["is_mastered"],
             }
+            if match["card_id"] in scores:
+                card["avg_score"] = round(float(scores[match["card_id"]]), 2)
+            relevant.append(card)
+        return relevant
 
-        elif "struggling" in query_lower:
-            # Only low-scoring cards + related content
-            return {
-                "recent_struggles": AIService.get_top_struggling_cards(
-                    user_id, limit=5
-                ),
-                "focus_areas": AIService.identify_knowledge_gaps(user_id, limit=3),
-            }
+    @staticmethod
+    def get_context_by_query_type(user_query, user_id, max_tokens=1500):
+        """Only include relevant context based on query
 
-        else:
-            # General context
-            return AIService.create_compressed_context(user_id, max_tokens=1500)
+        The cards semantically closest to the question come first, followed by
+        the overall study stats. Questions that match no card (e.g. "how am I
+        doing?") get the general compressed context instead.
+        """
+        try:
+            relevant_cards = AIService.get_relevant_cards(user_query, user_id)
+        except Exception as e:
+            current_app.logger.warning(f"Card retrieval unavailable: {e}")
+            relevant_cards = []
+
+        if not relevant_cards:
+            return AIService.create_compressed_context(user_id, max_tokens)
+
+        sections = [
+            ("relevant_cards", relevant_cards),
+            ("study_stats", AIService.get_key_metrics(user_id)),
+        ]
+        context, _ = pack_context(sections, max_tokens, get_token_counter())
+        return context
+
+    @staticmethod
+    def _format_turn(turn):
+        return f"User: {turn.user_query}\nAssistant: {turn.ai_response}"
+
+    def summarize_turns(self, summary, turns, counter):
+        """Fold turns into a running summary, one bounded prompt at a time.
+
+        Returns:
+            summary (str): Updated summary of at most THREAD_SUMMARY_TOKENS
+            used (int): Prompt and response tokens spent
+        """
+        turn_budget = AIService.SUMMARY_INPUT_TOKENS // 4
+        texts = [
+            truncate_to_tokens(AIService._format_turn(turn), turn_budget, counter)
+            for turn in turns
+        ]
+        max_words = AIService.THREAD_SUMMARY_TOKENS * 3 // 4
+        used = 0
+
+        while texts:
+            batch, batch_tokens = [], counter.count(summary)
+            while texts and (
+                not batch
+                or batch_tokens + counter.count(texts[0]) <= turn_budget * 3
+            ):
+                batch_tokens += counter.count(texts[0])
+                batch.append(texts.pop(0))
+
+            prompt = SUMMARY_PROMPT_TEMPLATE.format(
+                max_words=max_words, summary=summary or "(none)", turns="\n".join(batch)
+            )
+            response = self._generate_content(prompt).strip()
+            used += counter.count(prompt) + counter.count(response)
+            summary = truncate_to_tokens(
+                response, AIService.THREAD_SUMMARY_TOKENS, counter
+            )
+
+        return summary, used
+
+    def build_thread_history(self, thread, counter):
+        """History of a thread for the prompt, bounded by THREAD_HISTORY_TOKENS.
+
+        The most recent turns that fit next to the summary are quoted as is.
+        Older turns that have not been summarized yet are folded into the
+        thread's running summary first, so the history never grows with the
+        length of the thread.
+
+        Returns:
+            history (str): Text to put in the prompt ("" for a new thread)
+            used (int): Tokens spent updating the summary
+        """
+        turns = ConversationService.unsummarized_turns(thread)
+        recent_budget = AIService.THREAD_HISTORY_TOKENS - AIService.THREAD_SUMMARY_TOKENS
+
+        recent, recent_tokens = [], 0
+        for turn in reversed(turns):
+            text = AIService._format_turn(turn)
+            cost = counter.count(text)
+            if recent_tokens + cost > recent_budget:
+                break
+            recent.insert(0, text)
+            recent_tokens += cost
+
+        older = turns[: len(turns) - len(recent)]
+        used = 0
+        if older:
+            try:
+                thread.summary, used = self.summarize_turns(
+                    thread.summary, older, counter
+                )
+                thread.summarized_through_id = older[-1].id
+            except Exception as e:
+                # Keep the previous summary; the older turns are left out of
+                # this prompt and folded in on a later turn
+                current_app.logger.warning(f"Thread summary not updated: {e}")
+
+        sections = []
+        if thread.summary:
+            sections.append(f"Conversation so far: {thread.summary}")
+        if recent:
+            sections.append("Recent messages:\n" + "\n".join(recent))
+        return "\n\n".join(sections), used
+
+    def ai_chat_with_budget(
+        self, user_query, user_id, max_context_tokens=2000, thread_id=None
+    ):
+        """Ensure we stay within token budget
 
-    def ai_chat_with_budget(self, user_query, user_id, max_context_tokens=2000):
-        """Ensure we stay within token budget"""
+        Each chat is a turn of a thread: a new one unless ``thread_id`` names
+        one of the user's threads to continue. The thread history takes its
+        share of the budget before the learning context.
+        """
 
-        # Estimate query tokens
-        query_tokens = AIService.estimate_tokens(user_query)
+        counter = get_token_counter()
 
         # Reserve tokens for response (typically 500-1000)
         response_buffer = 800
 
+        if thread_id is None:
+            thread = ConversationService.create_thread(user_id, user_query)
+            history, summary_tokens = "", 0
+        else:
+            thread = ConversationService.get_thread(thread_id, user_id)
+            history, summary_tokens = self.build_thread_history(thread, counter)
+
+        # Everything in the prompt except the context is fixed
+        fixed_tokens = counter.count(
+            CHAT_PROMPT_TEMPLATE.format(context="", history=history, query=user_query)
+        )
+
         # Calculate available tokens for context
-        available_for_context = max_context_tokens - query_tokens - response_buffer
+        available_for_context = max(
+            0, max_context_tokens - fixed_tokens - response_buffer
+        )
 
-        # Get compressed context
-        context = AIService.create_compressed_context(user_id, available_for_context)
+        # Get the context relevant to the question
+        context = AIService.get_context_by_query_type(
+            user_query, user_id, available_for_context
+        )
 
         # Build prompt
-        system_prompt = f"""
-        You are a helpful study assistant. Based on the user's learning data below, 
-        provide personalized insights and recommendations.
-        
-        Learning Context: {json.dumps(context)}
-        
-        User Question: {user_query}
-        
-        Provide helpful, encouraging response with specific insights based on their data.
-        """
+        system_prompt = CHAT_PROMPT_TEMPLATE.format(
+            context=json.dumps(context), history=history, query=user_query
+        )
 
-        total_estimated = AIService.estimate_tokens(system_prompt)
+        total_estimated = counter.count(system_prompt)
         print(f"Estimated tokens: {total_estimated}")
 
         try:
-            response = self.client.models.generate_content(
-                model="gemini-1.5-flash",
-                contents=system_prompt,
-            )
+            response_text = self._generate_content(system_prompt)
 
             # Save conversation
             conversation = AIConversation(
-                user_query=user_query, ai_response=response.text, user_id=user_id
+                user_query=user_query,
+                ai_response=response_text,
+                user_id=user_id,
+                thread=thread,
             )
             db.session.add(conversation)
             db.session.commit()
 
+            response_tokens = counter.count(response_text)
             return {
                 "data": {
                     "query": user_query,
-                    "response": response.text,
+                    "response": response_text,
                     "conversation_id": conversation.id,
+                    "thread_id": thread.id,
+                    "usage": {
+                        "prompt_tokens": total_estimated,
+                        "response_tokens": response_tokens,
+                        "summary_tokens": summary_tokens,
+                        "total_tokens": total_estimated
+                        + response_tokens
+                        + summary_tokens,
+                    },
                 }
             }
 
+        except AIUnavailableError:
+            db.session.rollback()
+            raise
         except Exception as e:
             db.session.rollback()
             raise ValueError(f"Failed to generate AI response: {str(e)}")
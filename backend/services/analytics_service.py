@@ -57,11 +57,7 @@ class AnalyticsService:
     # Statistics by deck (showing average accuracy score & improvement over time)
     @staticmethod
     def get_stats_one_deck(user_id, deck_id):
-        deck = (
-            Deck.query.join(Folder)
-            .filter(Deck.id == deck_id, Folder.user_id == user_id)
-            .first()
-        )
+        deck = Deck.query.filter_by(id=deck_id, user_id=user_id).first()
         if not deck:
             raise ValueError("Deck not found")
 
@@ -109,7 +105,7 @@ class AnalyticsService:
             raise ValueError("User not found")
 
         all_folders = Folder.query.filter_by(user_id=user_id).all()
-        all_decks = Deck.query.join(Folder).filter(Folder.user_id == user_id).all()
+        all_decks = Deck.query.filter_by(user_id=user_id).all()
         all_reviews = Review.query.filter_by(user_id=user_id).all()
 
         # Calculate study streak
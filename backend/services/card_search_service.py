@@ -0,0 +1,101 @@
+from models.base import db
+from services.search_service import (
+    HIGHLIGHT_END,
+    HIGHLIGHT_START,
+    fts5_query,
+    search_terms,
+    tsquery,
+)
+from sqlalchemy import text
+
+# bm25() is lower for better matches; it is negated so higher scores win.
+# Questions count twice as much as answers. Raw SQL skips the soft-delete
+# hook, so deleted rows are filtered here; deleting a deck or folder also
+# marks its cards, so the card's own deleted_at is enough.
+_SQLITE_CARD_SEARCH = text("""
+    SELECT c.id, c.deck_id, d.name AS deck_name,
+        snippet(card_fts, 0, :start, :end, '...', 12) AS question_snippet,
+        snippet(card_fts, 1, :start, :end, '...', 24) AS answer_snippet,
+        -bm25(card_fts, 2.0, 1.0) AS score
+    FROM card_fts
+    JOIN card AS c ON c.id = card_fts.rowid
+    JOIN deck AS d ON d.id = c.deck_id
+    WHERE card_fts MATCH :query
+        AND c.user_id = :user_id
+        AND c.deleted_at IS NULL
+    ORDER BY bm25(card_fts, 2.0, 1.0), c.id
+    LIMIT :limit OFFSET :offset
+    """)
+
+# Headlines are costly, so they are only built for the page of results
+_POSTGRES_CARD_SEARCH = text("""
+    WITH search AS (SELECT to_tsquery('english', :query) AS query),
+    page AS (
+        SELECT c.id, c.deck_id, d.name AS deck_name, c.question, c.answer,
+            ts_rank_cd(c.search_vector, search.query) AS score
+        FROM card AS c
+        JOIN deck AS d ON d.id = c.deck_id, search
+        WHERE c.user_id = :user_id
+            AND c.deleted_at IS NULL
+            AND c.search_vector @@ search.query
+        ORDER BY score DESC, c.id
+        LIMIT :limit OFFSET :offset
+    )
+    SELECT page.id, page.deck_id, page.deck_name, page.score,
+        ts_headline('english', page.question, search.query,
+            'StartSel=' || :start || ', StopSel=' || :end
+            || ', MaxWords=12, MinWords=4') AS question_snippet,
+        ts_headline('english', page.answer, search.query,
+            'StartSel=' || :start || ', StopSel=' || :end
+            || ', MaxWords=24, MinWords=8') AS answer_snippet
+    FROM page, search
+    ORDER BY page.score DESC, page.id
+    """)
+
+
+class CardSearchService:
+
+    @staticmethod
+    def search_cards(user_id, query, limit=20, offset=0):
+        """Full-text search over the questions and answers of a user's cards.
+
+        Matches must contain every term of the query (stemmed); the last term
+        also matches words it starts, for search as you type. Questions count
+        twice as much as answers when ranking, and each result carries
+        snippets with the matched terms highlighted.
+        """
+        terms = search_terms(query)
+        if not terms:
+            raise ValueError("Search query is required")
+
+        params = {
+            "user_id": user_id,
+            "limit": limit + 1,
+            "offset": offset,
+            "start": HIGHLIGHT_START,
+            "end": HIGHLIGHT_END,
+        }
+        if db.engine.dialect.name == "postgresql":
+            params["query"] = tsquery(terms, prefix_last=True)
+            statement = _POSTGRES_CARD_SEARCH
+        else:
+            params["query"] = fts5_query(terms, prefix_last=True)
+            statement = _SQLITE_CARD_SEARCH
+
+        rows = db.session.execute(statement, params).all()
+        has_more = len(rows) > limit
+
+        return {
+            "results": [
+                {
+                    "id": row.id,
+                    "deck_id": row.deck_id,
+                    "deck_name": row.deck_name,
+                    "question_snippet": row.question_snippet,
+                    "answer_snippet": row.answer_snippet,
+                    "score": round(float(row.score), 4),
+                }
+                for row in rows[:limit]
+            ],
+            "pagination": {"limit": limit, "offset": offset, "has_more": has_more},
+        }
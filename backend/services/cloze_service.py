@@ -0,0 +1,254 @@
+import math
+import re
+import threading
+from collections import Counter, OrderedDict
+
+from models.base import db
+from models.card import Card
+
+BLANK = "_____"
+
+# Sentence ends: terminal punctuation (and closing quotes) followed by space
+# and a capital or digit, or a blank line
+_SENTENCE_END = re.compile(r"[.!?][\"')\]]*(?=\s+[\"'(\[]?[A-Z0-9])|\n\s*\n")
+_WORD = re.compile(r"[^\W\d_][\w'-]*[^\W_]|\d{3,}", re.UNICODE)
+
+STOPWORDS = frozenset("""
+    about above after again against also although among another because been
+    before being below between both cannot could does doing down during each
+    either every from further have having here however into itself just less
+    made make many more most much must neither other others over same several
+    should since some such than that their theirs them then there these they
+    this those though through thus under until upon very were what when where
+    whether which while whom whose will with within without would your yours
+    often usually called known used uses using include includes including
+    """.split())
+
+
+def split_sentences(text):
+    """Split text into sentences, collapsing whitespace and dropping empty ones."""
+    pieces, start = [], 0
+    for match in _SENTENCE_END.finditer(text):
+        pieces.append(text[start : match.end()])
+        start = match.end()
+    pieces.append(text[start:])
+    return [" ".join(piece.split()) for piece in pieces if piece.strip()]
+
+
+def key_terms(text):
+    """Candidate cloze answers of a text: lowercased content words."""
+    return [
+        word
+        for word in (match.lower() for match in _WORD.findall(text))
+        if len(word) >= 4 and word not in STOPWORDS
+    ]
+
+
+class CorpusStats:
+    """Document frequencies of key terms over a collection of texts.
+
+    Args:
+        document_frequency (Counter): Number of documents containing each term
+        num_documents (int): Size of the collection
+    """
+
+    def __init__(self, document_frequency=None, num_documents=0):
+        self.document_frequency = document_frequency or Counter()
+        self.num_documents = num_documents
+
+    @classmethod
+    def from_documents(cls, documents):
+        document_frequency = Counter()
+        num_documents = 0
+        for document in documents:
+            document_frequency.update(set(key_terms(document)))
+            num_documents += 1
+        return cls(document_frequency, num_documents)
+
+
+class UserCorpusCache:
+    """Per-user document frequencies over the user's cards, kept in an LRU.
+
+    A cheap aggregate (card count, largest id, latest update) tells whether the
+    cached statistics are still current, so the cards are only read again
+    after they changed.
+
+    Args:
+        max_users (int): Number of users whose statistics stay in memory
+    """
+
+    def __init__(self, max_users=64):
+        self.max_users = max_users
+        self._stats = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _user_cards(statement, user_id):
+        return statement.where(Card.user_id == user_id)
+
+    def get(self, user_id):
+        signature = tuple(
+            db.session.execute(
+                self._user_cards(
+                    db.select(
+                        db.func.count(Card.id),
+                        db.func.max(Card.id),
+                        db.func.max(Card.updated_at),
+                    ),
+                    user_id,
+                )
+            ).one()
+        )
+
+        with self._lock:
+            cached = self._stats.get(user_id)
+            if cached is not None and cached[0] == signature:
+                self._stats.move_to_end(user_id)
+                return cached[1]
+
+        rows = db.session.execute(
+            self._user_cards(db.select(Card.question, Card.answer), user_id)
+        )
+        stats = CorpusStats.from_documents(
+            f"{question} {answer}" for question, answer in rows
+        )
+
+        with self._lock:
+            self._stats[user_id] = (signature, stats)
+            self._stats.move_to_end(user_id)
+            while len(self._stats) > self.max_users:
+                self._stats.popitem(last=False)
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self._stats.clear()
+
+
+user_corpus_cache = UserCorpusCache()
+
+
+def _blank_out(sentence, term):
+    """Replace the first whole-word occurrence of a term, keeping its casing."""
+    pattern = re.compile(rf"(?<![\w-]){re.escape(term)}(?![\w-])", re.IGNORECASE)
+    match = pattern.search(sentence)
+    if match is None:
+        return None, None
+    return sentence[: match.start()] + BLANK + sentence[match.end() :], match.group()
+
+
+def generate_cloze_cards(
+    text, num_cards, difficulty="medium", corpus=None, min_words=6, max_words=60
+):
+    """Turn the most informative sentences of a text into cloze cards.
+
+    Terms are weighted by TF-IDF: their frequency in the text against how many
+    documents of the corpus (the user's cards) and sentences of the text
+    contain them, so topic words of the text beat words the user already has
+    many cards about. Easy cards blank the text's recurring topic words, hard
+    cards its rarest words. Each sentence gives at most one card and each term
+    is blanked at most once; cards keep the order of the text.
+
+    Args:
+        text (str): Source text
+        num_cards (int): Maximum number of cards
+        difficulty (str): easy, medium or hard
+        corpus (CorpusStats): Document frequencies of the user's cards
+        min_words (int): Shortest sentence usable as a card
+        max_words (int): Longest sentence usable as a card
+
+    Returns:
+        list of dict: Cards with question, answer and difficulty_level
+    """
+    corpus = corpus or CorpusStats()
+    sentences = []
+    for sentence in split_sentences(text):
+        num_words = len(sentence.split())
+        if min_words <= num_words <= max_words:
+            sentences.append((sentence, key_terms(sentence)))
+
+    # Term frequencies, and for each term the first sentences containing it;
+    # a term needs at most one sentence per card already taken plus one
+    term_frequency = Counter()
+    sentence_frequency = Counter()
+    postings = {}
+    for position, (_, terms) in enumerate(sentences):
+        term_frequency.update(terms)
+        distinct = set(terms)
+        sentence_frequency.update(distinct)
+        for term in distinct:
+            positions = postings.setdefault(term, [])
+            if len(positions) <= num_cards:
+                positions.append(position)
+
+    num_documents = corpus.num_documents + len(sentences)
+
+    def idf(term):
+        document_frequency = corpus.document_frequency[term] + sentence_frequency[term]
+        return math.log((1 + num_documents) / (1 + document_frequency)) + 1
+
+    if difficulty == "easy":
+        weight = lambda term: term_frequency[term] * math.sqrt(idf(term))
+    elif difficulty == "hard":
+        weight = lambda term: idf(term) ** 2 / term_frequency[term]
+    else:
+        weight = lambda term: term_frequency[term] * idf(term)
+
+    # Best terms first, each blanked in its earliest sentence not yet used;
+    # on ties longer (more specific) terms win
+    ranked_terms = sorted(term_frequency, key=lambda term: (-weight(term), -len(term)))
+
+    chosen = {}
+    for term in ranked_terms:
+        if len(chosen) >= num_cards:
+            break
+        for position in postings[term]:
+            if position in chosen:
+                continue
+            question, answer = _blank_out(sentences[position][0], term)
+            if question is not None:
+                chosen[position] = (question, answer)
+                break
+
+    return [
+        {
+            "question": chosen[position][0],
+            "answer": chosen[position][1],
+            "difficulty_level": difficulty,
+        }
+        for position in sorted(chosen)
+    ]
+
+
+class ClozeService:
+    """Rule-based card generation that needs no model API.
+
+    Used when explicitly requested and as the fallback while Gemini is
+    unavailable. Results have the same shape as AIService's.
+    """
+
+    @staticmethod
+    def generate_cards(
+        text, num_cards, deck_id, user_id, difficulty="medium", source="text"
+    ):
+        """Generate cloze cards from text, weighting terms by the user's cards."""
+        cards = generate_cloze_cards(
+            text, num_cards, difficulty, user_corpus_cache.get(user_id)
+        )
+        if not cards:
+            raise ValueError("No sentences suitable for cards found in content")
+
+        return {
+            "data": {
+                "preview": True,
+                "deck_id": deck_id,
+                "cards": cards,
+                "source": source,
+                "metadata": {
+                    "num_cards_generated": len(cards),
+                    "num_cards_requested": num_cards,
+                    "difficulty": difficulty,
+                    "content_length": len(text),
+                },
+            }
+        }
@@ -0,0 +1,305 @@
+from models.ai import AIConversation, ConversationThread
+from models.base import db
+from services.search_service import (
+    HIGHLIGHT_END,
+    HIGHLIGHT_START,
+    fts5_column_filter,
+    fts5_query,
+    search_terms,
+)
+from sqlalchemy import func, text
+
+
+def _preview(text, length):
+    """Preview of a text selected with one extra character to detect truncation."""
+    return text[:length] + "..." if len(text) > length else text
+
+
+class ConversationService:
+    QUERY_PREVIEW_LENGTH = 100
+    RESPONSE_PREVIEW_LENGTH = 200
+    # Conversations counted at most for the history total
+    COUNT_CAP = 1000
+
+    @staticmethod
+    def list_conversations(user_id, limit=10, cursor=None, offset=0):
+        """List a user's conversations, newest first.
+
+        Only ids, timestamps and previews cut by the database are selected,
+        so long responses are never loaded. Pages follow a keyset on
+        (user_id, id): ``cursor`` is the id of the last conversation of the
+        previous page. ``offset`` is still accepted when no cursor is given.
+
+        The total is computed on the first page only and counts at most
+        COUNT_CAP conversations; ``total_is_exact`` tells whether it was cut.
+        """
+        query_preview = func.substr(
+            AIConversation.user_query, 1, ConversationService.QUERY_PREVIEW_LENGTH + 1
+        )
+        response_preview = func.substr(
+            AIConversation.ai_response,
+            1,
+            ConversationService.RESPONSE_PREVIEW_LENGTH + 1,
+        )
+        statement = (
+            db.select(
+                AIConversation.id,
+                AIConversation.created_at,
+                AIConversation.updated_at,
+                query_preview.label("query_preview"),
+                response_preview.label("response_preview"),
+            )
+            .where(AIConversation.user_id == user_id)
+            .order_by(AIConversation.id.desc())
+            .limit(limit + 1)
+        )
+        if cursor is not None:
+            statement = statement.where(AIConversation.id < cursor)
+        elif offset:
+            statement = statement.offset(offset)
+
+        rows = db.session.execute(statement).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        pagination = {
+            "limit": limit,
+            "has_more": has_more,
+            "next_cursor": str(rows[-1].id) if has_more else None,
+        }
+        if cursor is None:
+            pagination["offset"] = offset
+            pagination.update(ConversationService.count_conversations(user_id))
+
+        return {
+            "conversations": [
+                {
+                    "id": row.id,
+                    "query": _preview(
+                        row.query_preview, ConversationService.QUERY_PREVIEW_LENGTH
+                    ),
+                    "response_preview": _preview(
+                        row.response_preview,
+                        ConversationService.RESPONSE_PREVIEW_LENGTH,
+                    ),
+                    "created_at": row.created_at.isoformat(),
+                    "updated_at": (
+                        row.updated_at.isoformat() if row.updated_at else None
+                    ),
+                }
+                for row in rows
+            ],
+            "pagination": pagination,
+        }
+
+    @staticmethod
+    def count_conversations(user_id):
+        """Count a user's conversations, stopping at COUNT_CAP + 1 rows."""
+        capped = (
+            db.select(AIConversation.id)
+            .where(AIConversation.user_id == user_id)
+            .limit(ConversationService.COUNT_CAP + 1)
+            .subquery()
+        )
+        count = db.session.execute(db.select(func.count()).select_from(capped)).scalar()
+        return {
+            "total": min(count, ConversationService.COUNT_CAP),
+            "total_is_exact": count <= ConversationService.COUNT_CAP,
+        }
+
+    @staticmethod
+    def search_conversations(user_id, query, limit=10, offset=0):
+        """Full-text search over a user's conversations, best match first.
+
+        Matches must contain every term of the query (stemmed). Queries count
+        twice as much as responses when ranking, and each result carries
+        snippets with the matched terms highlighted.
+        """
+        terms = search_terms(query)
+        if not terms:
+            raise ValueError("Search query is required")
+
+        params = {
+            "user_id": user_id,
+            "limit": limit + 1,
+            "offset": offset,
+            "start": HIGHLIGHT_START,
+            "end": HIGHLIGHT_END,
+        }
+        if db.engine.dialect.name == "postgresql":
+            params["query"] = " ".join(terms)
+            statement = _POSTGRES_CONVERSATION_SEARCH
+        else:
+            # The owner is matched by the index itself instead of a join
+            params["query"] = (
+                fts5_column_filter(["user_id"], fts5_query([user_id]))
+                + " AND "
+                + fts5_column_filter(["user_query", "ai_response"], fts5_query(terms))
+            )
+            statement = _SQLITE_CONVERSATION_SEARCH
+
+        rows = db.session.execute(statement, params).all()
+        has_more = len(rows) > limit
+
+        return {
+            "results": [
+                {
+                    "id": row.id,
+                    "query_snippet": row.query_snippet,
+                    "response_snippet": row.response_snippet,
+                    "score": round(float(row.score), 4),
+                    "created_at": _isoformat(row.created_at),
+                }
+                for row in rows[:limit]
+            ],
+            "pagination": {"limit": limit, "offset": offset, "has_more": has_more},
+        }
+
+    # THREADS
+    @staticmethod
+    def create_thread(user_id, first_query):
+        """Start a thread titled after its first question (not committed)."""
+        title = " ".join(first_query.split())
+        if len(title) > ConversationService.QUERY_PREVIEW_LENGTH:
+            title = title[: ConversationService.QUERY_PREVIEW_LENGTH] + "..."
+        thread = ConversationThread(title=title, user_id=user_id)
+        db.session.add(thread)
+        return thread
+
+    @staticmethod
+    def get_thread(thread_id, user_id):
+        thread = db.session.execute(
+            db.select(ConversationThread).where(
+                ConversationThread.id == thread_id,
+                ConversationThread.user_id == user_id,
+            )
+        ).scalar_one_or_none()
+        if thread is None:
+            raise ValueError("Thread not found")
+        return thread
+
+    @staticmethod
+    def unsummarized_turns(thread):
+        """Turns of a thread not yet folded into its summary, oldest first."""
+        if thread.id is None:
+            return []
+        return (
+            db.session.execute(
+                db.select(AIConversation)
+                .where(
+                    AIConversation.thread_id == thread.id,
+                    AIConversation.id > thread.summarized_through_id,
+                )
+                .order_by(AIConversation.id)
+            )
+            .scalars()
+            .all()
+        )
+
+    @staticmethod
+    def list_threads(user_id, limit=10, cursor=None):
+        """List a user's threads, most recent first, keyed on id."""
+        statement = (
+            db.select(
+                ConversationThread.id,
+                ConversationThread.title,
+                ConversationThread.created_at,
+                ConversationThread.updated_at,
+            )
+            .where(ConversationThread.user_id == user_id)
+            .order_by(ConversationThread.id.desc())
+            .limit(limit + 1)
+        )
+        if cursor is not None:
+            statement = statement.where(ConversationThread.id < cursor)
+
+        rows = db.session.execute(statement).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        return {
+            "threads": [
+                {
+                    "id": row.id,
+                    "title": row.title,
+                    "created_at": row.created_at.isoformat(),
+                    "updated_at": (
+                        row.updated_at.isoformat() if row.updated_at else None
+                    ),
+                }
+                for row in rows
+            ],
+            "pagination": {
+                "limit": limit,
+                "has_more": has_more,
+                "next_cursor": str(rows[-1].id) if has_more else None,
+            },
+        }
+
+    @staticmethod
+    def get_thread_detail(thread_id, user_id):
+        """A thread with its summary and every turn, oldest first."""
+        thread = ConversationService.get_thread(thread_id, user_id)
+        turns = db.session.execute(
+            db.select(AIConversation)
+            .where(AIConversation.thread_id == thread.id)
+            .order_by(AIConversation.id)
+        ).scalars()
+        return {
+            "id": thread.id,
+            "title": thread.title,
+            "summary": thread.summary,
+            "turns": [
+                {
+                    "id": turn.id,
+                    "user_query": turn.user_query,
+                    "ai_response": turn.ai_response,
+                    "summarized": turn.id <= thread.summarized_through_id,
+                    "created_at": turn.created_at.isoformat(),
+                }
+                for turn in turns
+            ],
+        }
+
+
+def _isoformat(value):
+    # Raw SQL on SQLite returns timestamps as strings
+    return value if isinstance(value, str) else value.isoformat()
+
+
+# bm25() is lower for better matches; it is negated so higher scores win.
+# user_id has no weight, it only filters inside the MATCH; the owner is
+# checked on the table as well. Ties are broken by id so pages are stable.
+_SQLITE_CONVERSATION_SEARCH = text("""
+    SELECT c.id, c.created_at,
+        snippet(aiconversation_fts, 0, :start, :end, '...', 12) AS query_snippet,
+        snippet(aiconversation_fts, 1, :start, :end, '...', 24) AS response_snippet,
+        -bm25(aiconversation_fts, 2.0, 1.0, 0.0) AS score
+    FROM aiconversation_fts
+    JOIN aiconversation AS c ON c.id = aiconversation_fts.rowid
+    WHERE aiconversation_fts MATCH :query
+        AND c.user_id = :user_id
+    ORDER BY bm25(aiconversation_fts, 2.0, 1.0, 0.0), c.id
+    LIMIT :limit OFFSET :offset
+    """)
+
+# Headlines are costly, so they are only built for the page of results
+_POSTGRES_CONVERSATION_SEARCH = text("""
+    WITH search AS (SELECT plainto_tsquery('english', :query) AS query),
+    page AS (
+        SELECT c.id, c.created_at, c.user_query, c.ai_response,
+            ts_rank_cd(c.search_vector, search.query) AS score
+        FROM aiconversation AS c, search
+        WHERE c.user_id = :user_id AND c.search_vector @@ search.query
+        ORDER BY score DESC, c.id
+        LIMIT :limit OFFSET :offset
+    )
+    SELECT page.id, page.created_at, page.score,
+        ts_headline('english', page.user_query, search.query,
+            'StartSel=' || :start || ', StopSel=' || :end
+            || ', MaxWords=12, MinWords=4') AS query_snippet,
+        ts_headline('english', page.ai_response, search.query,
+            'StartSel=' || :start || ', StopSel=' || :end
+            || ', MaxWords=24, MinWords=8') AS response_snippet
+    FROM page, search
+    ORDER BY page.score DESC, page.id
+    """)
@@ -0,0 +1,320 @@
+from datetime import datetime
+
+from sqlalchemy import case, func, or_, update
+
+from models.base import db
+from models.card import Card
+from models.deck import Deck
+from models.folder import Folder
+
+DECK_COUNTERS = ("card_count", "due_count", "mastered_count", "next_due_at")
+FOLDER_COUNTERS = ("deck_count",) + DECK_COUNTERS
+
+# Counter updates are plain additions done by the database; the objects in
+# the session are not refreshed to match
+_NO_SYNC = {"synchronize_session": False}
+
+
+def card_counts(next_review_at, is_fully_reviewed, now):
+    """How one card counts towards its deck's due and mastered counters.
+
+    Returns:
+        tuple: (due, mastered), each 0 or 1
+    """
+    due = next_review_at is not None and next_review_at <= now
+    return int(due), int(bool(is_fully_reviewed))
+
+
+def _earliest(column, value):
+    # The earlier of a nullable datetime column and a datetime, in SQL
+    if value is None:
+        return column
+    return case((or_(column.is_(None), column > value), value), else_=column)
+
+
+def _empty_folder():
+    return {
+        "deck_count": 0,
+        "card_count": 0,
+        "due_count": 0,
+        "mastered_count": 0,
+        "next_due_at": None,
+    }
+
+
+def _counted_decks(now):
+    # Each deck's counters, counted from its cards
+    return (
+        db.select(
+            Deck.id,
+            Deck.folder_id,
+            func.count(Card.id).label("card_count"),
+            func.count(case((Card.next_review_at <= now, Card.id))).label("due_count"),
+            func.count(case((Card.is_fully_reviewed, Card.id))).label("mastered_count"),
+            func.min(case((Card.next_review_at > now, Card.next_review_at))).label(
+                "next_due_at"
+            ),
+        )
+        .outerjoin(Card, Card.deck_id == Deck.id)
+        .group_by(Deck.id)
+    )
+
+
+class CounterService:
+    """Maintain the card counters stored on decks and folders.
+
+    Write paths call these helpers in their own transaction, so the counters
+    commit or roll back with the change they describe. card_count and
+    mastered_count only change when cards do. due_count also changes as time
+    passes, so each deck records the time its next card becomes due
+    (next_due_at) and its due_count is recounted by refresh_due once that
+    time is reached. `flask repair-counters` recounts everything.
+    """
+
+    @staticmethod
+    def adjust(deck_id, cards=0, due=0, mastered=0, next_due_at=None):
+        """Apply a change to a deck's cards to its counters and its folder's.
+
+        Args:
+            deck_id (int): Deck whose cards changed
+            cards, due, mastered (int): Change to each counter
+            next_due_at (datetime): Review time of a card that is not due yet,
+                which may bring the deck's next_due_at forward
+        """
+        folder_id = db.select(Deck.folder_id).where(Deck.id == deck_id)
+        for model, where in (
+            (Deck, Deck.id == deck_id),
+            (Folder, Folder.id == folder_id.scalar_subquery()),
+        ):
+            db.session.execute(
+                update(model)
+                .where(where)
+                .values(
+                    card_count=model.card_count + cards,
+                    due_count=model.due_count + due,
+                    mastered_count=model.mastered_count + mastered,
+                    next_due_at=_earliest(model.next_due_at, next_due_at),
+                ),
+                execution_options=_NO_SYNC,
+            )
+
+    @staticmethod
+    def cards_added(deck_id, count, next_review_at):
+        """Count new, not yet reviewed cards that share a next review time."""
+        due, _ = card_counts(next_review_at, False, datetime.utcnow())
+        CounterService.adjust(
+            deck_id,
+            cards=count,
+            due=due * count,
+            next_due_at=None if due else next_review_at,
+        )
+
+    @staticmethod
+    def card_removed(card):
+        """Uncount a card that is about to be deleted."""
+        due, mastered = card_counts(
+            card.next_review_at, card.is_fully_reviewed, datetime.utcnow()
+        )
+        CounterService.adjust(card.deck_id, cards=-1, due=-due, mastered=-mastered)
+
+    @staticmethod
+    def cards_removed(cards):
+        """Uncount cards about to be deleted or moved out, once per deck.
+
+        Args:
+            cards (list): Rows with deck_id, next_review_at and is_fully_reviewed
+        """
+        now = datetime.utcnow()
+        totals = {}
+        for card in cards:
+            due, mastered = card_counts(
+                card.next_review_at, card.is_fully_reviewed, now
+            )
+            total = totals.setdefault(card.deck_id, [0, 0, 0])
+            total[0] += 1
+            total[1] += due
+            total[2] += mastered
+        for deck_id, (count, due, mastered) in totals.items():
+            CounterService.adjust(deck_id, cards=-count, due=-due, mastered=-mastered)
+
+    @staticmethod
+    def cards_moved_in(deck_id, cards):
+        """Count cards moved into a deck with their review state.
+
+        Args:
+            cards (list): Rows with next_review_at and is_fully_reviewed
+        """
+        now = datetime.utcnow()
+        due = mastered = 0
+        next_due_at = None
+        for card in cards:
+            card_due, card_mastered = card_counts(
+                card.next_review_at, card.is_fully_reviewed, now
+            )
+            due += card_due
+            mastered += card_mastered
+            if card.next_review_at is not None and not card_due:
+                next_due_at = min(
+                    next_due_at or card.next_review_at, card.next_review_at
+                )
+        CounterService.adjust(
+            deck_id,
+            cards=len(cards),
+            due=due,
+            mastered=mastered,
+            next_due_at=next_due_at,
+        )
+
+    @staticmethod
+    def cards_copied(deck_id, count):
+        """Count cards copied into a new deck by the database.
+
+        Their review state is read back with one aggregate over the deck's
+        cards instead of being taken from the original deck's counters.
+        """
+        counted = db.session.execute(
+            _counted_decks(datetime.utcnow()).where(Deck.id == deck_id)
+        ).one()
+        CounterService.adjust(
+            deck_id,
+            cards=count,
+            due=counted.due_count,
+            mastered=counted.mastered_count,
+            next_due_at=counted.next_due_at,
+        )
+
+    @staticmethod
+    def card_rescheduled(deck_id, before, after):
+        """Recount a card whose review schedule changed.
+
+        Args:
+            deck_id (int): Deck of the card
+            before, after (tuple): (next_review_at, is_fully_reviewed) of the
+                card before and after the change
+        """
+        now = datetime.utcnow()
+        due_before, mastered_before = card_counts(*before, now)
+        due_after, mastered_after = card_counts(*after, now)
+        CounterService.adjust(
+            deck_id,
+            due=due_after - due_before,
+            mastered=mastered_after - mastered_before,
+            next_due_at=None if due_after else after[0],
+        )
+
+    @staticmethod
+    def deck_added(folder_id):
+        """Count a new, empty deck."""
+        db.session.execute(
+            update(Folder)
+            .where(Folder.id == folder_id)
+            .values(deck_count=Folder.deck_count + 1),
+            execution_options=_NO_SYNC,
+        )
+
+    @staticmethod
+    def deck_removed(deck_id):
+        """Uncount a deck and its cards; call before the deck is deleted."""
+        deck = db.select(Deck).where(Deck.id == deck_id).subquery()
+        db.session.execute(
+            update(Folder)
+            .where(Folder.id == deck.c.folder_id)
+            .values(
+                deck_count=Folder.deck_count - 1,
+                card_count=Folder.card_count - deck.c.card_count,
+                due_count=Folder.due_count - deck.c.due_count,
+                mastered_count=Folder.mastered_count - deck.c.mastered_count,
+            ),
+            execution_options=_NO_SYNC,
+        )
+
+    @staticmethod
+    def refresh_due(folder_ids, now=None):
+        """Recount due cards in the decks of these folders that went stale.
+
+        Only decks whose next_due_at has passed are recounted, with one
+        grouped query; the folders' totals are then summed from their decks.
+        The caller commits.
+        """
+        now = now or datetime.utcnow()
+        counts = db.session.execute(
+            _counted_decks(now).where(
+                Deck.folder_id.in_(folder_ids), Deck.next_due_at <= now
+            )
+        ).all()
+        if counts:
+            db.session.execute(
+                update(Deck),
+                [
+                    {
+                        "id": row.id,
+                        "due_count": row.due_count,
+                        "next_due_at": row.next_due_at,
+                    }
+                    for row in counts
+                ],
+            )
+
+        decks = db.select(Deck).where(Deck.folder_id == Folder.id)
+        db.session.execute(
+            update(Folder)
+            .where(Folder.id.in_(folder_ids))
+            .values(
+                due_count=decks.with_only_columns(
+                    func.coalesce(func.sum(Deck.due_count), 0)
+                ).scalar_subquery(),
+                next_due_at=decks.with_only_columns(
+                    func.min(Deck.next_due_at)
+                ).scalar_subquery(),
+            ),
+            execution_options=_NO_SYNC,
+        )
+
+    @staticmethod
+    def repair(user_id=None):
+        """Recount every counter from the cards and fix those that differ.
+
+        Args:
+            user_id (str): Only repair this user's folders (all when None)
+
+        Returns:
+            dict: Number of decks and folders whose counters were fixed
+        """
+        now = datetime.utcnow()
+        counted = _counted_decks(now)
+        stored_decks = db.select(Deck.id, *(getattr(Deck, c) for c in DECK_COUNTERS))
+        folders = db.select(Folder.id, *(getattr(Folder, c) for c in FOLDER_COUNTERS))
+        if user_id is not None:
+            counted = counted.join(Folder).where(Folder.user_id == user_id)
+            stored_decks = stored_decks.join(Folder).where(Folder.user_id == user_id)
+            folders = folders.where(Folder.user_id == user_id)
+
+        stored = {row.id: row for row in db.session.execute(stored_decks)}
+        totals = {}
+        deck_fixes = []
+        for deck in db.session.execute(counted):
+            values = {name: getattr(deck, name) for name in DECK_COUNTERS}
+            if tuple(values.values()) != tuple(stored[deck.id])[1:]:
+                deck_fixes.append({"id": deck.id, **values})
+
+            total = totals.setdefault(deck.folder_id, _empty_folder())
+            total["deck_count"] += 1
+            for name in ("card_count", "due_count", "mastered_count"):
+                total[name] += values[name]
+            if deck.next_due_at is not None and (
+                total["next_due_at"] is None or deck.next_due_at < total["next_due_at"]
+            ):
+                total["next_due_at"] = deck.next_due_at
+
+        folder_fixes = []
+        for folder in db.session.execute(folders):
+            values = totals.get(folder.id, _empty_folder())
+            if tuple(values.values()) != tuple(folder)[1:]:
+                folder_fixes.append({"id": folder.id, **values})
+
+        if deck_fixes:
+            db.session.execute(update(Deck), deck_fixes)
+        if folder_fixes:
+            db.session.execute(update(Folder), folder_fixes)
+        db.session.commit()
+        return {"decks": len(deck_fixes), "folders": len(folder_fixes)}
@@ -2,11 +2,137 @@ from models.folder import Folder
 from models.deck import Deck
 from models.card import Card
 from models.base import db
+from services.counter_service import CounterService
+from services.embedding_service import deck_question_index
+from services.trash_service import TrashService
+import base64
+import json
+from collections import Counter
 from datetime import datetime, timedelta
-from sqlalchemy import func
+from sqlalchemy import and_, case, func, insert, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import load_only
+
+# Columns the cards of a deck can be sorted on; each is indexed with deck_id
+CARD_SORTS = {
+    "id": Card.id,
+    "question": Card.question,
+    "next_review_at": Card.next_review_at,
+}
+CARD_VIEWS = ("full", "summary")
+DIFFICULTY_LEVELS = ("easy", "medium", "hard")
+# Operations POST /card/bulk applies to many cards at once
+CARD_OPERATIONS = ("move", "delete", "set_difficulty", "reset")
+
+# Fields a client can ask for with ?fields=, and the columns they read
+FOLDER_FIELDS = {
+    "id": Folder.id,
+    "name": Folder.name,
+    "description": Folder.description,
+    "deckCount": Folder.deck_count,
+    "cardCount": Folder.card_count,
+    "dueCount": Folder.due_count,
+    "masteredCount": Folder.mastered_count,
+}
+DECK_FIELDS = ("id", "name", "description", "card_count", "due_count", "mastered_count")
+CARD_FIELDS = {
+    "id": Card.id,
+    "question": Card.question,
+    "answer": Card.answer,
+    "difficulty_level": Card.difficulty_level,
+    "next_review_at": Card.next_review_at,
+    "review_count": Card.review_count,
+    "is_fully_reviewed": Card.is_fully_reviewed,
+    "last_reviewed_at": Card.last_reviewed_at,
+}
+
+
+def _pick_fields(requested, available, default=None):
+    """Names of the fields to return, in the order of ``available``.
+
+    The id is always returned. Every field (or ``default``) is returned when
+    none are requested.
+    """
+    if not requested:
+        return list(default or available)
+    unknown = sorted(set(requested) - set(available))
+    if unknown:
+        raise ValueError(
+            f"Unknown fields: {', '.join(unknown)}. "
+            f"Choose from {', '.join(available)}"
+        )
+    return [name for name in available if name == "id" or name in requested]
+
+
+def _card_order(column, descending):
+    # Cards with no next review (mastered ones) sort first, and last when
+    # descending; the id breaks ties so every card has a unique position
+    if column is Card.id:
+        return [Card.id.desc() if descending else Card.id]
+    if descending:
+        key = (
+            column.desc().nulls_last() if column.expression.nullable else column.desc()
+        )
+        return [key, Card.id.desc()]
+    key = column.asc().nulls_first() if column.expression.nullable else column.asc()
+    return [key, Card.id]
+
+
+def _after_cursor(column, descending, position):
+    # Cards that come after (value, id) in the _card_order order
+    value, card_id = position
+    after_id = Card.id < card_id if descending else Card.id > card_id
+    if column is Card.id:
+        return after_id
+    if value is None:
+        if descending:
+            return and_(column.is_(None), after_id)
+        return or_(column.is_not(None), after_id)
+
+    beyond = column < value if descending else column > value
+    condition = or_(beyond, and_(column == value, after_id))
+    if descending and column.expression.nullable:
+        condition = or_(condition, column.is_(None))
+    return condition
+
+
+def _encode_cursor(value, card_id):
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = json.dumps([value, card_id]).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def _decode_cursor(cursor, column):
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        value, card_id = json.loads(payload)
+        if column is Card.next_review_at and value is not None:
+            value = datetime.fromisoformat(value)
+        if not isinstance(card_id, int):
+            raise ValueError
+    except (ValueError, TypeError):
+        raise ValueError("cursor is not valid")
+    return value, card_id
+
+
+def _batches(items):
+    # Lists of at most BULK_LOOKUP_SIZE items, one per IN (...) statement
+    size = CRUDService.BULK_LOOKUP_SIZE
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+class NotFoundError(ValueError):
+    """Raised when a folder, deck or card does not exist or is someone else's."""
 
 
 class CRUDService:
+    # Questions or ids per IN lookup when adding or changing cards in bulk
+    BULK_LOOKUP_SIZE = 500
+    # Characters of the question shown in the summary view of a deck
+    QUESTION_PREVIEW_LENGTH = 80
+
     # CREATION LOGIC
     @staticmethod
     def add_new_folder(folder_data, user_id):
@@ -37,7 +163,7 @@ class CRUDService:
 
         folder = Folder.query.filter_by(id=folder_id, user_id=user_id).first()
         if not folder:
-            raise ValueError("Folder not found")
+            raise NotFoundError("Folder not found")
 
         # Check for duplicate in the same folder
         existing_deck = Deck.query.filter(
@@ -51,9 +177,11 @@ class CRUDService:
             name=name,
             description=description,
             folder_id=folder_id,
+            user_id=user_id,
             created_at=datetime.utcnow(),
         )
         db.session.add(new_deck)
+        CounterService.deck_added(folder_id)
         db.session.commit()
         return {
             "data": {
@@ -65,13 +193,9 @@ class CRUDService:
 
     @staticmethod
     def add_new_card(card_data, deck_id, user_id):
-        deck = (
-            Deck.query.join(Folder)
-            .filter(Deck.id == deck_id, Folder.user_id == user_id)
-            .first()
-        )
+        deck = Deck.query.filter_by(id=deck_id, user_id=user_id).first()
         if not deck:
-            raise ValueError("Deck is not found")
+            raise NotFoundError("Deck is not found")
         required_fields = ["question", "answer", "difficulty_level"]
         for field in required_fields:
             if field not in card_data or card_data[field] is None:
@@ -96,9 +220,16 @@ class CRUDService:
             review_count=review_count,
             is_fully_reviewed=False,
             deck_id=deck_id,
+            user_id=user_id,
         )
         db.session.add(new_card)
+        CounterService.cards_added(deck_id, 1, next_review_at)
         db.session.commit()
+        try:
+            deck_question_index.card_added(deck_id, new_card.id, new_card.question)
+        except Exception:
+            # The card is saved; the index is rebuilt on its next use
+            deck_question_index.invalidate(deck_id)
         return {
             "data": {
                 "id": new_card.id,
@@ -108,54 +239,342 @@ class CRUDService:
             }
         }
 
-    # READ LOGIC
     @staticmethod
-    def get_all_folders(user_id):
-        # Query all folders for the user with deck and card counts
-        folders_query = (
-            db.session.query(
-                Folder,
-                func.count(Deck.id).label("deck_count"),
-                func.count(Card.id).label("card_count"),
+    def add_cards_bulk(cards_data, deck_id, user_id, rejected=None):
+        """Add many cards to a deck in one transaction.
+
+        Ownership is checked once, duplicates of existing questions are found
+        with one IN query per BULK_LOOKUP_SIZE questions, and the valid cards
+        are inserted with a single executemany. Invalid cards are reported
+        per item and do not stop the others from being saved.
+
+        Args:
+            cards_data (list of dict): Cards with question, answer and
+                difficulty_level
+            deck_id (int): Target deck
+            user_id (str): Owner of the deck
+            rejected (dict): Errors of cards the caller already rejected,
+                keyed by position in cards_data
+
+        Returns:
+            saved (list of dict): index (1-based), card_id and question
+            failed (list of dict): index (1-based), error and question
+        """
+        deck = Deck.query.filter_by(id=deck_id, user_id=user_id).first()
+        if not deck:
+            raise NotFoundError("Deck is not found")
+
+        rejected = rejected or {}
+        failed = []
+        candidates = []
+        seen_questions = set()
+        required_fields = ["question", "answer", "difficulty_level"]
+
+        def fail(position, error, card_data):
+            question = (
+                card_data.get("question") if isinstance(card_data, dict) else None
+            )
+            if not isinstance(question, str):
+                question = None
+            failed.append(
+                {
+                    "index": position + 1,
+                    "error": error,
+                    "question": question or "Unknown",
+                }
+            )
+
+        for position, card_data in enumerate(cards_data):
+            if position in rejected:
+                fail(position, rejected[position], card_data)
+                continue
+            if not isinstance(card_data, dict):
+                fail(position, f"Card {position + 1}: must be an object", card_data)
+                continue
+            missing = [field for field in required_fields if not card_data.get(field)]
+            if missing:
+                fail(
+                    position,
+                    f"Card {position + 1}: {missing[0]} is required",
+                    card_data,
+                )
+                continue
+            text_field = next(
+                (
+                    field
+                    for field in ("question", "answer")
+                    if not isinstance(card_data[field], str)
+                ),
+                None,
             )
-            .outerjoin(Deck, Folder.id == Deck.folder_id)
-            .outerjoin(Card, Deck.id == Card.deck_id)
-            .filter(Folder.user_id == user_id)
-            .group_by(Folder.id)
-            .all()
+            if text_field:
+                fail(
+                    position,
+                    f"Card {position + 1}: {text_field} must be a string",
+                    card_data,
+                )
+                continue
+            if card_data["difficulty_level"] not in DIFFICULTY_LEVELS:
+                fail(
+                    position,
+                    f"Card {position + 1}: difficulty_level must be one of "
+                    f"{', '.join(DIFFICULTY_LEVELS)}",
+                    card_data,
+                )
+                continue
+            if card_data["question"] in seen_questions:
+                fail(
+                    position,
+                    f"Card {position + 1}: question repeated in this request",
+                    card_data,
+                )
+                continue
+            seen_questions.add(card_data["question"])
+            candidates.append((position, card_data))
+
+        # Questions already in the deck, looked up in IN batches that stay
+        # under the database's bound parameter limit
+        questions = [card_data["question"] for _, card_data in candidates]
+        existing = set()
+        for start in range(0, len(questions), CRUDService.BULK_LOOKUP_SIZE):
+            batch = questions[start : start + CRUDService.BULK_LOOKUP_SIZE]
+            existing.update(
+                db.session.execute(
+                    db.select(Card.question).where(
+                        Card.deck_id == deck_id, Card.question.in_(batch)
+                    )
+                ).scalars()
+            )
+
+        next_review_at = datetime.utcnow() + timedelta(days=1)
+        rows = []
+        positions = []
+        for position, card_data in candidates:
+            if card_data["question"] in existing:
+                fail(
+                    position, f"Card {position + 1}: question already exists", card_data
+                )
+                continue
+            positions.append(position)
+            rows.append(
+                {
+                    "question": card_data["question"],
+                    "answer": card_data["answer"],
+                    "difficulty_level": card_data["difficulty_level"],
+                    "next_review_at": next_review_at,
+                    "review_count": card_data.get("review_count", 0),
+                    "is_fully_reviewed": False,
+                    "deck_id": deck_id,
+                    "user_id": user_id,
+                }
+            )
+
+        saved = []
+        if rows:
+            try:
+                # Questions are validated strings, unique within the batch, so
+                # the returned ids are matched by question and the driver may
+                # batch freely (ordering RETURNING rows would make it insert
+                # one row per statement on SQLite)
+                inserted = dict(
+                    db.session.execute(
+                        insert(Card).returning(Card.question, Card.id), rows
+                    ).all()
+                )
+                CounterService.cards_added(deck_id, len(rows), next_review_at)
+                db.session.commit()
+            except IntegrityError:
+                # A card with one of the questions was added concurrently
+                db.session.rollback()
+                raise ValueError("Deck changed while adding cards, please retry")
+
+            saved = [
+                {
+                    "index": position + 1,
+                    "card_id": inserted[row["question"]],
+                    "question": row["question"],
+                }
+                for position, row in zip(positions, rows)
+            ]
+            try:
+                deck_question_index.cards_added(
+                    deck_id, [(card["card_id"], card["question"]) for card in saved]
+                )
+            except Exception:
+                # The cards are saved; the index is rebuilt on its next use
+                deck_question_index.invalidate(deck_id)
+
+        failed.sort(key=lambda item: item["index"])
+        return {"data": {"saved": saved, "failed": failed}}
+
+    @staticmethod
+    def clone_deck(deck_id, folder_id, user_id, name=None, reset_review=False):
+        """Copy a deck and its cards into a folder.
+
+        The cards are copied by the database with one INSERT ... SELECT, so
+        no card is loaded into Python. Reviews are not copied.
+
+        Args:
+            deck_id (int): Deck to copy
+            folder_id (int): Folder the copy goes to
+            user_id (str): Owner of both
+            name (str): Name of the copy (the deck's name by default)
+            reset_review (bool): Start the copied cards over as new cards
+                instead of keeping their review state
+
+        Returns:
+            dict: The new deck with its number of cards
+        """
+        source = db.session.execute(
+            db.select(Deck.name, Deck.description).where(
+                Deck.id == deck_id, Deck.user_id == user_id
+            )
+        ).one_or_none()
+        if source is None:
+            raise NotFoundError("Deck does not exist")
+        if not Folder.query.filter_by(id=folder_id, user_id=user_id).first():
+            raise NotFoundError("Folder not found")
+
+        name = name or source.name
+        if Deck.query.filter(
+            db.func.lower(Deck.name) == db.func.lower(name), Deck.folder_id == folder_id
+        ).first():
+            raise ValueError("Deck name already exists")
+
+        copy = Deck(
+            name=name,
+            description=source.description,
+            folder_id=folder_id,
+            user_id=user_id,
         )
+        db.session.add(copy)
+        db.session.flush()
+
+        if reset_review:
+            next_review_at = datetime.utcnow() + timedelta(days=1)
+            review_state = (
+                db.literal(next_review_at, Card.next_review_at.type),
+                db.literal(0),
+                db.literal(False),
+                db.null(),
+            )
+        else:
+            review_state = (
+                Card.next_review_at,
+                Card.review_count,
+                Card.is_fully_reviewed,
+                Card.last_reviewed_at,
+            )
+        # The deleted_at filter is added by hand: the select only runs as
+        # part of the INSERT, which the soft-delete hook does not touch. The
+        # rows are ordered so the copies keep the order of the original cards
+        copied = db.session.execute(
+            insert(Card).from_select(
+                [
+                    "deck_id",
+                    "user_id",
+                    "question",
+                    "answer",
+                    "difficulty_level",
+                    "next_review_at",
+                    "review_count",
+                    "is_fully_reviewed",
+                    "last_reviewed_at",
+                ],
+                db.select(
+                    db.literal(copy.id),
+                    Card.user_id,
+                    Card.question,
+                    Card.answer,
+                    Card.difficulty_level,
+                    *review_state,
+                )
+                .where(Card.deck_id == deck_id, Card.deleted_at.is_(None))
+                .order_by(Card.id),
+            )
+        ).rowcount
 
-        folder_list = []
+        CounterService.deck_added(folder_id)
+        if reset_review:
+            CounterService.cards_added(copy.id, copied, next_review_at)
+        else:
+            CounterService.cards_copied(copy.id, copied)
+        db.session.commit()
 
-        for folder, deck_count, card_count in folders_query:
-            folder_info = {
-                "id": folder.id,
-                "name": folder.name,
-                "description": folder.description,
-                "deckCount": deck_count or 0,
-                "cardCount": card_count or 0,
+        return {
+            "data": {
+                "id": copy.id,
+                "name": copy.name,
+                "description": copy.description,
+                "folder_id": folder_id,
+                "card_count": copied,
             }
-            folder_list.append(folder_info)
+        }
+
+    # READ LOGIC
+    @staticmethod
+    def get_all_folders(user_id, fields=None):
+        # Query all folders for the user; the counts are stored on each folder
+        names = _pick_fields(fields, FOLDER_FIELDS)
+        query = (
+            Folder.query.options(
+                load_only(*(FOLDER_FIELDS[name] for name in names), Folder.next_due_at)
+            )
+            .filter_by(user_id=user_id)
+            .order_by(Folder.id)
+        )
+        folders = query.all()
+
+        # Due counts change as time passes, not only when cards do: recount
+        # the folders in which a card has become due since they were counted
+        now = datetime.utcnow()
+        stale = [
+            folder.id
+            for folder in folders
+            if folder.next_due_at is not None and folder.next_due_at <= now
+        ]
+        if stale:
+            CounterService.refresh_due(stale, now)
+            db.session.commit()
+            folders = query.all()
+
+        folder_list = [
+            {name: getattr(folder, FOLDER_FIELDS[name].key) for name in names}
+            for folder in folders
+        ]
 
         return {"data": folder_list}
 
     @staticmethod
-    def get_one_folder(folder_id, user_id):
+    def get_one_folder(folder_id, user_id, fields=None):
         # Get all decks for a single folder
+        names = _pick_fields(fields, DECK_FIELDS)
         folder = Folder.query.filter_by(id=folder_id, user_id=user_id).first()
         if folder:
-            all_decks = Deck.query.filter_by(folder_id=folder_id).all()
+            # Count each deck's cards in the same query as the decks, instead
+            # of loading every card of every deck to count them
+            now = datetime.utcnow()
+            counts = {
+                "card_count": func.count(Card.id),
+                "due_count": func.count(case((Card.next_review_at <= now, Card.id))),
+                "mastered_count": func.count(case((Card.is_fully_reviewed, Card.id))),
+            }
+            columns = [
+                counts[name].label(name) if name in counts else getattr(Deck, name)
+                for name in names
+            ]
+            statement = (
+                db.select(*columns).where(Deck.folder_id == folder_id).order_by(Deck.id)
+            )
+            # The cards are only read when a count is asked for
+            if set(names) & set(counts):
+                statement = statement.outerjoin(Card, Card.deck_id == Deck.id).group_by(
+                    Deck.id
+                )
+            all_decks = db.session.execute(statement).all()
 
             # Serialize all decks data
-            decks_list = [
-                {
-                    "id": deck.id,
-                    "name": deck.name,
-                    "description": deck.description,
-                    "card_count": len(deck.cards),
-                }
-                for deck in all_decks
-            ]
+            decks_list = [deck._asdict() for deck in all_decks]
 
             return {
                 "data": {
@@ -166,81 +585,146 @@ class CRUDService:
                 }
             }
         else:
-            raise ValueError("Folder does not exist")
+            raise NotFoundError("Folder does not exist")
 
     @staticmethod
-    def get_one_deck(deck_id, user_id):
-        # Get all cards for a single deck
-        deck = (
-            Deck.query.join(Folder)
-            .filter(Deck.id == deck_id, Folder.user_id == user_id)
-            .first()
+    def get_one_deck(
+        deck_id,
+        user_id,
+        limit=None,
+        cursor=None,
+        sort="id",
+        due=None,
+        mastered=None,
+        difficulty=None,
+        view="full",
+        fields=None,
+    ):
+        """Get a deck with its cards, optionally filtered and paginated.
+
+        Pages are keyed on the sort column and the card id, so every page is
+        an index range scan however deep into the deck it is. Without a limit
+        every matching card is returned.
+
+        Args:
+            deck_id (int): Deck to read
+            user_id (str): Owner of the deck
+            limit (int): Cards per page (all cards when None)
+            cursor (str): "next_cursor" of the previous page
+            sort (str): id, question or next_review_at; prefix with "-" for
+                descending order
+            due (bool): Only cards that are (or are not) due for review
+            mastered (bool): Only cards that are (or are not) fully reviewed
+            difficulty (list of str): Only cards of these difficulty levels
+            view (str): "full", or "summary" for ids and question previews
+            fields (list of str): Card fields to return in the full view
+
+        Returns:
+            dict: The deck, its cards and the pagination info
+        """
+        descending = sort.startswith("-")
+        column = CARD_SORTS.get(sort.lstrip("-"))
+        if column is None:
+            raise ValueError(f"sort must be one of {', '.join(CARD_SORTS)}")
+        if view not in CARD_VIEWS:
+            raise ValueError(f"view must be one of {', '.join(CARD_VIEWS)}")
+        if fields and view == "summary":
+            raise ValueError("fields cannot be combined with the summary view")
+        names = _pick_fields(fields, CARD_FIELDS)
+        if difficulty and not set(difficulty) <= set(DIFFICULTY_LEVELS):
+            raise ValueError(f"difficulty must be in {', '.join(DIFFICULTY_LEVELS)}")
+
+        deck = Deck.query.filter_by(id=deck_id, user_id=user_id).first()
+        if not deck:
+            raise NotFoundError("Deck does not exist")
+
+        if view == "summary":
+            columns = [
+                Card.id,
+                func.substr(
+                    Card.question, 1, CRUDService.QUESTION_PREVIEW_LENGTH
+                ).label("question"),
+            ]
+        else:
+            columns = [CARD_FIELDS[name] for name in names]
+        statement = db.select(*columns, column.label("sort_key")).where(
+            Card.deck_id == deck_id
         )
-        if deck:
-            all_cards = Card.query.filter_by(deck_id=deck_id).all()
 
-            # Serialize all cards data
-            cards_list = [
-                {
-                    "id": card.id,
-                    "question": card.question,
-                    "answer": card.answer,
-                    "difficulty_level": card.difficulty_level,
-                    "next_review_at": card.next_review_at,
-                    "review_count": card.review_count,
-                    "is_fully_reviewed": card.is_fully_reviewed,
-                    "last_reviewed_at": card.last_reviewed_at,
-                }
-                for card in all_cards
-            ]
+        now = datetime.utcnow()
+        if due is not None:
+            is_due = Card.next_review_at <= now
+            statement = statement.where(
+                is_due if due else or_(Card.next_review_at.is_(None), ~is_due)
+            )
+        if mastered is not None:
+            statement = statement.where(Card.is_fully_reviewed.is_(mastered))
+        if difficulty:
+            statement = statement.where(Card.difficulty_level.in_(difficulty))
+        if cursor is not None:
+            statement = statement.where(
+                _after_cursor(column, descending, _decode_cursor(cursor, column))
+            )
 
-            return {
-                "data": {
-                    "id": deck.id,
-                    "name": deck.name,
-                    "description": deck.description,
-                    "cards": cards_list,
-                }
+        statement = statement.order_by(*_card_order(column, descending))
+        if limit is not None:
+            statement = statement.limit(limit + 1)
+
+        rows = db.session.execute(statement).all()
+        has_more = limit is not None and len(rows) > limit
+        rows = rows[:limit]
+
+        # Serialize all cards data
+        cards_list = [
+            {key: value for key, value in row._asdict().items() if key != "sort_key"}
+            for row in rows
+        ]
+
+        return {
+            "data": {
+                "id": deck.id,
+                "name": deck.name,
+                "description": deck.description,
+                "cards": cards_list,
+                "pagination": {
+                    "limit": limit,
+                    "has_more": has_more,
+                    "next_cursor": (
+                        _encode_cursor(rows[-1].sort_key, rows[-1].id)
+                        if has_more
+                        else None
+                    ),
+                },
             }
-        else:
-            raise ValueError("Deck does not exist")
+        }
 
     @staticmethod
-    def get_one_card(card_id, user_id):
+    def get_one_card(card_id, user_id, fields=None):
         # Get information for a single card
-        card = Card.query.filter_by(id=card_id).first()
+        names = _pick_fields(
+            fields,
+            CARD_FIELDS,
+            default=[n for n in CARD_FIELDS if n != "last_reviewed_at"],
+        )
 
-        # Join Card -> Deck -> Folder to verify ownership
         card = (
-            Card.query.join(Deck)
-            .join(Folder)
-            .filter(Card.id == card_id, Folder.user_id == user_id)
+            Card.query.options(load_only(*(CARD_FIELDS[name] for name in names)))
+            .filter_by(id=card_id, user_id=user_id)
             .first()
         )
 
         if not card:
-            raise ValueError("Card does not exist")
+            raise NotFoundError("Card does not exist")
 
-        if card:
-            card_info = {
-                "id": card.id,
-                "question": card.question,
-                "answer": card.answer,
-                "difficulty_level": card.difficulty_level,
-                "next_review_at": card.next_review_at,
-                "review_count": card.review_count,
-                "is_fully_reviewed": card.is_fully_reviewed,
-            }
-            return {"data": card_info}
-        else:
-            raise ValueError("Card does not exist")
+        card_info = {name: getattr(card, name) for name in names}
+        return {"data": card_info}
 
     # UPDATE LOGIC
     @staticmethod
     def update_one_folder(folder_id, user_id, update_data):
         folder = Folder.query.filter_by(id=folder_id, user_id=user_id).first()
         if folder is None:
-            raise ValueError("Folder does not exist")
+            raise NotFoundError("Folder does not exist")
 
         name = update_data.get("name")
         description = update_data.get("description")
@@ -262,13 +746,9 @@ class CRUDService:
 
     @staticmethod
     def update_one_deck(deck_id, update_data, user_id):
-        deck = (
-            Deck.query.join(Folder)
-            .filter(Deck.id == deck_id, Folder.user_id == user_id)
-            .first()
-        )
+        deck = Deck.query.filter_by(id=deck_id, user_id=user_id).first()
         if deck is None:
-            raise ValueError("Deck does not exist")
+            raise NotFoundError("Deck does not exist")
 
         name = update_data.get("name")
         description = update_data.get("description")
@@ -299,14 +779,9 @@ class CRUDService:
 
     @staticmethod
     def update_one_card(card_id, user_id, update_data):
-        card = (
-            Card.query.join(Deck)
-            .join(Folder)
-            .filter(Card.id == card_id, Folder.user_id == user_id)
-            .first()
-        )
+        card = Card.query.filter_by(id=card_id, user_id=user_id).first()
         if card is None:
-            raise ValueError("Folder does not exist")
+            raise NotFoundError("Folder does not exist")
 
         question = update_data.get("question")
         answer = update_data.get("answer")
@@ -328,6 +803,12 @@ class CRUDService:
             card.difficulty_level = difficulty_level
 
         db.session.commit()
+        if question:
+            try:
+                deck_question_index.card_added(card.deck_id, card.id, card.question)
+            except Exception:
+                # The card is saved; the index is rebuilt on its next use
+                deck_question_index.invalidate(card.deck_id)
 
         return {
             "data": {
@@ -338,40 +819,198 @@ class CRUDService:
             }
         }
 
+    @staticmethod
+    def bulk_update_cards(card_ids, user_id, operation, options=None):
+        """Apply one operation to many cards at once.
+
+        The cards are looked up, with their owner checked, and changed with
+        one statement per BULK_LOOKUP_SIZE cards, so the work does not grow
+        with the number of statements per card and stays under the database's
+        limit on bound parameters. Cards that do not exist (or belong to someone
+        else) and cards whose question is already in the target deck are
+        listed in "failed" and do not stop the others.
+
+        Args:
+            card_ids (list): Ids of the cards
+            user_id (str): Owner of the cards
+            operation (str): One of CARD_OPERATIONS:
+                move: to the deck in options["deck_id"], keeping review state
+                delete: soft-delete the cards and their reviews
+                set_difficulty: to options["difficulty_level"]
+                reset: forget the review state, as if the cards were new
+            options (dict): Arguments of the operation
+
+        Returns:
+            dict: Ids of the "updated" cards and the "failed" ones with errors
+        """
+        options = options or {}
+        if operation not in CARD_OPERATIONS:
+            raise ValueError(f"operation must be one of {', '.join(CARD_OPERATIONS)}")
+        if not all(isinstance(card_id, int) for card_id in card_ids):
+            raise ValueError("card_ids must be integers")
+        difficulty = options.get("difficulty_level")
+        if operation == "set_difficulty" and difficulty not in DIFFICULTY_LEVELS:
+            raise ValueError(
+                f"difficulty_level must be one of {', '.join(DIFFICULTY_LEVELS)}"
+            )
+        target = None
+        if operation == "move":
+            target = (
+                db.session.execute(
+                    db.select(Deck.id).where(
+                        Deck.id == options.get("deck_id"), Deck.user_id == user_id
+                    )
+                )
+                .scalars()
+                .first()
+            )
+            if target is None:
+                raise NotFoundError("Deck does not exist")
+
+        card_ids = list(dict.fromkeys(card_ids))
+        cards = []
+        for batch in _batches(card_ids):
+            cards += db.session.execute(
+                db.select(
+                    Card.id,
+                    Card.deck_id,
+                    Card.question,
+                    Card.next_review_at,
+                    Card.is_fully_reviewed,
+                ).where(Card.id.in_(batch), Card.user_id == user_id)
+            ).all()
+        found = {card.id: card for card in cards}
+        failed = [
+            {"card_id": card_id, "error": "Card does not exist"}
+            for card_id in card_ids
+            if card_id not in found
+        ]
+
+        if operation == "move":
+            moving = [card for card in cards if card.deck_id != target]
+            taken = set()
+            for batch in _batches([card.question for card in moving]):
+                taken.update(
+                    db.session.execute(
+                        db.select(Card.question).where(
+                            Card.deck_id == target, Card.question.in_(batch)
+                        )
+                    ).scalars()
+                )
+            cards = [card for card in cards if card.deck_id == target]
+            for card in moving:
+                if card.question in taken:
+                    failed.append(
+                        {
+                            "card_id": card.id,
+                            "error": "question already exists in the deck",
+                        }
+                    )
+                else:
+                    # Two of the cards may share a question; the first one wins
+                    taken.add(card.question)
+                    cards.append(card)
+            moving = [card for card in cards if card.deck_id != target]
+            if moving:
+                try:
+                    for batch in _batches([card.id for card in moving]):
+                        db.session.execute(
+                            update(Card)
+                            .where(Card.id.in_(batch))
+                            .values(deck_id=target),
+                            execution_options={"synchronize_session": False},
+                        )
+                    CounterService.cards_removed(moving)
+                    CounterService.cards_moved_in(target, moving)
+                    db.session.commit()
+                except IntegrityError:
+                    # A card with one of the questions was added concurrently
+                    db.session.rollback()
+                    raise ValueError("Deck changed while moving cards, please retry")
+                for card in moving:
+                    deck_question_index.card_removed(card.deck_id, card.id)
+                deck_question_index.invalidate(target)
+
+        elif cards:
+            batches = list(_batches([card.id for card in cards]))
+            if operation == "delete":
+                CounterService.cards_removed(cards)
+                for batch in batches:
+                    TrashService.delete_cards(batch)
+            elif operation == "set_difficulty":
+                for batch in batches:
+                    db.session.execute(
+                        update(Card)
+                        .where(Card.id.in_(batch))
+                        .values(difficulty_level=difficulty),
+                        execution_options={"synchronize_session": False},
+                    )
+            else:
+                next_review_at = datetime.utcnow() + timedelta(days=1)
+                for batch in batches:
+                    db.session.execute(
+                        update(Card)
+                        .where(Card.id.in_(batch))
+                        .values(
+                            next_review_at=next_review_at,
+                            review_count=0,
+                            is_fully_reviewed=False,
+                            last_reviewed_at=None,
+                        ),
+                        execution_options={"synchronize_session": False},
+                    )
+                CounterService.cards_removed(cards)
+                for deck_id, count in Counter(card.deck_id for card in cards).items():
+                    CounterService.cards_added(deck_id, count, next_review_at)
+            db.session.commit()
+            if operation == "delete":
+                for card in cards:
+                    deck_question_index.card_removed(card.deck_id, card.id)
+
+        return {
+            "data": {
+                "updated": [card.id for card in cards],
+                "failed": failed,
+            }
+        }
+
     # DELETE LOGIC
     @staticmethod
     def delete_one_folder(folder_id, user_id):
         folder = Folder.query.filter_by(id=folder_id, user_id=user_id).first()
         if folder:
-            db.session.delete(folder)
+            deck_ids = (
+                db.session.execute(
+                    db.select(Deck.id).where(Deck.folder_id == folder_id)
+                )
+                .scalars()
+                .all()
+            )
+            TrashService.delete_folders([folder_id])
             db.session.commit()
+            for deck_id in deck_ids:
+                deck_question_index.invalidate(deck_id)
         else:
-            raise ValueError("Folder does not exist")
+            raise NotFoundError("Folder does not exist")
 
     @staticmethod
     def delete_one_deck(deck_id, user_id):
-        deck = (
-            Deck.query.join(Folder)
-            .filter(Deck.id == deck_id, Folder.user_id == user_id)
-            .first()
-        )
+        deck = Deck.query.filter_by(id=deck_id, user_id=user_id).first()
         if deck:
-            db.session.delete(deck)
+            CounterService.deck_removed(deck_id)
+            TrashService.delete_decks([deck_id])
             db.session.commit()
+            deck_question_index.invalidate(deck_id)
         else:
-            raise ValueError("Deck does not exist")
+            raise NotFoundError("Deck does not exist")
 
     @staticmethod
     def delete_one_card(card_id, user_id):
-        card = Card.query.filter_by(id=card_id).first()
-        card = (
-            Card.query.join(Deck)
-            .join(Folder)
-            .filter(Card.id == card_id, Folder.user_id == user_id)
-            .first()
-        )
+        card = Card.query.filter_by(id=card_id, user_id=user_id).first()
         if card:
-            db.session.delete(card)
+            CounterService.card_removed(card)
+            TrashService.delete_cards([card.id])
             db.session.commit()
+            deck_question_index.card_removed(card.deck_id, card.id)
         else:
-            raise ValueError("Card does not exist")
+            raise NotFoundError("Card does not exist")
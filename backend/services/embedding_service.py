@@ -0,0 +1,475 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from sqlalchemy import case, func, or_
+
+from models.base import db
+from models.ai import CardEmbedding
+from models.card import Card
+from models.deck import Deck
+
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+_embedder = None
+_embedder_lock = threading.Lock()
+
+
+def _sentence_transformer_embedder():
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(EMBEDDING_MODEL)
+
+    def encode(texts):
+        return model.encode(list(texts), convert_to_numpy=True)
+
+    return encode
+
+
+def set_embedder(embedder):
+    """Replace the function used to embed text (``None`` restores the default).
+
+    The embedder takes a list of strings and returns a 2D array with one
+    row per string.
+    """
+    global _embedder
+    with _embedder_lock:
+        _embedder = embedder
+
+
+def embed(texts):
+    """Embed a list of texts as L2-normalized float32 rows."""
+    global _embedder
+    if _embedder is None:
+        with _embedder_lock:
+            if _embedder is None:
+                _embedder = _sentence_transformer_embedder()
+
+    texts = [text.strip() for text in texts]
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+
+    vectors = np.asarray(_embedder(texts), dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def top_k(query_vectors, vectors, k):
+    """Return (scores, indices) of the k most similar rows for each query.
+
+    Both arrays must be L2-normalized, so the dot product is the cosine
+    similarity. Results are sorted by descending similarity.
+    """
+    if len(vectors) == 0 or len(query_vectors) == 0:
+        empty = np.zeros((len(query_vectors), 0))
+        return empty, empty.astype(int)
+
+    similarities = query_vectors @ vectors.T
+    k = min(k, similarities.shape[1])
+    indices = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+    scores = np.take_along_axis(similarities, indices, axis=1)
+    order = np.argsort(-scores, axis=1)
+    return (
+        np.take_along_axis(scores, order, axis=1),
+        np.take_along_axis(indices, order, axis=1),
+    )
+
+
+class DeckQuestionIndex:
+    """Question embeddings of the cards in one deck."""
+
+    def __init__(self, card_ids, questions, vectors):
+        self.card_ids = list(card_ids)
+        self.questions = list(questions)
+        self.vectors = vectors
+
+    def add(self, card_id, question, vector):
+        self.remove(card_id)
+        self.card_ids.append(card_id)
+        self.questions.append(question)
+        if len(self.vectors) == 0:
+            self.vectors = vector.reshape(1, -1)
+        else:
+            self.vectors = np.vstack([self.vectors, vector])
+
+    def remove(self, card_id):
+        if card_id not in self.card_ids:
+            return
+        position = self.card_ids.index(card_id)
+        del self.card_ids[position]
+        del self.questions[position]
+        self.vectors = np.delete(self.vectors, position, axis=0)
+
+    def search(self, query_vectors, k):
+        scores, indices = top_k(query_vectors, self.vectors, k)
+        return [
+            [
+                {
+                    "card_id": self.card_ids[index],
+                    "question": self.questions[index],
+                    "similarity": round(float(score), 4),
+                }
+                for score, index in zip(row_scores, row_indices)
+            ]
+            for row_scores, row_indices in zip(scores, indices)
+        ]
+
+
+class NearDuplicateIndex:
+    """Per-deck question indexes, built lazily and kept in memory.
+
+    An index is built from a single query the first time a deck is searched
+    and then updated by the card write paths. Only the most recently used
+    decks are kept.
+    """
+
+    def __init__(self, max_decks=256):
+        self.max_decks = max_decks
+        self._decks = OrderedDict()
+        self._lock = threading.RLock()
+
+    def _build(self, deck_id):
+        rows = db.session.execute(
+            db.select(Card.id, Card.question).where(Card.deck_id == deck_id)
+        ).all()
+        card_ids = [row.id for row in rows]
+        questions = [row.question for row in rows]
+        vectors = embed(questions) if questions else np.zeros((0, 0), np.float32)
+        return DeckQuestionIndex(card_ids, questions, vectors)
+
+    def get(self, deck_id):
+        with self._lock:
+            index = self._decks.get(deck_id)
+            if index is not None:
+                self._decks.move_to_end(deck_id)
+                return index
+
+        index = self._build(deck_id)
+        with self._lock:
+            index = self._decks.setdefault(deck_id, index)
+            self._decks.move_to_end(deck_id)
+            while len(self._decks) > self.max_decks:
+                self._decks.popitem(last=False)
+            return index
+
+    def card_added(self, deck_id, card_id, question):
+        """Add or refresh a card in the deck's index if it has been built."""
+        with self._lock:
+            index = self._decks.get(deck_id)
+        if index is not None:
+            vector = embed([question])[0]
+            with self._lock:
+                index.add(card_id, question, vector)
+
+    def cards_added(self, deck_id, cards):
+        """Add several (card_id, question) pairs with a single embedding call."""
+        with self._lock:
+            index = self._decks.get(deck_id)
+        if index is not None and cards:
+            vectors = embed([question for _, question in cards])
+            with self._lock:
+                for (card_id, question), vector in zip(cards, vectors):
+                    index.add(card_id, question, vector)
+
+    def card_removed(self, deck_id, card_id):
+        with self._lock:
+            index = self._decks.get(deck_id)
+            if index is not None:
+                index.remove(card_id)
+
+    def invalidate(self, deck_id):
+        with self._lock:
+            self._decks.pop(deck_id, None)
+
+    def find_duplicates(self, deck_id, questions, threshold, k=3):
+        """Find near-duplicates of candidate questions in a deck.
+
+        The candidates are embedded in one batch and compared with the deck
+        index and with each other, so no query is issued per candidate.
+
+        Returns:
+            matches (list): For each question, the existing cards above the
+            threshold (most similar first) and the index of an earlier
+            candidate in the same batch it repeats, if any.
+        """
+        if not questions:
+            return []
+
+        query_vectors = embed(questions)
+        index = self.get(deck_id)
+        with self._lock:
+            existing = index.search(query_vectors, k)
+
+        batch_similarity = query_vectors @ query_vectors.T
+        results = []
+        for position, candidates in enumerate(existing):
+            earlier = batch_similarity[position, :position]
+            batch_duplicate_of = None
+            if len(earlier) and earlier.max() >= threshold:
+                batch_duplicate_of = int(earlier.argmax())
+
+            results.append(
+                {
+                    "existing": [
+                        match
+                        for match in candidates
+                        if match["similarity"] >= threshold
+                    ],
+                    "batch_duplicate_of": batch_duplicate_of,
+                }
+            )
+        return results
+
+
+deck_question_index = NearDuplicateIndex()
+
+
+def card_content_hash(question, answer):
+    """Hash of the text embedded for a card, tied to the embedding model."""
+    text = f"{EMBEDDING_MODEL}\n{question}\n{answer}"
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class UserCardIndex:
+    """Question and answer embeddings of all cards of one user."""
+
+    def __init__(self, hashes, cards, vectors):
+        # card_id -> content hash, used to detect edits, additions and deletions
+        self.hashes = hashes
+        self.cards = cards
+        self.vectors = vectors
+
+    def positions(self):
+        return {card["card_id"]: position for position, card in enumerate(self.cards)}
+
+    def search(self, query_vector, k, min_similarity=0.0):
+        scores, indices = top_k(query_vector.reshape(1, -1), self.vectors, k)
+        return [
+            {**self.cards[index], "similarity": round(float(score), 4)}
+            for score, index in zip(scores[0], indices[0])
+            if score >= min_similarity
+        ]
+
+
+class CardVectorIndex:
+    """Per-user semantic index over card questions and answers.
+
+    Embeddings are persisted in the card_embedding table so they are computed
+    once per card version. Each lookup runs one query listing the user's
+    cards with their stored hashes, and flags in SQL the cards changed since
+    their vector was stored. Only those, and cards missing from memory, have
+    their text read and hashed; the ones whose text did change are embedded
+    in one batch. The matrix of the most recent users is kept in memory.
+    """
+
+    # Cards read or updated per statement, well below SQLite's parameter limit
+    BATCH_SIZE = 500
+
+    def __init__(self, max_users=64):
+        self.max_users = max_users
+        self._users = OrderedDict()
+        self._lock = threading.RLock()
+
+    def _card_rows(self, user_id):
+        # Any write to a card bumps its updated_at, which only means its text
+        # may have changed. The check is >= since SQLite's clock has whole
+        # seconds; a card checked in the second it changed is checked again.
+        changed = or_(
+            CardEmbedding.updated_at.is_(None),
+            Card.updated_at >= CardEmbedding.updated_at,
+        )
+        return db.session.execute(
+            db.select(
+                Card.id,
+                Card.is_fully_reviewed,
+                Deck.name.label("topic"),
+                CardEmbedding.content_hash,
+                case((CardEmbedding.card_id.is_(None), True), else_=changed).label(
+                    "changed"
+                ),
+            )
+            .join(Deck, Card.deck_id == Deck.id)
+            .outerjoin(CardEmbedding, CardEmbedding.card_id == Card.id)
+            .where(Card.user_id == user_id)
+            .order_by(Card.id)
+        ).all()
+
+    def _batches(self, ids):
+        ids = list(ids)
+        for start in range(0, len(ids), self.BATCH_SIZE):
+            yield ids[start : start + self.BATCH_SIZE]
+
+    def _load_texts(self, card_ids):
+        texts = {}
+        for batch in self._batches(card_ids):
+            rows = db.session.execute(
+                db.select(Card.id, Card.question, Card.answer).where(Card.id.in_(batch))
+            ).all()
+            texts.update((row.id, (row.question, row.answer)) for row in rows)
+        return texts
+
+    def _load_vectors(self, card_ids):
+        vectors = {}
+        for batch in self._batches(card_ids):
+            rows = db.session.execute(
+                db.select(CardEmbedding.card_id, CardEmbedding.vector).where(
+                    CardEmbedding.card_id.in_(batch)
+                )
+            ).all()
+            for row in rows:
+                vectors[row.card_id] = np.frombuffer(row.vector, dtype=np.float32)
+        return vectors
+
+    def _store_vectors(self, user_id, rows, vectors, hashes):
+        for row, vector in zip(rows, vectors):
+            values = {
+                "content_hash": hashes[row.id],
+                "vector": vector.astype(np.float32).tobytes(),
+            }
+            if row.content_hash is not None:
+                db.session.execute(
+                    db.update(CardEmbedding)
+                    .where(CardEmbedding.card_id == row.id)
+                    .values(**values)
+                )
+            else:
+                db.session.add(CardEmbedding(card_id=row.id, user_id=user_id, **values))
+
+    def _touch(self, card_ids):
+        # Mark vectors whose card changed but not its text as checked
+        for batch in self._batches(card_ids):
+            db.session.execute(
+                db.update(CardEmbedding)
+                .where(CardEmbedding.card_id.in_(batch))
+                .values(updated_at=func.now())
+            )
+
+    def get(self, user_id):
+        """Return the user's index, embedding any new or edited cards first.
+
+        New vectors are flushed to the caller's session, not committed, so
+        they are saved by the caller's commit along with its own changes.
+        """
+        rows = self._card_rows(user_id)
+        with self._lock:
+            cached = self._users.get(user_id)
+        known = {}
+        if cached is not None:
+            known = {
+                card["card_id"]: (position, card)
+                for position, card in enumerate(cached.cards)
+            }
+
+        # Text is read for changed cards and for those memory does not have,
+        # or has at another version than the table
+        texts = self._load_texts(
+            row.id
+            for row in rows
+            if row.changed
+            or row.id not in known
+            or cached.hashes[row.id] != row.content_hash
+        )
+        hashes = {}
+        stale, unchanged = [], []
+        for row in rows:
+            if row.changed:
+                hashes[row.id] = card_content_hash(*texts[row.id])
+                if hashes[row.id] != row.content_hash:
+                    stale.append(row)
+                    continue
+                unchanged.append(row.id)
+            else:
+                hashes[row.id] = row.content_hash
+
+        cards = []
+        for row in rows:
+            if row.id in texts:
+                question, answer = texts[row.id]
+            else:
+                card = known[row.id][1]
+                question, answer = card["question"], card["answer"]
+            cards.append(
+                {
+                    "card_id": row.id,
+                    "question": question,
+                    "answer": answer,
+                    "topic": row.topic,
+                    "is_mastered": row.is_fully_reviewed,
+                }
+            )
+
+        if cached is not None and not stale and cached.hashes == hashes:
+            # Same card texts, only the metadata can have changed
+            if unchanged:
+                self._touch(unchanged)
+                db.session.flush()
+            with self._lock:
+                cached.cards = cards
+                self._users.move_to_end(user_id)
+            return cached
+
+        # Reuse vectors already in memory, read the rest from the table
+        vectors = {}
+        stale_ids = {row.id for row in stale}
+        for row in rows:
+            if (
+                row.id not in stale_ids
+                and row.id in known
+                and cached.hashes[row.id] == hashes[row.id]
+            ):
+                vectors[row.id] = cached.vectors[known[row.id][0]]
+        vectors.update(
+            self._load_vectors(
+                row.id
+                for row in rows
+                if row.id not in stale_ids and row.id not in vectors
+            )
+        )
+
+        if stale:
+            new_vectors = embed(["{}\n{}".format(*texts[row.id]) for row in stale])
+            self._store_vectors(user_id, stale, new_vectors, hashes)
+            vectors.update(zip((row.id for row in stale), new_vectors))
+        self._touch(unchanged)
+
+        if cached is None or set(cached.hashes) - set(hashes):
+            # Drop vectors of cards that are gone. The subquery runs inside
+            # the DELETE, which the soft-delete filter does not touch, so
+            # soft-deleted cards keep their vectors until they are purged.
+            db.session.execute(
+                db.delete(CardEmbedding).where(
+                    CardEmbedding.user_id == user_id,
+                    CardEmbedding.card_id.not_in(db.select(Card.id)),
+                )
+            )
+        db.session.flush()
+
+        matrix = (
+            np.vstack([vectors[row.id] for row in rows])
+            if rows
+            else np.zeros((0, 0), np.float32)
+        )
+        index = UserCardIndex(hashes, cards, matrix)
+
+        with self._lock:
+            self._users[user_id] = index
+            self._users.move_to_end(user_id)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+        return index
+
+    def search(self, user_id, query, k=8, min_similarity=0.0):
+        """Return the user's k cards most similar to a query, best first."""
+        index = self.get(user_id)
+        if not index.cards:
+            return []
+        return index.search(embed([query])[0], k, min_similarity)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._users.pop(user_id, None)
+
+
+user_card_index = CardVectorIndex()
@@ -0,0 +1,254 @@
+import os
+import random
+import threading
+import time
+
+DEFAULT_MODEL = "gemini-1.5-flash"
+
+# HTTP statuses worth retrying: rate limited or upstream trouble
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+class AIUnavailableError(Exception):
+    """The model API cannot serve the request right now (overloaded or down)."""
+
+
+class CircuitOpenError(AIUnavailableError):
+    """Calls are short-circuited after repeated upstream failures."""
+
+
+class CircuitBreaker:
+    """Stop calling an upstream that keeps failing.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    calls fail fast. Once ``reset_timeout`` seconds have passed a single trial
+    call is let through (half-open): success closes the circuit, failure
+    opens it again.
+
+    Args:
+        failure_threshold (int): Consecutive failures that open the circuit
+        reset_timeout (float): Seconds to wait before a trial call
+        clock (callable): Monotonic time source, replaceable in tests
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return self.CLOSED
+        if self._clock() - self._opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow_request(self):
+        """Return True if a call may go through now."""
+        with self._lock:
+            state = self._state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or self._failures >= self.failure_threshold:
+                self._opened_at = self._clock()
+            self._trial_running = False
+
+
+def _is_retryable(error):
+    """Whether a failed call may succeed if repeated."""
+    import httpx
+    from google.genai import errors
+
+    if isinstance(error, errors.APIError):
+        return error.code in RETRYABLE_STATUS_CODES
+    return isinstance(error, (httpx.TimeoutException, httpx.TransportError))
+
+
+class GeminiClient:
+    """Process-wide Gemini client that protects workers from a slow upstream.
+
+    One ``genai.Client`` (and so one pool of keep-alive HTTP connections) is
+    shared by every request. Each call:
+
+    - waits for one of ``max_concurrency`` slots, but never past its deadline
+    - gets a per-attempt HTTP timeout equal to the time left before the deadline
+    - retries timeouts, 429 and 5xx responses with full-jitter exponential
+      backoff while the deadline allows
+    - fails fast with CircuitOpenError while the circuit breaker is open
+
+    Args:
+        api_key (str): Gemini API key
+        model (str): Model used for generation
+        base_url (str): Override of the API endpoint (e.g. a local fake server)
+        max_concurrency (int): Calls allowed in flight at once
+        timeout (float): Default deadline of a call in seconds
+        max_retries (int): Extra attempts after a retryable failure
+        backoff_base (float): First backoff ceiling in seconds
+        backoff_max (float): Largest backoff ceiling in seconds
+        failure_threshold (int): Consecutive failures that open the circuit
+        reset_timeout (float): Seconds before the open circuit allows a trial
+    """
+
+    def __init__(
+        self,
+        api_key,
+        model=DEFAULT_MODEL,
+        base_url=None,
+        max_concurrency=8,
+        timeout=30.0,
+        max_retries=3,
+        backoff_base=0.5,
+        backoff_max=8.0,
+        failure_threshold=5,
+        reset_timeout=30.0,
+    ):
+        try:
+            import httpx
+            from google import genai
+            from google.genai import types
+        except ImportError:
+            raise ImportError("google-genai package is required for AI features")
+
+        self.model = model
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._types = types
+
+        http_options = types.HttpOptions(
+            timeout=int(timeout * 1000),
+            client_args={
+                "limits": httpx.Limits(
+                    max_connections=max_concurrency,
+                    max_keepalive_connections=max_concurrency,
+                )
+            },
+        )
+        if base_url:
+            http_options.base_url = base_url
+        self._client = genai.Client(api_key=api_key, http_options=http_options)
+
+    def _backoff(self, attempt):
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+
+    def _call(self, prompt, timeout):
+        config = self._types.GenerateContentConfig(
+            http_options=self._types.HttpOptions(timeout=max(1, int(timeout * 1000)))
+        )
+        response = self._client.models.generate_content(
+            model=self.model, contents=prompt, config=config
+        )
+        return response.text
+
+    def generate(self, prompt, timeout=None):
+        """Generate text for a prompt within ``timeout`` seconds (all attempts).
+
+        Raises:
+            CircuitOpenError: The upstream has been failing, try again later
+            AIUnavailableError: No slot, retries or time left for the call
+        """
+        deadline = time.monotonic() + (timeout or self.timeout)
+
+        if not self._slots.acquire(timeout=max(0, deadline - time.monotonic())):
+            raise AIUnavailableError("AI service is busy, please try again")
+
+        try:
+            if not self.breaker.allow_request():
+                raise CircuitOpenError("AI service is temporarily unavailable")
+
+            attempt = 0
+            while True:
+                remaining = deadline - time.monotonic()
+                try:
+                    text = self._call(prompt, remaining)
+                except Exception as e:
+                    if not _is_retryable(e):
+                        # Not an outage, e.g. the request itself was rejected
+                        self.breaker.record_success()
+                        raise
+                    self.breaker.record_failure()
+                    delay = self._backoff(attempt)
+                    attempt += 1
+                    if (
+                        attempt > self.max_retries
+                        or time.monotonic() + delay >= deadline
+                        or not self.breaker.allow_request()
+                    ):
+                        raise AIUnavailableError(
+                            f"AI service did not respond in time: {e}"
+                        ) from e
+                    time.sleep(delay)
+                else:
+                    self.breaker.record_success()
+                    return text
+        finally:
+            self._slots.release()
+
+
+def get_gemini_client():
+    """Get the process-wide client for the current app's settings.
+
+    The API key comes from ``GEMINI_API_KEY`` in the app config or the
+    environment; outside an app context the defaults are used. Clients are
+    cached per key and endpoint.
+    """
+    from flask import current_app, has_app_context
+
+    config = current_app.config if has_app_context() else {}
+    api_key = config.get("GEMINI_API_KEY") or os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        raise ValueError("GEMINI_API_KEY environment variable is required")
+
+    key = (api_key, config.get("GEMINI_BASE_URL"))
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = GeminiClient(
+                api_key,
+                model=config.get("GEMINI_MODEL", DEFAULT_MODEL),
+                base_url=config.get("GEMINI_BASE_URL"),
+                max_concurrency=config.get("GEMINI_MAX_CONCURRENCY", 8),
+                timeout=config.get("GEMINI_TIMEOUT", 30.0),
+                max_retries=config.get("GEMINI_MAX_RETRIES", 3),
+                failure_threshold=config.get("GEMINI_BREAKER_THRESHOLD", 5),
+                reset_timeout=config.get("GEMINI_BREAKER_RESET", 30.0),
+            )
+            _clients[key] = client
+    return client
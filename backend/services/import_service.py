@@ -0,0 +1,266 @@
+import codecs
+import csv
+import html
+import itertools
+import re
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from models.base import db
+from models.card import Card
+from models.deck import Deck
+from services.counter_service import CounterService
+from services.crud_service import NotFoundError
+from services.embedding_service import deck_question_index
+
+FORMATS = ("csv", "tsv", "anki")
+DIFFICULTY_LEVELS = ("easy", "medium", "hard")
+
+# Column names accepted in a CSV/TSV header row
+QUESTION_COLUMNS = ("question", "front", "term")
+ANSWER_COLUMNS = ("answer", "back", "definition")
+DIFFICULTY_COLUMNS = ("difficulty_level", "difficulty", "level")
+
+# Separators an Anki export may declare with "#separator:<name>"
+ANKI_SEPARATORS = {
+    "tab": "\t",
+    "comma": ",",
+    "semicolon": ";",
+    "pipe": "|",
+    "space": " ",
+}
+
+_TAG = re.compile(r"<[^>]+>")
+_LINE_BREAK = re.compile(r"<br\s*/?>|</div>|</p>", re.IGNORECASE)
+
+
+def iter_text_lines(stream, encoding="utf-8-sig"):
+    """Decode a binary stream line by line, keeping the line endings."""
+    return codecs.iterdecode(stream, encoding, errors="replace")
+
+
+def detect_format(first_line, filename=None):
+    """Guess the format of an import from its file name or first line."""
+    extension = (filename or "").rsplit(".", 1)[-1].lower()
+    if extension == "csv":
+        return "csv"
+    if extension in ("tsv", "tab"):
+        return "tsv"
+    if first_line.startswith("#"):
+        return "anki"
+    if extension == "txt":
+        return "anki"
+    return "tsv" if "\t" in first_line else "csv"
+
+
+def _strip_html(text):
+    text = _LINE_BREAK.sub("\n", text)
+    return html.unescape(_TAG.sub("", text)).strip()
+
+
+def _anki_options(lines):
+    """Read the "#key:value" header of an Anki export.
+
+    Returns:
+        options (dict): Header values by key
+        lines (iterator): The remaining lines, starting with the first note
+    """
+    options = {}
+    for line in lines:
+        if not line.startswith("#"):
+            return options, itertools.chain([line], lines)
+        key, _, value = line[1:].partition(":")
+        options[key.strip().lower()] = value.strip()
+    return options, iter(())
+
+
+def _column_positions(header):
+    """Positions of the question, answer and difficulty columns of a header row.
+
+    Returns None when the row is not a header.
+    """
+    names = [name.strip().lower() for name in header]
+
+    def find(candidates):
+        return next((names.index(name) for name in candidates if name in names), None)
+
+    question, answer = find(QUESTION_COLUMNS), find(ANSWER_COLUMNS)
+    if question is None or answer is None:
+        return None
+    return question, answer, find(DIFFICULTY_COLUMNS)
+
+
+def iter_card_rows(lines, fmt):
+    """Parse an import into card rows, one at a time.
+
+    Without a header row the columns are question, answer and an optional
+    difficulty. Anki exports are tab separated unless their header declares
+    another separator, and may contain HTML.
+
+    Args:
+        lines (iterator of str): Lines of the file, with their line endings
+        fmt (str): csv, tsv or anki
+
+    Yields:
+        tuple: (line number, question, answer, difficulty) of each row, or
+        (line number, None, None, error) for rows that cannot be used
+    """
+    lines = iter(lines)
+    strip_html = False
+    line_offset = 0
+    if fmt == "anki":
+        options, lines = _anki_options(lines)
+        line_offset = len(options)
+        delimiter = ANKI_SEPARATORS.get(options.get("separator", "tab").lower(), "\t")
+        strip_html = options.get("html", "false").lower() == "true"
+    else:
+        delimiter = "," if fmt == "csv" else "\t"
+
+    reader = csv.reader(lines, delimiter=delimiter)
+    positions = (0, 1, 2)
+    for row in reader:
+        line_number = reader.line_num + line_offset
+        if not row or not any(field.strip() for field in row):
+            continue
+        if reader.line_num == 1 and fmt != "anki":
+            header = _column_positions(row)
+            if header is not None:
+                positions = header
+                continue
+
+        question_at, answer_at, difficulty_at = positions
+        if max(question_at, answer_at) >= len(row):
+            yield line_number, None, None, "question and answer are required"
+            continue
+
+        question, answer = row[question_at], row[answer_at]
+        if strip_html:
+            question, answer = _strip_html(question), _strip_html(answer)
+        question, answer = question.strip(), answer.strip()
+        if not question or not answer:
+            yield line_number, None, None, "question and answer are required"
+            continue
+
+        difficulty = ""
+        if difficulty_at is not None and difficulty_at < len(row):
+            difficulty = row[difficulty_at].strip().lower()
+        if fmt == "anki" or not difficulty:
+            # Anki's extra columns are tags, not difficulties
+            difficulty = "medium"
+        if difficulty not in DIFFICULTY_LEVELS:
+            yield line_number, None, None, f"unknown difficulty {difficulty!r}"
+            continue
+
+        yield line_number, question, answer, difficulty
+
+
+class ImportService:
+    # Rows checked for duplicates and inserted per statement
+    BATCH_SIZE = 1000
+    # Invalid rows listed in an import summary
+    MAX_REPORTED_ERRORS = 20
+
+    @staticmethod
+    def import_cards(stream, deck_id, user_id, fmt=None, filename=None):
+        """Import cards into a deck from a CSV, TSV or Anki text export.
+
+        The upload is decoded and parsed as a stream and handled BATCH_SIZE
+        rows at a time: one IN query finds the questions already in the deck
+        (including those imported by earlier batches) and one executemany
+        inserts the rest, so memory stays bounded however large the file is.
+        The whole import is one transaction.
+
+        Args:
+            stream (file-like): Binary stream of the file
+            deck_id (int): Target deck
+            user_id (str): Owner of the deck
+            fmt (str): csv, tsv or anki; guessed from the file when None
+            filename (str): Name of the uploaded file, used to guess the format
+
+        Returns:
+            dict: Counts of inserted, duplicate and invalid rows and the first
+            errors with their line numbers
+        """
+        if fmt is not None and fmt not in FORMATS:
+            raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+
+        deck = Deck.query.filter_by(id=deck_id, user_id=user_id).first()
+        if not deck:
+            raise NotFoundError("Deck is not found")
+
+        lines = iter_text_lines(stream)
+        first_line = next(lines, "")
+        fmt = fmt or detect_format(first_line, filename)
+        rows = iter_card_rows(itertools.chain([first_line], lines), fmt)
+
+        summary = {
+            "format": fmt,
+            "inserted": 0,
+            "duplicates": 0,
+            "invalid": 0,
+            "errors": [],
+        }
+        next_review_at = datetime.utcnow() + timedelta(days=1)
+
+        try:
+            while True:
+                batch = list(itertools.islice(rows, ImportService.BATCH_SIZE))
+                if not batch:
+                    break
+                ImportService._import_batch(
+                    batch, deck_id, user_id, next_review_at, summary
+                )
+            if summary["inserted"]:
+                CounterService.cards_added(deck_id, summary["inserted"], next_review_at)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        if summary["inserted"]:
+            deck_question_index.invalidate(deck_id)
+        return {"data": summary}
+
+    @staticmethod
+    def _import_batch(batch, deck_id, user_id, next_review_at, summary):
+        cards = {}
+        for line_number, question, answer, difficulty in batch:
+            if question is None:
+                summary["invalid"] += 1
+                if len(summary["errors"]) < ImportService.MAX_REPORTED_ERRORS:
+                    summary["errors"].append({"line": line_number, "error": difficulty})
+            elif question in cards:
+                summary["duplicates"] += 1
+            else:
+                cards[question] = (answer, difficulty)
+
+        if not cards:
+            return
+
+        existing = set(
+            db.session.execute(
+                db.select(Card.question).where(
+                    Card.deck_id == deck_id, Card.question.in_(list(cards))
+                )
+            ).scalars()
+        )
+        summary["duplicates"] += len(existing)
+
+        new_rows = [
+            {
+                "question": question,
+                "answer": answer,
+                "difficulty_level": difficulty,
+                "next_review_at": next_review_at,
+                "review_count": 0,
+                "is_fully_reviewed": False,
+                "deck_id": deck_id,
+                "user_id": user_id,
+            }
+            for question, (answer, difficulty) in cards.items()
+            if question not in existing
+        ]
+        if new_rows:
+            db.session.execute(insert(Card), new_rows)
+            summary["inserted"] += len(new_rows)
@@ -0,0 +1,328 @@
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+# Registered job handlers: kind -> callable(payload, report_progress) -> dict
+JOB_HANDLERS = {}
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+FINISHED_STATES = (SUCCEEDED, FAILED)
+
+
+class JobLimitError(ValueError):
+    """Raised when a job is rejected because a concurrency limit is reached."""
+
+
+def job_handler(kind):
+    """Register a function as the handler for a kind of job.
+
+    The handler is called with the job payload and a ``report_progress``
+    callback taking a percentage (0-100) and an optional message. Its return
+    value must be JSON serializable and becomes the job result.
+    """
+
+    def decorator(func):
+        JOB_HANDLERS[kind] = func
+        return func
+
+    return decorator
+
+
+def _now():
+    return datetime.utcnow().isoformat()
+
+
+def _new_job(kind, user_id):
+    timestamp = _now()
+    return {
+        "id": uuid.uuid4().hex,
+        "kind": kind,
+        "user_id": user_id,
+        "status": QUEUED,
+        "progress": 0,
+        "message": None,
+        "result": None,
+        "error": None,
+        "created_at": timestamp,
+        "updated_at": timestamp,
+    }
+
+
+def _execute(app, job, payload, update):
+    """Run the handler for a job inside an app context, recording its outcome."""
+    handler = JOB_HANDLERS.get(job["kind"])
+
+    def report_progress(progress, message=None):
+        update(progress=max(0, min(100, int(progress))), message=message)
+
+    update(status=RUNNING)
+    with app.app_context():
+        try:
+            if handler is None:
+                raise ValueError(f"No handler registered for job kind {job['kind']!r}")
+            result = handler(payload, report_progress)
+            update(status=SUCCEEDED, progress=100, result=result)
+        except Exception as e:
+            update(status=FAILED, error=str(e))
+        finally:
+            from models.base import db
+
+            db.session.remove()
+
+
+class ThreadPoolJobQueue:
+    """In-process job queue backed by a thread pool.
+
+    Attributes:
+        - max_concurrency: number of jobs running at the same time (pool size)
+        - max_per_user: number of queued or running jobs allowed per user
+        - max_pending: number of queued or running jobs allowed in total
+        - result_ttl: seconds a finished job is kept for status polling
+    """
+
+    def __init__(
+        self, max_concurrency=4, max_per_user=2, max_pending=100, result_ttl=3600
+    ):
+        self.max_per_user = max_per_user
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="ai-job"
+        )
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def _active(self, user_id=None):
+        return sum(
+            1
+            for job in self._jobs.values()
+            if job["status"] not in FINISHED_STATES
+            and (user_id is None or job["user_id"] == user_id)
+        )
+
+    def _prune(self):
+        cutoff = time.time() - self.result_ttl
+        expired = [
+            job_id
+            for job_id, job in self._jobs.items()
+            if job["status"] in FINISHED_STATES and job["_finished"] < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def submit(self, kind, user_id, payload, app):
+        with self._lock:
+            self._prune()
+            if self._active(user_id) >= self.max_per_user:
+                raise JobLimitError(
+                    "Too many generation jobs in progress for this user"
+                )
+            if self._active() >= self.max_pending:
+                raise JobLimitError(
+                    "Too many generation jobs in progress, try again later"
+                )
+
+            job = _new_job(kind, user_id)
+            job["_finished"] = None
+            self._jobs[job["id"]] = job
+            snapshot = self._public(job)
+
+        def update(**fields):
+            with self._lock:
+                job.update(fields, updated_at=_now())
+                if job["status"] in FINISHED_STATES:
+                    job["_finished"] = time.time()
+
+        self._executor.submit(_execute, app, snapshot, payload, update)
+        return snapshot
+
+    def get(self, job_id, user_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job["user_id"] != user_id:
+                return None
+            return self._public(job)
+
+    @staticmethod
+    def _public(job):
+        return {key: value for key, value in job.items() if not key.startswith("_")}
+
+
+class RedisJobQueue:
+    """Job queue that stores jobs in Redis and runs them in worker processes.
+
+    Web processes only enqueue jobs; workers started with ``work()`` (or the
+    ``run-ai-worker`` CLI command) pop them from a list. Job state is stored
+    as a JSON record per job. Concurrency is enforced with leases: each slot
+    is a member of a sorted set scored by the time it expires, so the limits
+    hold across every process using the same Redis, and the slots of a
+    worker that dies mid-job are freed once their lease runs out instead of
+    being held for good. Workers renew the leases of a job whenever it
+    reports progress.
+
+    Attributes:
+        - job_ttl: seconds a job may stay queued, or run without reporting
+            progress, before its slots and records are given up
+        - result_ttl: seconds a finished job is kept for status polling
+    """
+
+    def __init__(
+        self,
+        redis_client,
+        max_concurrency=4,
+        max_per_user=2,
+        max_pending=100,
+        result_ttl=3600,
+        job_ttl=3600,
+        prefix="ai-jobs",
+    ):
+        self.redis = redis_client
+        self.max_concurrency = max_concurrency
+        self.max_per_user = max_per_user
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        self.job_ttl = job_ttl
+        self.prefix = prefix
+
+    def _key(self, *parts):
+        return ":".join((self.prefix,) + parts)
+
+    def _acquire(self, key, member, limit):
+        """Take a slot of a lease set, returning False when it is full.
+
+        Expired leases are dropped first. The slot is added before the set
+        is counted, so two processes racing for the last slot cannot both
+        get it.
+        """
+        now = time.time()
+        pipe = self.redis.pipeline()
+        pipe.zremrangebyscore(key, "-inf", now)
+        pipe.zadd(key, {member: now + self.job_ttl})
+        pipe.zcard(key)
+        pipe.expire(key, self.job_ttl)
+        taken = pipe.execute()[2]
+        if taken > limit:
+            self.redis.zrem(key, member)
+            return False
+        return True
+
+    def _renew(self, keys, member):
+        deadline = time.time() + self.job_ttl
+        pipe = self.redis.pipeline()
+        for key in keys:
+            pipe.zadd(key, {member: deadline}, xx=True)
+            pipe.expire(key, self.job_ttl)
+        pipe.execute()
+
+    def _release(self, key, member):
+        self.redis.zrem(key, member)
+
+    def submit(self, kind, user_id, payload, app=None):
+        job = _new_job(kind, user_id)
+        user_key = self._key("active", user_id)
+        if not self._acquire(user_key, job["id"], self.max_per_user):
+            raise JobLimitError("Too many generation jobs in progress for this user")
+        if not self._acquire(self._key("pending"), job["id"], self.max_pending):
+            self._release(user_key, job["id"])
+            raise JobLimitError("Too many generation jobs in progress, try again later")
+
+        self._save(job)
+        self.redis.set(
+            self._key("payload", job["id"]), json.dumps(payload), ex=self.job_ttl
+        )
+        self.redis.rpush(self._key("queue"), job["id"])
+        return job
+
+    def _save(self, job):
+        ttl = self.result_ttl if job["status"] in FINISHED_STATES else self.job_ttl
+        self.redis.set(self._key("job", job["id"]), json.dumps(job), ex=ttl)
+
+    def _load(self, job_id):
+        raw = self.redis.get(self._key("job", job_id))
+        return json.loads(raw) if raw else None
+
+    def get(self, job_id, user_id):
+        job = self._load(job_id)
+        if job is None or job["user_id"] != user_id:
+            return None
+        return job
+
+    def work_once(self, app, timeout=1):
+        """Pop and run a single job. Returns False when no job was available."""
+        running_key = self._key("running")
+        worker = uuid.uuid4().hex
+        if not self._acquire(running_key, worker, self.max_concurrency):
+            time.sleep(min(timeout, 0.1))
+            return False
+
+        try:
+            item = self.redis.blpop([self._key("queue")], timeout=timeout)
+            if item is None:
+                return False
+
+            job_id = item[1].decode() if isinstance(item[1], bytes) else item[1]
+            job = self._load(job_id)
+            if job is None:
+                # Expired while queued; its leases have run out as well
+                return True
+
+            payload_key = self._key("payload", job_id)
+            raw_payload = self.redis.get(payload_key)
+            payload = json.loads(raw_payload) if raw_payload else {}
+            job_keys = (self._key("active", job["user_id"]), self._key("pending"))
+
+            def update(**fields):
+                job.update(fields, updated_at=_now())
+                self._save(job)
+                if job["status"] not in FINISHED_STATES:
+                    self._renew(job_keys, job_id)
+                    self._renew((running_key,), worker)
+                    self.redis.expire(payload_key, self.job_ttl)
+
+            try:
+                _execute(app, job, payload, update)
+            finally:
+                self.redis.delete(payload_key)
+                for key in job_keys:
+                    self._release(key, job_id)
+            return True
+        finally:
+            self._release(running_key, worker)
+
+    def work(self, app, stop_event=None):
+        """Process jobs until the stop event is set."""
+        while stop_event is None or not stop_event.is_set():
+            self.work_once(app)
+
+
+def get_job_queue():
+    """Get the job queue configured for the current app, creating it once."""
+    from flask import current_app
+
+    queue = current_app.extensions.get("job_queue")
+    if queue is None:
+        config = current_app.config
+        options = {
+            "max_concurrency": config.get("AI_JOB_MAX_CONCURRENCY", 4),
+            "max_per_user": config.get("AI_JOB_MAX_PER_USER", 2),
+            "max_pending": config.get("AI_JOB_MAX_PENDING", 100),
+            "result_ttl": config.get("AI_JOB_RESULT_TTL", 3600),
+        }
+        if config.get("AI_JOB_BACKEND", "thread") == "redis":
+            import redis
+
+            queue = RedisJobQueue(
+                redis.from_url(config["REDIS_URL"]),
+                job_ttl=config.get("AI_JOB_TTL", 3600),
+                **options,
+            )
+        else:
+            queue = ThreadPoolJobQueue(**options)
+        current_app.extensions["job_queue"] = queue
+    return queue
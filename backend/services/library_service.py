@@ -0,0 +1,179 @@
+import hashlib
+import itertools
+import json
+from datetime import datetime
+
+from sqlalchemy import func, union_all
+
+from models.base import db
+from models.card import Card
+from models.deck import Deck
+from models.folder import Folder
+from services.counter_service import CounterService
+from services.crud_service import CRUDService
+
+
+class _Groups:
+    """Hand out consecutive runs of rows that share a parent, in order.
+
+    Rows must be sorted the way the parents are visited; a parent with no
+    rows gets an empty run.
+    """
+
+    def __init__(self, rows, key):
+        self._groups = itertools.groupby(rows, key)
+        self._current = next(self._groups, None)
+        self._used = False
+
+    def pop(self, parent_id):
+        if self._used:
+            self._current = next(self._groups, None)
+            self._used = False
+        if self._current is None or self._current[0] != parent_id:
+            return iter(())
+        self._used = True
+        return self._current[1]
+
+
+class LibraryService:
+    # Cards written to the response per chunk
+    CHUNK_SIZE = 500
+
+    @staticmethod
+    def get_library(user_id):
+        """Get the user's folder -> deck -> card summary tree.
+
+        The tree is read with one query per level, each sorted to match the
+        (user_id, name), (folder_id, name) and (deck_id, question) unique
+        indexes, and written as JSON while the cards are read. The counts
+        come from the counters stored on folders and decks.
+
+        Returns:
+            dict: The ETag of the library and a generator of the JSON chunks;
+            no tree query runs until the first chunk is requested
+        """
+        now = datetime.utcnow()
+        # Recount the due cards that went stale, as the folder listing does
+        stale = (
+            db.session.execute(
+                db.select(Folder.id).where(
+                    Folder.user_id == user_id, Folder.next_due_at <= now
+                )
+            )
+            .scalars()
+            .all()
+        )
+        if stale:
+            CounterService.refresh_due(stale, now)
+            db.session.commit()
+
+        return {
+            "data": {
+                "etag": LibraryService.etag(user_id),
+                "chunks": LibraryService._stream(user_id),
+            }
+        }
+
+    @staticmethod
+    def etag(user_id):
+        """Fingerprint of everything in the user's library.
+
+        Counts, id sums and the latest change of the folders, decks and
+        cards change whenever one is added, deleted or edited.
+        """
+        folder_ids = db.select(Folder.id).where(Folder.user_id == user_id)
+        deck_ids = db.select(Deck.id).where(Deck.folder_id.in_(folder_ids))
+        parts = [
+            db.select(
+                func.count(model.id),
+                func.coalesce(func.sum(model.id), 0),
+                func.max(func.coalesce(model.updated_at, model.created_at)),
+            ).where(where)
+            for model, where in (
+                (Folder, Folder.user_id == user_id),
+                (Deck, Deck.folder_id.in_(folder_ids)),
+                (Card, Card.deck_id.in_(deck_ids)),
+            )
+        ]
+        rows = db.session.execute(union_all(*parts)).all()
+        return hashlib.sha1(repr(rows).encode()).hexdigest()
+
+    @staticmethod
+    def _stream(user_id):
+        folders = db.session.execute(
+            db.select(
+                Folder.id,
+                Folder.name,
+                Folder.deck_count,
+                Folder.card_count,
+                Folder.due_count,
+                Folder.mastered_count,
+            )
+            .where(Folder.user_id == user_id)
+            .order_by(Folder.name)
+        ).all()
+        decks = db.session.execute(
+            db.select(
+                Deck.id,
+                Deck.folder_id,
+                Deck.name,
+                Deck.card_count,
+                Deck.due_count,
+                Deck.mastered_count,
+            )
+            .join(Folder, Deck.folder_id == Folder.id)
+            .where(Folder.user_id == user_id)
+            .order_by(Folder.name, Deck.name)
+        ).all()
+        cards = db.session.execute(
+            db.select(
+                Card.id,
+                Card.deck_id,
+                func.substr(Card.question, 1, CRUDService.QUESTION_PREVIEW_LENGTH),
+            )
+            .join(Deck, Card.deck_id == Deck.id)
+            .join(Folder, Deck.folder_id == Folder.id)
+            .where(Folder.user_id == user_id)
+            .order_by(Folder.name, Deck.name, Card.question)
+            .execution_options(yield_per=LibraryService.CHUNK_SIZE)
+        )
+
+        decks_of = _Groups(decks, key=lambda deck: deck.folder_id)
+        cards_of = _Groups(cards, key=lambda card: card.deck_id)
+        # Each node is dumped without its closing brace, its children are
+        # written after it and the brace is added once they are done
+        dumps = json.dumps
+        try:
+            yield '{"message": "Library retrieved successfully", "data": {"folders": ['
+            for folder_number, folder in enumerate(folders):
+                yield ("," if folder_number else "") + dumps(
+                    {
+                        "id": folder.id,
+                        "name": folder.name,
+                        "deckCount": folder.deck_count,
+                        "cardCount": folder.card_count,
+                        "dueCount": folder.due_count,
+                        "masteredCount": folder.mastered_count,
+                    }
+                )[:-1] + ', "decks": ['
+                for deck_number, deck in enumerate(decks_of.pop(folder.id)):
+                    yield ("," if deck_number else "") + dumps(
+                        {
+                            "id": deck.id,
+                            "name": deck.name,
+                            "card_count": deck.card_count,
+                            "due_count": deck.due_count,
+                            "mastered_count": deck.mastered_count,
+                        }
+                    )[:-1] + ', "cards": ['
+                    batch, written = [], False
+                    for card_id, _, question in cards_of.pop(deck.id):
+                        batch.append(dumps({"id": card_id, "question": question}))
+                        if len(batch) == LibraryService.CHUNK_SIZE:
+                            yield ("," if written else "") + ",".join(batch)
+                            batch, written = [], True
+                    yield ("," if written and batch else "") + ",".join(batch) + "]}"
+                yield "]}"
+            yield "]}}"
+        finally:
+            cards.close()
@@ -0,0 +1,166 @@
+import os
+import re
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+# Size of the buffer used when copying an upload to disk
+COPY_BUFFER_SIZE = 64 * 1024
+
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+
+
+@contextmanager
+def spooled_pdf(pdf_file):
+    """Copy an uploaded PDF to a temporary file that is removed on exit.
+
+    The upload is copied in fixed-size blocks so the whole file is never held
+    in memory. Objects without a ``stream`` attribute (e.g. simple file-like
+    wrappers) fall back to ``read()``.
+
+    Args:
+        pdf_file: A werkzeug ``FileStorage`` or any object with ``read()``
+
+    Yields:
+        path (str): Location of the temporary PDF file
+    """
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    try:
+        with os.fdopen(fd, "wb") as temp_file:
+            stream = getattr(pdf_file, "stream", None)
+            if stream is not None:
+                stream.seek(0)
+                shutil.copyfileobj(stream, temp_file, COPY_BUFFER_SIZE)
+            else:
+                temp_file.write(pdf_file.read())
+        yield path
+    finally:
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+def iter_pdf_pages(path):
+    """Yield the extracted text of each page of a PDF, one page at a time."""
+    try:
+        from pypdf import PdfReader
+        from pypdf.errors import PdfReadError
+    except ImportError:
+        raise ImportError("pypdf package is required for PDF processing")
+
+    with open(path, "rb") as pdf:
+        try:
+            reader = PdfReader(pdf)
+            for page in reader.pages:
+                yield page.extract_text() or ""
+        except PdfReadError as e:
+            raise ValueError(f"Could not read PDF: {str(e)}")
+
+
+def _split_oversized(text, max_tokens, count_tokens):
+    """Split a single piece of text that is larger than the budget by words.
+
+    Words are counted one at a time and their counts summed, like sentences
+    in chunk_text; the joined piece is only counted again when the sum says
+    the next word might not fit, so a long run of text without sentence
+    breaks costs one count per word rather than one per word per piece.
+    """
+    piece = []
+    piece_tokens = 0
+    for word in text.split():
+        word_tokens = count_tokens(word)
+        if piece and piece_tokens + word_tokens > max_tokens:
+            # Joined words may take fewer tokens than counted separately
+            joined_tokens = count_tokens(" ".join(piece + [word]))
+            if joined_tokens > max_tokens:
+                yield " ".join(piece)
+                piece, piece_tokens = [word], word_tokens
+            else:
+                piece.append(word)
+                piece_tokens = joined_tokens
+            continue
+        piece.append(word)
+        piece_tokens += word_tokens
+    if piece:
+        yield " ".join(piece)
+
+
+def chunk_text(pages, max_tokens, count_tokens):
+    """Group page texts into chunks that each fit within a token budget.
+
+    Sentences are kept whole where possible; a sentence that alone exceeds
+    the budget is split on word boundaries.
+
+    Args:
+        pages (iterable of str): Page texts, typically from iter_pdf_pages
+        max_tokens (int): Upper bound on the tokens of a single chunk
+        count_tokens (callable): Function returning the token count of a string
+
+    Yields:
+        chunk (str): Text chunk within the token budget
+    """
+    current = []
+    current_tokens = 0
+
+    for page_text in pages:
+        page_text = " ".join(page_text.split())
+        if not page_text:
+            continue
+
+        for sentence in _SENTENCE_BOUNDARY.split(page_text):
+            sentence_tokens = count_tokens(sentence)
+
+            if sentence_tokens > max_tokens:
+                if current:
+                    yield " ".join(current)
+                    current, current_tokens = [], 0
+                yield from _split_oversized(sentence, max_tokens, count_tokens)
+                continue
+
+            if current and current_tokens + sentence_tokens > max_tokens:
+                yield " ".join(current)
+                current, current_tokens = [], 0
+
+            current.append(sentence)
+            current_tokens += sentence_tokens
+
+    if current:
+        yield " ".join(current)
+
+
+def allocate_cards(num_chunks, num_cards):
+    """Spread the requested number of cards over the chunks of a document.
+
+    When there are more chunks than cards, chunks are sampled evenly across
+    the document so the cards still cover all of it.
+
+    Returns:
+        plan (list of tuple): (chunk_index, cards_for_chunk) pairs
+    """
+    if num_chunks <= 0 or num_cards <= 0:
+        return []
+
+    if num_chunks > num_cards:
+        step = num_chunks / num_cards
+        return [(int(i * step), 1) for i in range(num_cards)]
+
+    base, extra = divmod(num_cards, num_chunks)
+    return [(i, base + (1 if i < extra else 0)) for i in range(num_chunks)]
+
+
+def _normalize_question(question):
+    return re.sub(r"[^a-z0-9]+", " ", question.lower()).strip()
+
+
+def dedupe_cards(cards):
+    """Drop cards whose question repeats an earlier one (ignoring case/punctuation)."""
+    seen = set()
+    unique_cards = []
+    for card in cards:
+        if not isinstance(card, dict) or not card.get("question"):
+            continue
+        key = _normalize_question(card["question"])
+        if key in seen:
+            continue
+        seen.add(key)
+        unique_cards.append(card)
+    return unique_cards
@@ -0,0 +1,261 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+
+class RateLimitExceeded(ValueError):
+    """Raised when a request would use more AI tokens than its budget allows."""
+
+    def __init__(self, scope, retry_after):
+        self.scope = scope
+        self.retry_after = retry_after
+        owner = "Your" if scope == "user" else "The service's"
+        super().__init__(
+            f"{owner} AI token budget is used up, retry in {retry_after} seconds"
+        )
+
+
+def _refill(level, updated_at, capacity, rate, now):
+    """Level of a bucket after refilling at ``rate`` tokens/second since updated_at."""
+    if level is None:
+        return float(capacity)
+    return min(float(capacity), level + max(0.0, now - updated_at) * rate)
+
+
+def _enough(levels, buckets, tokens):
+    """Whether every bucket can pay for a request.
+
+    A request larger than a bucket only needs a full bucket and leaves it in
+    debt, so it is delayed rather than rejected forever.
+    """
+    return all(
+        level >= min(tokens, capacity)
+        for level, (_, capacity, _) in zip(levels, buckets)
+    )
+
+
+class MemoryBucketStore:
+    """Token buckets kept in process memory (one process, or tests)."""
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, buckets, tokens, now, force=False):
+        """Take tokens from every bucket, or from none if one is short.
+
+        Args:
+            buckets (list of tuple): (key, capacity, rate) of each bucket
+            tokens (float): Tokens to take; negative values give tokens back
+            now (float): Current time in seconds
+            force (bool): Take the tokens even if a bucket is short
+
+        Returns:
+            allowed (bool): Whether the tokens were taken
+            levels (list of float): Bucket levels after the operation
+        """
+        with self._lock:
+            levels = [
+                _refill(*self._buckets.get(key, (None, now)), capacity, rate, now)
+                for key, capacity, rate in buckets
+            ]
+            allowed = force or _enough(levels, buckets, tokens)
+            if allowed:
+                levels = [
+                    min(float(capacity), level - tokens)
+                    for level, (_, capacity, _) in zip(levels, buckets)
+                ]
+                for (key, _, _), level in zip(buckets, levels):
+                    self._buckets[key] = (level, now)
+            return allowed, levels
+
+
+class RedisBucketStore:
+    """Token buckets stored in Redis hashes, shared by every process.
+
+    Buckets are read and written in a WATCH/MULTI transaction that is retried
+    when another process changed them in between, so updates are atomic
+    without server-side scripts.
+    """
+
+    def __init__(self, redis_client, prefix="ai-tokens"):
+        self.redis = redis_client
+        self.prefix = prefix
+
+    def _key(self, key):
+        return f"{self.prefix}:{key}"
+
+    def take(self, buckets, tokens, now, force=False):
+        import redis
+
+        keys = [self._key(key) for key, _, _ in buckets]
+        while True:
+            with self.redis.pipeline() as pipe:
+                try:
+                    pipe.watch(*keys)
+                    levels = []
+                    for key, (_, capacity, rate) in zip(keys, buckets):
+                        level, updated_at = pipe.hmget(key, "level", "updated_at")
+                        levels.append(
+                            _refill(
+                                None if level is None else float(level),
+                                float(updated_at or now),
+                                capacity,
+                                rate,
+                                now,
+                            )
+                        )
+                    allowed = force or _enough(levels, buckets, tokens)
+                    if not allowed:
+                        pipe.unwatch()
+                        return False, levels
+
+                    levels = [
+                        min(float(capacity), level - tokens)
+                        for level, (_, capacity, _) in zip(levels, buckets)
+                    ]
+                    pipe.multi()
+                    for key, level, (_, capacity, rate) in zip(keys, levels, buckets):
+                        pipe.hset(key, mapping={"level": level, "updated_at": now})
+                        # An idle bucket is full again once it has refilled
+                        pipe.expire(key, max(1, math.ceil((capacity - level) / rate)))
+                    pipe.execute()
+                    return True, levels
+                except redis.WatchError:
+                    continue
+
+
+class Reservation:
+    """Tokens reserved for a request and, once known, the tokens it used."""
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.used = None
+
+
+class TokenBudgetLimiter:
+    """Per-user and global token buckets for AI requests.
+
+    Each bucket holds up to ``tokens_per_minute`` tokens and refills
+    continuously at that rate, so short bursts are allowed while the average
+    stays under the budget. A request reserves its estimated tokens from both
+    the user's and the global bucket up front and settles the difference once
+    the real usage is known.
+
+    Args:
+        store (MemoryBucketStore | RedisBucketStore): Where bucket levels live
+        user_tokens_per_minute (int): Budget of each user
+        global_tokens_per_minute (int): Budget shared by all users
+        clock (callable): Time source in seconds, replaceable in tests
+    """
+
+    def __init__(
+        self,
+        store,
+        user_tokens_per_minute=20000,
+        global_tokens_per_minute=500000,
+        clock=time.time,
+    ):
+        self.store = store
+        self.user_capacity = user_tokens_per_minute
+        self.global_capacity = global_tokens_per_minute
+        self._clock = clock
+
+    def _buckets(self, user_id):
+        return [
+            (f"user:{user_id}", self.user_capacity, self.user_capacity / 60),
+            ("global", self.global_capacity, self.global_capacity / 60),
+        ]
+
+    def consume(self, user_id, tokens):
+        """Take tokens from the user's and the global budget.
+
+        Raises:
+            RateLimitExceeded: A budget does not have enough tokens left
+        """
+        buckets = self._buckets(user_id)
+        allowed, levels = self.store.take(buckets, tokens, self._clock())
+        if not allowed:
+            for scope, (_, capacity, rate), level in zip(
+                ("user", "global"), buckets, levels
+            ):
+                missing = min(tokens, capacity) - level
+                if missing > 0:
+                    raise RateLimitExceeded(scope, max(1, math.ceil(missing / rate)))
+        return self._describe(buckets[0], levels[0])
+
+    def settle(self, user_id, tokens):
+        """Charge (or refund, if negative) tokens regardless of the budget left."""
+        buckets = self._buckets(user_id)
+        _, levels = self.store.take(buckets, tokens, self._clock(), force=True)
+        return self._describe(buckets[0], levels[0])
+
+    @contextmanager
+    def reservation(self, user_id, tokens):
+        """Reserve tokens for a request and settle them when it finishes.
+
+        Set ``used`` on the yielded object to the tokens really used; if the
+        block raises, the whole reservation is refunded.
+        """
+        reservation = Reservation(tokens)
+        self.consume(user_id, tokens)
+        try:
+            yield reservation
+        except Exception:
+            self.settle(user_id, -tokens)
+            raise
+        if reservation.used is not None and reservation.used != tokens:
+            self.settle(user_id, reservation.used - tokens)
+
+    def usage(self, user_id):
+        """Current state of the user's and the global budget."""
+        buckets = self._buckets(user_id)
+        _, levels = self.store.take(buckets, 0, self._clock())
+        return {
+            "user": self._describe(buckets[0], levels[0]),
+            "global": self._describe(buckets[1], levels[1]),
+        }
+
+    @staticmethod
+    def _describe(bucket, level):
+        _, capacity, rate = bucket
+        remaining = max(0, math.floor(level))
+        return {
+            "limit": capacity,
+            "remaining": remaining,
+            "used": capacity - remaining,
+            # Seconds until the bucket is full again
+            "reset": max(0, math.ceil((capacity - level) / rate)),
+        }
+
+
+def get_rate_limiter():
+    """Get the token budget limiter of the current app, creating it once."""
+    from flask import current_app
+
+    limiter = current_app.extensions.get("ai_rate_limiter")
+    if limiter is None:
+        config = current_app.config
+        if config.get("AI_RATE_LIMIT_BACKEND", "memory") == "redis":
+            import redis
+
+            store = RedisBucketStore(redis.from_url(config["REDIS_URL"]))
+        else:
+            store = MemoryBucketStore()
+        limiter = TokenBudgetLimiter(
+            store,
+            user_tokens_per_minute=config.get("AI_USER_TOKENS_PER_MINUTE", 20000),
+            global_tokens_per_minute=config.get("AI_GLOBAL_TOKENS_PER_MINUTE", 500000),
+        )
+        current_app.extensions["ai_rate_limiter"] = limiter
+    return limiter
+
+
+def rate_limit_headers(status):
+    """Headers of the IETF RateLimit draft for a budget description."""
+    return {
+        "RateLimit-Limit": str(status["limit"]),
+        "RateLimit-Remaining": str(status["remaining"]),
+        "RateLimit-Reset": str(status["reset"]),
+    }
@@ -1,6 +1,7 @@
 from models.base import db
 from models.card import Card
 from models.review import Review
+from services.counter_service import CounterService
 from sentence_transformers import SentenceTransformer, util
 from datetime import datetime, timedelta
 
@@ -57,6 +58,7 @@ class ReviewService:
         )
 
         # Update the review count and the time the card is reviewed
+        before = (card.next_review_at, card.is_fully_reviewed)
         card.review_count += 1
         card.last_reviewed = datetime.utcnow()
 
@@ -68,6 +70,9 @@ class ReviewService:
             interval_days = ReviewService.INTERVALS[card.review_count - 1]
             card.next_review_at = card.last_reviewed + timedelta(days=interval_days)
 
+        CounterService.card_rescheduled(
+            card.deck_id, before, (card.next_review_at, card.is_fully_reviewed)
+        )
         db.session.add(review)
         db.session.commit()
 
@@ -0,0 +1,44 @@
+import re
+
+# Markers around matched terms in snippets
+HIGHLIGHT_START = "<mark>"
+HIGHLIGHT_END = "</mark>"
+
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+
+def search_terms(text, max_terms=16):
+    """Split a user's search text into plain terms (no query syntax)."""
+    return _TERM.findall(text or "")[:max_terms]
+
+
+def fts5_query(terms, prefix_last=False):
+    """Build an FTS5 MATCH expression requiring every term.
+
+    Terms are quoted so user input can never inject FTS5 operators. With
+    ``prefix_last`` the last term also matches longer words, for search as
+    you type.
+    """
+    quoted = ['"' + term.replace('"', '""') + '"' for term in terms]
+    if prefix_last and quoted:
+        quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def tsquery(terms, prefix_last=False):
+    """Build a PostgreSQL tsquery requiring every term.
+
+    Each term is quoted as a lexeme so user input can never inject tsquery
+    operators, and terms made only of underscores, which the parser turns
+    into no lexeme at all, are dropped. With ``prefix_last`` the last term
+    also matches longer words, for search as you type.
+    """
+    quoted = ["'" + term.replace("'", "''") + "'" for term in terms if term.strip("_")]
+    if prefix_last and quoted:
+        quoted[-1] += ":*"
+    return " & ".join(quoted)
+
+
+def fts5_column_filter(columns, expression):
+    """Restrict an FTS5 expression to some columns of the table."""
+    return "{" + " ".join(columns) + "} : (" + expression + ")"
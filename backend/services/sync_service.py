@@ -0,0 +1,152 @@
+import base64
+import json
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import func
+
+from models.base import db
+from models.card import Card
+from models.deck import Deck
+from models.folder import Folder
+from models.review import Review
+from services.trash_service import INCLUDE_DELETED
+
+# Columns sent for each kind of row, besides updated_at and deleted_at
+SYNC_COLUMNS = {
+    "folders": (Folder.id, Folder.name, Folder.description),
+    "decks": (Deck.id, Deck.folder_id, Deck.name, Deck.description),
+    "cards": (
+        Card.id,
+        Card.deck_id,
+        Card.question,
+        Card.answer,
+        Card.difficulty_level,
+        Card.next_review_at,
+        Card.review_count,
+        Card.is_fully_reviewed,
+        Card.last_reviewed_at,
+    ),
+    "reviews": (
+        Review.id,
+        Review.card_id,
+        Review.user_answer,
+        Review.score,
+        Review.reviewed_at,
+    ),
+}
+_MODELS = {"folders": Folder, "decks": Deck, "cards": Card, "reviews": Review}
+
+
+def _owned(kind, statement, user_id):
+    # Restrict a statement on one kind of row to the user's rows
+    if kind == "decks":
+        statement = statement.join(Folder, Deck.folder_id == Folder.id)
+    elif kind == "cards":
+        statement = statement.join(Deck, Card.deck_id == Deck.id).join(
+            Folder, Deck.folder_id == Folder.id
+        )
+    owner = Review.user_id if kind == "reviews" else Folder.user_id
+    return statement.where(owner == user_id)
+
+
+def _encode_token(since, until=None, after=None):
+    payload = {"since": since.isoformat() if since else None}
+    if until is not None:
+        payload["until"] = until.isoformat()
+        payload["after"] = after
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+def _decode_token(token):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        since = payload["since"] and datetime.fromisoformat(payload["since"])
+        until = payload.get("until") and datetime.fromisoformat(payload["until"])
+        after = payload.get("after") or {}
+        if not all(
+            kind in SYNC_COLUMNS and isinstance(last_id, int)
+            for kind, last_id in after.items()
+        ):
+            raise ValueError
+    except (ValueError, TypeError, KeyError, AttributeError):
+        raise ValueError("token is not valid")
+    return since, until, after
+
+
+class SyncService:
+    # Rows of each kind sent per page
+    PAGE_SIZE = 500
+
+    @staticmethod
+    def get_changes(user_id, token=None, limit=None):
+        """Get the user's folders, decks, cards and reviews changed since a sync.
+
+        Without a token every live row is sent. A token is only ever made by
+        the server: it holds the database clock at the start of the last sync,
+        so the client's own clock plays no part. Each sync sends again the
+        rows changed in the SYNC_OVERLAP_SECONDS before that time, which
+        covers servers whose clocks run behind the database's and
+        transactions that committed after the last sync read past them;
+        clients apply rows by id, so a row received twice is harmless. Rows
+        with a deleted_at are sent so clients can drop them; they are purged
+        after PURGE_AFTER_SECONDS, so older tokens are refused.
+
+        A sync larger than a page is read over several requests, paged by id
+        within each kind; has_more tells the client to call again with
+        next_token.
+
+        Args:
+            user_id (str): Owner of the rows
+            token (str): "next_token" of the previous response
+            limit (int): Rows of each kind per page
+
+        Returns:
+            dict: The changed rows of each kind, has_more and next_token
+        """
+        limit = limit or SyncService.PAGE_SIZE
+        since, until, after = _decode_token(token) if token else (None, None, {})
+        if until is None:
+            # A new sync: it covers what changed up to now, by the database clock
+            until = db.session.scalar(db.select(func.now()))
+            if since is not None and since > until:
+                # The database clock went back since the token was made
+                since = until
+
+        config = current_app.config
+        if since is not None and since < until - timedelta(
+            seconds=config.get("PURGE_AFTER_SECONDS", 30 * 24 * 3600)
+        ):
+            # Rows deleted since then may be purged already
+            raise ValueError("token has expired, sync again without one")
+
+        overlap = timedelta(seconds=config.get("SYNC_OVERLAP_SECONDS", 300))
+        changes, has_more = {}, False
+        for kind, columns in SYNC_COLUMNS.items():
+            model = _MODELS[kind]
+            statement = db.select(
+                *columns, model.updated_at, model.deleted_at
+            ).execution_options(**INCLUDE_DELETED)
+            statement = _owned(kind, statement, user_id)
+            if since is None:
+                # Deleted rows are of no use to a client that syncs from scratch
+                statement = statement.where(model.deleted_at.is_(None))
+            else:
+                statement = statement.where(model.updated_at >= since - overlap)
+            if kind in after:
+                statement = statement.where(model.id > after[kind])
+            rows = db.session.execute(
+                statement.order_by(model.id).limit(limit + 1)
+            ).all()
+
+            if len(rows) > limit:
+                rows, has_more = rows[:limit], True
+            if rows:
+                after[kind] = rows[-1].id
+            changes[kind] = [dict(row._mapping) for row in rows]
+
+        if has_more:
+            next_token = _encode_token(since, until, after)
+        else:
+            next_token = _encode_token(until)
+        return {"data": {**changes, "has_more": has_more, "next_token": next_token}}
@@ -0,0 +1,189 @@
+import json
+import math
+import re
+import threading
+from functools import lru_cache
+
+DEFAULT_TOKENIZER = "tiktoken:cl100k_base"
+
+_WORD_OR_SYMBOL = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+_counters = {}
+_counters_lock = threading.Lock()
+
+
+def heuristic_token_count(text):
+    """Approximate BPE token count without a tokenizer.
+
+    Every punctuation mark is one token and words are split into pieces of
+    about four characters, which tracks subword tokenizers far better than
+    dividing the raw length by four.
+    """
+    return sum(
+        math.ceil(len(piece) / 4) if piece[0].isalnum() or piece[0] == "_" else 1
+        for piece in _WORD_OR_SYMBOL.findall(text)
+    )
+
+
+class TokenCounter:
+    """Token counter with memoized counts.
+
+    Prompts are assembled from the same fragments over and over (deck names,
+    card texts, serialized stats), so counts are cached per exact string.
+
+    Args:
+        count_fn (callable): Returns the number of tokens of a string
+        name (str): Name of the tokenizer backing the counter
+        cache_size (int): Number of distinct strings to memoize
+    """
+
+    def __init__(self, count_fn, name="custom", cache_size=16384):
+        self.name = name
+        self._count = lru_cache(maxsize=cache_size)(count_fn)
+
+    def count(self, text):
+        if not text:
+            return 0
+        return self._count(text)
+
+    def count_json(self, value):
+        """Count the tokens of a value serialized the way prompts embed it."""
+        return self.count(json.dumps(value))
+
+    def cache_info(self):
+        return self._count.cache_info()
+
+
+def _load_tokenizer(spec):
+    """Build the count function for a tokenizer spec like "tiktoken:cl100k_base"."""
+    backend, _, name = spec.partition(":")
+
+    if backend == "heuristic":
+        return heuristic_token_count
+
+    if backend == "tiktoken":
+        import tiktoken
+
+        encoding = tiktoken.get_encoding(name or "cl100k_base")
+        return lambda text: len(encoding.encode(text, disallowed_special=()))
+
+    if backend == "hf":
+        from tokenizers import Tokenizer
+
+        tokenizer = Tokenizer.from_pretrained(name)
+        return lambda text: len(tokenizer.encode(text, add_special_tokens=False).ids)
+
+    raise ValueError(f"Unknown tokenizer: {spec}")
+
+
+def get_token_counter(spec=None):
+    """Get the shared counter for a tokenizer spec, falling back to the heuristic.
+
+    Without a spec the ``AI_TOKENIZER`` setting of the current app is used.
+    """
+    if spec is None:
+        try:
+            from flask import current_app
+
+            spec = current_app.config.get("AI_TOKENIZER", DEFAULT_TOKENIZER)
+        except RuntimeError:
+            spec = DEFAULT_TOKENIZER
+
+    counter = _counters.get(spec)
+    if counter is not None:
+        return counter
+
+    with _counters_lock:
+        counter = _counters.get(spec)
+        if counter is None:
+            try:
+                counter = TokenCounter(_load_tokenizer(spec), name=spec)
+            except Exception:
+                # Tokenizer package or vocabulary unavailable
+                counter = TokenCounter(heuristic_token_count, name="heuristic")
+            _counters[spec] = counter
+    return counter
+
+
+def pack_context(sections, budget, counter, max_skips=32):
+    """Fill a context dict with as many items as fit in a token budget.
+
+    Sections are considered in priority order and items within a section in
+    their given order. An item that does not fit is skipped so smaller,
+    lower-priority items can still use the remaining budget; after
+    ``max_skips`` misses in a row the rest of the section is left out, so
+    huge profiles are not scanned to the end once the budget is spent. The
+    returned context is checked against the budget once fully serialized.
+
+    Args:
+        sections (list of tuple): (key, value) pairs in priority order. A list
+            value is packed item by item; any other value is all or nothing.
+        budget (int): Maximum tokens of the serialized context
+        counter (TokenCounter): Counter used to size every fragment
+        max_skips (int): Consecutive items that may not fit before a section
+            is cut off
+
+    Returns:
+        context (dict): Packed context, keys in priority order
+        used (int): Tokens of the serialized context
+    """
+    context = {}
+    used = counter.count("{}")
+
+    for key, value in sections:
+        key_cost = counter.count_json(key) + 2  # ": " / ", " separators
+
+        if not isinstance(value, list):
+            cost = key_cost + counter.count_json(value)
+            if used + cost <= budget:
+                context[key] = value
+                used += cost
+            continue
+
+        packed = []
+        section_cost = key_cost + counter.count("[]")
+        if used + section_cost > budget:
+            continue
+        skipped = 0
+        for item in value:
+            cost = counter.count_json(item) + 1  # ", " separator
+            if used + section_cost + cost <= budget:
+                packed.append(item)
+                section_cost += cost
+                skipped = 0
+            else:
+                skipped += 1
+                if skipped >= max_skips:
+                    break
+        context[key] = packed
+        used += section_cost
+
+    # Separator estimates can drift from the real tokenization; trim from the
+    # lowest-priority end until the serialized context really fits.
+    actual = counter.count_json(context)
+    while actual > budget and context:
+        last_key = next(reversed(context))
+        if isinstance(context[last_key], list) and context[last_key]:
+            context[last_key].pop()
+        else:
+            del context[last_key]
+        actual = counter.count_json(context)
+
+    return context, actual
+
+
+def truncate_to_tokens(text, max_tokens, counter):
+    """Cut a text at a word boundary so it fits in ``max_tokens`` tokens."""
+    if counter.count(text) <= max_tokens:
+        return text
+
+    words = text.split()
+    # Binary search on the number of words kept
+    low, high = 0, len(words)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if counter.count(" ".join(words[:middle]) + " ...") <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    return " ".join(words[:low]) + " ..." if low else ""
@@ -0,0 +1,102 @@
+from datetime import datetime
+
+from sqlalchemy import delete, update
+
+from models.ai import CardEmbedding
+from models.base import db
+from models.card import Card
+from models.deck import Deck
+from models.folder import Folder
+from models.review import Review
+
+# Soft-deleted rows are read with this option, which lifts the deleted_at filter
+INCLUDE_DELETED = {"include_deleted": True}
+_NO_SYNC = {"synchronize_session": False}
+
+
+def _mark(model, where, now):
+    db.session.execute(
+        update(model).where(where, model.deleted_at.is_(None)).values(deleted_at=now),
+        execution_options=_NO_SYNC,
+    )
+
+
+class TrashService:
+    """Soft-delete folders, decks and cards, and purge them later.
+
+    Deleting sets deleted_at on a row and everything under it with one
+    UPDATE per table, so it takes no longer for a large tree than for a
+    small one to load. Deleted rows are hidden from every query (see
+    models.base) and stay in the database for PURGE_AFTER_SECONDS, so
+    syncing clients get to see them go, before purge() removes them in
+    bounded batches. The caller commits the deletes.
+    """
+
+    # Rows removed per statement when purging
+    BATCH_SIZE = 1000
+
+    @staticmethod
+    def delete_folders(folder_ids, now=None):
+        now = now or datetime.utcnow()
+        deck_ids = db.select(Deck.id).where(Deck.folder_id.in_(folder_ids))
+        TrashService.delete_decks(deck_ids, now)
+        _mark(Folder, Folder.id.in_(folder_ids), now)
+
+    @staticmethod
+    def delete_decks(deck_ids, now=None):
+        now = now or datetime.utcnow()
+        card_ids = db.select(Card.id).where(Card.deck_id.in_(deck_ids))
+        TrashService.delete_cards(card_ids, now)
+        _mark(Deck, Deck.id.in_(deck_ids), now)
+
+    @staticmethod
+    def delete_cards(card_ids, now=None):
+        """Soft-delete cards and their reviews.
+
+        Args:
+            card_ids: Ids of the cards, as a list or a select of ids
+        """
+        now = now or datetime.utcnow()
+        _mark(Review, Review.card_id.in_(card_ids), now)
+        _mark(Card, Card.id.in_(card_ids), now)
+
+    @staticmethod
+    def purge(older_than, batch_size=None):
+        """Remove the rows deleted before a time, in batches.
+
+        Children go before their parents so foreign keys always hold, and
+        each batch commits on its own, so the purge holds its locks briefly
+        and can be stopped at any point.
+
+        Args:
+            older_than (datetime): Rows deleted before this are removed
+            batch_size (int): Most rows removed per statement
+
+        Returns:
+            dict: Number of rows removed from each table
+        """
+        batch_size = batch_size or TrashService.BATCH_SIZE
+        removed = {}
+        for model in (Review, Card, Deck, Folder):
+            removed[model.__tablename__] = 0
+            deleted = (
+                db.select(model.id)
+                .where(model.deleted_at < older_than)
+                .limit(batch_size)
+                .execution_options(**INCLUDE_DELETED)
+            )
+            while True:
+                ids = db.session.execute(deleted).scalars().all()
+                if not ids:
+                    break
+                if model is Card:
+                    db.session.execute(
+                        delete(CardEmbedding).where(CardEmbedding.card_id.in_(ids))
+                    )
+                db.session.execute(
+                    delete(model).where(model.id.in_(ids)),
+                    execution_options=_NO_SYNC,
+                )
+                db.session.commit()
+                removed[model.__tablename__] += len(ids)
+        return removed
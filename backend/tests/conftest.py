@@ -4,7 +4,10 @@ import os
 from app import create_app
 from models.base import db
 from models.user import User
+from services import review_service
 from services.auth_service import AuthService
+from services.crud_service import CRUDService
+from services.embedding_service import deck_question_index
 
 
 @pytest.fixture
@@ -39,6 +42,78 @@ def runner(app):
     return app.test_cli_runner()
 
 
+@pytest.fixture(autouse=True)
+def reset_deck_index():
+    """Drop the near-duplicate indexes a test built; deck ids are reused."""
+    yield
+    deck_question_index._decks.clear()
+
+
+@pytest.fixture
+def fixed_similarity(monkeypatch):
+    """Score reviews without loading the sentence model."""
+    monkeypatch.setattr(review_service, "semantic_similarity", lambda *args: 90)
+
+
+@pytest.fixture
+def card_data():
+    """Build the request body of a new card."""
+
+    def card_data(question, answer="Answer", difficulty_level="easy"):
+        return {
+            "question": question,
+            "answer": answer,
+            "difficulty_level": difficulty_level,
+        }
+
+    return card_data
+
+
+@pytest.fixture
+def make_user(app):
+    """Add a user straight to the database and return its id."""
+
+    def make_user(username):
+        user = User(
+            full_name="Test User",
+            username=username,
+            email=f"{username}@example.com",
+            password_hash="hashed_password",
+        )
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+    return make_user
+
+
+@pytest.fixture
+def make_folder(app):
+    """Add a folder through the services and return its id."""
+
+    def make_folder(user_id, name="Biology", **fields):
+        return CRUDService.add_new_folder({"name": name, **fields}, user_id)["data"][
+            "id"
+        ]
+
+    return make_folder
+
+
+@pytest.fixture
+def make_deck(app):
+    """Add a deck, and the given cards, through the services; return its id."""
+
+    def make_deck(folder_id, user_id, name="Cells", cards=(), **fields):
+        deck_id = CRUDService.add_new_deck(
+            {"name": name, **fields}, folder_id, user_id
+        )["data"]["id"]
+        if cards:
+            CRUDService.add_cards_bulk(list(cards), deck_id, user_id)
+        return deck_id
+
+    return make_deck
+
+
 @pytest.fixture
 def sample_user_data():
     """Sample user data for testing."""
@@ -67,3 +142,33 @@ def auth_headers(app, client, sample_user_data):
 
         token = data["access_token"]
         return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    """Replace the app's Redis connection with an in-memory stand-in."""
+    fakeredis = pytest.importorskip("fakeredis", reason="fakeredis not installed")
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(
+        "services.auth_service.get_redis_client",
+        lambda: fakeredis.FakeRedis(server=server, decode_responses=True),
+    )
+    return fakeredis.FakeRedis(server=server)
+
+
+@pytest.fixture
+def fake_gemini(app):
+    """Point the Gemini client at a local fake server with fast retries."""
+    from services import gemini_client
+    from tests.fake_gemini_server import FakeGeminiServer
+
+    server = FakeGeminiServer().start()
+    app.config.update(
+        GEMINI_API_KEY="test-key",
+        GEMINI_BASE_URL=server.url,
+        GEMINI_TIMEOUT=2.0,
+    )
+    gemini_client._clients.clear()
+    yield server
+    gemini_client._clients.clear()
+    server.stop()
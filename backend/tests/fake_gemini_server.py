@@ -0,0 +1,88 @@
+"""Local stand-in for the Gemini REST API that can simulate latency and errors."""
+
+import json
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeGeminiServer:
+    """Serve ``:generateContent`` requests on a random local port.
+
+    Attributes:
+        latency (float): Seconds to wait before answering every request
+        reply (str): Text of successful responses
+        failures (deque): Status codes returned by the next requests, in order
+        requests (list): Prompts received, for assertions
+    """
+
+    def __init__(self):
+        self.latency = 0.0
+        self.reply = "[]"
+        self.failures = deque()
+        self.requests = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, args=(0.05,), daemon=True
+        )
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def fail_next(self, *status_codes):
+        self.failures.extend(status_codes)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with fake._lock:
+                    fake.requests.append(body["contents"][0]["parts"][0]["text"])
+                    status = fake.failures.popleft() if fake.failures else 200
+                time.sleep(fake.latency)
+
+                if status == 200:
+                    payload = {
+                        "candidates": [
+                            {
+                                "content": {
+                                    "role": "model",
+                                    "parts": [{"text": fake.reply}],
+                                }
+                            }
+                        ]
+                    }
+                else:
+                    payload = {
+                        "error": {"code": status, "message": "Simulated failure"}
+                    }
+                data = json.dumps(payload).encode()
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client gave up (timeout)
+                    pass
+
+        return Handler
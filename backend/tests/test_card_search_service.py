@@ -0,0 +1,130 @@
+import pytest
+from services.card_search_service import CardSearchService
+from services.crud_service import CRUDService
+from services.search_service import search_terms, tsquery
+from services.trash_service import TrashService
+from models import User, Card, db
+from datetime import datetime, timedelta
+
+
+class TestCardSearch:
+
+    @pytest.fixture(autouse=True)
+    def setup_cards(self, app, card_data, make_user, make_folder, make_deck):
+        with app.app_context():
+            self.user_id = make_user("alice")
+            other_id = make_user("bob")
+            cards = {
+                self.user_id: [
+                    card_data("What is photosynthesis?", "Light becomes sugar."),
+                    card_data(
+                        "Where do plants store energy?", "As photosynthesis output."
+                    ),
+                    card_data(
+                        "What is a mitochondrion?", "The powerhouse of the cell."
+                    ),
+                ]
+                + [card_data(f"Unrelated {n}", "Nothing to see") for n in range(5)],
+                other_id: [card_data("Photosynthesis for Bob", "Someone else's")],
+            }
+            self.deck_ids = [
+                make_deck(make_folder(user_id), user_id, "Plants", deck_cards)
+                for user_id, deck_cards in cards.items()
+            ]
+
+    def search(self, app, query, **kwargs):
+        with app.app_context():
+            return CardSearchService.search_cards(self.user_id, query, **kwargs)
+
+    def test_ranks_question_matches_first(self, app):
+        results = self.search(app, "photosynthesis")["results"]
+
+        assert len(results) == 2
+        assert "<mark>photosynthesis</mark>" in results[0]["question_snippet"]
+        assert "<mark>photosynthesis</mark>" in results[1]["answer_snippet"]
+        assert results[0]["score"] > results[1]["score"]
+        assert results[0]["deck_name"] == "Plants"
+
+    def test_prefix_and_stemmed_matches(self, app):
+        assert len(self.search(app, "mitochon")["results"]) == 1
+        assert len(self.search(app, "plant stores")["results"]) == 1
+
+    def test_pages(self, app):
+        first = self.search(app, "unrelated", limit=3)
+        second = self.search(app, "unrelated", limit=3, offset=3)
+
+        assert first["pagination"]["has_more"] is True
+        assert second["pagination"]["has_more"] is False
+        ids = [row["id"] for row in first["results"] + second["results"]]
+        assert len(set(ids)) == 5
+
+    def test_index_follows_writes(self, app):
+        with app.app_context():
+            card_id = db.session.scalars(
+                db.select(Card.id).where(Card.question == "What is a mitochondrion?")
+            ).one()
+            CRUDService.update_one_card(
+                card_id, self.user_id, {"question": "What is a ribosome?"}
+            )
+            assert self.search(app, "mitochondrion")["results"] == []
+            assert len(self.search(app, "ribosome")["results"]) == 1
+
+            # Deleted cards are hidden at once and leave the index when purged
+            CRUDService.delete_one_card(card_id, self.user_id)
+            assert self.search(app, "ribosome")["results"] == []
+            TrashService.purge(datetime.utcnow() + timedelta(seconds=1))
+            indexed = db.session.execute(
+                db.text("SELECT count(*) FROM card_fts WHERE card_fts MATCH 'ribosome'")
+            ).scalar()
+            assert indexed == 0
+
+            # Cloned cards are indexed too
+            target = CRUDService.add_new_folder({"name": "Copies"}, self.user_id)
+            CRUDService.clone_deck(self.deck_ids[0], target["data"]["id"], self.user_id)
+        assert len(self.search(app, "photosynthesis")["results"]) == 4
+
+    def test_query_syntax_is_not_interpreted(self, app):
+        assert self.search(app, 'photosynthesis OR "mitochondrion')["results"] == []
+
+    def test_empty_query_is_rejected(self, app):
+        with pytest.raises(ValueError):
+            self.search(app, "?!")
+
+
+class TestTsquery:
+
+    def test_terms_are_quoted_lexemes(self):
+        terms = search_terms("cell's & !power | house:*")
+
+        assert tsquery(terms, prefix_last=True) == (
+            "'cell' & 's' & 'power' & 'house':*"
+        )
+        assert tsquery(["cell", "power"]) == "'cell' & 'power'"
+
+    def test_underscore_terms_are_dropped(self):
+        assert tsquery(["cell", "__", "_"], prefix_last=True) == "'cell':*"
+        assert tsquery(["snake_case", "___"], prefix_last=True) == "'snake_case':*"
+        assert tsquery(["_"], prefix_last=True) == ""
+
+
+class TestCardSearchRoute:
+
+    def test_search_route(
+        self, app, client, fake_redis, auth_headers, card_data, make_folder, make_deck
+    ):
+        with app.app_context():
+            user = User.query.filter_by(username="testuser").first()
+            make_deck(
+                make_folder(user.id),
+                user.id,
+                cards=[card_data("Explain mitochondria", "They produce energy")],
+            )
+
+        response = client.get("/card/search?q=mito", headers=auth_headers)
+        missing = client.get("/card/search", headers=auth_headers)
+        bad_limit = client.get("/card/search?q=mito&limit=0", headers=auth_headers)
+
+        assert response.status_code == 200
+        assert len(response.get_json()["data"]["results"]) == 1
+        assert missing.status_code == 400
+        assert bad_limit.status_code == 400
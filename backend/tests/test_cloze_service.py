@@ -0,0 +1,182 @@
+import pytest
+import numpy as np
+from services.cloze_service import (
+    BLANK,
+    CorpusStats,
+    ClozeService,
+    generate_cloze_cards,
+    split_sentences,
+    user_corpus_cache,
+)
+from services.embedding_service import set_embedder
+from services.gemini_client import CircuitOpenError
+from services.ai_service import AIService
+from tests.test_job_service import _wait_for
+from models import User, Card, db
+
+TEXT = (
+    "The mitochondria is the powerhouse of the eukaryotic cell. "
+    "Photosynthesis converts light energy into chemical energy in chloroplasts. "
+    "The French Revolution began in 1789 and ended the monarchy in France. "
+    "Enzymes speed up chemical reactions by lowering the activation energy. "
+    "Ribosomes translate messenger RNA into proteins in the cytoplasm."
+)
+
+
+class TestClozeGeneration:
+
+    def test_split_sentences(self):
+        text = 'He said "Stop." Then it ended.\n\nNew paragraph without a stop\nNext'
+
+        assert split_sentences(text) == [
+            'He said "Stop."',
+            "Then it ended.",
+            "New paragraph without a stop Next",
+        ]
+        assert split_sentences("e.g. the value 3.14 is pi.") == [
+            "e.g. the value 3.14 is pi."
+        ]
+
+    def test_cards_blank_a_key_term(self):
+        cards = generate_cloze_cards(TEXT, 3)
+
+        assert len(cards) == 3
+        for card in cards:
+            assert card["question"].count(BLANK) == 1
+            assert card["question"].replace(BLANK, card["answer"]) in TEXT
+            assert card["difficulty_level"] == "medium"
+        assert len({card["answer"].lower() for card in cards}) == 3
+
+    def test_cards_keep_text_order(self):
+        cards = generate_cloze_cards(TEXT, 5)
+        positions = [
+            TEXT.index(card["question"].replace(BLANK, card["answer"]))
+            for card in cards
+        ]
+
+        assert positions == sorted(positions)
+
+    def test_terms_common_in_the_corpus_are_avoided(self):
+        text = "Glycolysis splits glucose into two pyruvate molecules."
+        without = generate_cloze_cards(text, 1, "medium")[0]["answer"]
+        corpus = CorpusStats.from_documents([f"What does {without} do?"] * 50)
+
+        with_corpus = generate_cloze_cards(text, 1, "medium", corpus)[0]["answer"]
+
+        assert with_corpus.lower() != without.lower()
+
+    def test_short_sentences_are_skipped(self):
+        assert generate_cloze_cards("Too short. Also short.", 5) == []
+
+
+class TestClozeService:
+
+    @pytest.fixture(autouse=True)
+    def setup_cards(self, app, card_data, make_user, make_folder, make_deck):
+        user_corpus_cache.clear()
+        with app.app_context():
+            self.user_id = make_user("testuser")
+            self.deck_id = make_deck(
+                make_folder(self.user_id),
+                self.user_id,
+                cards=[
+                    card_data("What is the powerhouse of the cell?", "The mitochondria")
+                ],
+            )
+
+    def test_result_shape(self, app):
+        with app.app_context():
+            result = ClozeService.generate_cards(TEXT, 2, self.deck_id, self.user_id)
+
+        data = result["data"]
+        assert data["deck_id"] == self.deck_id
+        assert data["preview"] is True
+        assert data["metadata"]["num_cards_generated"] == 2
+
+    def test_corpus_is_cached_until_cards_change(self, app):
+        with app.app_context():
+            first = user_corpus_cache.get(self.user_id)
+            assert user_corpus_cache.get(self.user_id) is first
+            assert first.num_documents == 1
+
+            db.session.add(
+                Card(
+                    question="What do ribosomes make?",
+                    answer="Proteins",
+                    difficulty_level="easy",
+                    deck_id=self.deck_id,
+                )
+            )
+            db.session.commit()
+
+            assert user_corpus_cache.get(self.user_id).num_documents == 2
+
+    def test_no_usable_sentences(self, app):
+        with app.app_context():
+            with pytest.raises(ValueError):
+                ClozeService.generate_cards("Hi.", 2, self.deck_id, self.user_id)
+
+
+class TestOfflineGenerationRoutes:
+
+    @pytest.fixture(autouse=True)
+    def setup_deck(self, app, fake_redis, auth_headers, make_folder, make_deck):
+        set_embedder(lambda texts: np.eye(len(texts), 8, dtype=np.float32))
+        with app.app_context():
+            user = User.query.filter_by(username="testuser").first()
+            self.deck_id = make_deck(make_folder(user.id), user.id)
+        self.headers = auth_headers
+        yield
+        set_embedder(None)
+
+    def generate(self, client, **fields):
+        response = client.post(
+            "/ai/generate-cards",
+            json={"content": TEXT, "deck_id": self.deck_id, "num_cards": 2, **fields},
+            headers=self.headers,
+        )
+        assert response.status_code == 202
+        job_id = response.get_json()["data"]["job_id"]
+        return _wait_for(
+            lambda: client.get(f"/ai/jobs/{job_id}", headers=self.headers).get_json()[
+                "data"
+            ]
+        )
+
+    def test_offline_generator_needs_no_api_key(self, app, client, monkeypatch):
+        monkeypatch.delenv("GEMINI_API_KEY", raising=False)
+        app.config["GEMINI_API_KEY"] = None
+
+        job = self.generate(client, generator="offline")
+
+        assert job["status"] == "succeeded"
+        assert len(job["result"]["cards"]) == 2
+        assert job["result"]["metadata"]["generator"] == "offline"
+
+    def test_unknown_generator(self, client):
+        response = client.post(
+            "/ai/generate-cards",
+            json={
+                "content": TEXT,
+                "deck_id": self.deck_id,
+                "num_cards": 2,
+                "generator": "magic",
+            },
+            headers=self.headers,
+        )
+
+        assert response.status_code == 400
+
+    def test_falls_back_when_gemini_is_unavailable(self, app, client, monkeypatch):
+        monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+
+        def unavailable(self, prompt):
+            raise CircuitOpenError("AI service is temporarily unavailable")
+
+        monkeypatch.setattr(AIService, "_generate_content", unavailable)
+
+        job = self.generate(client)
+
+        assert job["status"] == "succeeded"
+        assert job["result"]["metadata"]["generator"] == "offline"
+        assert "temporarily unavailable" in job["result"]["metadata"]["fallback_reason"]
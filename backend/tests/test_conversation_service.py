@@ -0,0 +1,236 @@
+import pytest
+from sqlalchemy import event
+from services.conversation_service import ConversationService
+from models import User, AIConversation, db
+
+
+class TestConversationHistory:
+
+    @pytest.fixture(autouse=True)
+    def setup_conversations(self, app, make_user):
+        with app.app_context():
+            self.user_id = make_user("testuser")
+            for number in range(25):
+                db.session.add(
+                    AIConversation(
+                        user_query=f"Question {number}",
+                        ai_response=f"Answer {number} " + "x" * 500,
+                        user_id=self.user_id,
+                    )
+                )
+            db.session.commit()
+
+    def test_previews_are_truncated(self, app):
+        with app.app_context():
+            data = ConversationService.list_conversations(self.user_id, limit=1)
+
+        conversation = data["conversations"][0]
+        assert conversation["query"] == "Question 24"
+        assert len(conversation["response_preview"]) == 203
+        assert conversation["response_preview"].endswith("...")
+
+    def test_full_texts_are_not_selected(self, app):
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        with app.app_context():
+            event.listen(db.engine, "before_cursor_execute", listener)
+            try:
+                ConversationService.list_conversations(self.user_id, cursor=10)
+            finally:
+                event.remove(db.engine, "before_cursor_execute", listener)
+
+        assert len(statements) == 1
+        select_list = statements[0].split(" FROM ")[0]
+        assert "substr(aiconversation.ai_response" in select_list
+        assert select_list.count("aiconversation.ai_response") == 1
+
+    def test_cursor_pages_cover_every_conversation_once(self, app):
+        seen = []
+        cursor = None
+        with app.app_context():
+            while True:
+                data = ConversationService.list_conversations(
+                    self.user_id, limit=10, cursor=cursor
+                )
+                seen.extend(c["id"] for c in data["conversations"])
+                cursor = data["pagination"]["next_cursor"]
+                if not data["pagination"]["has_more"]:
+                    break
+                cursor = int(cursor)
+
+        assert len(seen) == 25
+        assert seen == sorted(seen, reverse=True)
+
+    def test_total_is_capped(self, app, monkeypatch):
+        monkeypatch.setattr(ConversationService, "COUNT_CAP", 20)
+        with app.app_context():
+            first = ConversationService.list_conversations(self.user_id)["pagination"]
+            later = ConversationService.list_conversations(self.user_id, cursor=5)
+
+        assert first["total"] == 20
+        assert first["total_is_exact"] is False
+        assert "total" not in later["pagination"]
+
+
+class TestConversationHistoryRoute:
+
+    def test_pages_with_cursor(self, app, client, fake_redis, auth_headers):
+        with app.app_context():
+            user = User.query.filter_by(username="testuser").first()
+            for number in range(3):
+                db.session.add(
+                    AIConversation(
+                        user_query=f"Question {number}",
+                        ai_response="Answer",
+                        user_id=user.id,
+                    )
+                )
+            db.session.commit()
+
+        first = client.get("/ai/conversations?limit=2", headers=auth_headers)
+        cursor = first.get_json()["data"]["pagination"]["next_cursor"]
+        second = client.get(
+            f"/ai/conversations?limit=2&cursor={cursor}", headers=auth_headers
+        )
+
+        assert first.get_json()["data"]["pagination"]["total"] == 3
+        assert [c["query"] for c in second.get_json()["data"]["conversations"]] == [
+            "Question 0"
+        ]
+        bad = client.get("/ai/conversations?cursor=abc", headers=auth_headers)
+        assert bad.status_code == 400
+
+
+class TestConversationSearch:
+
+    @pytest.fixture(autouse=True)
+    def setup_conversations(self, app, make_user):
+        with app.app_context():
+            self.user_id = make_user("alice")
+            other_id = make_user("bob")
+            conversations = [
+                ("How do I study photosynthesis?", "Review the light reactions."),
+                ("Tips for calculus?", "Practice derivatives and photosynthesis."),
+                ("What about history?", "Focus on the treaty dates."),
+            ] + [(f"Unrelated question {n}", "Unrelated answer") for n in range(6)]
+            for query, response in conversations:
+                db.session.add(
+                    AIConversation(
+                        user_query=query, ai_response=response, user_id=self.user_id
+                    )
+                )
+            db.session.add(
+                AIConversation(
+                    user_query="Photosynthesis question",
+                    ai_response="Someone else's answer",
+                    user_id=other_id,
+                )
+            )
+            db.session.commit()
+
+    def test_ranks_query_matches_first(self, app):
+        with app.app_context():
+            data = ConversationService.search_conversations(
+                self.user_id, "photosynthesis"
+            )
+
+        results = data["results"]
+        assert len(results) == 2
+        assert "<mark>photosynthesis</mark>" in results[0]["query_snippet"]
+        assert "<mark>photosynthesis</mark>" in results[1]["response_snippet"]
+        assert results[0]["score"] > results[1]["score"]
+
+    def test_matches_stemmed_words(self, app):
+        with app.app_context():
+            data = ConversationService.search_conversations(self.user_id, "derivative")
+
+        assert len(data["results"]) == 1
+
+    def test_index_follows_updates_and_deletes(self, app):
+        with app.app_context():
+            conversation = AIConversation.query.filter_by(
+                user_query="What about history?"
+            ).first()
+            conversation.ai_response = "Focus on revolutions."
+            db.session.commit()
+            assert (
+                ConversationService.search_conversations(self.user_id, "treaty")[
+                    "results"
+                ]
+                == []
+            )
+            assert (
+                len(
+                    ConversationService.search_conversations(
+                        self.user_id, "revolutions"
+                    )["results"]
+                )
+                == 1
+            )
+
+            db.session.delete(conversation)
+            db.session.commit()
+            assert (
+                ConversationService.search_conversations(self.user_id, "revolutions")[
+                    "results"
+                ]
+                == []
+            )
+
+    def test_query_syntax_is_not_interpreted(self, app):
+        with app.app_context():
+            data = ConversationService.search_conversations(
+                self.user_id, 'photosynthesis OR "calculus'
+            )
+
+        assert data["results"] == []
+
+    def test_empty_query_is_rejected(self, app):
+        with app.app_context(), pytest.raises(ValueError):
+            ConversationService.search_conversations(self.user_id, "?!")
+
+    def test_equal_scores_page_without_gaps(self, app):
+        with app.app_context():
+            db.session.add_all(
+                AIConversation(
+                    user_query="Flashcard tips",
+                    ai_response="Keep them short",
+                    user_id=self.user_id,
+                )
+                for _ in range(7)
+            )
+            db.session.commit()
+            ids = []
+            for offset in range(0, 7, 3):
+                ids += [
+                    row["id"]
+                    for row in ConversationService.search_conversations(
+                        self.user_id, "flashcard", limit=3, offset=offset
+                    )["results"]
+                ]
+
+        assert ids == sorted(set(ids)) and len(ids) == 7
+
+
+class TestConversationSearchRoute:
+
+    def test_search_route(self, app, client, fake_redis, auth_headers):
+        with app.app_context():
+            user = User.query.filter_by(username="testuser").first()
+            db.session.add(
+                AIConversation(
+                    user_query="Explain mitochondria",
+                    ai_response="They produce energy",
+                    user_id=user.id,
+                )
+            )
+            db.session.commit()
+
+        response = client.get(
+            "/ai/conversations/search?q=mitochondria", headers=auth_headers
+        )
+        missing = client.get("/ai/conversations/search", headers=auth_headers)
+
+        assert response.status_code == 200
+        assert len(response.get_json()["data"]["results"]) == 1
+        assert missing.status_code == 400
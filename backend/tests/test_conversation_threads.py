@@ -0,0 +1,174 @@
+import pytest
+from sqlalchemy import create_engine
+from services.ai_service import AIService
+from services.token_service import get_token_counter
+from models import AIConversation, ConversationThread, db
+from models.ai import add_conversation_threads
+
+
+class TestThreadHistory:
+
+    @pytest.fixture(autouse=True)
+    def setup_user(self, app, monkeypatch, make_user):
+        with app.app_context():
+            self.user_id = make_user("testuser")
+            self.other_id = make_user("otheruser")
+
+        self.prompts = []
+
+        def generate(service, prompt):
+            self.prompts.append(prompt)
+            if "running summary" in prompt:
+                return "The student is revising cell biology."
+            return "Keep reviewing the enzyme cards. " * 10
+
+        monkeypatch.setattr(AIService, "_generate_content", generate)
+        monkeypatch.setattr(
+            AIService, "get_context_by_query_type", staticmethod(lambda *args: {})
+        )
+
+    def chat(self, query, thread_id=None):
+        return AIService().ai_chat_with_budget(
+            query, self.user_id, thread_id=thread_id
+        )["data"]
+
+    def test_first_chat_starts_a_thread(self, app):
+        with app.app_context():
+            data = self.chat("How do enzymes work?")
+            thread = db.session.get(ConversationThread, data["thread_id"])
+
+            assert thread.title == "How do enzymes work?"
+            assert thread.user_id == self.user_id
+            assert [c.id for c in thread.conversations] == [data["conversation_id"]]
+
+    def test_recent_turns_are_quoted(self, app):
+        with app.app_context():
+            thread_id = self.chat("How do enzymes work?")["thread_id"]
+            self.chat("And what about ribosomes?", thread_id)
+
+        assert "User: How do enzymes work?" in self.prompts[-1]
+        assert not any("running summary" in prompt for prompt in self.prompts)
+
+    def test_old_turns_are_folded_into_the_summary(self, app):
+        with app.app_context():
+            thread_id = self.chat("Question 0 about cells")["thread_id"]
+            for number in range(1, 20):
+                data = self.chat(f"Question {number} about cells", thread_id)
+            thread = db.session.get(ConversationThread, thread_id)
+
+            assert thread.summary == "The student is revising cell biology."
+            assert thread.summarized_through_id > 0
+            assert data["usage"]["summary_tokens"] > 0
+
+        chat_prompt = self.prompts[-1]
+        assert "Conversation so far: The student is revising" in chat_prompt
+        assert "Question 0 about cells" not in chat_prompt
+        assert "Question 18 about cells" in chat_prompt
+
+    def test_prompt_size_stays_bounded(self, app):
+        with app.app_context():
+            counter = get_token_counter()
+            thread_id = self.chat("Question 0 about cells")["thread_id"]
+            sizes = []
+            for number in range(1, 40):
+                data = self.chat(f"Question {number} about cells", thread_id)
+                sizes.append(data["usage"]["prompt_tokens"])
+
+        assert max(sizes[10:]) <= max(sizes[:10]) + 10
+        assert max(sizes) < 2000 - 800
+        summary_prompts = [p for p in self.prompts if "running summary" in p]
+        assert all(
+            counter.count(p) <= AIService.SUMMARY_INPUT_TOKENS for p in summary_prompts
+        )
+
+    def test_failed_summary_keeps_the_thread_usable(self, app, monkeypatch):
+        def summarize(*args):
+            raise RuntimeError("upstream down")
+
+        monkeypatch.setattr(AIService, "summarize_turns", summarize)
+        with app.app_context():
+            thread_id = self.chat("Question 0 about cells")["thread_id"]
+            for number in range(1, 10):
+                data = self.chat(f"Question {number} about cells", thread_id)
+
+            thread = db.session.get(ConversationThread, thread_id)
+            assert data["response"]
+            assert thread.summarized_through_id == 0
+
+    def test_thread_of_another_user_is_rejected(self, app):
+        with app.app_context():
+            thread = ConversationThread(title="Private", user_id=self.other_id)
+            db.session.add(thread)
+            db.session.commit()
+
+            with pytest.raises(ValueError, match="Thread not found"):
+                self.chat("Hello", thread.id)
+            assert AIConversation.query.count() == 0
+
+
+class TestThreadRoutes:
+
+    def test_chat_continues_a_thread(
+        self, app, client, fake_redis, auth_headers, fake_gemini
+    ):
+        first = client.post(
+            "/ai/chat", json={"query": "How do enzymes work?"}, headers=auth_headers
+        )
+        thread_id = first.get_json()["data"]["thread_id"]
+        second = client.post(
+            "/ai/chat",
+            json={"query": "And ribosomes?", "thread_id": thread_id},
+            headers=auth_headers,
+        )
+
+        assert second.status_code == 200
+        assert second.get_json()["data"]["thread_id"] == thread_id
+
+        threads = client.get("/ai/threads", headers=auth_headers).get_json()["data"]
+        assert [t["id"] for t in threads["threads"]] == [thread_id]
+
+        detail = client.get(f"/ai/threads/{thread_id}", headers=auth_headers)
+        turns = detail.get_json()["data"]["turns"]
+        assert [t["user_query"] for t in turns] == [
+            "How do enzymes work?",
+            "And ribosomes?",
+        ]
+
+    def test_invalid_thread_ids(self, app, client, fake_redis, auth_headers):
+        bad = client.post(
+            "/ai/chat",
+            json={"query": "Hello", "thread_id": "abc"},
+            headers=auth_headers,
+        )
+        missing = client.get("/ai/threads/999", headers=auth_headers)
+
+        assert missing.status_code == 404
+        assert bad.status_code in (400, 503)
+
+
+class TestThreadUpgrade:
+
+    def test_add_threads_to_an_older_database(self):
+        engine = create_engine("sqlite://")
+        with engine.begin() as connection:
+            for statement in (
+                'CREATE TABLE "user" (id VARCHAR(36) PRIMARY KEY)',
+                "CREATE TABLE aiconversation (id INTEGER PRIMARY KEY,"
+                " user_query TEXT, ai_response TEXT, user_id VARCHAR(36))",
+                "INSERT INTO aiconversation VALUES (1, 'Hi', 'Hello', 'u1')",
+            ):
+                connection.exec_driver_sql(statement)
+
+            added = add_conversation_threads(connection)
+            again = add_conversation_threads(connection)
+            turns = connection.exec_driver_sql(
+                "SELECT id, thread_id FROM aiconversation"
+            ).all()
+            indexes = connection.exec_driver_sql(
+                "PRAGMA index_list(aiconversation)"
+            ).all()
+
+        assert added == ["conversationthread", "aiconversation.thread_id"]
+        assert again == []
+        assert turns == [(1, None)]
+        assert "ix_aiconversation_thread_id_id" in [index[1] for index in indexes]
@@ -0,0 +1,171 @@
+import io
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, event, update
+from services.counter_service import CounterService
+from services.crud_service import CRUDService
+from services.import_service import ImportService
+from services.review_service import ReviewService
+from models import Folder, Deck, Card, db
+from models.deck import add_counter_columns
+from run import repair_counters
+
+
+def _counters(model, id):
+    row = db.session.get(model, id)
+    db.session.refresh(row)
+    names = ("card_count", "due_count", "mastered_count")
+    if model is Folder:
+        names = ("deck_count",) + names
+    return tuple(getattr(row, name) for name in names)
+
+
+class TestCounterService:
+
+    @pytest.fixture(autouse=True)
+    def setup_folder(self, app, fixed_similarity, make_user, make_folder, make_deck):
+        with app.app_context():
+            self.user_id = make_user("counteruser")
+            self.folder_id = make_folder(self.user_id)
+            self.deck_id = make_deck(self.folder_id, self.user_id)
+
+    def test_write_paths_keep_counters(self, app, card_data):
+        with app.app_context():
+            card_id = CRUDService.add_new_card(
+                card_data("What is ATP?"), self.deck_id, self.user_id
+            )["data"]["id"]
+            CRUDService.add_cards_bulk(
+                [card_data("Q1"), card_data("Q2")], self.deck_id, self.user_id
+            )
+            ImportService.import_cards(
+                io.BytesIO(b"Q3,A3\nQ4,A4\n"), self.deck_id, self.user_id, "csv"
+            )
+            assert _counters(Deck, self.deck_id) == (5, 0, 0)
+            assert _counters(Folder, self.folder_id) == (1, 5, 0, 0)
+
+            for _ in range(ReviewService.REQUIRED_REVIEWS):
+                ReviewService.submit_review(card_id, self.user_id, {"answer": "A"})
+            assert _counters(Deck, self.deck_id) == (5, 0, 1)
+
+            CRUDService.delete_one_card(card_id, self.user_id)
+            assert _counters(Folder, self.folder_id) == (1, 4, 0, 0)
+
+            CRUDService.add_new_deck({"name": "Plants"}, self.folder_id, self.user_id)
+            CRUDService.delete_one_deck(self.deck_id, self.user_id)
+            assert _counters(Folder, self.folder_id) == (1, 0, 0, 0)
+
+    def test_due_counts_are_refreshed_once_stale(self, app, card_data):
+        with app.app_context():
+            CRUDService.add_cards_bulk(
+                [card_data("Q1"), card_data("Q2")], self.deck_id, self.user_id
+            )
+            # Two days pass: the cards that were due tomorrow were due yesterday
+            yesterday = datetime.utcnow() - timedelta(days=1)
+            db.session.execute(update(Card).values(next_review_at=yesterday))
+            db.session.execute(update(Deck).values(next_due_at=yesterday))
+            db.session.execute(update(Folder).values(next_due_at=yesterday))
+            db.session.execute(
+                update(Card)
+                .where(Card.question == "Q2")
+                .values(next_review_at=datetime.utcnow() + timedelta(days=3))
+            )
+            db.session.commit()
+
+            folders = CRUDService.get_all_folders(self.user_id)["data"]
+            deck = db.session.get(Deck, self.deck_id)
+
+        assert folders[0]["cardCount"] == 2
+        assert folders[0]["dueCount"] == 1
+        assert deck.due_count == 1
+        assert deck.next_due_at > datetime.utcnow() + timedelta(days=2)
+
+    def test_listing_is_one_query(self, app, card_data):
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        with app.app_context():
+            CRUDService.add_cards_bulk(
+                [card_data(f"Q{number}") for number in range(20)],
+                self.deck_id,
+                self.user_id,
+            )
+            event.listen(db.engine, "before_cursor_execute", listener)
+            try:
+                folders = CRUDService.get_all_folders(self.user_id)["data"]
+            finally:
+                event.remove(db.engine, "before_cursor_execute", listener)
+
+        assert folders[0]["deckCount"] == 1
+        assert folders[0]["cardCount"] == 20
+        assert len(statements) == 1
+
+    def test_repair(self, app):
+        with app.app_context():
+            # Cards added behind the services' back leave the counters wrong
+            db.session.add_all(
+                [
+                    Card(
+                        question=f"Q{number}",
+                        answer="A",
+                        difficulty_level="easy",
+                        deck_id=self.deck_id,
+                        next_review_at=(
+                            None
+                            if number == 0
+                            else datetime.utcnow() - timedelta(days=number)
+                        ),
+                        is_fully_reviewed=number == 0,
+                    )
+                    for number in range(3)
+                ]
+            )
+            db.session.commit()
+
+            assert CounterService.repair(self.user_id) == {"decks": 1, "folders": 1}
+            assert CounterService.repair() == {"decks": 0, "folders": 0}
+            assert _counters(Deck, self.deck_id) == (3, 2, 1)
+            assert _counters(Folder, self.folder_id) == (1, 3, 2, 1)
+
+    def test_repair_command(self, app):
+        with app.app_context():
+            db.session.execute(update(Folder).values(deck_count=7))
+            db.session.commit()
+
+        result = app.test_cli_runner().invoke(repair_counters)
+
+        assert "Fixed 0 decks and 1 folders" in result.output
+
+    def test_add_counters_to_an_older_database(self):
+        engine = create_engine("sqlite://")
+        with engine.begin() as connection:
+            for statement in (
+                "CREATE TABLE folder (id INTEGER PRIMARY KEY, user_id VARCHAR(36))",
+                "CREATE TABLE deck (id INTEGER PRIMARY KEY, folder_id INTEGER)",
+                "INSERT INTO folder VALUES (1, 'u1')",
+                "INSERT INTO deck VALUES (1, 1)",
+            ):
+                connection.exec_driver_sql(statement)
+
+            added = add_counter_columns(connection)
+            again = add_counter_columns(connection)
+            folder = connection.exec_driver_sql(
+                "SELECT deck_count, card_count, due_count, mastered_count, next_due_at"
+                " FROM folder"
+            ).one()
+            deck = connection.exec_driver_sql(
+                "SELECT card_count, due_count, mastered_count, next_due_at FROM deck"
+            ).one()
+
+        assert added == [
+            "folder.deck_count",
+            "folder.card_count",
+            "folder.due_count",
+            "folder.mastered_count",
+            "folder.next_due_at",
+            "deck.card_count",
+            "deck.due_count",
+            "deck.mastered_count",
+            "deck.next_due_at",
+        ]
+        assert again == []
+        assert tuple(folder) == (0, 0, 0, 0, None)
+        assert tuple(deck) == (0, 0, 0, None)
@@ -1,6 +1,10 @@
 import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, event
+from services.counter_service import CounterService, _counted_decks
 from services.crud_service import CRUDService
-from models import User, Folder, db
+from models import User, Folder, Deck, Card, Review, db
+from models.card import backfill_owners
 
 
 class TestCRUDService:
@@ -64,3 +68,864 @@ class TestCRUDService:
             folder_names = [f["name"] for f in result["data"]]
             assert "Math" in folder_names
             assert "Science" in folder_names
+
+    def add_decks(self, num_decks, cards_per_deck):
+        """Add a folder of decks whose cards are due, mastered or neither."""
+        folder = Folder(name="Biology", user_id=self.user_id)
+        db.session.add(folder)
+        db.session.flush()
+        yesterday = datetime.utcnow() - timedelta(days=1)
+        tomorrow = datetime.utcnow() + timedelta(days=1)
+        for deck_number in range(num_decks):
+            deck = Deck(name=f"Deck {deck_number}", folder_id=folder.id)
+            db.session.add(deck)
+            db.session.flush()
+            for number in range(cards_per_deck):
+                db.session.add(
+                    Card(
+                        question=f"Q{number}",
+                        answer="A",
+                        difficulty_level="easy",
+                        deck_id=deck.id,
+                        next_review_at=(
+                            None
+                            if number % 3 == 2
+                            else (yesterday if number % 3 == 0 else tomorrow)
+                        ),
+                        is_fully_reviewed=number % 3 == 2,
+                    )
+                )
+        db.session.commit()
+        return folder.id
+
+    def test_get_one_folder_counts(self, app):
+        """Test the card, due and mastered counts of each deck."""
+        with app.app_context():
+            folder_id = self.add_decks(2, 7)
+            db.session.add(Deck(name="Empty", folder_id=folder_id))
+            db.session.commit()
+
+            result = CRUDService.get_one_folder(folder_id, self.user_id)
+
+            decks = result["data"]["decks"]
+            assert [deck["name"] for deck in decks] == ["Deck 0", "Deck 1", "Empty"]
+            assert decks[0]["card_count"] == 7
+            assert decks[0]["due_count"] == 3
+            assert decks[0]["mastered_count"] == 2
+            assert decks[2]["card_count"] == decks[2]["due_count"] == 0
+
+    @pytest.mark.parametrize("num_decks,cards_per_deck", [(1, 1), (8, 25)])
+    def test_get_one_folder_query_count(self, app, num_decks, cards_per_deck):
+        """Test the folder view runs the same queries however large it is."""
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        with app.app_context():
+            folder_id = self.add_decks(num_decks, cards_per_deck)
+            db.session.expire_all()
+            event.listen(db.engine, "before_cursor_execute", listener)
+            try:
+                result = CRUDService.get_one_folder(folder_id, self.user_id)
+            finally:
+                event.remove(db.engine, "before_cursor_execute", listener)
+
+        assert len(result["data"]["decks"]) == num_decks
+        # The folder, then its decks with their counts
+        assert len(statements) == 2
+
+
+class TestBulkCards:
+
+    @pytest.fixture(autouse=True)
+    def setup_deck(self, app, card_data, make_user, make_folder, make_deck):
+        with app.app_context():
+            self.user_id = make_user("bulkuser")
+            self.deck_id = make_deck(
+                make_folder(self.user_id),
+                self.user_id,
+                cards=[card_data("What is ATP?", "Energy")],
+            )
+        self.card_data = card_data
+
+    def test_saves_valid_cards_and_reports_failures(self, app):
+        cards = [
+            self.card_data("What is a cell?"),
+            self.card_data("What is ATP?"),
+            {"question": "No answer", "difficulty_level": "easy"},
+            self.card_data("What is a cell?"),
+            self.card_data("What is DNA?"),
+        ]
+        with app.app_context():
+            result = CRUDService.add_cards_bulk(cards, self.deck_id, self.user_id)
+
+            saved = result["data"]["saved"]
+            failed = result["data"]["failed"]
+            assert [card["index"] for card in saved] == [1, 5]
+            assert [card["index"] for card in failed] == [2, 3, 4]
+            assert "already exists" in failed[0]["error"]
+            assert "answer is required" in failed[1]["error"]
+            assert "repeated" in failed[2]["error"]
+            assert Card.query.filter_by(deck_id=self.deck_id).count() == 3
+            assert db.session.get(Card, saved[1]["card_id"]).question == "What is DNA?"
+
+    def test_uses_a_fixed_number_of_statements(self, app, monkeypatch):
+        monkeypatch.setattr(CRUDService, "BULK_LOOKUP_SIZE", 100)
+        cards = [self.card_data(f"Question {number}") for number in range(250)]
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        with app.app_context():
+            event.listen(db.engine, "before_cursor_execute", listener)
+            try:
+                result = CRUDService.add_cards_bulk(cards, self.deck_id, self.user_id)
+            finally:
+                event.remove(db.engine, "before_cursor_execute", listener)
+
+        assert len(result["data"]["saved"]) == 250
+        selects = [s for s in statements if s.startswith("SELECT")]
+        inserts = [s for s in statements if s.startswith("INSERT")]
+        # Ownership check plus one duplicate lookup per 100 questions
+        assert len(selects) == 1 + 3
+        # One executemany, split into batches by the driver at most
+        assert 1 <= len(inserts) <= 3
+
+    def test_rejected_cards_are_not_saved(self, app):
+        cards = [
+            self.card_data("What is a cell?"),
+            self.card_data("What is a membrane?"),
+        ]
+        with app.app_context():
+            result = CRUDService.add_cards_bulk(
+                cards, self.deck_id, self.user_id, rejected={0: "near-duplicate"}
+            )
+
+        assert result["data"]["failed"][0]["error"] == "near-duplicate"
+        assert [card["index"] for card in result["data"]["saved"]] == [2]
+
+    def test_reports_cards_of_the_wrong_type(self, app):
+        cards = [
+            self.card_data(["What", "is", "a", "cell?"]),
+            self.card_data(5),
+            self.card_data("What is a ribosome?", {"text": "Protein factory"}),
+            self.card_data("What is a membrane?", difficulty_level="bogus"),
+            self.card_data("What is DNA?"),
+        ]
+        with app.app_context():
+            result = CRUDService.add_cards_bulk(cards, self.deck_id, self.user_id)
+
+            saved = result["data"]["saved"]
+            failed = result["data"]["failed"]
+            assert [card["index"] for card in saved] == [5]
+            assert [card["index"] for card in failed] == [1, 2, 3, 4]
+            assert "question must be a string" in failed[0]["error"]
+            assert failed[0]["question"] == "Unknown"
+            assert "question must be a string" in failed[1]["error"]
+            assert "answer must be a string" in failed[2]["error"]
+            assert "difficulty_level must be one of" in failed[3]["error"]
+            assert Card.query.filter_by(deck_id=self.deck_id).count() == 2
+
+    def test_saved_ids_match_their_cards(self, app):
+        cards = [self.card_data(f"Question {number}") for number in range(20)]
+        with app.app_context():
+            result = CRUDService.add_cards_bulk(cards, self.deck_id, self.user_id)
+
+            for card in result["data"]["saved"]:
+                assert (
+                    db.session.get(Card, card["card_id"]).question == card["question"]
+                )
+
+    def test_deck_of_another_user(self, app):
+        with app.app_context():
+            with pytest.raises(ValueError, match="Deck is not found"):
+                CRUDService.add_cards_bulk(
+                    [self.card_data("Hi")], self.deck_id, "other"
+                )
+
+
+class TestBulkCardRoute:
+
+    def test_bulk_create(
+        self, app, client, fake_redis, auth_headers, card_data, make_folder, make_deck
+    ):
+        with app.app_context():
+            user = User.query.filter_by(username="testuser").first()
+            deck_id = make_deck(make_folder(user.id), user.id)
+
+        cards = [card_data(f"Q{n}", "A") for n in range(30)]
+        response = client.post(
+            f"/card/{deck_id}/bulk", json={"cards": cards}, headers=auth_headers
+        )
+        missing = client.post(
+            "/card/999/bulk", json={"cards": cards}, headers=auth_headers
+        )
+        empty = client.post(
+            f"/card/{deck_id}/bulk", json={"cards": []}, headers=auth_headers
+        )
+
+        assert response.status_code == 201
+        assert response.get_json()["data"]["saved_count"] == 30
+        assert missing.status_code == 404
+        assert empty.status_code == 400
+
+
+class TestDeckCards:
+
+    @pytest.fixture(autouse=True)
+    def setup_deck(self, app, make_user, make_folder, make_deck):
+        with app.app_context():
+            self.user_id = make_user("pageuser")
+            self.deck_id = make_deck(make_folder(self.user_id), self.user_id)
+            now = datetime.utcnow()
+            for number in range(12):
+                mastered = number % 4 == 3
+                db.session.add(
+                    Card(
+                        question=f"Question {number:02d} " + "x" * 200,
+                        answer="A",
+                        difficulty_level=("easy", "medium", "hard")[number % 3],
+                        deck_id=self.deck_id,
+                        # Pairs of cards share a review time
+                        next_review_at=(
+                            None if mastered else now + timedelta(days=number // 2 - 2)
+                        ),
+                        is_fully_reviewed=mastered,
+                    )
+                )
+            db.session.commit()
+
+    def pages(self, **options):
+        """Follow the cursors through every page; return the card ids."""
+        ids, cursor = [], None
+        while True:
+            data = CRUDService.get_one_deck(
+                self.deck_id, self.user_id, limit=5, cursor=cursor, **options
+            )["data"]
+            ids += [card["id"] for card in data["cards"]]
+            cursor = data["pagination"]["next_cursor"]
+            if cursor is None:
+                return ids
+
+    @pytest.mark.parametrize(
+        "sort",
+        ["id", "-id", "question", "-question", "next_review_at", "-next_review_at"],
+    )
+    def test_pages_match_the_full_listing(self, app, sort):
+        with app.app_context():
+            everything = CRUDService.get_one_deck(self.deck_id, self.user_id, sort=sort)
+            paged = self.pages(sort=sort)
+
+        cards = everything["data"]["cards"]
+        assert paged == [card["id"] for card in cards]
+        assert len(set(paged)) == 12
+        assert everything["data"]["pagination"]["has_more"] is False
+
+    def test_review_order(self, app):
+        with app.app_context():
+            cards = CRUDService.get_one_deck(
+                self.deck_id, self.user_id, sort="next_review_at"
+            )["data"]["cards"]
+
+        # Mastered cards have no next review and come first
+        assert [card["is_fully_reviewed"] for card in cards[:3]] == [True] * 3
+        times = [card["next_review_at"] for card in cards[3:]]
+        assert times == sorted(times)
+
+    def test_filters(self, app):
+        with app.app_context():
+            due = self.pages(due=True)
+            not_due = self.pages(due=False, mastered=False)
+            hard = CRUDService.get_one_deck(
+                self.deck_id, self.user_id, difficulty=["hard"], mastered=True
+            )["data"]["cards"]
+
+        # Cards 0 to 5 are due, except card 3 which is mastered
+        assert len(due) == 5
+        assert len(not_due) == 4
+        assert [card["question"][:11] for card in hard] == ["Question 11"]
+
+    def test_summary_view(self, app):
+        with app.app_context():
+            cards = CRUDService.get_one_deck(
+                self.deck_id, self.user_id, limit=2, view="summary"
+            )["data"]["cards"]
+
+        assert set(cards[0]) == {"id", "question"}
+        assert len(cards[0]["question"]) == CRUDService.QUESTION_PREVIEW_LENGTH
+
+    def test_invalid_options(self, app):
+        with app.app_context():
+            for options, message in (
+                ({"sort": "answer"}, "sort must be one of"),
+                ({"view": "tiny"}, "view must be one of"),
+                ({"difficulty": ["extreme"]}, "difficulty must be in"),
+                ({"cursor": "not-a-cursor"}, "cursor is not valid"),
+            ):
+                with pytest.raises(ValueError, match=message):
+                    CRUDService.get_one_deck(self.deck_id, self.user_id, **options)
+
+    def test_route(self, app, client, fake_redis, auth_headers):
+        with app.app_context():
+            user = User.query.filter_by(username="testuser").first()
+            for model in (Folder, Deck, Card):
+                db.session.execute(db.update(model).values(user_id=user.id))
+            db.session.commit()
+
+        first = client.get(
+            f"/deck/{self.deck_id}?limit=4&sort=-question&view=summary",
+            headers=auth_headers,
+        ).get_json()["data"]
+        second = client.get(
+            f"/deck/{self.deck_id}?limit=4&sort=-question&view=summary"
+            f"&cursor={first['pagination']['next_cursor']}",
+            headers=auth_headers,
+        ).get_json()["data"]
+        filtered = client.get(
+            f"/deck/{self.deck_id}?difficulty=easy,hard&mastered=false",
+            headers=auth_headers,
+        ).get_json()["data"]
+        invalid = client.get(f"/deck/{self.deck_id}?due=maybe", headers=auth_headers)
+        missing = client.get("/deck/999", headers=auth_headers)
+
+        assert first["cards"][0]["question"].startswith("Question 11")
+        assert second["cards"][0]["question"].startswith("Question 07")
+        assert len(filtered["cards"]) == 6
+        assert invalid.status_code == 400
+        assert missing.status_code == 404
+
+
+class TestSparseFields:
+
+    @pytest.fixture(autouse=True)
+    def setup_deck(self, app, make_user, make_folder, make_deck):
+        with app.app_context():
+            self.user_id = make_user("fieldsuser")
+            self.folder_id = make_folder(self.user_id, description="Long text")
+            self.deck_id = make_deck(
+                self.folder_id, self.user_id, description="Long text"
+            )
+            card = Card(
+                question="What is ATP?",
+                answer="A long answer",
+                difficulty_level="easy",
+                deck_id=self.deck_id,
+            )
+            db.session.add(card)
+            db.session.commit()
+            self.card_id = card.id
+
+    @staticmethod
+    def statements(app, read):
+        """Run a read and return its result and the SQL it executed."""
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        with app.app_context():
+            db.session.expire_all()
+            event.listen(db.engine, "before_cursor_execute", listener)
+            try:
+                result = read()
+            finally:
+                event.remove(db.engine, "before_cursor_execute", listener)
+        return result["data"], " ".join(statements)
+
+    def test_folder_listing(self, app):
+        folders, sql = self.statements(
+            app, lambda: CRUDService.get_all_folders(self.user_id, ["name"])
+        )
+
+        assert folders == [{"id": self.folder_id, "name": "Biology"}]
+        assert "folder.description" not in sql
+
+    def test_folder_detail_skips_the_cards(self, app):
+        folder, sql = self.statements(
+            app,
+            lambda: CRUDService.get_one_folder(self.folder_id, self.user_id, ["name"]),
+        )
+        counted, _ = self.statements(
+            app,
+            lambda: CRUDService.get_one_folder(
+                self.folder_id, self.user_id, ["card_count"]
+            ),
+        )
+
+        assert folder["decks"] == [{"id": self.deck_id, "name": "Cells"}]
+        assert "JOIN card" not in sql
+        assert counted["decks"] == [{"id": self.deck_id, "card_count": 1}]
+
+    def test_deck_and_card(self, app):
+        deck, deck_sql = self.statements(
+            app,
+            lambda: CRUDService.get_one_deck(
+                self.deck_id, self.user_id, fields=["question"]
+            ),
+        )
+        card, card_sql = self.statements(
+            app,
+            lambda: CRUDService.get_one_card(
+                self.card_id, self.user_id, ["question", "review_count"]
+            ),
+        )
+
+        assert deck["cards"] == [{"id": self.card_id, "question": "What is ATP?"}]
+        assert card == {
+            "id": self.card_id,
+            "question": "What is ATP?",
+            "review_count": 0,
+        }
+        assert "card.answer" not in deck_sql + card_sql
+
+    def test_unknown_fields(self, app):
+        with app.app_context():
+            with pytest.raises(ValueError, match="Unknown fields: secret"):
+                CRUDService.get_one_card(self.card_id, self.user_id, ["secret"])
+            with pytest.raises(ValueError, match="summary view"):
+                CRUDService.get_one_deck(
+                    self.deck_id, self.user_id, view="summary", fields=["answer"]
+                )
+
+    def test_routes(self, app, client, fake_redis, auth_headers):
+        with app.app_context():
+            user = User.query.filter_by(username="testuser").first()
+            for model in (Folder, Deck, Card):
+                db.session.execute(db.update(model).values(user_id=user.id))
+            db.session.commit()
+
+        folders = client.get("/folder/?fields=name,cardCount", headers=auth_headers)
+        folder = client.get(
+            f"/folder/{self.folder_id}?fields=name", headers=auth_headers
+        )
+        card = client.get(f"/card/{self.card_id}?fields=answer", headers=auth_headers)
+        invalid = client.get("/folder/?fields=secret", headers=auth_headers)
+
+        assert folders.get_json()["data"] == [
+            {"id": self.folder_id, "name": "Biology", "cardCount": 0}
+        ]
+        assert folder.get_json()["data"]["decks"][0] == {
+            "id": self.deck_id,
+            "name": "Cells",
+        }
+        assert card.get_json()["data"] == {
+            "id": self.card_id,
+            "answer": "A long answer",
+        }
+        assert invalid.status_code == 400
+
+
+class TestBulkCardOperations:
+
+    @pytest.fixture(autouse=True)
+    def setup_decks(self, app, card_data, make_user, make_folder, make_deck):
+        with app.app_context():
+            self.user_id = make_user("bulkopsuser")
+            folder_id = make_folder(self.user_id)
+            self.deck_ids = [
+                make_deck(
+                    folder_id,
+                    self.user_id,
+                    name,
+                    [card_data(question, "A") for question in questions],
+                )
+                for name, questions in (
+                    ("Cells", ("Q1", "Q2", "Q3")),
+                    ("Plants", ("Q1",)),
+                )
+            ]
+            self.card_ids = (
+                db.session.execute(
+                    db.select(Card.id)
+                    .where(Card.deck_id == self.deck_ids[0])
+                    .order_by(Card.id)
+                )
+                .scalars()
+                .all()
+            )
+
+    def run(self, app, operation, card_ids=None, **options):
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        with app.app_context():
+            event.listen(db.engine, "before_cursor_execute", listener)
+            try:
+                result = CRUDService.bulk_update_cards(
+                    card_ids or self.card_ids, self.user_id, operation, options
+                )
+            finally:
+                event.remove(db.engine, "before_cursor_execute", listener)
+            # The stored counts still match the cards
+            counted = db.session.execute(_counted_decks(datetime.utcnow())).all()
+            stored = db.session.execute(
+                db.select(Deck.id, Deck.card_count, Deck.due_count, Deck.mastered_count)
+            ).all()
+            assert sorted(
+                (row.id, row.card_count, row.due_count, row.mastered_count)
+                for row in counted
+            ) == sorted(tuple(row) for row in stored)
+            folder = db.session.scalars(db.select(Folder)).one()
+            assert folder.card_count == sum(row.card_count for row in stored)
+            assert folder.mastered_count == sum(row.mastered_count for row in stored)
+        return result["data"], statements
+
+    def test_move_reports_question_conflicts(self, app):
+        data, statements = self.run(
+            app, "move", self.card_ids + [999], deck_id=self.deck_ids[1]
+        )
+
+        assert data["updated"] == self.card_ids[1:]
+        assert data["failed"] == [
+            {"card_id": 999, "error": "Card does not exist"},
+            {
+                "card_id": self.card_ids[0],
+                "error": "question already exists in the deck",
+            },
+        ]
+        # Target deck, cards with their owner and the questions already there
+        assert len([s for s in statements if s.startswith("SELECT")]) == 3
+        assert len([s for s in statements if s.startswith("UPDATE card")]) == 1
+        with app.app_context():
+            moved = db.session.get(Card, self.card_ids[1])
+            assert moved.deck_id == self.deck_ids[1]
+
+    def test_delete(self, app):
+        with app.app_context():
+            db.session.add(
+                Review(
+                    user_answer="A",
+                    score=90,
+                    card_id=self.card_ids[0],
+                    user_id=self.user_id,
+                )
+            )
+            db.session.commit()
+
+        data, _ = self.run(app, "delete")
+
+        assert data["updated"] == self.card_ids
+        with app.app_context():
+            assert Card.query.filter_by(deck_id=self.deck_ids[0]).count() == 0
+            assert Review.query.count() == 0
+
+    def test_set_difficulty_and_reset(self, app):
+        with app.app_context():
+            db.session.execute(
+                db.update(Card)
+                .where(Card.id == self.card_ids[0])
+                .values(
+                    review_count=3,
+                    is_fully_reviewed=True,
+                    next_review_at=None,
+                    last_reviewed_at=datetime.utcnow(),
+                )
+            )
+            db.session.commit()
+            CounterService.repair(self.user_id)
+
+        self.run(app, "set_difficulty", difficulty_level="hard")
+        self.run(app, "reset")
+
+        with app.app_context():
+            card = db.session.get(Card, self.card_ids[0])
+            assert card.difficulty_level == "hard"
+            assert (card.review_count, card.is_fully_reviewed) == (0, False)
+            assert card.next_review_at > datetime.utcnow()
+            assert card.last_reviewed_at is None
+
+    def test_ids_are_sent_in_batches(self, app, monkeypatch):
+        monkeypatch.setattr(CRUDService, "BULK_LOOKUP_SIZE", 2)
+
+        data, statements = self.run(
+            app, "move", self.card_ids[1:] + [999], deck_id=self.deck_ids[1]
+        )
+        assert data["updated"] == self.card_ids[1:]
+        assert len([s for s in statements if s.startswith("UPDATE card")]) == 1
+
+        data, statements = self.run(app, "set_difficulty", difficulty_level="hard")
+        assert data["updated"] == self.card_ids
+        assert len([s for s in statements if s.startswith("UPDATE card")]) == 2
+        with app.app_context():
+            assert Card.query.filter_by(difficulty_level="hard").count() == 3
+
+    def test_invalid_requests(self, app):
+        with app.app_context():
+            for operation, options, error in (
+                ("rename", {}, "operation must be one of"),
+                ("set_difficulty", {"difficulty_level": "extreme"}, "difficulty_level"),
+                ("move", {"deck_id": 999}, "Deck does not exist"),
+            ):
+                with pytest.raises(ValueError, match=error):
+                    CRUDService.bulk_update_cards(
+                        self.card_ids, self.user_id, operation, options
+                    )
+            other = CRUDService.bulk_update_cards(self.card_ids, "other", "delete")[
+                "data"
+            ]
+
+        assert other["updated"] == []
+        assert len(other["failed"]) == 3
+
+    def test_route(self, app, client, fake_redis, auth_headers):
+        with app.app_context():
+            user = User.query.filter_by(username="testuser").first()
+            for model in (Folder, Deck, Card):
+                db.session.execute(db.update(model).values(user_id=user.id))
+            db.session.commit()
+
+        moved = client.post(
+            "/card/bulk",
+            json={
+                "operation": "move",
+                "card_ids": self.card_ids[1:],
+                "deck_id": self.deck_ids[1],
+            },
+            headers=auth_headers,
+        )
+        missing_deck = client.post(
+            "/card/bulk",
+            json={"operation": "move", "card_ids": self.card_ids, "deck_id": 999},
+            headers=auth_headers,
+        )
+        empty = client.post(
+            "/card/bulk",
+            json={"operation": "reset", "card_ids": []},
+            headers=auth_headers,
+        )
+        bad_difficulty = client.post(
+            "/card/bulk",
+            json={
+                "operation": "set_difficulty",
+                "card_ids": self.card_ids,
+                "difficulty_level": "extreme",
+            },
+            headers=auth_headers,
+        )
+
+        assert moved.status_code == 200
+        assert moved.get_json()["data"]["updated_count"] == 2
+        assert missing_deck.status_code == 404
+        assert empty.status_code == 400
+        assert bad_difficulty.status_code == 400
+
+
+class TestCloneDeck:
+
+    @pytest.fixture(autouse=True)
+    def setup_deck(self, app, card_data, make_user, make_folder, make_deck):
+        with app.app_context():
+            self.user_id = make_user("cloneuser")
+            self.folder_id = make_folder(self.user_id, "Templates")
+            self.target_id = make_folder(self.user_id, "Class 1")
+            self.deck_id = make_deck(
+                self.folder_id,
+                self.user_id,
+                cards=[card_data(f"Q{n}", "A") for n in range(4)],
+            )
+            card_ids = db.session.scalars(db.select(Card.id).order_by(Card.id)).all()
+            # One mastered card, changed after the others, and one deleted card
+            db.session.execute(
+                db.update(Card)
+                .where(Card.id == card_ids[0])
+                .values(
+                    review_count=3,
+                    is_fully_reviewed=True,
+                    next_review_at=None,
+                    updated_at=datetime.utcnow() + timedelta(seconds=5),
+                )
+            )
+            db.session.commit()
+            CRUDService.delete_one_card(card_ids[1], self.user_id)
+            CounterService.repair(self.user_id)
+
+    def clone(self, app, **options):
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        with app.app_context():
+            event.listen(db.engine, "before_cursor_execute", listener)
+            try:
+                copy = CRUDService.clone_deck(
+                    self.deck_id, self.target_id, self.user_id, **options
+                )["data"]
+            finally:
+                event.remove(db.engine, "before_cursor_execute", listener)
+            deck = db.session.get(Deck, copy["id"])
+            cards = db.session.scalars(
+                db.select(Card).where(Card.deck_id == copy["id"]).order_by(Card.id)
+            ).all()
+            folder = db.session.get(Folder, self.target_id)
+            return copy, deck, cards, folder, statements
+
+    def test_clone_keeps_review_state(self, app):
+        copy, deck, cards, folder, statements = self.clone(app)
+
+        assert copy["name"] == "Cells"
+        assert copy["card_count"] == 3
+        assert [card.question for card in cards] == ["Q0", "Q2", "Q3"]
+        assert cards[0].is_fully_reviewed and cards[0].review_count == 3
+        assert (deck.card_count, deck.mastered_count) == (3, 1)
+        assert (folder.deck_count, folder.card_count, folder.mastered_count) == (
+            1,
+            3,
+            1,
+        )
+        # The deck and its cards are inserted without loading the cards
+        inserts = [s for s in statements if s.startswith("INSERT")]
+        assert len(inserts) == 2
+        assert "INSERT INTO card" in inserts[1] and "SELECT" in inserts[1]
+        assert not any(s.startswith("SELECT") and "FROM card" in s for s in statements)
+
+    def test_clone_counts_the_copied_cards(self, app):
+        with app.app_context():
+            # Counters of the original that drifted from its cards
+            db.session.execute(
+                db.update(Deck)
+                .where(Deck.id == self.deck_id)
+                .values(card_count=9, due_count=9, mastered_count=0)
+            )
+            db.session.commit()
+
+        copy, deck, cards, folder, _ = self.clone(app)
+
+        due = sum(
+            card.next_review_at is not None and card.next_review_at <= datetime.utcnow()
+            for card in cards
+        )
+        assert copy["card_count"] == 3
+        assert (deck.card_count, deck.due_count, deck.mastered_count) == (3, due, 1)
+        assert (folder.card_count, folder.mastered_count) == (3, 1)
+
+    def test_clone_resetting_review_state(self, app):
+        copy, deck, cards, _, _ = self.clone(
+            app, name="Cells (class)", reset_review=True
+        )
+
+        assert copy["name"] == "Cells (class)"
+        assert {card.review_count for card in cards} == {0}
+        assert not any(card.is_fully_reviewed for card in cards)
+        assert all(card.next_review_at > datetime.utcnow() for card in cards)
+        assert (deck.card_count, deck.due_count, deck.mastered_count) == (3, 0, 0)
+
+    def test_clone_errors(self, app):
+        with app.app_context():
+            with pytest.raises(ValueError, match="Deck name already exists"):
+                CRUDService.clone_deck(self.deck_id, self.folder_id, self.user_id)
+            with pytest.raises(ValueError, match="Deck does not exist"):
+                CRUDService.clone_deck(self.deck_id, self.target_id, "other")
+            with pytest.raises(ValueError, match="Folder not found"):
+                CRUDService.clone_deck(self.deck_id, 999, self.user_id)
+
+    def test_route(self, app, client, fake_redis, auth_headers):
+        with app.app_context():
+            user = User.query.filter_by(username="testuser").first()
+            for model in (Folder, Deck, Card):
+                db.session.execute(db.update(model).values(user_id=user.id))
+            db.session.commit()
+
+        cloned = client.post(
+            f"/deck/{self.deck_id}/clone?folder_id={self.target_id}&reset=true",
+            headers=auth_headers,
+        )
+        no_folder = client.post(f"/deck/{self.deck_id}/clone", headers=auth_headers)
+        missing = client.post(
+            f"/deck/999/clone?folder_id={self.target_id}", headers=auth_headers
+        )
+
+        assert cloned.status_code == 201
+        assert cloned.get_json()["data"]["card_count"] == 3
+        assert no_folder.status_code == 400
+        assert missing.status_code == 404
+
+
+class TestCardOwner:
+
+    @pytest.fixture(autouse=True)
+    def setup_cards(self, app, card_data, make_user, make_folder, make_deck):
+        with app.app_context():
+            self.user_id = make_user("owner")
+            self.other_id = make_user("other")
+            self.folder_id = make_folder(self.user_id, "Bio")
+            self.deck_id = make_deck(self.folder_id, self.user_id)
+            self.card_id = CRUDService.add_new_card(
+                card_data("Q", "A"), self.deck_id, self.user_id
+            )["data"]["id"]
+
+    def test_owner_is_copied_from_the_parent(self, app):
+        with app.app_context():
+            deck = Deck(name="Direct", folder_id=self.folder_id)
+            db.session.add(deck)
+            db.session.flush()
+            db.session.execute(
+                db.insert(Card),
+                [
+                    {
+                        "question": f"Direct {n}",
+                        "answer": "A",
+                        "difficulty_level": "easy",
+                        "is_fully_reviewed": False,
+                        "deck_id": deck.id,
+                    }
+                    for n in range(2)
+                ],
+            )
+            copy_folder = CRUDService.add_new_folder({"name": "Copy"}, self.user_id)
+            CRUDService.clone_deck(
+                self.deck_id, copy_folder["data"]["id"], self.user_id
+            )
+
+            owners = {
+                *db.session.scalars(db.select(Deck.user_id)),
+                *db.session.scalars(db.select(Card.user_id)),
+            }
+        assert owners == {self.user_id}
+
+    def test_card_lookup_is_one_query_without_joins(self, app):
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        with app.app_context():
+            event.listen(db.engine, "before_cursor_execute", listener)
+            try:
+                card = CRUDService.get_one_card(self.card_id, self.user_id)["data"]
+                with pytest.raises(ValueError, match="Card does not exist"):
+                    CRUDService.get_one_card(self.card_id, self.other_id)
+            finally:
+                event.remove(db.engine, "before_cursor_execute", listener)
+
+        assert card["question"] == "Q"
+        assert len(statements) == 2
+        assert not any("JOIN" in statement for statement in statements)
+
+    def test_other_users_cannot_change_cards(self, app):
+        with app.app_context():
+            with pytest.raises(ValueError):
+                CRUDService.update_one_card(
+                    self.card_id, self.other_id, {"answer": "Changed"}
+                )
+            with pytest.raises(ValueError, match="Card does not exist"):
+                CRUDService.delete_one_card(self.card_id, self.other_id)
+            with pytest.raises(ValueError, match="Deck does not exist"):
+                CRUDService.bulk_update_cards(
+                    [self.card_id], self.other_id, "move", {"deck_id": self.deck_id}
+                )
+
+            assert db.session.get(Card, self.card_id).answer == "A"
+
+    def test_backfill_owners_of_an_older_database(self):
+        engine = create_engine("sqlite://")
+        with engine.begin() as connection:
+            for statement in (
+                'CREATE TABLE "user" (id VARCHAR(36) PRIMARY KEY)',
+                "CREATE TABLE folder (id INTEGER PRIMARY KEY, user_id VARCHAR(36))",
+                "CREATE TABLE deck (id INTEGER PRIMARY KEY, folder_id INTEGER)",
+                "CREATE TABLE card (id INTEGER PRIMARY KEY, deck_id INTEGER)",
+                "INSERT INTO \"user\" VALUES ('u1'), ('u2')",
+                "INSERT INTO folder VALUES (1, 'u1'), (2, 'u2')",
+                "INSERT INTO deck VALUES (1, 1), (2, 2)",
+                "INSERT INTO card VALUES (1, 1), (2, 2), (3, 2)",
+            ):
+                connection.exec_driver_sql(statement)
+
+            filled = backfill_owners(connection)
+            again = backfill_owners(connection)
+            owners = connection.exec_driver_sql(
+                "SELECT id, user_id FROM card ORDER BY id"
+            ).all()
+            indexes = connection.exec_driver_sql("PRAGMA index_list(card)").all()
+
+        assert filled == {"deck": 2, "card": 3}
+        assert again == {"deck": 0, "card": 0}
+        assert owners == [(1, "u1"), (2, "u2"), (3, "u2")]
+        assert "ix_card_user_id" in [index[1] for index in indexes]
@@ -0,0 +1,344 @@
+import pytest
+import re
+import numpy as np
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from services.ai_service import AIService
+from services.crud_service import CRUDService
+from services.embedding_service import (
+    NearDuplicateIndex,
+    deck_question_index,
+    embed,
+    set_embedder,
+    top_k,
+    user_card_index,
+)
+from models import User, Folder, Card, CardEmbedding, db
+
+STOPWORDS = {"what", "is", "the", "of", "a", "an", "does", "do", "s"}
+
+
+def bag_of_words_embedder(texts):
+    """Deterministic embedder: words hashed into a fixed-size count vector."""
+    vectors = np.zeros((len(texts), 256), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for word in re.findall(r"[a-z0-9]+", text.lower()):
+            if word not in STOPWORDS:
+                vectors[row, sum(map(ord, word)) % 256] += 1
+    return vectors
+
+
+@pytest.fixture(autouse=True)
+def fake_embedder():
+    set_embedder(bag_of_words_embedder)
+    yield
+    set_embedder(None)
+
+
+class TestEmbeddingIndex:
+
+    @pytest.fixture(autouse=True)
+    def setup_deck(self, app, card_data, make_user, make_folder, make_deck):
+        with app.app_context():
+            self.user_id = make_user("testuser")
+            self.deck_id = make_deck(make_folder(self.user_id), self.user_id)
+            self.card_id = CRUDService.add_new_card(
+                card_data("What is the powerhouse of the cell?", "The mitochondria"),
+                self.deck_id,
+                self.user_id,
+            )["data"]["id"]
+        self.card_data = card_data
+
+    def test_top_k_orders_by_similarity(self):
+        vectors = embed(["red apple", "green apple", "blue car"])
+        scores, indices = top_k(embed(["red apple"]), vectors, 2)
+
+        assert list(indices[0]) == [0, 1]
+        assert scores[0][0] == pytest.approx(1.0)
+
+    def test_finds_paraphrased_question(self, app):
+        with app.app_context():
+            index = NearDuplicateIndex()
+            matches = index.find_duplicates(
+                self.deck_id,
+                ["The cell's powerhouse is what?", "What is osmosis?"],
+                threshold=0.8,
+            )
+
+        assert matches[0]["existing"][0]["card_id"] == self.card_id
+        assert matches[1]["existing"] == []
+
+    def test_flags_duplicates_within_batch(self, app):
+        with app.app_context():
+            index = NearDuplicateIndex()
+            matches = index.find_duplicates(
+                self.deck_id,
+                ["What is osmosis?", "Osmosis is what?"],
+                threshold=0.8,
+            )
+
+        assert matches[0]["batch_duplicate_of"] is None
+        assert matches[1]["batch_duplicate_of"] == 0
+
+    def test_index_is_built_with_one_query(self, app):
+        from sqlalchemy import event
+
+        with app.app_context():
+            index = NearDuplicateIndex()
+            statements = []
+            listener = lambda *args: statements.append(args[2])
+            event.listen(db.engine, "before_cursor_execute", listener)
+            try:
+                index.find_duplicates(self.deck_id, ["q1", "q2", "q3"], 0.8)
+                index.find_duplicates(self.deck_id, ["q4"], 0.8)
+            finally:
+                event.remove(db.engine, "before_cursor_execute", listener)
+
+        assert len(statements) == 1
+
+    def test_crud_keeps_index_up_to_date(self, app):
+        with app.app_context():
+            deck_question_index.get(self.deck_id)
+
+            result = CRUDService.add_new_card(
+                self.card_data("What does osmosis move?", "Water"),
+                self.deck_id,
+                self.user_id,
+            )
+            new_id = result["data"]["id"]
+            matches = deck_question_index.find_duplicates(
+                self.deck_id, ["Osmosis does move what?"], 0.8
+            )
+            assert matches[0]["existing"][0]["card_id"] == new_id
+
+            CRUDService.delete_one_card(new_id, self.user_id)
+            matches = deck_question_index.find_duplicates(
+                self.deck_id, ["Osmosis does move what?"], 0.8
+            )
+            assert matches[0]["existing"] == []
+
+    def test_embedding_failure_does_not_fail_the_write(self, app):
+        def failing_embedder(texts):
+            raise RuntimeError("model unavailable")
+
+        with app.app_context():
+            deck_question_index.get(self.deck_id)
+            set_embedder(failing_embedder)
+
+            added = CRUDService.add_new_card(
+                self.card_data("What is osmosis?", "Water"), self.deck_id, self.user_id
+            )["data"]
+            assert deck_question_index._decks.get(self.deck_id) is None
+
+            set_embedder(bag_of_words_embedder)
+            deck_question_index.get(self.deck_id)
+            set_embedder(failing_embedder)
+            CRUDService.update_one_card(
+                added["id"], self.user_id, {"question": "What moves in osmosis?"}
+            )
+            assert deck_question_index._decks.get(self.deck_id) is None
+
+            set_embedder(bag_of_words_embedder)
+            matches = deck_question_index.find_duplicates(
+                self.deck_id, ["Osmosis moves what?"], 0.8
+            )
+            assert matches[0]["existing"][0]["card_id"] == added["id"]
+
+
+class TestAcceptCardsNearDuplicates:
+
+    @pytest.fixture(autouse=True)
+    def setup_deck(
+        self, app, fake_redis, auth_headers, card_data, make_folder, make_deck
+    ):
+        with app.app_context():
+            user = User.query.filter_by(username="testuser").first()
+            self.deck_id = make_deck(
+                make_folder(user.id),
+                user.id,
+                cards=[
+                    card_data("What is the powerhouse of the cell?", "The mitochondria")
+                ],
+            )
+        self.headers = auth_headers
+
+    def _accept(self, client, **extra):
+        return client.post(
+            "/ai/accept-cards",
+            json={
+                "deck_id": self.deck_id,
+                "cards": [
+                    {
+                        "question": "The cell's powerhouse is what?",
+                        "answer": "Mitochondria",
+                        "difficulty_level": "easy",
+                    },
+                    {
+                        "question": "What is osmosis?",
+                        "answer": "Diffusion of water",
+                        "difficulty_level": "easy",
+                    },
+                ],
+                **extra,
+            },
+            headers=self.headers,
+        )
+
+    def test_near_duplicates_are_rejected(self, client):
+        response = self._accept(client)
+
+        assert response.status_code == 201
+        data = response.get_json()["data"]
+        assert data["saved_count"] == 1
+        assert data["saved_cards"][0]["question"] == "What is osmosis?"
+        assert "near-duplicate" in data["failed_cards"][0]["error"]
+
+    def test_near_duplicates_can_be_allowed(self, client):
+        response = self._accept(client, allow_near_duplicates=True)
+
+        assert response.get_json()["data"]["saved_count"] == 2
+
+
+class TestCardVectorIndex:
+
+    @pytest.fixture(autouse=True)
+    def setup_cards(self, app, card_data, make_user, make_folder, make_deck):
+        with app.app_context():
+            self.user_id = make_user("testuser")
+            deck_id = make_deck(
+                make_folder(self.user_id),
+                self.user_id,
+                cards=[
+                    card_data(
+                        "What is the powerhouse of the cell?", "The mitochondria"
+                    ),
+                    card_data(
+                        "What is osmosis?", "Diffusion of water through a membrane"
+                    ),
+                    card_data("Who wrote Hamlet?", "Shakespeare"),
+                ],
+            )
+            self.card_ids = db.session.scalars(
+                db.select(Card.id).where(Card.deck_id == deck_id).order_by(Card.id)
+            ).all()
+        yield
+        user_card_index._users.clear()
+
+    @pytest.fixture
+    def embedded_texts(self):
+        texts = []
+
+        def counting_embedder(batch):
+            texts.extend(batch)
+            return bag_of_words_embedder(batch)
+
+        set_embedder(counting_embedder)
+        return texts
+
+    def test_returns_most_relevant_cards(self, app):
+        with app.app_context():
+            matches = user_card_index.search(
+                self.user_id, "The mitochondria of a cell", k=2, min_similarity=0.3
+            )
+
+        assert matches[0]["card_id"] == self.card_ids[0]
+        assert matches[0]["topic"] == "Cells"
+        assert self.card_ids[2] not in [match["card_id"] for match in matches]
+
+    def test_embeddings_are_persisted_and_reused(self, app, embedded_texts):
+        with app.app_context():
+            user_card_index.get(self.user_id)
+            assert CardEmbedding.query.count() == 3
+            assert len(embedded_texts) == 3
+
+            # A fresh process loads the stored vectors instead of re-embedding
+            user_card_index._users.clear()
+            user_card_index.get(self.user_id)
+
+        assert len(embedded_texts) == 3
+
+    def test_does_not_commit_the_callers_changes(self, app):
+        with app.app_context():
+            db.session.add(Folder(name="Unsaved", user_id=self.user_id))
+            user_card_index.get(self.user_id)
+            db.session.rollback()
+
+            assert Folder.query.filter_by(name="Unsaved").count() == 0
+            assert CardEmbedding.query.count() == 0
+
+    def test_only_edited_and_new_cards_are_embedded(self, app, embedded_texts):
+        with app.app_context():
+            user_card_index.get(self.user_id)
+            card = db.session.get(Card, self.card_ids[1])
+            card.answer = "Water moving across a membrane"
+            db.session.delete(db.session.get(Card, self.card_ids[2]))
+            db.session.commit()
+
+            index = user_card_index.get(self.user_id)
+
+            assert embedded_texts[3:] == [
+                "What is osmosis?\nWater moving across a membrane"
+            ]
+            assert [card["card_id"] for card in index.cards] == self.card_ids[:2]
+            assert CardEmbedding.query.count() == 2
+
+    def test_unchanged_cards_are_not_read_again(self, app, embedded_texts):
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        with app.app_context():
+            user_card_index.get(self.user_id)
+            # Cards written before their vectors were stored
+            earlier = datetime.utcnow() - timedelta(minutes=1)
+            db.session.execute(db.update(Card).values(updated_at=earlier))
+            db.session.commit()
+
+            event.listen(db.engine, "before_cursor_execute", listener)
+            try:
+                index = user_card_index.get(self.user_id)
+            finally:
+                event.remove(db.engine, "before_cursor_execute", listener)
+
+        assert len(statements) == 1
+        assert "question" not in statements[0]
+        assert index.cards[0]["question"] == "What is the powerhouse of the cell?"
+
+    def test_cards_changed_without_new_text_are_not_embedded(self, app, embedded_texts):
+        with app.app_context():
+            user_card_index.get(self.user_id)
+            card = db.session.get(Card, self.card_ids[0])
+            card.is_fully_reviewed = True
+            db.session.commit()
+            user_card_index._users.clear()
+
+            index = user_card_index.get(self.user_id)
+
+        assert len(embedded_texts) == 3
+        assert index.cards[0]["is_mastered"] is True
+
+    def test_deleted_cards_keep_their_vectors(self, app, embedded_texts):
+        with app.app_context():
+            user_card_index.get(self.user_id)
+            CRUDService.delete_one_card(self.card_ids[2], self.user_id)
+
+            index = user_card_index.get(self.user_id)
+
+            assert [card["card_id"] for card in index.cards] == self.card_ids[:2]
+            assert CardEmbedding.query.count() == 3
+
+    def test_chat_context_contains_relevant_cards(self, app):
+        with app.app_context():
+            context = AIService.get_context_by_query_type(
+                "Explain the mitochondria again", self.user_id, 500
+            )
+
+        assert list(context) == ["relevant_cards", "study_stats"]
+        assert context["relevant_cards"][0]["answer"] == "The mitochondria"
+
+    def test_unrelated_question_falls_back_to_overview(self, app):
+        with app.app_context():
+            context = AIService.get_context_by_query_type(
+                "How am I doing?", self.user_id, 500
+            )
+
+        assert "relevant_cards" not in context
+        assert "study_stats" in context
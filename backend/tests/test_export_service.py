@@ -0,0 +1,138 @@
+import csv
+import io
+import json
+import pytest
+from services.export_service import ExportService
+from services.import_service import ImportService
+from models import User, Card, db
+
+
+def _read(export):
+    return "".join(export["data"]["chunks"])
+
+
+class TestExportService:
+
+    @pytest.fixture(autouse=True)
+    def setup_folder(self, app, make_user, make_folder, make_deck):
+        with app.app_context():
+            self.user_id = make_user("exportuser")
+            self.folder_id = make_folder(self.user_id)
+            self.deck_id = make_deck(self.folder_id, self.user_id)
+            plants_id = make_deck(self.folder_id, self.user_id, "Plants")
+            for number in range(7):
+                db.session.add(
+                    Card(
+                        question=f"Q{number}, really?",
+                        answer=f"Line one\nline {number}",
+                        difficulty_level="hard",
+                        deck_id=self.deck_id,
+                    )
+                )
+            db.session.add(
+                Card(
+                    question="What is chlorophyll?",
+                    answer="A pigment",
+                    difficulty_level="easy",
+                    deck_id=plants_id,
+                )
+            )
+            db.session.commit()
+
+    def test_deck_jsonl_in_batches(self, app, monkeypatch):
+        monkeypatch.setattr(ExportService, "BATCH_SIZE", 3)
+
+        with app.app_context():
+            export = ExportService.export_deck(self.deck_id, self.user_id)["data"]
+            chunks = list(export["chunks"])
+
+        cards = [json.loads(line) for line in "".join(chunks).splitlines()]
+        # One chunk per batch of rows read from the cursor
+        assert [chunk.count("\n") for chunk in chunks] == [3, 3, 1]
+        assert export["filename"] == f"deck-{self.deck_id}.jsonl"
+        assert [card["question"] for card in cards] == [
+            f"Q{number}, really?" for number in range(7)
+        ]
+        assert cards[0]["answer"] == "Line one\nline 0"
+        assert cards[0]["review_count"] == 0
+        assert cards[0]["next_review_at"] is None
+
+    def test_folder_csv(self, app):
+        with app.app_context():
+            text = _read(
+                ExportService.export_folder(self.folder_id, self.user_id, "csv")
+            )
+
+        rows = list(csv.DictReader(io.StringIO(text)))
+        assert len(rows) == 8
+        assert rows[0]["deck"] == "Cells"
+        assert rows[0]["question"] == "Q0, really?"
+        assert rows[-1]["deck"] == "Plants"
+        assert rows[-1]["difficulty_level"] == "easy"
+
+    def test_csv_export_imports_back(self, app, make_deck):
+        with app.app_context():
+            text = _read(ExportService.export_deck(self.deck_id, self.user_id, "csv"))
+            copy_id = make_deck(self.folder_id, self.user_id, "Copy")
+
+            result = ImportService.import_cards(
+                io.BytesIO(text.encode()), copy_id, self.user_id, "csv"
+            )
+            copied = Card.query.filter_by(deck_id=copy_id).order_by(Card.id).all()
+
+        assert result["data"]["inserted"] == 7
+        assert copied[3].answer == "Line one\nline 3"
+        assert copied[3].difficulty_level == "hard"
+
+    def test_errors(self, app):
+        with app.app_context():
+            with pytest.raises(ValueError, match="Deck is not found"):
+                ExportService.export_deck(self.deck_id, "other")
+            with pytest.raises(ValueError, match="Folder is not found"):
+                ExportService.export_folder(self.folder_id, "other")
+            with pytest.raises(ValueError, match="format must be one of"):
+                ExportService.export_deck(self.deck_id, self.user_id, "xml")
+
+
+class TestExportRoutes:
+
+    def test_download(
+        self, app, client, fake_redis, auth_headers, make_folder, make_deck
+    ):
+        with app.app_context():
+            user = User.query.filter_by(username="testuser").first()
+            folder_id = make_folder(user.id)
+            deck_id = make_deck(folder_id, user.id)
+            db.session.add(
+                Card(
+                    question="What is ATP?",
+                    answer="Energy",
+                    difficulty_level="medium",
+                    deck_id=deck_id,
+                )
+            )
+            db.session.commit()
+
+        # A streamed response keeps its request context until it is read
+        deck_response = client.get(f"/deck/{deck_id}/export", headers=auth_headers)
+        deck_text = deck_response.get_data(as_text=True)
+        folder_response = client.get(
+            f"/folder/{folder_id}/export?format=csv", headers=auth_headers
+        )
+        folder_text = folder_response.get_data(as_text=True)
+        bad_format = client.get(
+            f"/deck/{deck_id}/export?format=xml", headers=auth_headers
+        )
+        missing = client.get("/folder/999/export", headers=auth_headers)
+
+        assert deck_response.status_code == 200
+        assert deck_response.mimetype == "application/x-ndjson"
+        assert json.loads(deck_text)["answer"] == "Energy"
+        assert folder_response.mimetype == "text/csv"
+        assert (
+            f'filename="folder-{folder_id}.csv"'
+            in folder_response.headers["Content-Disposition"]
+        )
+        assert folder_text.splitlines()[1].startswith("Cells,")
+        assert bad_format.status_code == 400
+        assert missing.status_code == 404
@@ -0,0 +1,150 @@
+import threading
+import time
+import pytest
+from services.gemini_client import (
+    AIUnavailableError,
+    CircuitBreaker,
+    CircuitOpenError,
+    GeminiClient,
+    get_gemini_client,
+)
+from services.ai_service import AIService
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestCircuitBreaker:
+
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10)
+
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.CLOSED
+        breaker.record_failure()
+
+        assert breaker.state == CircuitBreaker.OPEN
+        assert not breaker.allow_request()
+
+    def test_success_resets_failure_count(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10)
+
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    def test_half_open_allows_a_single_trial(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=clock)
+        breaker.record_failure()
+
+        clock.now = 11
+        assert breaker.allow_request()
+        assert not breaker.allow_request()
+
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+
+        clock.now = 22
+        assert breaker.allow_request()
+        breaker.record_success()
+        assert breaker.state == CircuitBreaker.CLOSED
+
+
+class TestGeminiClient:
+
+    @pytest.fixture
+    def gemini(self, fake_gemini):
+        return GeminiClient(
+            "test-key",
+            base_url=fake_gemini.url,
+            timeout=2.0,
+            max_retries=2,
+            backoff_base=0.01,
+            failure_threshold=3,
+        )
+
+    def test_returns_response_text(self, gemini, fake_gemini):
+        fake_gemini.reply = "Hello"
+
+        assert gemini.generate("Say hello") == "Hello"
+        assert fake_gemini.requests == ["Say hello"]
+
+    def test_retries_transient_errors(self, gemini, fake_gemini):
+        fake_gemini.fail_next(503, 429)
+        fake_gemini.reply = "Recovered"
+
+        assert gemini.generate("prompt") == "Recovered"
+        assert len(fake_gemini.requests) == 3
+
+    def test_does_not_retry_client_errors(self, gemini, fake_gemini):
+        fake_gemini.fail_next(400)
+
+        with pytest.raises(Exception) as error:
+            gemini.generate("prompt")
+
+        assert not isinstance(error.value, AIUnavailableError)
+        assert len(fake_gemini.requests) == 1
+
+    def test_deadline_bounds_slow_calls(self, gemini, fake_gemini):
+        fake_gemini.latency = 1.0
+
+        start = time.monotonic()
+        with pytest.raises(AIUnavailableError):
+            gemini.generate("prompt", timeout=0.3)
+
+        assert time.monotonic() - start < 0.9
+
+    def test_circuit_opens_and_fails_fast(self, gemini, fake_gemini):
+        fake_gemini.fail_next(*[500] * 10)
+
+        with pytest.raises(AIUnavailableError):
+            gemini.generate("prompt")
+        calls = len(fake_gemini.requests)
+        with pytest.raises(CircuitOpenError):
+            gemini.generate("prompt")
+
+        assert calls == 3
+        assert len(fake_gemini.requests) == calls
+
+    def test_concurrency_is_bounded(self, fake_gemini):
+        gemini = GeminiClient(
+            "test-key", base_url=fake_gemini.url, max_concurrency=1, timeout=2.0
+        )
+        fake_gemini.latency = 0.5
+        worker = threading.Thread(target=gemini.generate, args=("first",))
+        worker.start()
+        time.sleep(0.1)
+
+        with pytest.raises(AIUnavailableError, match="busy"):
+            gemini.generate("second", timeout=0.2)
+        worker.join()
+
+        assert fake_gemini.requests == ["first"]
+
+
+class TestSharedClient:
+
+    def test_client_is_shared_per_process(self, app, fake_gemini):
+        with app.app_context():
+            assert get_gemini_client() is get_gemini_client()
+            assert AIService().client is AIService().client
+
+    def test_chat_returns_503_when_upstream_is_down(
+        self, app, client, fake_redis, auth_headers, fake_gemini
+    ):
+        app.config["GEMINI_MAX_RETRIES"] = 0
+        fake_gemini.fail_next(503)
+
+        response = client.post(
+            "/ai/chat", json={"query": "How am I doing?"}, headers=auth_headers
+        )
+
+        assert response.status_code == 503
@@ -0,0 +1,129 @@
+import io
+import pytest
+from services.import_service import ImportService, detect_format, iter_card_rows
+from models import User, Card
+
+
+def _rows(text, fmt):
+    return list(iter_card_rows(io.StringIO(text), fmt))
+
+
+class TestCardRows:
+
+    def test_csv_with_header(self):
+        text = 'Answer,Question,Difficulty\n"Energy, mostly",What is ATP?,Hard\n'
+
+        assert _rows(text, "csv") == [(2, "What is ATP?", "Energy, mostly", "hard")]
+
+    def test_csv_without_header(self):
+        text = 'What is ATP?,Energy\n"Multi\nline?",Yes,easy\n'
+
+        assert _rows(text, "csv") == [
+            (1, "What is ATP?", "Energy", "medium"),
+            (3, "Multi\nline?", "Yes", "easy"),
+        ]
+
+    def test_invalid_rows_are_reported(self):
+        text = "Only a question\n\n,Answer\nQ,A,impossible\n"
+
+        rows = _rows(text, "csv")
+
+        assert [row[0] for row in rows] == [1, 3, 4]
+        assert all(row[1] is None for row in rows)
+        assert "unknown difficulty" in rows[2][3]
+
+    def test_anki_export(self):
+        text = (
+            "#separator:tab\n"
+            "#html:true\n"
+            "#tags column:3\n"
+            "What is <b>ATP</b>?\tEnergy<br>currency\tbiology\n"
+        )
+
+        assert _rows(text, "anki") == [
+            (4, "What is ATP?", "Energy\ncurrency", "medium")
+        ]
+
+    def test_detect_format(self):
+        assert detect_format("a,b\n", "cards.csv") == "csv"
+        assert detect_format("a\tb\n", None) == "tsv"
+        assert detect_format("#separator:tab\n", None) == "anki"
+        assert detect_format("a\tb\n", "export.txt") == "anki"
+        assert detect_format("a,b\n", None) == "csv"
+
+
+class TestImportCards:
+
+    @pytest.fixture(autouse=True)
+    def setup_deck(self, app, card_data, make_user, make_folder, make_deck):
+        with app.app_context():
+            self.user_id = make_user("importuser")
+            self.deck_id = make_deck(
+                make_folder(self.user_id), self.user_id, cards=[card_data("Q0", "A")]
+            )
+
+    def test_import_in_batches(self, app, monkeypatch):
+        monkeypatch.setattr(ImportService, "BATCH_SIZE", 7)
+        lines = ["question,answer"]
+        lines += [f"Q{number},A{number}" for number in range(50)]
+        lines += ["Q3,again", "broken row"]
+        stream = io.BytesIO("\n".join(lines).encode())
+
+        with app.app_context():
+            result = ImportService.import_cards(stream, self.deck_id, self.user_id)
+            count = Card.query.filter_by(deck_id=self.deck_id).count()
+
+        summary = result["data"]
+        assert summary["format"] == "csv"
+        assert summary["inserted"] == 49
+        # Q0 was already in the deck, Q3 repeats across batches
+        assert summary["duplicates"] == 2
+        assert summary["invalid"] == 1
+        assert summary["errors"] == [
+            {"line": 53, "error": "question and answer are required"}
+        ]
+        assert count == 50
+
+    def test_bom_and_windows_line_endings(self, app):
+        stream = io.BytesIO("﻿What is ATP?\tEnergy\r\nQ1\tA1\r\n".encode())
+
+        with app.app_context():
+            result = ImportService.import_cards(stream, self.deck_id, self.user_id)
+            question = Card.query.filter_by(answer="Energy").one().question
+
+        assert result["data"]["inserted"] == 2
+        assert question == "What is ATP?"
+
+    def test_deck_of_another_user(self, app):
+        with app.app_context():
+            with pytest.raises(ValueError, match="Deck is not found"):
+                ImportService.import_cards(io.BytesIO(b"Q,A"), self.deck_id, "other")
+
+
+class TestImportRoute:
+
+    def test_upload_file(
+        self, app, client, fake_redis, auth_headers, make_folder, make_deck
+    ):
+        with app.app_context():
+            user = User.query.filter_by(username="testuser").first()
+            deck_id = make_deck(make_folder(user.id), user.id)
+
+        response = client.post(
+            f"/deck/{deck_id}/import",
+            data={"file": (io.BytesIO(b"Q1\tA1\nQ2\tA2\n"), "cards.tsv")},
+            headers=auth_headers,
+            content_type="multipart/form-data",
+        )
+        raw = client.post(
+            f"/deck/{deck_id}/import?format=csv",
+            data=b"Q3,A3\nQ1,A1\n",
+            headers={**auth_headers, "Content-Type": "text/csv"},
+        )
+        missing = client.post("/deck/999/import", data=b"Q,A\n", headers=auth_headers)
+
+        assert response.status_code == 201
+        assert response.get_json()["data"]["inserted"] == 2
+        assert raw.get_json()["data"]["inserted"] == 1
+        assert raw.get_json()["data"]["duplicates"] == 1
+        assert missing.status_code == 404
@@ -0,0 +1,295 @@
+import pytest
+import json
+import threading
+import time
+import numpy as np
+from services.ai_service import AIService
+from services.embedding_service import set_embedder
+from services.gemini_client import AIUnavailableError
+from services.job_service import (
+    JOB_HANDLERS,
+    JobLimitError,
+    RedisJobQueue,
+    ThreadPoolJobQueue,
+    job_handler,
+)
+from services.rate_limit_service import MemoryBucketStore, TokenBudgetLimiter
+from models import User, Folder, Deck, db
+
+
+def _wait_for(get_job, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = get_job()
+        if job["status"] in ("succeeded", "failed"):
+            return job
+        time.sleep(0.01)
+    pytest.fail("Job did not finish in time")
+
+
+@pytest.fixture
+def blocking_handler():
+    """Register a job handler that waits until released."""
+    release = threading.Event()
+
+    @job_handler("test_block")
+    def handler(payload, report_progress):
+        report_progress(50, "halfway")
+        release.wait(5)
+        return {"echo": payload["value"]}
+
+    yield release
+    release.set()
+    JOB_HANDLERS.pop("test_block", None)
+
+
+class TestThreadPoolJobQueue:
+
+    def test_job_runs_and_reports_result(self, app, blocking_handler):
+        queue = ThreadPoolJobQueue(max_concurrency=2)
+        job = queue.submit("test_block", "user-1", {"value": 42}, app)
+
+        assert job["status"] == "queued"
+        blocking_handler.set()
+        finished = _wait_for(lambda: queue.get(job["id"], "user-1"))
+
+        assert finished["status"] == "succeeded"
+        assert finished["progress"] == 100
+        assert finished["result"] == {"echo": 42}
+
+    def test_job_is_only_visible_to_owner(self, app, blocking_handler):
+        queue = ThreadPoolJobQueue()
+        job = queue.submit("test_block", "user-1", {"value": 1}, app)
+
+        assert queue.get(job["id"], "user-2") is None
+        assert queue.get("missing", "user-1") is None
+
+    def test_per_user_limit(self, app, blocking_handler):
+        queue = ThreadPoolJobQueue(max_concurrency=4, max_per_user=2)
+        queue.submit("test_block", "user-1", {"value": 1}, app)
+        queue.submit("test_block", "user-1", {"value": 2}, app)
+
+        with pytest.raises(JobLimitError):
+            queue.submit("test_block", "user-1", {"value": 3}, app)
+
+        # Other users are not affected
+        queue.submit("test_block", "user-2", {"value": 4}, app)
+
+    def test_global_limit(self, app, blocking_handler):
+        queue = ThreadPoolJobQueue(max_concurrency=1, max_per_user=5, max_pending=2)
+        queue.submit("test_block", "user-1", {"value": 1}, app)
+        queue.submit("test_block", "user-2", {"value": 2}, app)
+
+        with pytest.raises(JobLimitError):
+            queue.submit("test_block", "user-3", {"value": 3}, app)
+
+    def test_failed_job_records_error(self, app):
+        @job_handler("test_fail")
+        def handler(payload, report_progress):
+            raise ValueError("bad input")
+
+        try:
+            queue = ThreadPoolJobQueue()
+            job = queue.submit("test_fail", "user-1", {}, app)
+            finished = _wait_for(lambda: queue.get(job["id"], "user-1"))
+        finally:
+            JOB_HANDLERS.pop("test_fail", None)
+
+        assert finished["status"] == "failed"
+        assert finished["error"] == "bad input"
+
+
+class TestRedisJobQueue:
+
+    @pytest.fixture
+    def queue(self):
+        fakeredis = pytest.importorskip("fakeredis", reason="fakeredis not installed")
+        return RedisJobQueue(fakeredis.FakeRedis(), max_concurrency=1, max_per_user=1)
+
+    def test_worker_processes_queued_job(self, app, queue, blocking_handler):
+        job = queue.submit("test_block", "user-1", {"value": "hi"}, app)
+        assert queue.get(job["id"], "user-1")["status"] == "queued"
+
+        blocking_handler.set()
+        assert queue.work_once(app, timeout=1) is True
+
+        finished = queue.get(job["id"], "user-1")
+        assert finished["status"] == "succeeded"
+        assert finished["result"] == {"echo": "hi"}
+
+    def test_per_user_slot_released_after_job(self, app, queue, blocking_handler):
+        queue.submit("test_block", "user-1", {"value": 1}, app)
+        with pytest.raises(JobLimitError):
+            queue.submit("test_block", "user-1", {"value": 2}, app)
+
+        blocking_handler.set()
+        queue.work_once(app, timeout=1)
+
+        queue.submit("test_block", "user-1", {"value": 3}, app)
+
+    def test_global_concurrency_limit(self, app, queue):
+        assert queue._acquire(queue._key("running"), "other-worker", 1)
+
+        assert queue.work_once(app, timeout=0.1) is False
+
+    def test_slots_of_a_crashed_worker_expire(self, app, queue, monkeypatch):
+        queue.submit("test_block", "user-1", {"value": 1}, app)
+        assert queue._acquire(queue._key("running"), "crashed-worker", 1)
+        with pytest.raises(JobLimitError):
+            queue.submit("test_block", "user-1", {"value": 2}, app)
+
+        later = time.time() + queue.job_ttl + 1
+        monkeypatch.setattr(time, "time", lambda: later)
+
+        queue.submit("test_block", "user-1", {"value": 3}, app)
+        assert queue._acquire(queue._key("running"), "next-worker", 1)
+
+    def test_job_records_expire(self, app, queue, blocking_handler):
+        job = queue.submit("test_block", "user-1", {"value": "hi"}, app)
+        job_key, payload_key = queue._key("job", job["id"]), queue._key(
+            "payload", job["id"]
+        )
+        assert 0 < queue.redis.ttl(job_key) <= queue.job_ttl
+        assert 0 < queue.redis.ttl(payload_key) <= queue.job_ttl
+
+        blocking_handler.set()
+        queue.work_once(app, timeout=1)
+
+        assert 0 < queue.redis.ttl(job_key) <= queue.result_ttl
+        assert not queue.redis.exists(payload_key)
+
+    def test_empty_queue(self, app, queue):
+        assert queue.work_once(app, timeout=0.1) is False
+
+
+class TestGenerationJobRoutes:
+
+    @pytest.fixture(autouse=True)
+    def setup_deck(self, app, fake_redis, auth_headers, monkeypatch):
+        monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+        # Keep duplicate detection local instead of loading the embedding model
+        set_embedder(lambda texts: np.eye(len(texts), 8, dtype=np.float32))
+        with app.app_context():
+            user = User.query.filter_by(username="testuser").first()
+            folder = Folder(name="Biology", user_id=user.id)
+            db.session.add(folder)
+            db.session.flush()
+            deck = Deck(name="Cells", folder_id=folder.id)
+            db.session.add(deck)
+            db.session.commit()
+            self.deck_id = deck.id
+        self.headers = auth_headers
+        yield
+        set_embedder(None)
+
+    def test_generate_cards_returns_job(self, client, monkeypatch):
+        monkeypatch.setattr(
+            AIService,
+            "_generate_content",
+            lambda self, prompt: json.dumps(
+                [
+                    {
+                        "question": "What is ATP?",
+                        "answer": "Energy",
+                        "difficulty_level": "easy",
+                    }
+                ]
+            ),
+        )
+
+        response = client.post(
+            "/ai/generate-cards",
+            json={
+                "content": "ATP stores energy.",
+                "deck_id": self.deck_id,
+                "num_cards": 1,
+            },
+            headers=self.headers,
+        )
+
+        assert response.status_code == 202
+        job_id = response.get_json()["data"]["job_id"]
+
+        job = _wait_for(
+            lambda: client.get(f"/ai/jobs/{job_id}", headers=self.headers).get_json()[
+                "data"
+            ]
+        )
+        assert job["status"] == "succeeded"
+        assert job["result"]["deck_id"] == self.deck_id
+        assert job["result"]["cards"][0]["question"] == "What is ATP?"
+        assert job["result"]["cards"][0]["near_duplicates"] == []
+
+    def _generate(self, app, client, content="ATP stores energy."):
+        # A stopped clock keeps the budget from refilling during the job
+        limiter = TokenBudgetLimiter(MemoryBucketStore(), clock=lambda: 1000.0)
+        app.extensions["ai_rate_limiter"] = limiter
+        response = client.post(
+            "/ai/generate-cards",
+            json={"content": content, "deck_id": self.deck_id, "num_cards": 1},
+            headers=self.headers,
+        )
+        assert response.status_code == 202
+        job_id = response.get_json()["data"]["job_id"]
+        job = _wait_for(
+            lambda: client.get(f"/ai/jobs/{job_id}", headers=self.headers).get_json()[
+                "data"
+            ]
+        )
+        with app.app_context():
+            user = User.query.filter_by(username="testuser").first()
+            used = limiter.usage(user.id)["user"]["used"]
+        return job, used
+
+    def test_generation_settles_the_tokens_used(self, app, client, monkeypatch):
+        cards = [
+            {"question": "What is ATP?", "answer": "Energy", "difficulty_level": "easy"}
+        ]
+        monkeypatch.setattr(
+            AIService, "_generate_content", lambda self, prompt: json.dumps(cards)
+        )
+
+        job, used = self._generate(app, client)
+
+        assert job["status"] == "succeeded"
+        with app.app_context():
+            expected = AIService.count_generation_tokens(
+                ["ATP stores energy."], 1, "medium", cards
+            )
+            estimated = AIService.estimate_generation_tokens(
+                ["ATP stores energy."], 1, "medium"
+            )
+        assert used == expected
+        assert used < estimated
+
+    def test_failed_generation_is_refunded(self, app, client, monkeypatch):
+        monkeypatch.setattr(
+            AIService, "_generate_content", lambda self, prompt: "not json"
+        )
+
+        job, used = self._generate(app, client)
+
+        assert job["status"] == "failed"
+        assert used == 0
+
+    def test_offline_fallback_is_refunded(self, app, client, monkeypatch):
+        def unavailable(self, prompt):
+            raise AIUnavailableError("Gemini is down")
+
+        monkeypatch.setattr(AIService, "_generate_content", unavailable)
+
+        job, used = self._generate(
+            app,
+            client,
+            "The mitochondria is the powerhouse of the eukaryotic cell. "
+            "Enzymes speed up chemical reactions by lowering the activation energy.",
+        )
+
+        assert job["status"] == "succeeded"
+        assert job["result"]["metadata"]["generator"] == "offline"
+        assert used == 0
+
+    def test_unknown_job(self, client):
+        response = client.get("/ai/jobs/does-not-exist", headers=self.headers)
+
+        assert response.status_code == 404
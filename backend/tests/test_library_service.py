@@ -0,0 +1,113 @@
+import json
+import pytest
+from sqlalchemy import event
+from services.crud_service import CRUDService
+from services.library_service import LibraryService
+from models import User, Deck, db
+
+
+def _tree(user_id):
+    library = LibraryService.get_library(user_id)["data"]
+    return json.loads("".join(library["chunks"]))["data"]["folders"]
+
+
+class TestLibraryService:
+
+    @pytest.fixture(autouse=True)
+    def setup_user(self, app, card_data, make_user, make_folder, make_deck):
+        with app.app_context():
+            self.user_id = make_user("libraryuser")
+        self.card_data = card_data
+        self.make_folder = make_folder
+        self.make_deck = make_deck
+
+    def add_library(self, folders, decks, cards):
+        """Add folders of decks of cards through the services."""
+        for folder_number in range(folders):
+            folder_id = self.make_folder(self.user_id, f"Folder {folder_number}")
+            for deck_number in range(decks):
+                self.make_deck(
+                    folder_id,
+                    self.user_id,
+                    f"Deck {deck_number}",
+                    [
+                        self.card_data(f"Question {n} " + "x" * 200, "A")
+                        for n in range(cards)
+                    ],
+                )
+
+    def test_tree(self, app, monkeypatch):
+        monkeypatch.setattr(LibraryService, "CHUNK_SIZE", 2)
+        with app.app_context():
+            self.add_library(2, 2, 5)
+            # An empty folder and an empty deck
+            self.make_deck(
+                self.make_folder(self.user_id, "Empty"), self.user_id, "Blank"
+            )
+
+            folders = _tree(self.user_id)
+
+        assert [folder["name"] for folder in folders] == [
+            "Empty",
+            "Folder 0",
+            "Folder 1",
+        ]
+        assert folders[0]["decks"][0]["cards"] == []
+        assert folders[1]["cardCount"] == 10
+        deck = folders[1]["decks"][1]
+        assert deck["name"] == "Deck 1"
+        assert deck["card_count"] == 5
+        assert len(deck["cards"]) == 5
+        assert deck["cards"][0]["question"].startswith("Question 0")
+        assert len(deck["cards"][0]["question"]) == CRUDService.QUESTION_PREVIEW_LENGTH
+
+    def test_empty_library(self, app):
+        with app.app_context():
+            assert _tree(self.user_id) == []
+
+    @pytest.mark.parametrize("size", [(1, 1, 1), (3, 4, 30)])
+    def test_query_count(self, app, size):
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        with app.app_context():
+            self.add_library(*size)
+            event.listen(db.engine, "before_cursor_execute", listener)
+            try:
+                folders = _tree(self.user_id)
+            finally:
+                event.remove(db.engine, "before_cursor_execute", listener)
+
+        assert len(folders) == size[0]
+        # Stale check, ETag, then folders, decks and cards
+        assert len(statements) == 5
+
+    def test_etag_changes_with_the_library(self, app):
+        with app.app_context():
+            self.add_library(1, 1, 2)
+            first = LibraryService.etag(self.user_id)
+            same = LibraryService.etag(self.user_id)
+            deck_id = Deck.query.first().id
+            CRUDService.add_new_card(self.card_data("New", "A"), deck_id, self.user_id)
+            added = LibraryService.etag(self.user_id)
+
+        assert first == same
+        assert added != first
+
+
+class TestLibraryRoute:
+
+    def test_etag(self, app, client, fake_redis, auth_headers, make_folder):
+        with app.app_context():
+            user = User.query.filter_by(username="testuser").first()
+            make_folder(user.id)
+
+        response = client.get("/library", headers=auth_headers)
+        body = response.get_json()
+        etag = response.headers["ETag"]
+        cached = client.get("/library", headers={**auth_headers, "If-None-Match": etag})
+
+        assert response.status_code == 200
+        assert etag.startswith('W/"')
+        assert body["data"]["folders"][0]["name"] == "Biology"
+        assert cached.status_code == 304
+        assert cached.data == b""
@@ -0,0 +1,203 @@
+import pytest
+import json
+import os
+import threading
+from services.ai_service import AIService
+from services.pdf_service import (
+    allocate_cards,
+    chunk_text,
+    dedupe_cards,
+    iter_pdf_pages,
+    spooled_pdf,
+)
+
+
+def _make_pdf(path, pages):
+    """Write a PDF with one drawn line of text per entry on each page."""
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.pagesizes import letter
+
+    c = canvas.Canvas(path, pagesize=letter)
+    for lines in pages:
+        y = 750
+        for line in lines:
+            c.drawString(72, y, line)
+            y -= 20
+        c.showPage()
+    c.save()
+
+
+class UploadedPDF:
+    """Minimal stand-in for werkzeug's FileStorage."""
+
+    def __init__(self, path, filename):
+        self.stream = open(path, "rb")
+        self.filename = filename
+
+    def close(self):
+        self.stream.close()
+
+
+class TestPDFService:
+
+    @pytest.fixture
+    def pdf_path(self, tmp_path):
+        pytest.importorskip("reportlab", reason="reportlab not installed")
+        pytest.importorskip("pypdf", reason="pypdf not installed")
+        path = str(tmp_path / "notes.pdf")
+        _make_pdf(
+            path,
+            [
+                ["Photosynthesis converts light into chemical energy."],
+                ["Mitochondria produce ATP for the cell."],
+                ["Ribosomes assemble proteins from amino acids."],
+            ],
+        )
+        return path
+
+    def test_iter_pdf_pages_yields_each_page(self, pdf_path):
+        pages = list(iter_pdf_pages(pdf_path))
+
+        assert len(pages) == 3
+        assert "Photosynthesis" in pages[0]
+        assert "Ribosomes" in pages[2]
+
+    def test_spooled_pdf_removes_temp_file(self, pdf_path):
+        upload = UploadedPDF(pdf_path, "notes.pdf")
+        try:
+            with spooled_pdf(upload) as temp_path:
+                assert os.path.exists(temp_path)
+                assert os.path.getsize(temp_path) == os.path.getsize(pdf_path)
+            assert not os.path.exists(temp_path)
+        finally:
+            upload.close()
+
+    def test_spooled_pdf_removes_temp_file_on_error(self, pdf_path):
+        upload = UploadedPDF(pdf_path, "notes.pdf")
+        try:
+            with pytest.raises(RuntimeError):
+                with spooled_pdf(upload) as temp_path:
+                    raise RuntimeError("boom")
+            assert not os.path.exists(temp_path)
+        finally:
+            upload.close()
+
+    def test_chunk_text_respects_budget(self):
+        pages = ["One two three. Four five six. " * 20, "Seven eight nine. " * 20]
+        count = lambda text: len(text.split())
+
+        chunks = list(chunk_text(pages, 10, count))
+
+        assert len(chunks) > 1
+        assert all(count(chunk) <= 10 for chunk in chunks)
+        assert sum(count(chunk) for chunk in chunks) == sum(
+            count(page) for page in pages
+        )
+
+    def test_chunk_text_splits_oversized_sentence(self):
+        pages = ["word " * 25]
+        count = lambda text: len(text.split())
+
+        chunks = list(chunk_text(pages, 10, count))
+
+        assert [count(chunk) for chunk in chunks] == [10, 10, 5]
+
+    def test_oversized_sentence_counts_each_word_once(self):
+        calls = []
+
+        def count(text):
+            calls.append(text)
+            return len(text.split())
+
+        chunks = list(chunk_text(["word " * 2000], 100, count))
+        counted = len(calls)
+
+        assert [len(chunk.split()) for chunk in chunks] == [100] * 20
+        # The sentence, each word, and the joined piece at each boundary
+        assert counted <= 1 + 2000 + 20
+
+    def test_allocate_cards(self):
+        assert allocate_cards(3, 7) == [(0, 3), (1, 2), (2, 2)]
+        assert allocate_cards(10, 2) == [(0, 1), (5, 1)]
+        assert allocate_cards(0, 5) == []
+
+    def test_dedupe_cards_ignores_case_and_punctuation(self):
+        cards = [
+            {"question": "What is ATP?", "answer": "Energy"},
+            {"question": "what is atp", "answer": "Energy currency"},
+            {"question": "What are ribosomes?", "answer": "Protein factories"},
+        ]
+
+        unique = dedupe_cards(cards)
+
+        assert [c["question"] for c in unique] == [
+            "What is ATP?",
+            "What are ribosomes?",
+        ]
+
+    def test_generate_cards_from_pdf_uses_document_text(self, pdf_path, monkeypatch):
+        prompts = []
+        lock = threading.Lock()
+
+        def fake_generate(self, prompt):
+            with lock:
+                prompts.append(prompt)
+            return json.dumps(
+                [
+                    {
+                        "question": "What does the cell use for energy?",
+                        "answer": "ATP",
+                        "difficulty_level": "medium",
+                    },
+                    {
+                        "question": f"Question {len(prompts)}",
+                        "answer": "Answer",
+                        "difficulty_level": "medium",
+                    },
+                ]
+            )
+
+        monkeypatch.setattr(AIService, "_generate_content", fake_generate)
+        monkeypatch.setattr(AIService, "PDF_CHUNK_TOKENS", 15)
+
+        upload = UploadedPDF(pdf_path, "notes.pdf")
+        try:
+            result = AIService().generate_cards_from_pdf(upload, 4, 1, "medium")
+        finally:
+            upload.close()
+
+        data = result["data"]
+        assert data["source"] == "pdf"
+        assert data["metadata"]["num_chunks"] == 3
+        assert len(prompts) == 3
+        assert any("Mitochondria" in prompt for prompt in prompts)
+
+        # The repeated question from every chunk is kept only once
+        questions = [card["question"] for card in data["cards"]]
+        assert questions.count("What does the cell use for energy?") == 1
+        assert len(questions) == len(set(questions))
+
+    def test_generate_cards_from_chunks_tolerates_partial_failure(self, monkeypatch):
+        def fake_generate(self, prompt):
+            if "bad chunk" in prompt:
+                raise RuntimeError("upstream error")
+            return json.dumps(
+                [{"question": "Q", "answer": "A", "difficulty_level": "easy"}]
+            )
+
+        monkeypatch.setattr(AIService, "_generate_content", fake_generate)
+
+        cards = AIService().generate_cards_from_chunks(
+            ["good chunk", "bad chunk"], 2, "easy"
+        )
+
+        assert cards == [{"question": "Q", "answer": "A", "difficulty_level": "easy"}]
+
+    def test_generate_cards_from_chunks_raises_when_all_fail(self, monkeypatch):
+        def fake_generate(self, prompt):
+            raise RuntimeError("upstream error")
+
+        monkeypatch.setattr(AIService, "_generate_content", fake_generate)
+
+        with pytest.raises(RuntimeError, match="upstream error"):
+            AIService().generate_cards_from_chunks(["a", "b"], 2, "easy")
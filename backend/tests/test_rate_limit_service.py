@@ -0,0 +1,144 @@
+import pytest
+from services.rate_limit_service import (
+    MemoryBucketStore,
+    RateLimitExceeded,
+    RedisBucketStore,
+    TokenBudgetLimiter,
+    get_rate_limiter,
+)
+from models import User
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture(params=["memory", "redis"])
+def store(request):
+    if request.param == "memory":
+        return MemoryBucketStore()
+    fakeredis = pytest.importorskip("fakeredis", reason="fakeredis not installed")
+    return RedisBucketStore(fakeredis.FakeRedis())
+
+
+class TestTokenBudgetLimiter:
+
+    @pytest.fixture
+    def limiter(self, store, clock):
+        return TokenBudgetLimiter(
+            store,
+            user_tokens_per_minute=600,
+            global_tokens_per_minute=1000,
+            clock=clock,
+        )
+
+    def test_allows_bursts_up_to_the_budget(self, limiter):
+        limiter.consume("alice", 400)
+        status = limiter.consume("alice", 200)
+
+        assert status["remaining"] == 0
+        with pytest.raises(RateLimitExceeded) as error:
+            limiter.consume("alice", 100)
+
+        assert error.value.scope == "user"
+        assert error.value.retry_after == 10
+
+    def test_budget_refills_over_time(self, limiter, clock):
+        limiter.consume("alice", 600)
+
+        clock.now += 30
+
+        assert limiter.usage("alice")["user"]["remaining"] == 300
+        limiter.consume("alice", 300)
+
+    def test_users_have_separate_budgets(self, limiter):
+        limiter.consume("alice", 600)
+
+        limiter.consume("bob", 300)
+
+    def test_global_budget_is_shared(self, limiter):
+        limiter.consume("alice", 600)
+        limiter.consume("bob", 300)
+
+        with pytest.raises(RateLimitExceeded) as error:
+            limiter.consume("carol", 200)
+
+        assert error.value.scope == "global"
+        # A rejected request takes nothing
+        assert limiter.usage("carol")["user"]["remaining"] == 600
+
+    def test_reservation_settles_real_usage(self, limiter):
+        with limiter.reservation("alice", 500) as reservation:
+            reservation.used = 120
+
+        assert limiter.usage("alice")["user"]["used"] == 120
+
+    def test_failed_request_is_refunded(self, limiter):
+        with pytest.raises(RuntimeError):
+            with limiter.reservation("alice", 500):
+                raise RuntimeError("upstream failed")
+
+        assert limiter.usage("alice")["user"]["remaining"] == 600
+
+    def test_oversized_request_needs_a_full_budget(self, limiter, clock):
+        limiter.consume("alice", 900)
+
+        with pytest.raises(RateLimitExceeded):
+            limiter.consume("alice", 1)
+        clock.now += 90
+        limiter.consume("alice", 1)
+
+
+class TestRateLimitRoutes:
+
+    @pytest.fixture(autouse=True)
+    def setup(self, app, fake_redis, auth_headers, fake_gemini):
+        app.config["AI_USER_TOKENS_PER_MINUTE"] = 2500
+        app.extensions.pop("ai_rate_limiter", None)
+        fake_gemini.reply = "Keep going!"
+        self.headers = auth_headers
+
+    def _chat(self, client):
+        return client.post(
+            "/ai/chat", json={"query": "How am I doing?"}, headers=self.headers
+        )
+
+    def test_chat_reports_budget_headers(self, client):
+        response = self._chat(client)
+
+        assert response.status_code == 200
+        usage = response.get_json()["data"]["usage"]
+        assert response.headers["RateLimit-Limit"] == "2500"
+        remaining = int(response.headers["RateLimit-Remaining"])
+        # The bucket keeps refilling while the request runs
+        assert 2500 - usage["total_tokens"] <= remaining < 2500
+
+    def test_chat_over_budget_is_rejected(self, app, client):
+        with app.app_context():
+            user = User.query.filter_by(username="testuser").first()
+            get_rate_limiter().settle(user.id, 2000)
+
+        response = self._chat(client)
+
+        assert response.status_code == 429
+        assert int(response.headers["Retry-After"]) > 0
+
+    def test_usage_endpoint(self, client):
+        self._chat(client)
+
+        response = client.get("/ai/usage", headers=self.headers)
+
+        data = response.get_json()["data"]
+        assert response.status_code == 200
+        assert data["user"]["limit"] == 2500
+        assert data["user"]["used"] > 0
+        assert data["global"]["limit"] == 500000
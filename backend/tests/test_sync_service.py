@@ -0,0 +1,156 @@
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import update
+from services.crud_service import CRUDService
+from services.review_service import ReviewService
+from services.sync_service import SyncService, _encode_token
+from models import Folder, Deck, Card, Review, db
+
+
+def _ids(changes, kind):
+    return [row["id"] for row in changes[kind]]
+
+
+class TestSyncService:
+
+    @pytest.fixture(autouse=True)
+    def setup_library(
+        self, app, fixed_similarity, card_data, make_user, make_folder, make_deck
+    ):
+        with app.app_context():
+            self.user_id = make_user("syncuser")
+            self.other_id = make_user("otheruser")
+            self.deck_ids = [
+                make_deck(
+                    make_folder(user_id),
+                    user_id,
+                    cards=[card_data(f"Q{number}") for number in range(5)],
+                )
+                for user_id in (self.user_id, self.other_id)
+            ]
+            self.card_id = (
+                db.session.execute(
+                    db.select(Card.id).where(Card.deck_id == self.deck_ids[0])
+                )
+                .scalars()
+                .first()
+            )
+            ReviewService.submit_review(self.card_id, self.user_id, {"answer": "A"})
+
+    def age_everything(self, days=1):
+        """Make every row look as if it was last changed days ago."""
+        long_ago = datetime.utcnow() - timedelta(days=days)
+        for model in (Folder, Deck, Card, Review):
+            db.session.execute(update(model).values(updated_at=long_ago))
+        db.session.commit()
+
+    def test_first_sync_sends_everything_of_the_user(self, app):
+        with app.app_context():
+            changes = SyncService.get_changes(self.user_id)["data"]
+
+        assert len(changes["folders"]) == 1
+        assert changes["decks"][0]["id"] == self.deck_ids[0]
+        assert len(changes["cards"]) == 5
+        assert {card["deck_id"] for card in changes["cards"]} == {self.deck_ids[0]}
+        assert changes["reviews"][0]["card_id"] == self.card_id
+        assert changes["cards"][0]["deleted_at"] is None
+        assert changes["has_more"] is False
+
+    def test_delta_sends_only_changes(self, app):
+        with app.app_context():
+            self.age_everything()
+            token = SyncService.get_changes(self.user_id)["data"]["next_token"]
+            assert SyncService.get_changes(self.user_id, token)["data"]["cards"] == []
+
+            CRUDService.update_one_card(
+                self.card_id, self.user_id, {"answer": "Edited"}
+            )
+            changes = SyncService.get_changes(self.user_id, token)["data"]
+
+        assert _ids(changes, "cards") == [self.card_id]
+        assert changes["cards"][0]["answer"] == "Edited"
+        assert changes["folders"] == []
+        assert changes["reviews"] == []
+
+    def test_changes_just_before_the_token_are_sent_again(self, app):
+        # A server whose clock ran two minutes behind the database's
+        app.config["SYNC_OVERLAP_SECONDS"] = 300
+        with app.app_context():
+            self.age_everything()
+            now = db.session.scalar(db.select(db.func.now()))
+            db.session.execute(
+                update(Card)
+                .where(Card.id == self.card_id)
+                .values(updated_at=now - timedelta(minutes=2))
+            )
+            db.session.commit()
+
+            changes = SyncService.get_changes(self.user_id, _encode_token(now))["data"]
+            # A token made by a database clock that is now behind
+            future = _encode_token(now + timedelta(days=2))
+            future_changes = SyncService.get_changes(self.user_id, future)["data"]
+
+        assert _ids(changes, "cards") == [self.card_id]
+        assert _ids(future_changes, "cards") == [self.card_id]
+
+    def test_deleted_rows_are_sent_to_existing_clients_only(self, app):
+        with app.app_context():
+            self.age_everything()
+            token = SyncService.get_changes(self.user_id)["data"]["next_token"]
+            CRUDService.delete_one_card(self.card_id, self.user_id)
+
+            changes = SyncService.get_changes(self.user_id, token)["data"]
+            fresh = SyncService.get_changes(self.user_id)["data"]
+
+        assert _ids(changes, "cards") == [self.card_id]
+        assert changes["cards"][0]["deleted_at"] is not None
+        assert changes["reviews"][0]["deleted_at"] is not None
+        assert self.card_id not in _ids(fresh, "cards")
+
+    def test_pages(self, app, card_data):
+        with app.app_context():
+            token, pages, cards = None, 0, []
+            while True:
+                changes = SyncService.get_changes(self.user_id, token, limit=2)["data"]
+                cards += _ids(changes, "cards")
+                token = changes["next_token"]
+                pages += 1
+                if not changes["has_more"]:
+                    break
+
+            # A card added while paging is sent by the next sync
+            CRUDService.add_new_card(card_data("Late"), self.deck_ids[0], self.user_id)
+            late = SyncService.get_changes(self.user_id, token)["data"]
+
+        assert pages == 3
+        assert sorted(cards) == cards and len(set(cards)) == 5
+        assert "Late" in [card["question"] for card in late["cards"]]
+
+    def test_token_older_than_purged_rows_expires(self, app):
+        app.config["PURGE_AFTER_SECONDS"] = 3600
+        with app.app_context():
+            token = _encode_token(datetime.utcnow() - timedelta(hours=2))
+            with pytest.raises(ValueError, match="token has expired"):
+                SyncService.get_changes(self.user_id, token)
+
+    def test_invalid_token(self, app):
+        with app.app_context():
+            for token in ("not a token", _encode_token(None)[:-3] + "abc"):
+                with pytest.raises(ValueError, match="token is not valid"):
+                    SyncService.get_changes(self.user_id, token)
+
+
+class TestSyncRoutes:
+
+    def test_sync(self, app, client, fake_redis, auth_headers):
+        first = client.get("/sync", headers=auth_headers)
+        token = first.get_json()["data"]["next_token"]
+        again = client.get(f"/sync?since={token}", headers=auth_headers)
+        bad = client.get("/sync?since=nonsense", headers=auth_headers)
+        bad_limit = client.get("/sync?limit=0", headers=auth_headers)
+
+        assert first.status_code == 200
+        assert first.get_json()["data"]["folders"] == []
+        assert again.status_code == 200
+        assert bad.status_code == 400
+        assert bad_limit.status_code == 400
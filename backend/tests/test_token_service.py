@@ -0,0 +1,134 @@
+import pytest
+from services.ai_service import AIService
+from services.token_service import (
+    TokenCounter,
+    get_token_counter,
+    heuristic_token_count,
+    pack_context,
+)
+from models import Card, db
+
+
+class TestTokenCounter:
+
+    def test_heuristic_counts_words_and_punctuation(self):
+        assert heuristic_token_count("") == 0
+        assert heuristic_token_count("cell") == 1
+        assert heuristic_token_count("mitochondria") == 3
+        assert heuristic_token_count('{"a": 1}') == 7
+
+    def test_counts_are_memoized(self):
+        calls = []
+
+        def count_fn(text):
+            calls.append(text)
+            return len(text.split())
+
+        counter = TokenCounter(count_fn)
+        assert counter.count("deck name") == 2
+        assert counter.count("deck name") == 2
+
+        assert calls == ["deck name"]
+        assert counter.cache_info().hits == 1
+
+    def test_unavailable_tokenizer_falls_back_to_heuristic(self):
+        counter = get_token_counter("tiktoken:no-such-encoding")
+
+        assert counter.name == "heuristic"
+        assert counter.count("mitochondria") == 3
+
+    def test_unknown_tokenizer_falls_back_to_heuristic(self):
+        assert get_token_counter("nonsense").name == "heuristic"
+
+    def test_estimate_tokens_uses_configured_counter(self, app):
+        with app.app_context():
+            assert AIService.estimate_tokens("mitochondria") == 3
+
+
+class TestPackContext:
+
+    @pytest.fixture
+    def counter(self):
+        return TokenCounter(heuristic_token_count)
+
+    def test_everything_fits(self, counter):
+        sections = [("stats", {"total": 3}), ("items", ["a", "b", "c"])]
+
+        context, used = pack_context(sections, 1000, counter)
+
+        assert context == {"stats": {"total": 3}, "items": ["a", "b", "c"]}
+        assert used == counter.count_json(context)
+
+    def test_never_exceeds_budget(self, counter):
+        items = [{"question": f"Question number {i}", "score": i} for i in range(50)]
+        sections = [("stats", {"total_reviews": 120}), ("struggles", items)]
+
+        for budget in (5, 20, 57, 100, 250):
+            context, used = pack_context(sections, budget, counter)
+            assert used <= budget
+            assert counter.count_json(context) == used
+
+    def test_fills_in_priority_order(self, counter):
+        sections = [
+            ("first", ["alpha " * 5] * 4),
+            ("second", ["beta"] * 50),
+        ]
+
+        context, used = pack_context(sections, 80, counter)
+
+        # Higher-priority items are all taken before lower-priority ones
+        assert len(context["first"]) == 4
+        assert 0 < len(context["second"]) < 50
+        assert used <= 80
+
+    def test_skips_items_that_do_not_fit(self, counter):
+        sections = [("items", ["short", "a much much much longer item " * 10, "tiny"])]
+
+        context, _ = pack_context(sections, 20, counter)
+
+        assert context["items"] == ["short", "tiny"]
+
+    def test_stops_scanning_after_consecutive_misses(self, counter):
+        sections = [("items", ["big item " * 20] * 10 + ["tiny"])]
+
+        context, _ = pack_context(sections, 20, counter, max_skips=5)
+
+        assert context["items"] == []
+
+
+class TestCompressedContext:
+
+    @pytest.fixture(autouse=True)
+    def setup_cards(self, app, make_user, make_folder, make_deck):
+        with app.app_context():
+            self.user_id = make_user("testuser")
+            folder_id = make_folder(self.user_id)
+            for deck_number in range(10):
+                deck_id = make_deck(folder_id, self.user_id, f"Deck {deck_number}")
+                for card_number in range(5):
+                    db.session.add(
+                        Card(
+                            question=f"Question {card_number} of deck {deck_number}",
+                            answer="Answer",
+                            difficulty_level="easy",
+                            deck_id=deck_id,
+                            is_fully_reviewed=deck_number % 2 == 0,
+                        )
+                    )
+            db.session.commit()
+
+    def test_context_fits_budget(self, app):
+        with app.app_context():
+            counter = get_token_counter()
+            for budget in (10, 50, 200, 2000):
+                context = AIService.create_compressed_context(self.user_id, budget)
+                assert counter.count_json(context) <= budget
+
+            full = AIService.create_compressed_context(self.user_id, 2000)
+            assert list(full) == [
+                "study_stats",
+                "recent_struggles",
+                "focus_areas",
+                "mastered_topics",
+            ]
+            assert len(full["mastered_topics"]) == 5
@@ -0,0 +1,190 @@
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, event, func
+from sqlalchemy.exc import IntegrityError
+from services.crud_service import CRUDService
+from services.review_service import ReviewService
+from services.trash_service import INCLUDE_DELETED, TrashService
+from models import Folder, Deck, Card, Review, CardEmbedding, db
+from models.card import add_soft_delete_indexes
+from run import purge_deleted
+
+
+def _stored(model):
+    # Rows in the table, deleted or not
+    return db.session.scalar(
+        db.select(func.count()).select_from(model).execution_options(**INCLUDE_DELETED)
+    )
+
+
+class TestTrashService:
+
+    @pytest.fixture(autouse=True)
+    def setup_user(
+        self, app, fixed_similarity, card_data, make_user, make_folder, make_deck
+    ):
+        with app.app_context():
+            self.user_id = make_user("trashuser")
+        self.card_data = card_data
+        self.make_folder = make_folder
+        self.make_deck = make_deck
+
+    def add_folder(self, name, decks, cards):
+        folder_id = self.make_folder(self.user_id, name)
+        for deck_number in range(decks):
+            self.make_deck(
+                folder_id,
+                self.user_id,
+                f"Deck {deck_number}",
+                [self.card_data(f"Q{number}") for number in range(cards)],
+            )
+        return folder_id
+
+    def test_deleted_folder_is_hidden(self, app):
+        with app.app_context():
+            folder_id = self.add_folder("Biology", 2, 3)
+            deck_id = db.session.scalars(db.select(Deck.id)).first()
+            card_id = db.session.scalars(db.select(Card.id)).first()
+            ReviewService.submit_review(card_id, self.user_id, {"answer": "A"})
+
+            CRUDService.delete_one_folder(folder_id, self.user_id)
+
+            assert CRUDService.get_all_folders(self.user_id)["data"] == []
+            with pytest.raises(ValueError, match="Deck does not exist"):
+                CRUDService.get_one_deck(deck_id, self.user_id)
+            assert db.session.get(Card, card_id) is None
+            assert db.session.scalars(db.select(Review)).all() == []
+            # The rows are kept until they are purged
+            assert _stored(Card) == 6
+            assert _stored(Review) == 1
+
+            # The name of a deleted folder can be used again
+            self.add_folder("Biology", 1, 3)
+            folders = CRUDService.get_all_folders(self.user_id)["data"]
+
+        assert [folder["cardCount"] for folder in folders] == [3]
+
+    def test_deleted_card_and_deck(self, app):
+        with app.app_context():
+            folder_id = self.add_folder("Biology", 2, 3)
+            first, second = db.session.scalars(db.select(Deck.id)).all()
+            card_id = db.session.scalars(
+                db.select(Card.id).where(Card.deck_id == first)
+            ).first()
+
+            CRUDService.delete_one_card(card_id, self.user_id)
+            CRUDService.add_new_card(self.card_data("Q0"), first, self.user_id)
+            CRUDService.delete_one_deck(second, self.user_id)
+            deck = CRUDService.get_one_deck(first, self.user_id)["data"]
+            folder = db.session.get(Folder, folder_id)
+
+        assert len(deck["cards"]) == 3
+        assert (folder.deck_count, folder.card_count) == (1, 3)
+
+    def test_delete_statements_do_not_grow_with_the_tree(self, app):
+        counts = []
+        with app.app_context():
+            for name, decks, cards in (("Small", 1, 2), ("Large", 4, 30)):
+                folder_id = self.add_folder(name, decks, cards)
+                statements = []
+                listener = lambda *args: statements.append(args[2])
+                event.listen(db.engine, "before_cursor_execute", listener)
+                try:
+                    CRUDService.delete_one_folder(folder_id, self.user_id)
+                finally:
+                    event.remove(db.engine, "before_cursor_execute", listener)
+                counts.append(len(statements))
+
+        assert counts[0] == counts[1]
+
+    def test_purge_in_batches(self, app):
+        with app.app_context():
+            kept = self.add_folder("Kept", 1, 2)
+            folder_id = self.add_folder("Biology", 2, 4)
+            card_ids = db.session.scalars(
+                db.select(Card.id).join(Deck).where(Deck.folder_id == folder_id)
+            ).all()
+            ReviewService.submit_review(card_ids[0], self.user_id, {"answer": "A"})
+            db.session.add(
+                CardEmbedding(
+                    card_id=card_ids[0],
+                    user_id=self.user_id,
+                    content_hash="hash",
+                    vector=b"\0" * 4,
+                )
+            )
+            db.session.commit()
+            CRUDService.delete_one_folder(folder_id, self.user_id)
+
+            recent = TrashService.purge(datetime.utcnow() - timedelta(days=1))
+            purged = TrashService.purge(
+                datetime.utcnow() + timedelta(seconds=1), batch_size=3
+            )
+
+            assert recent == {"review": 0, "card": 0, "deck": 0, "folder": 0}
+            assert purged == {"review": 1, "card": 8, "deck": 2, "folder": 1}
+            assert _stored(Card) == 2
+            assert _stored(CardEmbedding) == 0
+            assert db.session.get(Folder, kept) is not None
+
+    def test_purge_command(self, app):
+        app.config["PURGE_AFTER_SECONDS"] = -1
+        with app.app_context():
+            folder_id = self.add_folder("Biology", 1, 2)
+            CRUDService.delete_one_folder(folder_id, self.user_id)
+
+        result = app.test_cli_runner().invoke(purge_deleted)
+
+        assert "Purged 0 reviews, 2 cards, 1 decks, 1 folders" in result.output
+
+    def test_soft_delete_indexes_of_an_older_database(self):
+        engine = create_engine("sqlite://")
+        with engine.begin() as connection:
+            for statement in (
+                "CREATE TABLE folder (id INTEGER PRIMARY KEY, name VARCHAR,"
+                " user_id VARCHAR(36), deleted_at DATETIME, updated_at DATETIME,"
+                " CONSTRAINT uix_user_folder_name UNIQUE (user_id, name))",
+                "CREATE TABLE deck (id INTEGER PRIMARY KEY, name VARCHAR,"
+                " folder_id INTEGER, deleted_at DATETIME, updated_at DATETIME,"
+                " CONSTRAINT uix_folder_deck_name UNIQUE (folder_id, name))",
+                "CREATE TABLE card (id INTEGER PRIMARY KEY, question TEXT,"
+                " answer TEXT, deck_id INTEGER, next_review_at DATETIME,"
+                " deleted_at DATETIME, updated_at DATETIME,"
+                " CONSTRAINT uix_deck_card_question UNIQUE (deck_id, question))",
+                "CREATE TABLE review (id INTEGER PRIMARY KEY, user_id VARCHAR(36),"
+                " deleted_at DATETIME, updated_at DATETIME)",
+                "INSERT INTO folder VALUES (1, 'Bio', 'u1', '2024-01-01', NULL)",
+                "INSERT INTO deck VALUES (1, 'Cells', 1, NULL, NULL)",
+                "INSERT INTO card VALUES (7, 'Q', 'A', 1, NULL, NULL, NULL)",
+            ):
+                connection.exec_driver_sql(statement)
+
+            replaced = add_soft_delete_indexes(connection)
+            again = add_soft_delete_indexes(connection)
+            # The deleted folder's name can be used again, a live one cannot
+            connection.exec_driver_sql(
+                "INSERT INTO folder (id, name, user_id) VALUES (2, 'Bio', 'u1')"
+            )
+            with pytest.raises(IntegrityError):
+                connection.exec_driver_sql(
+                    "INSERT INTO folder (id, name, user_id) VALUES (3, 'Bio', 'u1')"
+                )
+            cards = connection.exec_driver_sql("SELECT id, question FROM card").all()
+            # The search triggers are back on the rebuilt card table
+            connection.exec_driver_sql(
+                "INSERT INTO card (id, question, answer, deck_id) VALUES (8, 'R', 'A', 1)"
+            )
+            found = connection.exec_driver_sql(
+                "SELECT rowid FROM card_fts WHERE card_fts MATCH 'R'"
+            ).all()
+            indexes = connection.exec_driver_sql("PRAGMA index_list(review)").all()
+
+        assert replaced == [
+            "uix_user_folder_name",
+            "uix_folder_deck_name",
+            "uix_deck_card_question",
+        ]
+        assert again == []
+        assert cards == [(7, "Q")]
+        assert found == [(8,)]
+        assert "ix_review_deleted" in [index[1] for index in indexes]
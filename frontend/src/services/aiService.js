@@ -1,5 +1,33 @@
 import api, { createFormData } from './api';
 
+const JOB_POLL_INTERVAL = 1000;
+const JOB_TIMEOUT = 120000;
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+/**
+ * Poll a background job until it succeeds or fails
+ */
+async function waitForJob(jobId) {
+  const deadline = Date.now() + JOB_TIMEOUT;
+
+  while (Date.now() < deadline) {
+    const response = await api.get(`/ai/jobs/${jobId}`);
+    const job = response.data.data;
+
+    if (job.status === 'succeeded') {
+      return job.result;
+    }
+    if (job.status === 'failed') {
+      throw new Error(job.error || 'Failed to generate cards');
+    }
+
+    await sleep(JOB_POLL_INTERVAL);
+  }
+
+  throw new Error('Card generation is taking too long, please try again');
+}
+
 const aiService = {
   /**
    * Generate flashcards from text content or PDF file
@@ -21,7 +49,7 @@ const aiService = {
           headers: {
             'Content-Type': 'multipart/form-data',
           },
-          timeout: 45000, // Longer timeout for AI generation
+          timeout: 45000, // Longer timeout for PDF upload and text extraction
         });
       } else {
         // Text input - use JSON
@@ -30,19 +58,20 @@ const aiService = {
           deck_id: parseInt(deckId), // Convert to integer
           num_cards: parseInt(numCards),
           difficulty: difficulty
-        }, {
-          timeout: 30000, // Timeout for text generation
         });
       }
       
+      // Generation runs as a background job
+      const result = await waitForJob(response.data.data.job_id);
+
       return {
         success: true,
-        data: response.data.data
+        data: result
       };
     } catch (error) {
       return {
         success: false,
-        error: error.response?.data?.error || 'Failed to generate cards'
+        error: error.response?.data?.error || error.message || 'Failed to generate cards'
       };
     }
   },